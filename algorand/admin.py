@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import SwapLog
+from .models import SwapLog, TrackedTransaction
 
 
 @admin.register(SwapLog)
@@ -16,3 +16,11 @@ class SwapLogAdmin(admin.ModelAdmin):
     list_filter = ("status", "from_currency", "to_currency")
     search_fields = ("transaction__id", "transaction__user__email", "tx_id")
     readonly_fields = ("created_at",)
+
+
+@admin.register(TrackedTransaction)
+class TrackedTransactionAdmin(admin.ModelAdmin):
+    list_display = ("tx_id", "kind", "status", "first_round", "last_valid_round", "confirmed_round", "created_at")
+    list_filter = ("status", "kind")
+    search_fields = ("tx_id",)
+    readonly_fields = ("created_at", "resolved_at")
@@ -0,0 +1,153 @@
+"""
+Asynchronous confirmation tracking for submitted Algorand transactions.
+
+Submitters record the transaction with ``track`` and return immediately. The
+``poll_confirmations`` Celery task then runs ``ConfirmationTracker.poll``. Each poll
+fetches the transaction ids of every block not yet searched for some pending
+transaction, with one ``get_block_txids`` call per round, however many transactions
+are in flight. Every row remembers the last round searched for it in
+``scanned_round``, starting from its ``first_round``, so a row committed after its
+transaction already confirmed is still found. The poll marks the tracked ones
+confirmed and expires those whose whole validity window was searched in vain. It
+then resumes each caller through the dotted-path ``callback`` stored with the
+transaction. A Celery task is queued with the tracked transaction id; a plain
+function is called with the instance. Each row is resolved, and its caller
+resumed, by one poll only.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Optional
+
+from django.conf import settings
+from django.db.models import BigIntegerField, F, Min, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import TrackedTransaction, TrackedTransactionStatus
+
+logger = logging.getLogger(__name__)
+
+
+def track(
+    tx_id: str,
+    *,
+    kind: str,
+    first_round: int,
+    last_valid_round: int,
+    callback: str = "",
+    context: Optional[dict] = None,
+) -> TrackedTransaction:
+    tracked, _ = TrackedTransaction.objects.get_or_create(
+        tx_id=tx_id,
+        defaults={
+            "kind": kind,
+            "first_round": first_round,
+            "last_valid_round": last_valid_round,
+            "callback": callback,
+            "context": context or {},
+        },
+    )
+    return tracked
+
+
+def track_submitted(txn, *, kind: str, callback: str = "", context: Optional[dict] = None) -> TrackedTransaction:
+    """Track an algosdk transaction that has just been sent, using its validity window."""
+    return track(
+        txn.get_txid(),
+        kind=kind,
+        first_round=txn.first_valid_round,
+        last_valid_round=txn.last_valid_round,
+        callback=callback,
+        context=context,
+    )
+
+
+def async_confirmations_enabled() -> bool:
+    return getattr(settings, "ALGORAND_ASYNC_CONFIRMATIONS", True)
+
+
+class ConfirmationTracker:
+    def __init__(self, *, algod_client=None, max_rounds: Optional[int] = None):
+        self._algod_client = algod_client
+        self.max_rounds = max(1, max_rounds or getattr(settings, "ALGORAND_CONFIRMATION_MAX_ROUNDS", 50))
+
+    @property
+    def algod_client(self):
+        if self._algod_client is None:
+            from .utils import get_algod_client
+
+            self._algod_client = get_algod_client()
+        return self._algod_client
+
+    def poll(self) -> dict[str, int]:
+        """Scan rounds not yet searched for pending transactions; returns rounds scanned and transactions resolved."""
+        pending = TrackedTransaction.objects.filter(status=TrackedTransactionStatus.PENDING)
+        next_round = Coalesce(F("scanned_round") + 1, F("first_round"), output_field=BigIntegerField())
+        start = pending.aggregate(start=Min(next_round))["start"]
+        summary = {"rounds": 0, "confirmed": 0, "expired": 0}
+        if start is None:
+            return summary
+
+        last_round = self.algod_client.status()["last-round"]
+        end = min(last_round, start + self.max_rounds - 1)
+        if end < start:
+            return summary
+
+        in_flight = dict(pending.values_list("tx_id", "id"))
+        resolved: list[int] = []
+        now = timezone.now()
+        for round_number in range(start, end + 1):
+            block_tx_ids = self.algod_client.get_block_txids(round_number).get("blockTxids") or []
+            for tracked_id in [in_flight.pop(tx_id) for tx_id in block_tx_ids if tx_id in in_flight]:
+                if self._resolve(
+                    tracked_id,
+                    status=TrackedTransactionStatus.CONFIRMED,
+                    confirmed_round=round_number,
+                    resolved_at=now,
+                ):
+                    summary["confirmed"] += 1
+                    resolved.append(tracked_id)
+        summary["rounds"] = end - start + 1
+
+        # Every round up to ``end`` has now been searched for the rows still in flight.
+        TrackedTransaction.objects.filter(pk__in=in_flight.values(), first_round__lte=end).filter(
+            Q(scanned_round__isnull=True) | Q(scanned_round__lt=end)
+        ).update(scanned_round=end)
+
+        # Not committed anywhere in its validity window: it can no longer be confirmed.
+        expired = TrackedTransaction.objects.filter(
+            pk__in=in_flight.values(), last_valid_round__lte=F("scanned_round")
+        ).values_list("id", "scanned_round")
+        for tracked_id, scanned_round in list(expired):
+            if self._resolve(
+                tracked_id,
+                status=TrackedTransactionStatus.EXPIRED,
+                error=f"Not confirmed by round {scanned_round}.",
+                resolved_at=now,
+            ):
+                summary["expired"] += 1
+                resolved.append(tracked_id)
+
+        for tracked in TrackedTransaction.objects.filter(pk__in=resolved).exclude(callback=""):
+            self._resume(tracked)
+        return summary
+
+    @staticmethod
+    def _resolve(tracked_id: int, **fields) -> bool:
+        """Resolve a still-pending row; False when a concurrent poll already did."""
+        return bool(
+            TrackedTransaction.objects.filter(pk=tracked_id, status=TrackedTransactionStatus.PENDING).update(**fields)
+        )
+
+    def _resume(self, tracked: TrackedTransaction) -> None:
+        try:
+            target = import_string(tracked.callback)
+            if hasattr(target, "delay"):
+                target.delay(tracked.id)
+            else:
+                target(tracked)
+        except Exception:
+            logger.exception("Confirmation callback %s failed for %s.", tracked.callback, tracked.tx_id)
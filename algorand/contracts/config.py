@@ -0,0 +1,12 @@
+"""Subscription contract parameters, importable without PyTeal."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+
+@dataclass
+class SubscriptionContractConfig:
+    plan_id: int
+    price_micro_algo: int
+    renew_interval_rounds: int
+    treasury_address: str
@@ -1,8 +1,6 @@
 """PyTeal smart contract primitives for subscription management."""
 from __future__ import annotations
 
-from dataclasses import dataclass
-
 from pyteal import (
     Addr,
     And,
@@ -14,11 +12,16 @@ from pyteal import (
     Mode,
     OnComplete,
     Return,
+    ScratchVar,
     Seq,
+    TealType,
+    Tmpl,
     Txn,
     compileTeal,
 )
 
+from .config import SubscriptionContractConfig
+
 
 PLAN_KEY = Bytes("plan_id")
 PRICE_KEY = Bytes("price")
@@ -32,24 +35,40 @@ STATUS_ACTIVE = Bytes("active")
 STATUS_CANCELLED = Bytes("cancelled")
 
 
-@dataclass
-class SubscriptionContractConfig:
-    plan_id: int
-    price_micro_algo: int
-    renew_interval_rounds: int
-    treasury_address: str
-
-
 def approval_program(cfg: SubscriptionContractConfig):
     """Approval program storing plan metadata and user status."""
+    return _approval_router(
+        Int(cfg.plan_id), Int(cfg.price_micro_algo), Int(cfg.renew_interval_rounds), Addr(cfg.treasury_address)
+    )
+
 
+def approval_template():
+    """
+    ``approval_program`` with ``TMPL_`` placeholders for the plan parameters.
+
+    The placeholders are read into scratch slots before the first branch. Per-plan
+    bytecode can then be produced by substituting their encodings in place: no
+    branch offset spans them, so their length may change freely.
+    """
+    plan_id, price, interval = (ScratchVar(TealType.uint64) for _ in range(3))
+    treasury = ScratchVar(TealType.bytes)
+    return Seq(
+        plan_id.store(Tmpl.Int("TMPL_PLAN_ID")),
+        price.store(Tmpl.Int("TMPL_PRICE")),
+        interval.store(Tmpl.Int("TMPL_INTERVAL")),
+        treasury.store(Tmpl.Addr("TMPL_TREASURY")),
+        _approval_router(plan_id.load(), price.load(), interval.load(), treasury.load()),
+    )
+
+
+def _approval_router(plan_id, price, interval, treasury):
     is_creator = Txn.sender() == Global.creator_address()
 
     on_create = Seq(
-        App.globalPut(PLAN_KEY, Int(cfg.plan_id)),
-        App.globalPut(PRICE_KEY, Int(cfg.price_micro_algo)),
-        App.globalPut(INTERVAL_KEY, Int(cfg.renew_interval_rounds)),
-        App.globalPut(TREASURY_KEY, Addr(cfg.treasury_address)),
+        App.globalPut(PLAN_KEY, plan_id),
+        App.globalPut(PRICE_KEY, price),
+        App.globalPut(INTERVAL_KEY, interval),
+        App.globalPut(TREASURY_KEY, treasury),
         Return(Int(1)),
     )
 
@@ -101,6 +120,13 @@ def clear_state_program():
     return Return(Int(1))
 
 
+def get_template_sources(version: int = 8) -> dict[str, str]:
+    """TEAL sources of the plan-independent template; regenerate ``contracts/teal/`` with these."""
+    approval_teal = compileTeal(approval_template(), mode=Mode.Application, version=version, assembleConstants=True)
+    clear_teal = compileTeal(clear_state_program(), mode=Mode.Application, version=version)
+    return {"approval": approval_teal, "clear": clear_teal}
+
+
 def get_teal_sources(cfg: SubscriptionContractConfig, version: int = 8) -> dict[str, str]:
     """Compile PyTeal to TEAL source strings."""
     approval_teal = compileTeal(approval_program(cfg), mode=Mode.Application, version=version)
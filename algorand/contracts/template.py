@@ -0,0 +1,118 @@
+"""
+Per-plan subscription contract bytecode rendered from one compiled template.
+
+``teal/subscription_approval.teal`` is the approval program with ``TMPL_``
+placeholders, generated from ``subscription_contract.get_template_sources``. It is
+compiled once, with sentinel values standing in for the placeholders. The sentinels'
+byte offsets in the program are recorded, and each plan's program is then the
+template with the plan's own encodings spliced in at those offsets. Integers are
+``pushint`` varuints and may change length; the template reads every placeholder
+before its first branch, so no branch offset spans them. Addresses are 32 bytes
+and are replaced in place.
+
+PyTeal is only needed to regenerate the ``.teal`` files, not to render programs.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:  # pragma: no cover
+    from algorand.contracts.config import SubscriptionContractConfig
+
+TEAL_DIR = Path(__file__).with_name("teal")
+APPROVAL_TEMPLATE_PATH = TEAL_DIR / "subscription_approval.teal"
+CLEAR_PROGRAM_PATH = TEAL_DIR / "subscription_clear.teal"
+
+PUSHINT = b"\x81"
+PUSHBYTES_32 = b"\x80\x20"
+
+INT_VARIABLES = ("TMPL_PLAN_ID", "TMPL_PRICE", "TMPL_INTERVAL")
+ADDRESS_VARIABLES = ("TMPL_TREASURY",)
+
+
+def encode_uvarint(value: int) -> bytes:
+    """TEAL's varuint encoding (unsigned LEB128) of a uint64."""
+    if not 0 <= value < 2**64:
+        raise ValueError(f"{value} does not fit in a uint64.")
+    encoded = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            encoded.append(byte | 0x80)
+        else:
+            encoded.append(byte)
+            return bytes(encoded)
+
+
+def _sentinels() -> dict[str, tuple[str, bytes]]:
+    """Stand-in for each placeholder: its TEAL literal and the bytecode it compiles to."""
+    sentinels = {}
+    for index, name in enumerate(INT_VARIABLES):
+        # Ten-byte varuints near 2**64: nothing else in the program encodes like this.
+        value = 2**64 - 1 - index
+        sentinels[name] = (str(value), PUSHINT + encode_uvarint(value))
+    for name in ADDRESS_VARIABLES:
+        value = hashlib.sha256(name.encode("ascii")).digest()
+        sentinels[name] = ("0x" + value.hex(), PUSHBYTES_32 + value)
+    return sentinels
+
+
+@dataclass(frozen=True)
+class TemplateSlot:
+    name: str
+    offset: int
+    length: int
+
+
+class ContractTemplate:
+    def __init__(self, program: bytes, slots: list[TemplateSlot], clear_program: bytes, sources: dict[str, str]):
+        self.program = program
+        self.slots = sorted(slots, key=lambda slot: slot.offset)
+        self.clear_program = clear_program
+        self.sources = sources
+
+    @classmethod
+    def build(cls, compile_program: Callable[[str], bytes]) -> "ContractTemplate":
+        """Compile the template once through ``compile_program`` and locate its placeholders."""
+        sources = {"approval": APPROVAL_TEMPLATE_PATH.read_text(), "clear": CLEAR_PROGRAM_PATH.read_text()}
+        sentinels = _sentinels()
+        source = sources["approval"]
+        for name, (literal, _) in sentinels.items():
+            if name not in source:
+                raise ValueError(f"Contract template has no {name} placeholder.")
+            source = source.replace(name, literal)
+        program = compile_program(source)
+
+        slots = []
+        for name, (_, compiled) in sentinels.items():
+            offset = program.find(compiled)
+            if offset < 0 or program.find(compiled, offset + 1) >= 0:
+                raise ValueError(f"Cannot locate {name} exactly once in the compiled template.")
+            # Keep the opcode (and pushbytes length); only the immediate value is substituted.
+            prefix = len(PUSHINT) if name in INT_VARIABLES else len(PUSHBYTES_32)
+            slots.append(TemplateSlot(name, offset + prefix, len(compiled) - prefix))
+        return cls(program, slots, compile_program(sources["clear"]), sources)
+
+    def render(self, cfg: "SubscriptionContractConfig") -> bytes:
+        """The plan's approval program, byte for byte what compiling it with its own constants yields."""
+        from algosdk import encoding
+
+        values = {
+            "TMPL_PLAN_ID": encode_uvarint(cfg.plan_id),
+            "TMPL_PRICE": encode_uvarint(cfg.price_micro_algo),
+            "TMPL_INTERVAL": encode_uvarint(cfg.renew_interval_rounds),
+            "TMPL_TREASURY": encoding.decode_address(cfg.treasury_address),
+        }
+        parts = []
+        cursor = 0
+        for slot in self.slots:
+            parts.append(self.program[cursor : slot.offset])
+            parts.append(values[slot.name])
+            cursor = slot.offset + slot.length
+        parts.append(self.program[cursor:])
+        return b"".join(parts)
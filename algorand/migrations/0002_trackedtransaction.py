@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('algorand', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackedTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tx_id', models.CharField(max_length=64, unique=True)),
+                ('kind', models.CharField(max_length=32)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('expired', 'Expired')], default='pending', max_length=12)),
+                ('first_round', models.BigIntegerField()),
+                ('last_valid_round', models.BigIntegerField()),
+                ('confirmed_round', models.BigIntegerField(blank=True, null=True)),
+                ('callback', models.CharField(blank=True, help_text='Dotted path of a function or Celery task.', max_length=255)),
+                ('context', models.JSONField(blank=True, default=dict)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'first_round'], name='algorand_tr_status_54f314_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('algorand', '0002_trackedtransaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompiledProgram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_hash', models.CharField(max_length=64, unique=True)),
+                ('program', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
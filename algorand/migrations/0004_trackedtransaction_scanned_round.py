@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('algorand', '0003_compiledprogram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trackedtransaction',
+            name='scanned_round',
+            field=models.BigIntegerField(blank=True, help_text='Last round searched for this transaction.', null=True),
+        ),
+    ]
@@ -16,3 +16,46 @@ class SwapLog(models.Model):
     def __str__(self):
         return f"Swap {self.amount_in} ALGO → {self.amount_out or '...'} USDC"
 
+
+class TrackedTransactionStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    CONFIRMED = "confirmed", "Confirmed"
+    EXPIRED = "expired", "Expired"
+
+
+class TrackedTransaction(models.Model):
+    """A submitted transaction whose confirmation is polled by ``ConfirmationTracker``."""
+
+    tx_id = models.CharField(max_length=64, unique=True)
+    kind = models.CharField(max_length=32)
+    status = models.CharField(
+        max_length=12, choices=TrackedTransactionStatus.choices, default=TrackedTransactionStatus.PENDING
+    )
+    first_round = models.BigIntegerField()
+    last_valid_round = models.BigIntegerField()
+    scanned_round = models.BigIntegerField(null=True, blank=True, help_text="Last round searched for this transaction.")
+    confirmed_round = models.BigIntegerField(null=True, blank=True)
+    callback = models.CharField(max_length=255, blank=True, help_text="Dotted path of a function or Celery task.")
+    context = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=("status", "first_round")),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.tx_id} ({self.status})"
+
+
+class CompiledProgram(models.Model):
+    """TEAL bytecode keyed by the SHA-256 of its source, shared by every worker and deploy."""
+
+    source_hash = models.CharField(max_length=64, unique=True)
+    program = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Program {self.source_hash[:12]} ({len(self.program)} bytes)"
@@ -1,21 +1,24 @@
 from __future__ import annotations
 
+import logging
 from dataclasses import dataclass
 from typing import Optional
 
-from algosdk import account
-try:
-    from algosdk.future import transaction  # Compat with older SDKs
-except ModuleNotFoundError:  # pragma: no cover - py-algorand-sdk >=2.0
-    from algosdk import transaction
-from algosdk.v2client import algod
-
 from django.conf import settings
 
 from subscriptions.models import Plan, Subscription
 
-from .contracts.subscription_contract import SubscriptionContractConfig
-from .utils import deploy_subscription_contract, get_algod_client
+from .confirmations import async_confirmations_enabled, track_submitted
+from .contracts.config import SubscriptionContractConfig
+from .utils import (
+    deploy_subscription_contract,
+    get_algod_client,
+    get_suggested_params,
+    get_transaction_module,
+    submit_subscription_contract,
+)
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -33,43 +36,86 @@ def get_subscription_config(plan: Plan, interval_rounds: int) -> SubscriptionCon
     )
 
 
-def deploy_plan_contract(plan: Plan, interval_rounds: int = 30 * 60) -> int:
+def deploy_plan_contract(plan: Plan, interval_rounds: int = 30 * 60, *, wait: bool = True) -> Optional[int]:
+    """
+    Deploy the plan's contract and store its app ID.
+
+    With ``wait=False`` the creation is only submitted; ``record_plan_contract`` stores
+    the app ID once the confirmation tracker sees it committed, and ``None`` is returned.
+    """
     cfg = get_subscription_config(plan, interval_rounds)
+    if not wait:
+        submit_subscription_contract(
+            cfg,
+            callback="algorand.subscription.record_plan_contract",
+            context={"plan_id": plan.id},
+        )
+        return None
     app_id = deploy_subscription_contract(cfg)
     plan.contract_app_id = app_id
     plan.save(update_fields=["contract_app_id"])
     return app_id
 
 
-def opt_in_subscription(subscription: Subscription, subscription_account: SubscriptionAccount, interval_rounds: int = 30 * 60):
+def record_plan_contract(tracked) -> None:
+    """Confirmation callback for ``deploy_plan_contract(wait=False)``."""
+    plan_id = tracked.context.get("plan_id")
+    if tracked.confirmed_round is None:
+        logger.warning("Contract deployment %s for plan %s expired: %s", tracked.tx_id, plan_id, tracked.error)
+        return
+    app_id = get_algod_client().pending_transaction_info(tracked.tx_id).get("application-index")
+    if not app_id:
+        logger.error("Confirmed deployment %s for plan %s has no application index.", tracked.tx_id, plan_id)
+        return
+    Plan.objects.filter(pk=plan_id).update(contract_app_id=app_id)
+
+
+def opt_in_subscription(
+    subscription: Subscription,
+    subscription_account: SubscriptionAccount,
+    interval_rounds: int = 30 * 60,
+    *,
+    wait: Optional[bool] = None,
+) -> str:
     if not subscription.plan.contract_app_id:
         deploy_plan_contract(subscription.plan, interval_rounds)
 
     algod_client = get_algod_client()
-    params = algod_client.suggested_params()
-    txn = transaction.ApplicationOptInTxn(
+    params = get_suggested_params(algod_client)
+    txn = get_transaction_module().ApplicationOptInTxn(
         sender=subscription_account.address,
         sp=params,
         index=subscription.plan.contract_app_id,
         app_args=[b"register"],
     )
-    signed = txn.sign(subscription_account.private_key)
-    tx_id = algod_client.send_transaction(signed)
-    transaction.wait_for_confirmation(algod_client, tx_id, 4)
+    return _submit(algod_client, txn, subscription_account, "opt_in", subscription, wait)
 
 
-def renew_subscription_app(subscription: Subscription, subscription_account: SubscriptionAccount):
+def renew_subscription_app(
+    subscription: Subscription, subscription_account: SubscriptionAccount, *, wait: Optional[bool] = None
+) -> str:
     if not subscription.plan.contract_app_id:
         raise ValueError("Plan does not have a deployed contract")
 
     algod_client = get_algod_client()
-    params = algod_client.suggested_params()
-    txn = transaction.ApplicationNoOpTxn(
+    params = get_suggested_params(algod_client)
+    txn = get_transaction_module().ApplicationNoOpTxn(
         sender=subscription_account.address,
         sp=params,
         index=subscription.plan.contract_app_id,
         app_args=[b"renew"],
     )
+    return _submit(algod_client, txn, subscription_account, "renew_app", subscription, wait)
+
+
+def _submit(algod_client, txn, subscription_account: SubscriptionAccount, kind: str, subscription, wait) -> str:
+    """Send ``txn`` and either wait for it or hand it to the confirmation tracker."""
     signed = txn.sign(subscription_account.private_key)
     tx_id = algod_client.send_transaction(signed)
-    transaction.wait_for_confirmation(algod_client, tx_id, 4)
+    if wait is None:
+        wait = not async_confirmations_enabled()
+    if wait:
+        get_transaction_module().wait_for_confirmation(algod_client, tx_id, 4)
+    else:
+        track_submitted(txn, kind=kind, context={"subscription_id": subscription.id})
+    return tx_id
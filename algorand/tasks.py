@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from algorand.confirmations import ConfirmationTracker
+
+
+@shared_task(ignore_result=True)
+def poll_confirmations() -> dict:
+    """Scan new rounds for tracked transactions and resume their callers."""
+    return ConfirmationTracker().poll()
@@ -1,12 +1,51 @@
+import base64
+from decimal import Decimal
+from io import StringIO
 from unittest import mock
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 
+from algosdk import encoding
+
+from algorand.confirmations import ConfirmationTracker, track
 from algorand.contracts.subscription_contract import (
     SubscriptionContractConfig,
     get_teal_sources,
+    get_template_sources,
+)
+from algorand.contracts.template import (
+    APPROVAL_TEMPLATE_PATH,
+    CLEAR_PROGRAM_PATH,
+    ContractTemplate,
+    encode_uvarint,
 )
-from algorand.utils import compile_subscription_contract
+from algorand.models import CompiledProgram, TrackedTransactionStatus
+from algorand.utils import (
+    CompiledProgramCache,
+    SuggestedParamsProvider,
+    TinymanMetadataCache,
+    compile_subscription_contract,
+    compiled_program_cache,
+    perform_swap_algo_to_usdc,
+)
+from subscriptions.models import CurrencyChoices, Plan
+
+
+def _assemble(source: str) -> bytes:
+    """Stand-in for algod's assembler: real pushint/pushbytes encodings, one byte for any other op."""
+    program = bytearray(b"\x08")
+    for line in source.splitlines():
+        op, _, arg = line.split("//")[0].strip().partition(" ")
+        if op == "pushint":
+            program += b"\x81" + encode_uvarint(int(arg))
+        elif op == "pushbytes":
+            value = bytes.fromhex(arg[2:])
+            program += b"\x80" + encode_uvarint(len(value)) + value
+        elif op and not op.startswith("#") and not op.endswith(":"):
+            program += b"\x01"
+    return bytes(program)
 
 
 class SubscriptionContractTests(TestCase):
@@ -23,12 +62,204 @@ class SubscriptionContractTests(TestCase):
         self.assertIn("plan_id", sources["approval"])
         self.assertTrue(sources["clear"].startswith("#pragma"))
 
+    @mock.patch("algorand.utils._contract_template", None)
     @mock.patch("algorand.utils.compile_teal_source")
     @mock.patch("algorand.utils.get_algod_client")
     def test_compile_subscription_contract(self, mock_client, mock_compile):
         mock_client.return_value = mock.Mock()
-        mock_compile.return_value = b"compiled"
+        mock_compile.side_effect = lambda source, algod_client=None: _assemble(source)
         compiled = compile_subscription_contract(self.config)
-        self.assertEqual(compiled["approval"], b"compiled")
-        self.assertEqual(compiled["clear"], b"compiled")
+        self.assertEqual(compiled["clear"], _assemble(CLEAR_PROGRAM_PATH.read_text()))
         self.assertIn("sources", compiled)
+
+        compile_subscription_contract(self.config)
+        self.assertEqual(mock_compile.call_count, 2)
+
+    def test_template_files_match_the_pyteal_contract(self):
+        sources = get_template_sources()
+        self.assertEqual(APPROVAL_TEMPLATE_PATH.read_text().rstrip("\n"), sources["approval"])
+        self.assertEqual(CLEAR_PROGRAM_PATH.read_text().rstrip("\n"), sources["clear"])
+
+    def test_rendered_programs_match_compiling_with_the_plan_constants(self):
+        template = ContractTemplate.build(_assemble)
+        for plan_id, price, interval in ((1, 1_000_000, 1000), (987_654, 2**40, 1)):
+            cfg = SubscriptionContractConfig(plan_id, price, interval, self.config.treasury_address)
+            source = APPROVAL_TEMPLATE_PATH.read_text()
+            for name, value in (("TMPL_PLAN_ID", plan_id), ("TMPL_PRICE", price), ("TMPL_INTERVAL", interval)):
+                source = source.replace(name, str(value))
+            source = source.replace("TMPL_TREASURY", "0x" + encoding.decode_address(cfg.treasury_address).hex())
+
+            self.assertEqual(template.render(cfg), _assemble(source))
+
+
+class CompiledProgramCacheTests(TestCase):
+    def setUp(self):
+        self.algod = mock.Mock()
+        self.algod.compile.side_effect = lambda source: {"result": base64.b64encode(_assemble(source)).decode()}
+
+    def test_programs_are_compiled_once_and_shared_through_the_database(self):
+        cache = CompiledProgramCache()
+        program = cache.compile("#pragma version 8\nint 1", self.algod)
+        self.assertEqual(cache.compile("#pragma version 8\nint 1", self.algod), program)
+        self.algod.compile.assert_called_once()
+
+        other_worker = CompiledProgramCache()
+        self.assertEqual(other_worker.compile("#pragma version 8\nint 1", mock.Mock(side_effect=AssertionError)), program)
+        self.assertEqual(CompiledProgram.objects.get().source_hash, CompiledProgramCache.key("#pragma version 8\nint 1"))
+
+    @override_settings(ALGORAND_ACCOUNT_ADDRESS="AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAY5HFKQ")
+    @mock.patch("algorand.utils._contract_template", None)
+    @mock.patch("algorand.utils.get_algod_client")
+    def test_warm_command_compiles_the_template_once(self, mock_client):
+        mock_client.return_value = self.algod
+        compiled_program_cache.clear()
+        self.addCleanup(compiled_program_cache.clear)
+        for code in ("warm", "warmer"):
+            Plan.objects.create(code=code, name=code, amount=Decimal("5"), currency=CurrencyChoices.ALGO)
+
+        out = StringIO()
+        call_command("warm_contract_cache", stdout=out)
+
+        # The approval template and the clear program, whatever the number of plans.
+        self.assertEqual(self.algod.compile.call_count, 2)
+        self.assertIn("rendered programs for 2 plan(s)", out.getvalue())
+
+
+class SuggestedParamsProviderTests(TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.background = []
+        self.provider = SuggestedParamsProvider(
+            ttl=3, max_stale=30, clock=lambda: self.now, spawn=self.background.append
+        )
+        self.algod = mock.Mock()
+        self.algod.suggested_params.side_effect = lambda: mock.Mock(first=1000 + self.algod.suggested_params.call_count)
+
+    def test_params_are_fetched_once_per_round_and_copied(self):
+        first = self.provider.get(self.algod)
+        first.fee = 5000
+        second = self.provider.get(self.algod)
+
+        self.algod.suggested_params.assert_called_once()
+        self.assertIsNot(first, second)
+        self.assertNotEqual(second.fee, 5000)
+
+    def test_stale_params_are_served_while_refreshing_in_the_background(self):
+        self.provider.get(self.algod)
+        self.now = 4
+        self.assertEqual(self.provider.get(self.algod).first, 1001)
+        self.assertEqual(self.provider.get(self.algod).first, 1001)
+        self.assertEqual(len(self.background), 1)
+
+        self.background.pop()()
+        self.assertEqual(self.provider.get(self.algod).first, 1002)
+
+        self.now = 60
+        self.assertEqual(self.provider.get(self.algod).first, 1003)
+        self.assertEqual(self.background, [])
+
+
+class TinymanMetadataCacheTests(TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.cache = TinymanMetadataCache(pool_ttl=10, clock=lambda: self.now)
+        self.client = mock.Mock()
+        self.client.fetch_asset.side_effect = lambda asset_id: mock.Mock(id=asset_id)
+        self.client.is_opted_in.return_value = True
+        self.client.is_opted_in_to_asset.return_value = False
+        self.pool = self.client.fetch_pool.return_value
+        self.pool.fetch_fixed_input_swap_quote.return_value.amount_out.amount = 250_000
+        for patcher in (
+            mock.patch("algorand.utils.get_algod_client"),
+            mock.patch("algorand.utils.get_tinyman_client", return_value=self.client),
+            mock.patch("algorand.utils.tinyman_cache", self.cache),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        executor = mock.patch("algorand.utils._execute_transaction_group", return_value={"tx_ids": [], "confirmed_round": 1})
+        self.execute = executor.start()
+        self.addCleanup(executor.stop)
+
+    def _swap(self):
+        return perform_swap_algo_to_usdc("SENDER", "KEY", 1_000_000)
+
+    def test_setup_metadata_is_fetched_once(self):
+        for _ in range(3):
+            self.assertEqual(self._swap()["usdc_received"], 250_000)
+
+        self.assertEqual(self.client.fetch_asset.call_count, 2)
+        self.client.fetch_pool.assert_called_once()
+        self.client.is_opted_in.assert_called_once()
+        self.client.is_opted_in_to_asset.assert_called_once()
+        # The asset opt-in group runs once; every swap then sends only its own group.
+        self.assertEqual(self.execute.call_count, 4)
+        refreshes = [call.kwargs["refresh"] for call in self.pool.fetch_fixed_input_swap_quote.call_args_list]
+        self.assertEqual(refreshes, [False, False, False])
+
+    def test_stale_pools_are_refreshed_and_invalidation_rechecks(self):
+        self._swap()
+        self.now = 11
+        self._swap()
+        self._swap()
+        refreshes = [call.kwargs["refresh"] for call in self.pool.fetch_fixed_input_swap_quote.call_args_list]
+        self.assertEqual(refreshes, [False, True, False])
+
+        self.cache.invalidate(opt_ins_for="SENDER")
+        self._swap()
+        self.assertEqual(self.client.fetch_pool.call_count, 2)
+        self.assertEqual(self.client.is_opted_in.call_count, 2)
+        self.assertEqual(self.client.fetch_asset.call_count, 2)
+
+
+class ConfirmationTrackerTests(TestCase):
+    def setUp(self):
+        self.algod = mock.Mock()
+        self.algod.status.return_value = {"last-round": 105}
+        self.blocks = {102: ["OTHER", "TX-A"], 104: ["OTHER"]}
+        self.algod.get_block_txids.side_effect = lambda round_number: {"blockTxids": self.blocks.get(round_number, [])}
+
+    def test_poll_confirms_and_expires_with_one_call_per_round(self):
+        confirmed = track("TX-A", kind="payout", first_round=100, last_valid_round=1100, callback="algorand.tests.resumed")
+        late = track("TX-B", kind="payout", first_round=101, last_valid_round=103)
+        waiting = track("TX-C", kind="payout", first_round=101, last_valid_round=1101)
+        resumed.reset_mock()
+
+        summary = ConfirmationTracker(algod_client=self.algod).poll()
+
+        self.assertEqual(summary, {"rounds": 6, "confirmed": 1, "expired": 1})
+        self.assertEqual(self.algod.get_block_txids.call_count, 6)
+        for tracked in (confirmed, late, waiting):
+            tracked.refresh_from_db()
+        self.assertEqual((confirmed.status, confirmed.confirmed_round), (TrackedTransactionStatus.CONFIRMED, 102))
+        # TX-B's validity window closed at round 103 without it being committed.
+        self.assertEqual(late.status, TrackedTransactionStatus.EXPIRED)
+        self.assertEqual(waiting.status, TrackedTransactionStatus.PENDING)
+        resumed.assert_called_once()
+        self.assertEqual(resumed.call_args.args[0].tx_id, "TX-A")
+
+        self.algod.get_block_txids.reset_mock()
+        self.algod.status.return_value = {"last-round": 107}
+        self.assertEqual(ConfirmationTracker(algod_client=self.algod).poll()["rounds"], 2)
+        self.assertEqual([call.args[0] for call in self.algod.get_block_txids.call_args_list], [106, 107])
+
+    def test_transactions_recorded_late_are_searched_from_their_first_round(self):
+        track("TX-C", kind="payout", first_round=101, last_valid_round=1101)
+        ConfirmationTracker(algod_client=self.algod).poll()
+
+        # Recorded after rounds 100-105 were already searched for TX-C.
+        self.blocks[103] = ["TX-LATE"]
+        late = track("TX-LATE", kind="payout", first_round=100, last_valid_round=1100)
+        self.algod.get_block_txids.reset_mock()
+
+        summary = ConfirmationTracker(algod_client=self.algod).poll()
+
+        self.assertEqual(summary, {"rounds": 6, "confirmed": 1, "expired": 0})
+        late.refresh_from_db()
+        self.assertEqual((late.status, late.confirmed_round), (TrackedTransactionStatus.CONFIRMED, 103))
+
+    def test_poll_is_idle_without_pending_transactions(self):
+        self.assertEqual(ConfirmationTracker(algod_client=self.algod).poll(), {"rounds": 0, "confirmed": 0, "expired": 0})
+        self.algod.status.assert_not_called()
+
+
+resumed = mock.Mock(spec=lambda tracked: None)
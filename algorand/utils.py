@@ -3,38 +3,27 @@ from __future__ import annotations
 
 import logging
 import base64
-from typing import Iterable, List, Optional
+import copy
+import hashlib
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Iterable, List, Optional
 
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 
-from algosdk.atomic_transaction_composer import (
-    AccountTransactionSigner,
-    AtomicTransactionComposer,
-    TransactionWithSigner,
-)
-try:  # SDK >= 2.0 groups transaction primitives under algosdk.transaction
-    from algosdk.future.transaction import (
-        ApplicationCreateTxn,
-        OnComplete,
-        StateSchema,
-        wait_for_confirmation,
-    )
-except ModuleNotFoundError:  # pragma: no cover - compatibility for newer py-algorand-sdk
-    from algosdk import transaction as _transaction
-
-    ApplicationCreateTxn = _transaction.ApplicationCreateTxn
-    OnComplete = _transaction.OnComplete
-    StateSchema = _transaction.StateSchema
-    wait_for_confirmation = _transaction.wait_for_confirmation
-from algosdk.v2client import algod
 from rest_framework.exceptions import APIException
-from tinyman.v1.client import TinymanMainnetClient, TinymanTestnetClient
 
-from algorand.contracts.subscription_contract import (
-    SubscriptionContractConfig,
-    get_teal_sources,
-)
+from algorand.models import CompiledProgram
+
+if TYPE_CHECKING:  # pragma: no cover
+    from algosdk.v2client import algod
+
+    from algorand.contracts.config import SubscriptionContractConfig
+    from algorand.contracts.template import ContractTemplate
+
+# algosdk, Tinyman and the contract modules take a few hundred milliseconds to import,
+# so they are loaded on first use: web workers that never sign a transaction skip them.
 
 logger = logging.getLogger(__name__)
 
@@ -49,62 +38,240 @@ def _assert_setting(value: str, setting_name: str) -> str:
     return value
 
 
+def get_transaction_module():
+    """``algosdk.transaction`` (``algosdk.future.transaction`` on older SDKs), imported on first use."""
+    try:
+        from algosdk.future import transaction
+    except ModuleNotFoundError:  # pragma: no cover - compatibility for newer py-algorand-sdk
+        from algosdk import transaction
+    return transaction
+
+
 def get_algod_client() -> algod.AlgodClient:
     """Instantiate an Algod client using project settings."""
+    from algosdk.v2client import algod
+
     api_token = settings.ALGO_API_TOKEN
     headers = {"X-API-Key": api_token} if api_token else {}
     return algod.AlgodClient(api_token, settings.ALGO_NODE_URL, headers)
 
 
+class SuggestedParamsProvider:
+    """
+    Per-process cache of ``suggested_params`` shared by every transaction builder.
+
+    Params only change between rounds, so one fetch serves every transaction built
+    within ``ALGORAND_PARAMS_TTL_SECONDS`` (about one round). Once that has passed,
+    params younger than ``ALGORAND_PARAMS_MAX_STALE_SECONDS`` are still handed out
+    while a background thread fetches the next round's; they remain well inside
+    their 1000-round validity window. Only older params are refreshed inline. Fetches
+    are single-flight, and callers always get a copy they can adjust (fees) freely.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl: Optional[float] = None,
+        max_stale: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        spawn: Optional[Callable[[Callable[[], None]], None]] = None,
+    ):
+        self._ttl = ttl
+        self._max_stale = max_stale
+        self._clock = clock
+        self._spawn = spawn or (lambda refresh: threading.Thread(target=refresh, daemon=True).start())
+        self._lock = threading.Lock()
+        self._params = None
+        self._fetched_at = 0.0
+        self._refreshing = False
+
+    @property
+    def ttl(self) -> float:
+        return self._ttl if self._ttl is not None else float(getattr(settings, "ALGORAND_PARAMS_TTL_SECONDS", 3))
+
+    @property
+    def max_stale(self) -> float:
+        if self._max_stale is not None:
+            return self._max_stale
+        return float(getattr(settings, "ALGORAND_PARAMS_MAX_STALE_SECONDS", 30))
+
+    def get(self, algod_client: Optional[algod.AlgodClient] = None):
+        with self._lock:
+            params, age = self._params, self._clock() - self._fetched_at
+            refresh_in_background = params is not None and self.ttl <= age < self.max_stale and not self._refreshing
+            if refresh_in_background:
+                self._refreshing = True
+        if params is not None and age < self.max_stale:
+            if refresh_in_background:
+                self._spawn(lambda: self._refresh(algod_client))
+            return copy.copy(params)
+
+        with self._lock:
+            # Another caller may have refreshed while this one waited.
+            if self._params is None or self._clock() - self._fetched_at >= self.max_stale:
+                self._store((algod_client or get_algod_client()).suggested_params())
+            return copy.copy(self._params)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._params = None
+
+    def _refresh(self, algod_client: Optional[algod.AlgodClient]) -> None:
+        try:
+            params = (algod_client or get_algod_client()).suggested_params()
+        except Exception:  # pragma: no cover - the next caller refreshes inline
+            logger.warning("Background suggested params refresh failed.", exc_info=True)
+            with self._lock:
+                self._refreshing = False
+            return
+        with self._lock:
+            self._store(params)
+
+    def _store(self, params) -> None:
+        self._params = params
+        self._fetched_at = self._clock()
+        self._refreshing = False
+
+
+suggested_params_provider = SuggestedParamsProvider()
+
+
+def get_suggested_params(algod_client: Optional[algod.AlgodClient] = None):
+    """Suggested params for a new transaction, from the shared per-round cache."""
+    return suggested_params_provider.get(algod_client)
+
+
+class CompiledProgramCache:
+    """
+    Content-addressed cache of compiled TEAL.
+
+    The SHA-256 of a TEAL source always maps to the same bytecode, so a program is
+    compiled by algod once and stored as a ``CompiledProgram`` row. Every worker
+    and later deploy reads it from there, and this process keeps it in memory.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._programs: dict[str, bytes] = {}
+
+    @staticmethod
+    def key(teal_source: str) -> str:
+        return hashlib.sha256(teal_source.encode("utf-8")).hexdigest()
+
+    def get(self, teal_source: str) -> Optional[bytes]:
+        source_hash = self.key(teal_source)
+        with self._lock:
+            program = self._programs.get(source_hash)
+        if program is None:
+            stored = CompiledProgram.objects.filter(source_hash=source_hash).values_list("program", flat=True).first()
+            if stored is not None:
+                program = bytes(stored)
+                with self._lock:
+                    self._programs[source_hash] = program
+        return program
+
+    def compile(self, teal_source: str, algod_client: Optional[algod.AlgodClient] = None) -> bytes:
+        program = self.get(teal_source)
+        if program is not None:
+            return program
+        response = (algod_client or get_algod_client()).compile(teal_source)
+        program = base64.b64decode(response["result"])
+        source_hash = self.key(teal_source)
+        CompiledProgram.objects.get_or_create(source_hash=source_hash, defaults={"program": program})
+        with self._lock:
+            self._programs[source_hash] = program
+        return program
+
+    def clear(self) -> None:
+        with self._lock:
+            self._programs.clear()
+
+
+compiled_program_cache = CompiledProgramCache()
+
+
 def compile_teal_source(teal_source: str, algod_client: Optional[algod.AlgodClient] = None) -> bytes:
-    """Compile TEAL source code using the configured Algod client."""
-    algod_client = algod_client or get_algod_client()
-    response = algod_client.compile(teal_source)
-    return base64.b64decode(response["result"])
+    """Compile TEAL source code, reusing the bytecode of any identical source compiled before."""
+    return compiled_program_cache.compile(teal_source, algod_client)
+
+
+_template_lock = threading.Lock()
+_contract_template: Optional[ContractTemplate] = None
+
+
+def get_contract_template(algod_client: Optional[algod.AlgodClient] = None) -> ContractTemplate:
+    """The subscription contract template, compiled once per process (and once overall, via the program cache)."""
+    global _contract_template
+
+    if _contract_template is None:
+        from algorand.contracts.template import ContractTemplate
+
+        with _template_lock:
+            if _contract_template is None:
+                _contract_template = ContractTemplate.build(lambda source: compile_teal_source(source, algod_client))
+    return _contract_template
 
 
 def compile_subscription_contract(
     cfg: SubscriptionContractConfig,
     algod_client: Optional[algod.AlgodClient] = None,
 ) -> dict:
-    """Compile subscription contract approval and clear programs to binary."""
-    sources = get_teal_sources(cfg)
-    algod_client = algod_client or get_algod_client()
-    approval = compile_teal_source(sources["approval"], algod_client)
-    clear = compile_teal_source(sources["clear"], algod_client)
-    return {"approval": approval, "clear": clear, "sources": sources}
+    """Subscription contract approval and clear programs for ``cfg``, rendered from the compiled template."""
+    template = get_contract_template(algod_client)
+    return {"approval": template.render(cfg), "clear": template.clear_program, "sources": template.sources}
 
 
-def deploy_subscription_contract(
-    cfg: SubscriptionContractConfig,
-    algod_client: Optional[algod.AlgodClient] = None,
-) -> int:
-    """Deploy the subscription smart contract and return the app ID."""
-    algod_client = algod_client or get_algod_client()
+def _build_contract_creation(cfg: SubscriptionContractConfig, algod_client: algod.AlgodClient):
     compiled = compile_subscription_contract(cfg, algod_client)
 
-    params = algod_client.suggested_params()
+    params = get_suggested_params(algod_client)
     params.flat_fee = True
     params.fee = params.min_fee * 2
 
-    txn = ApplicationCreateTxn(
+    transaction = get_transaction_module()
+    txn = transaction.ApplicationCreateTxn(
         sender=settings.ALGORAND_ACCOUNT_ADDRESS,
         sp=params,
-        on_complete=OnComplete.NoOpOC,
+        on_complete=transaction.OnComplete.NoOpOC,
         approval_program=compiled["approval"],
         clear_program=compiled["clear"],
-        global_schema=StateSchema(num_uints=4, num_byte_slices=1),
-        local_schema=StateSchema(num_uints=1, num_byte_slices=1),
+        global_schema=transaction.StateSchema(num_uints=4, num_byte_slices=1),
+        local_schema=transaction.StateSchema(num_uints=1, num_byte_slices=1),
     )
 
     private_key = getattr(settings, "ALGORAND_DEPLOYER_PRIVATE_KEY", None)
     if not private_key:
         raise ImproperlyConfigured("ALGORAND_DEPLOYER_PRIVATE_KEY must be set to deploy contracts.")
+    return txn, txn.sign(private_key)
 
-    signed_txn = txn.sign(private_key)
+
+def submit_subscription_contract(
+    cfg: SubscriptionContractConfig,
+    algod_client: Optional[algod.AlgodClient] = None,
+    *,
+    callback: str = "",
+    context: Optional[dict] = None,
+) -> str:
+    """Submit the contract creation without waiting; the confirmation tracker resumes ``callback``."""
+    from algorand.confirmations import track_submitted
+
+    algod_client = algod_client or get_algod_client()
+    txn, signed_txn = _build_contract_creation(cfg, algod_client)
+    tx_id = algod_client.send_transaction(signed_txn)
+    track_submitted(txn, kind="deploy", callback=callback, context=context)
+    return tx_id
+
+
+def deploy_subscription_contract(
+    cfg: SubscriptionContractConfig,
+    algod_client: Optional[algod.AlgodClient] = None,
+) -> int:
+    """Deploy the subscription smart contract and return the app ID."""
+    algod_client = algod_client or get_algod_client()
+    _, signed_txn = _build_contract_creation(cfg, algod_client)
     tx_id = algod_client.send_transaction(signed_txn)
     wait_rounds = getattr(settings, "ALGORAND_APP_WAIT_ROUNDS", 4)
-    wait_for_confirmation(algod_client, tx_id, wait_rounds)
+    get_transaction_module().wait_for_confirmation(algod_client, tx_id, wait_rounds)
     response = algod_client.pending_transaction_info(tx_id)
     app_id = response.get("application-index")
     if not app_id:
@@ -124,6 +291,8 @@ def get_tinyman_client(user_address: str, algod_client: algod.AlgodClient | None
     if not user_address:
         raise ImproperlyConfigured("user_address is required to instantiate the Tinyman client.")
 
+    from tinyman.v1.client import TinymanMainnetClient, TinymanTestnetClient
+
     network = getattr(settings, "ALGORAND_NETWORK", "testnet").lower()
     algod_client = algod_client or get_algod_client()
 
@@ -132,7 +301,91 @@ def get_tinyman_client(user_address: str, algod_client: algod.AlgodClient | None
     return TinymanTestnetClient(user_address=user_address, algod_client=algod_client)
 
 
-def _extract_transactions(group) -> List[TransactionWithSigner]:
+def _network() -> str:
+    return getattr(settings, "ALGORAND_NETWORK", "testnet").lower()
+
+
+class TinymanMetadataCache:
+    """
+    Process-wide cache of the Tinyman metadata read before every swap or quote.
+
+    Asset definitions never change, and an account stays opted in once it has opted
+    in, so both are kept until ``invalidate`` drops them. Pool reserves move with
+    every trade: a cached pool is reused as is for ``TINYMAN_POOL_CACHE_SECONDS`` and
+    refreshed by the next quote after that. Entries are keyed by network.
+    """
+
+    def __init__(self, *, pool_ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self._pool_ttl = pool_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._assets: dict = {}
+        self._pools: dict = {}
+        self._opted_in: set = set()
+
+    @property
+    def pool_ttl(self) -> float:
+        if self._pool_ttl is not None:
+            return self._pool_ttl
+        return float(getattr(settings, "TINYMAN_POOL_CACHE_SECONDS", 10))
+
+    def asset(self, client, asset_id: int):
+        key = (_network(), asset_id)
+        with self._lock:
+            cached = self._assets.get(key)
+        if cached is None:
+            cached = client.fetch_asset(asset_id)
+            with self._lock:
+                cached = self._assets.setdefault(key, cached)
+        return cached
+
+    def quote(self, client, asset_in, asset_out, amount: int, slippage: float):
+        """Fixed-input swap quote; pool reserves are re-read only once the cached ones are stale."""
+        key = (_network(), asset_in.id, asset_out.id)
+        now = self._clock()
+        with self._lock:
+            entry = self._pools.get(key)
+        if entry is None:
+            pool, stale = client.fetch_pool(asset_in, asset_out), False
+        else:
+            pool, refreshed_at = entry
+            stale = now - refreshed_at >= self.pool_ttl
+        quote = pool.fetch_fixed_input_swap_quote(asset_in(amount), slippage=slippage, refresh=stale)
+        if entry is None or stale:
+            with self._lock:
+                self._pools[key] = (pool, now)
+        return quote
+
+    def ensure_opted_in(self, address: str, target, check: Callable[[], bool], opt_in: Callable[[], None]) -> None:
+        """Run ``opt_in`` unless ``address`` is known, or ``check`` reports it, to be opted into ``target``."""
+        key = (_network(), address, target)
+        with self._lock:
+            if key in self._opted_in:
+                return
+        if not check():
+            opt_in()
+        with self._lock:
+            self._opted_in.add(key)
+
+    def invalidate(self, *, pools: bool = True, opt_ins_for: Optional[str] = None, assets: bool = False) -> None:
+        """Drop cached pools, the opt-in state of one address (``"*"`` for all) and optionally assets."""
+        with self._lock:
+            if pools:
+                self._pools.clear()
+            if opt_ins_for == "*":
+                self._opted_in.clear()
+            elif opt_ins_for:
+                self._opted_in = {key for key in self._opted_in if key[1] != opt_ins_for}
+            if assets:
+                self._assets.clear()
+
+
+tinyman_cache = TinymanMetadataCache()
+
+
+def _extract_transactions(group) -> List:
+    from algosdk.atomic_transaction_composer import TransactionWithSigner
+
     if isinstance(group, (list, tuple)):
         items: Iterable = group
     elif hasattr(group, "transactions"):
@@ -156,6 +409,12 @@ def _extract_transactions(group) -> List[TransactionWithSigner]:
 
 
 def _execute_transaction_group(group, private_key: str, algod_client: algod.AlgodClient):
+    from algosdk.atomic_transaction_composer import (
+        AccountTransactionSigner,
+        AtomicTransactionComposer,
+        TransactionWithSigner,
+    )
+
     signer = AccountTransactionSigner(private_key)
     composer = AtomicTransactionComposer()
 
@@ -170,24 +429,28 @@ def _execute_transaction_group(group, private_key: str, algod_client: algod.Algo
     return {"tx_ids": result.tx_ids, "confirmed_round": result.confirmed_round}
 
 
-def _ensure_user_setup(client, private_key: str, algod_client: algod.AlgodClient, usdc_asset):
-    """Ensure the Tinyman user is opted-in to the protocol and the USDC asset."""
-    try:
-        is_opted_in = getattr(client, "is_opted_in")
-        if callable(is_opted_in) and not is_opted_in():
+def _ensure_user_setup(client, address: str, private_key: str, algod_client: algod.AlgodClient, usdc_asset):
+    """Ensure the Tinyman user is opted-in to the protocol and the USDC asset; known opt-ins are not re-checked."""
+    is_opted_in = getattr(client, "is_opted_in", None)
+    if callable(is_opted_in):
+
+        def opt_in_protocol():
             logger.info("Opting Tinyman account into the protocol.")
-            tx_group = client.prepare_opt_in_transactions()
-            _execute_transaction_group(tx_group, private_key, algod_client)
-    except AttributeError:
+            _execute_transaction_group(client.prepare_opt_in_transactions(), private_key, algod_client)
+
+        tinyman_cache.ensure_opted_in(address, "protocol", is_opted_in, opt_in_protocol)
+    else:
         logger.debug("Tinyman client does not expose opt-in helper.")
 
-    try:
-        is_asset_opted = getattr(client, "is_opted_in_to_asset")
-        if callable(is_asset_opted) and not is_asset_opted(usdc_asset):
+    is_asset_opted = getattr(client, "is_opted_in_to_asset", None)
+    if callable(is_asset_opted):
+
+        def opt_in_asset():
             logger.info("Opting Tinyman account into USDC asset %s.", usdc_asset)
-            tx_group = client.prepare_asset_opt_in_transactions(usdc_asset)
-            _execute_transaction_group(tx_group, private_key, algod_client)
-    except AttributeError:
+            _execute_transaction_group(client.prepare_asset_opt_in_transactions(usdc_asset), private_key, algod_client)
+
+        tinyman_cache.ensure_opted_in(address, usdc_asset.id, lambda: is_asset_opted(usdc_asset), opt_in_asset)
+    else:
         logger.debug("Tinyman client does not expose asset opt-in helper.")
 
 
@@ -197,10 +460,9 @@ def get_algo_to_usdc_rate() -> float:
     algod_client = get_algod_client()
     client = get_tinyman_client(address, algod_client)
     try:
-        algo_asset = client.fetch_asset(0)
-        usdc_asset = client.fetch_asset(_resolve_usdc_asset_id())
-        pool = client.fetch_pool(algo_asset, usdc_asset)
-        quote = pool.fetch_fixed_input_swap_quote(algo_asset(1_000_000), slippage=settings.TINYMAN_SWAP_SLIPPAGE)
+        algo_asset = tinyman_cache.asset(client, 0)
+        usdc_asset = tinyman_cache.asset(client, _resolve_usdc_asset_id())
+        quote = tinyman_cache.quote(client, algo_asset, usdc_asset, 1_000_000, settings.TINYMAN_SWAP_SLIPPAGE)
         return round(quote.amount_out.amount / 1_000_000, 6)
     except Exception as exc:
         logger.exception("Unable to fetch ALGO→USDC rate via Tinyman.")
@@ -228,17 +490,13 @@ def perform_swap_algo_to_usdc(
 
     algod_client = get_algod_client()
     client = get_tinyman_client(sender_address, algod_client)
-    usdc_asset = client.fetch_asset(_resolve_usdc_asset_id())
 
     try:
-        _ensure_user_setup(client, sender_private_key, algod_client, usdc_asset)
+        usdc_asset = tinyman_cache.asset(client, _resolve_usdc_asset_id())
+        _ensure_user_setup(client, sender_address, sender_private_key, algod_client, usdc_asset)
 
-        algo_asset = client.fetch_asset(0)  # ALGO native asset
-        pool = client.fetch_pool(algo_asset, usdc_asset)
-        quote = pool.fetch_fixed_input_swap_quote(
-            algo_asset(amount_algo),
-            slippage=settings.TINYMAN_SWAP_SLIPPAGE,
-        )
+        algo_asset = tinyman_cache.asset(client, 0)  # ALGO native asset
+        quote = tinyman_cache.quote(client, algo_asset, usdc_asset, amount_algo, settings.TINYMAN_SWAP_SLIPPAGE)
 
         logger.info(
             "Executing Tinyman swap for transaction=%s amount=%sµALGO expected=%sµUSDC",
@@ -262,4 +520,6 @@ def perform_swap_algo_to_usdc(
         }
     except Exception as exc:  # pragma: no cover - unexpected Tinyman/Algorand errors
         logger.exception("Tinyman swap failed for transaction=%s", transaction_id)
+        # The failure may come from moved reserves or a lost opt-in: re-read both on the next attempt.
+        tinyman_cache.invalidate(opt_ins_for=sender_address)
         raise TinymanSwapError(str(exc)) from exc
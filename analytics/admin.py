@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import EventLog, AnalyticsLog
+from .models import EventLog, AnalyticsLog, MetricsRollup
 
 @admin.register(EventLog)
 class EventLogAdmin(admin.ModelAdmin):
@@ -13,3 +13,9 @@ class AnalyticsLogAdmin(admin.ModelAdmin):
     list_display = ('event_type', 'created_at')
     ordering = ('-created_at',)
     search_fields = ('event_type',)
+
+@admin.register(MetricsRollup)
+class MetricsRollupAdmin(admin.ModelAdmin):
+    list_display = ('granularity', 'bucket_start', 'currency', 'mrr_change', 'net_revenue', 'churned', 'swap_volume_usdc')
+    list_filter = ('granularity', 'currency')
+    ordering = ('-bucket_start',)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.models import RollupGranularity
+from analytics.rollups import RollupRebuildConflict, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the hourly and daily metrics rollups from subscriptions, invoices and transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--granularity",
+            choices=RollupGranularity.values,
+            action="append",
+            help="Only rebuild this granularity (repeatable). Defaults to all.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        granularities = options["granularity"] or RollupGranularity.values
+        try:
+            written = rebuild_rollups(granularities, batch_size=options["batch_size"])
+        except RollupRebuildConflict as exc:
+            raise CommandError(f"{exc} Run the command again once billing is quieter.") from exc
+        for granularity, count in written.items():
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} {granularity} rollup bucket(s)."))
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=8)),
+                ('bucket_start', models.DateTimeField()),
+                ('currency', models.CharField(blank=True, default='', max_length=10)),
+                ('mrr_change', models.DecimalField(decimal_places=6, default=0, max_digits=18)),
+                ('active_change', models.IntegerField(default=0)),
+                ('trialing_change', models.IntegerField(default=0)),
+                ('past_due_change', models.IntegerField(default=0)),
+                ('new_subscriptions', models.IntegerField(default=0)),
+                ('churned', models.IntegerField(default=0)),
+                ('invoices_issued', models.IntegerField(default=0)),
+                ('net_revenue', models.DecimalField(decimal_places=6, default=0, max_digits=18)),
+                ('swap_volume_usdc', models.DecimalField(decimal_places=6, default=0, max_digits=18)),
+                ('swap_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ('granularity', 'bucket_start', 'currency'),
+                'constraints': [models.UniqueConstraint(fields=('granularity', 'bucket_start', 'currency'), name='unique_metrics_rollup_bucket')],
+            },
+        ),
+    ]
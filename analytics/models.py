@@ -30,4 +30,42 @@ class AnalyticsLog(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.event_type} @ {self.created_at}"
\ No newline at end of file
+        return f"{self.event_type} @ {self.created_at}"
+
+class RollupGranularity(models.TextChoices):
+    HOUR = "hour", "Hourly"
+    DAY = "day", "Daily"
+
+
+class MetricsRollup(models.Model):
+    """
+    Per-bucket deltas behind founder insights.
+
+    Flow metrics (revenue, churn, swaps, invoices) are totals for the bucket; the
+    ``*_change`` columns are net changes, so a running sum gives MRR and status
+    counts at any point in time.
+    """
+
+    granularity = models.CharField(max_length=8, choices=RollupGranularity.choices)
+    bucket_start = models.DateTimeField()
+    currency = models.CharField(max_length=10, blank=True, default="")
+    mrr_change = models.DecimalField(max_digits=18, decimal_places=6, default=0)
+    active_change = models.IntegerField(default=0)
+    trialing_change = models.IntegerField(default=0)
+    past_due_change = models.IntegerField(default=0)
+    new_subscriptions = models.IntegerField(default=0)
+    churned = models.IntegerField(default=0)
+    invoices_issued = models.IntegerField(default=0)
+    net_revenue = models.DecimalField(max_digits=18, decimal_places=6, default=0)
+    swap_volume_usdc = models.DecimalField(max_digits=18, decimal_places=6, default=0)
+    swap_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ("granularity", "bucket_start", "currency")
+        constraints = [
+            models.UniqueConstraint(fields=("granularity", "bucket_start", "currency"), name="unique_metrics_rollup_bucket"),
+        ]
+
+    def __str__(self):
+        return f"{self.granularity} {self.bucket_start:%Y-%m-%d %H:%M} {self.currency or '-'}"
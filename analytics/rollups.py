@@ -0,0 +1,347 @@
+"""
+Incrementally maintained metrics rollups.
+
+Lifecycle, invoicing and payment code report what changed through ``MetricsRecorder``;
+each change is added to the hourly and daily ``MetricsRollup`` buckets once the
+surrounding transaction commits, so renewal workers never hold a lock on the hot
+bucket rows while a swap is in flight. ``build_rollups`` recomputes every bucket
+from the source tables for the ``backfill_metrics`` command. Both book a
+subscription through ``status_columns``, so a rebuild lands on the same totals.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from typing import Iterable, Iterator, Optional
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import Coalesce, TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import MetricsRollup, RollupGranularity
+
+MRR_STATUSES = ("active", "trialing")
+STATUS_COLUMNS = {"active": "active_change", "trialing": "trialing_change", "past_due": "past_due_change"}
+COUNTER_FIELDS = (
+    "mrr_change",
+    "active_change",
+    "trialing_change",
+    "past_due_change",
+    "new_subscriptions",
+    "churned",
+    "invoices_issued",
+    "net_revenue",
+    "swap_volume_usdc",
+    "swap_count",
+)
+
+
+class RollupRebuildConflict(RuntimeError):
+    """Rollups kept changing while ``rebuild_rollups`` recomputed them."""
+
+
+def status_columns(status: Optional[str], value: Decimal) -> dict:
+    """Rollup columns a subscription priced at ``value`` holds while it is in ``status``."""
+    columns: dict[str, object] = defaultdict(int)
+    if status in MRR_STATUSES:
+        columns["mrr_change"] = value
+    if status in STATUS_COLUMNS:
+        columns[STATUS_COLUMNS[status]] = 1
+    return columns
+
+
+def status_before_end(subscription) -> str:
+    """
+    The status a canceled subscription held until it ended; status history is not stored.
+
+    Activation clears ``trial_end_at`` and renewals move ``current_period_start`` past
+    it, so a subscription still inside its first trial period ended while trialing, or
+    past due when its first charge failed. Anything else ended active.
+    """
+    trial_end = subscription.trial_end_at
+    if trial_end is None or subscription.current_period_start >= trial_end:
+        return "active"
+    ended = subscription.ended_at or subscription.canceled_at or subscription.updated_at
+    return "trialing" if ended < trial_end else "past_due"
+
+
+def mrr_by_currency(subscriptions) -> dict[str, Decimal]:
+    """MRR of the ``subscriptions`` queryset per currency, priced once per plan and quantity."""
+    from subscriptions.models import Plan
+    from subscriptions.services.pricing import PricingEngine
+
+    groups = list(
+        subscriptions.filter(status__in=MRR_STATUSES)
+        .values("plan_id", "quantity")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    plans = Plan.objects.in_bulk({row["plan_id"] for row in groups})
+    pricing = PricingEngine()
+    totals: dict[str, Decimal] = defaultdict(Decimal)
+    for row in groups:
+        plan = plans[row["plan_id"]]
+        totals[plan.currency or ""] += pricing.price(plan, row["quantity"]).total * row["count"]
+    return totals
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    moment = moment.astimezone(dt_timezone.utc)
+    if granularity == RollupGranularity.DAY:
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+class MetricsRecorder:
+    """Translate domain changes into rollup deltas applied after commit."""
+
+    def __init__(self, *, using: str = DEFAULT_DB_ALIAS):
+        self.using = using
+
+    def subscription_status_changed(self, subscription, previous_status: Optional[str], *, at=None) -> None:
+        """Record a transition; ``previous_status=None`` means the subscription was just created."""
+        status = subscription.status
+        if status == previous_status:
+            return
+
+        from subscriptions.services.pricing import PricingEngine
+
+        plan = subscription.plan
+        value = PricingEngine().price(plan, subscription.quantity).total
+        deltas: dict[str, object] = defaultdict(int)
+        for column, amount in status_columns(status, value).items():
+            deltas[column] += amount
+        for column, amount in status_columns(previous_status, value).items():
+            deltas[column] -= amount
+        if previous_status is None:
+            deltas["new_subscriptions"] = 1
+        if status == "canceled":
+            deltas["churned"] = 1
+        self.record(plan.currency, at=at, **deltas)
+
+    @contextmanager
+    def pricing_changes(self, subscriptions, *, at=None) -> Iterator[None]:
+        """Record the MRR change of the ``subscriptions`` queryset across a plan, tier or quantity edit."""
+        before = mrr_by_currency(subscriptions)
+        yield
+        after = mrr_by_currency(subscriptions)
+        zero = Decimal("0")
+        for currency in before.keys() | after.keys():
+            self.record(currency, at=at, mrr_change=after.get(currency, zero) - before.get(currency, zero))
+
+    def invoices_issued(self, invoices: Iterable, *, at=None) -> None:
+        per_currency: dict[str, int] = defaultdict(int)
+        for invoice in invoices:
+            per_currency[invoice.currency] += 1
+        for currency, count in per_currency.items():
+            self.record(currency, at=at, invoices_issued=count)
+
+    def invoice_paid(self, invoice) -> None:
+        self.record(invoice.currency, at=invoice.paid_at, net_revenue=invoice.total)
+
+    def swap_completed(self, transaction_obj) -> None:
+        self.record(
+            transaction_obj.currency,
+            at=transaction_obj.confirmed_at,
+            swap_volume_usdc=transaction_obj.usdc_received or Decimal("0"),
+            swap_count=1,
+        )
+
+    def record(self, currency: str, *, at=None, **deltas) -> None:
+        deltas = {field: value for field, value in deltas.items() if value}
+        if not deltas:
+            return
+        moment = at or timezone.now()
+        # Registered inside the caller's savepoint: a rollback drops the delta with the rows it describes.
+        transaction.on_commit(lambda: apply_deltas(currency or "", moment, deltas, using=self.using), using=self.using)
+
+
+def apply_deltas(currency: str, moment: datetime, deltas: dict, *, using: str = DEFAULT_DB_ALIAS) -> None:
+    increments = {field: F(field) + value for field, value in deltas.items()}
+    with transaction.atomic(using=using):
+        for granularity in RollupGranularity.values:
+            key = {"granularity": granularity, "bucket_start": bucket_start(moment, granularity), "currency": currency}
+            updated = MetricsRollup.objects.using(using).filter(**key).update(**increments, updated_at=timezone.now())
+            if updated:
+                continue
+            try:
+                with transaction.atomic(using=using):
+                    MetricsRollup.objects.using(using).create(**key, **deltas)
+            except IntegrityError:
+                # Another worker created the bucket first.
+                MetricsRollup.objects.using(using).filter(**key).update(**increments, updated_at=timezone.now())
+
+
+def snapshot(*, days: int = 30, now=None) -> dict:
+    """Founder insight metrics computed from the daily rollups only."""
+    now = now or timezone.now()
+    period_start = now - timedelta(days=days)
+    daily = MetricsRollup.objects.filter(granularity=RollupGranularity.DAY)
+    zero = Decimal("0")
+
+    totals = daily.aggregate(
+        mrr=Coalesce(Sum("mrr_change"), zero),
+        active=Coalesce(Sum("active_change"), 0),
+        trialing=Coalesce(Sum("trialing_change"), 0),
+        past_due=Coalesce(Sum("past_due_change"), 0),
+    )
+    recent = daily.filter(bucket_start__gte=bucket_start(period_start, RollupGranularity.DAY)).aggregate(
+        net_mrr=Coalesce(Sum("net_revenue"), zero),
+        churn_count=Coalesce(Sum("churned"), 0),
+        swap_volume_usdc=Coalesce(Sum("swap_volume_usdc"), zero),
+        swap_count=Coalesce(Sum("swap_count"), 0),
+        invoices_count=Coalesce(Sum("invoices_issued"), 0),
+    )
+    leading_currency = (
+        daily.exclude(currency="")
+        .values("currency")
+        .annotate(total=Sum("mrr_change"))
+        .order_by("-total")
+        .values_list("currency", flat=True)
+        .first()
+    )
+
+    swap_count = recent["swap_count"]
+    return {
+        "currency": leading_currency or "ALGO",
+        "mrr": totals["mrr"],
+        "net_mrr": recent["net_mrr"],
+        "churn_count": recent["churn_count"],
+        "swap_volume_usdc": recent["swap_volume_usdc"],
+        "swap_count": swap_count,
+        "swap_avg_usdc": recent["swap_volume_usdc"] / swap_count if swap_count else zero,
+        "active_subscriptions": totals["active"],
+        "trialing_subscriptions": totals["trialing"],
+        "past_due_subscriptions": totals["past_due"],
+        "invoices_count": recent["invoices_count"],
+        "period_start": period_start,
+    }
+
+
+def series(granularity: str, *, since: datetime, until: Optional[datetime] = None) -> list[dict]:
+    """Per-bucket totals across currencies, oldest first."""
+    queryset = MetricsRollup.objects.filter(granularity=granularity, bucket_start__gte=bucket_start(since, granularity))
+    if until is not None:
+        queryset = queryset.filter(bucket_start__lte=until)
+    rows = (
+        queryset.values("bucket_start")
+        .annotate(**{f"total_{field}": Sum(field) for field in COUNTER_FIELDS})
+        .order_by("bucket_start")
+    )
+    return [
+        {"bucket_start": row["bucket_start"], **{field: row[f"total_{field}"] for field in COUNTER_FIELDS}}
+        for row in rows
+    ]
+
+
+def build_rollups(granularity: str) -> list[MetricsRollup]:
+    """
+    Recompute every bucket of ``granularity`` from subscriptions, invoices and transactions.
+
+    Status history is not stored, so each live subscription counts towards its current
+    status from its creation bucket and each canceled one towards ``status_before_end``
+    from creation until it ended; the running totals therefore match the current state
+    exactly, priced and counted by the same ``status_columns`` as the recorder.
+    """
+    from payments.models import Transaction, TransactionStatus
+    from subscriptions.models import Invoice, InvoiceStatus, Subscription, SubscriptionStatus
+    from subscriptions.services.pricing import PricingEngine
+
+    trunc = TruncDay if granularity == RollupGranularity.DAY else TruncHour
+    buckets: dict[tuple, dict] = defaultdict(lambda: defaultdict(int))
+
+    def add(rows, bucket_field, currency_field, **columns):
+        for row in rows:
+            if row[bucket_field] is None:
+                continue
+            target = buckets[(row[bucket_field], row[currency_field] or "")]
+            for column, source in columns.items():
+                target[column] += row[source] or 0
+
+    # MRR is priced like an invoice, tiers included, so subscriptions are booked one by one.
+    pricing = PricingEngine()
+    subscriptions = Subscription.objects.select_related("plan").annotate(
+        created_bucket=trunc("created_at", tzinfo=dt_timezone.utc),
+        ended_bucket=trunc(Coalesce("ended_at", "canceled_at", "updated_at"), tzinfo=dt_timezone.utc),
+    )
+    for subscription in subscriptions.iterator(chunk_size=2000):
+        canceled = subscription.status == SubscriptionStatus.CANCELED
+        status = status_before_end(subscription) if canceled else subscription.status
+        value = pricing.price(subscription.plan, subscription.quantity).total if status in MRR_STATUSES else Decimal("0")
+        held = status_columns(status, value)
+        currency = subscription.plan.currency or ""
+        if subscription.created_bucket is not None:
+            created = buckets[(subscription.created_bucket, currency)]
+            created["new_subscriptions"] += 1
+            for column, amount in held.items():
+                created[column] += amount
+        if canceled:
+            ended = buckets[(subscription.ended_bucket, currency)]
+            ended["churned"] += 1
+            for column, amount in held.items():
+                ended[column] -= amount
+
+    add(
+        Invoice.objects.annotate(bucket=trunc("issued_at", tzinfo=dt_timezone.utc))
+        .values("bucket", "currency")
+        .annotate(count=Count("id")),
+        "bucket",
+        "currency",
+        invoices_issued="count",
+    )
+    add(
+        Invoice.objects.filter(status=InvoiceStatus.PAID, paid_at__isnull=False)
+        .annotate(bucket=trunc("paid_at", tzinfo=dt_timezone.utc))
+        .values("bucket", "currency")
+        .annotate(total=Sum("total")),
+        "bucket",
+        "currency",
+        net_revenue="total",
+    )
+    add(
+        Transaction.objects.filter(status=TransactionStatus.CONFIRMED, usdc_received__isnull=False)
+        .annotate(bucket=trunc(Coalesce("confirmed_at", "created_at"), tzinfo=dt_timezone.utc))
+        .values("bucket", "currency")
+        .annotate(volume=Sum("usdc_received"), count=Count("id")),
+        "bucket",
+        "currency",
+        swap_volume_usdc="volume",
+        swap_count="count",
+    )
+
+    return [
+        MetricsRollup(granularity=granularity, bucket_start=bucket, currency=currency, **columns)
+        for (bucket, currency), columns in sorted(buckets.items())
+        if any(columns.values())
+    ]
+
+
+def rebuild_rollups(
+    granularities: Iterable[str] = RollupGranularity.values, *, batch_size: int = 1000, attempts: int = 3
+) -> dict:
+    """
+    Replace the stored rollups with ``build_rollups`` output; returns the row count per granularity.
+
+    Deltas keep landing while the source tables are read, and replacing the buckets
+    afterwards would drop them. The stored buckets are therefore versioned before the
+    build and checked again under their row locks before they are replaced; a build
+    that raced a delta is discarded and redone, up to ``attempts`` times.
+    """
+    granularities = list(granularities)
+    stored = MetricsRollup.objects.filter(granularity__in=granularities)
+    for _ in range(max(1, attempts)):
+        version = stored.aggregate(count=Count("id"), updated=Max("updated_at"))
+        rows = {granularity: build_rollups(granularity) for granularity in granularities}
+        with transaction.atomic():
+            list(stored.select_for_update().order_by("pk").values_list("pk", flat=True))
+            if stored.aggregate(count=Count("id"), updated=Max("updated_at")) != version:
+                continue
+            stored.delete()
+            for granularity_rows in rows.values():
+                MetricsRollup.objects.bulk_create(granularity_rows, batch_size=batch_size)
+            return {granularity: len(granularity_rows) for granularity, granularity_rows in rows.items()}
+    raise RollupRebuildConflict(f"Metrics rollups changed during each of {attempts} rebuild attempt(s).")
@@ -1,3 +1,204 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from analytics import rollups
+from analytics.models import MetricsRollup, RollupGranularity
+from subscriptions.models import CurrencyChoices, Plan, PlanInterval, PriceTier, Subscription, TiersMode
+from subscriptions.services import InvoiceService, SubscriptionLifecycleService
+
+
+@override_settings(
+    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    NOTIFICATION_OUTBOX_ASYNC=False,
+)
+class MetricsRollupTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="metrics@example.com",
+            password="pass1234",
+            username="metrics",
+        )
+        self.plan = Plan.objects.create(
+            code="metrics",
+            name="Metrics",
+            amount=Decimal("12.000000"),
+            currency=CurrencyChoices.ALGO,
+            interval=PlanInterval.MONTH,
+        )
+        self.lifecycle = SubscriptionLifecycleService()
+
+    def _subscribe(self, quantity=1):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.lifecycle.create_subscription(
+                user=self.user, plan=self.plan, wallet_address="WALLET", quantity=quantity
+            ).subscription
+
+    def test_lifecycle_changes_update_hourly_and_daily_buckets(self):
+        kept = self._subscribe(quantity=2)
+        canceled = self._subscribe()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lifecycle.cancel_subscription(canceled, at_period_end=False)
+            self.lifecycle.mark_past_due(kept)
+
+        metrics = rollups.snapshot()
+
+        self.assertEqual(metrics["mrr"], Decimal("0"))
+        self.assertEqual(metrics["active_subscriptions"], 0)
+        self.assertEqual(metrics["past_due_subscriptions"], 1)
+        self.assertEqual(metrics["churn_count"], 1)
+        for granularity in RollupGranularity.values:
+            buckets = MetricsRollup.objects.filter(granularity=granularity)
+            self.assertEqual(sum(buckets.values_list("new_subscriptions", flat=True)), 2)
+
+    def test_rolled_back_changes_are_not_counted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.lifecycle.create_subscription(user=self.user, plan=self.plan, wallet_address="WALLET")
+                    raise RuntimeError("checkout aborted")
+            except RuntimeError:
+                pass
+
+        self.assertFalse(MetricsRollup.objects.exists())
+
+    def test_backfill_rebuilds_the_incremental_totals(self):
+        self._subscribe(quantity=3)
+        canceled = self._subscribe()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lifecycle.cancel_subscription(canceled, at_period_end=False)
+            InvoiceService().create_invoice(canceled)
+        incremental = rollups.snapshot()
+
+        MetricsRollup.objects.all().delete()
+        out = StringIO()
+        call_command("backfill_metrics", stdout=out)
+
+        rebuilt = rollups.snapshot()
+        for key in ("mrr", "active_subscriptions", "churn_count", "invoices_count"):
+            self.assertEqual(rebuilt[key], incremental[key], key)
+        self.assertEqual(rebuilt["mrr"], Decimal("36.000000"))
+        self.assertIn("day rollup bucket(s)", out.getvalue())
+
+    def test_mrr_prices_seats_through_the_plan_tiers(self):
+        self.plan.tiers_mode = TiersMode.GRADUATED
+        self.plan.save(update_fields=["tiers_mode"])
+        PriceTier.objects.create(plan=self.plan, up_to=2, unit_amount=Decimal("10"))
+        PriceTier.objects.create(plan=self.plan, up_to=None, unit_amount=Decimal("5"))
+        self._subscribe(quantity=4)
+
+        self.assertEqual(rollups.snapshot()["mrr"], Decimal("30.000000"))
+
+        MetricsRollup.objects.all().delete()
+        call_command("backfill_metrics", stdout=StringIO())
+        self.assertEqual(rollups.snapshot()["mrr"], Decimal("30.000000"))
+
+
+    def _buckets(self):
+        return list(
+            MetricsRollup.objects.order_by("granularity", "bucket_start", "currency").values_list(
+                "granularity", "bucket_start", "currency", "mrr_change", "active_change", "trialing_change",
+                "past_due_change", "new_subscriptions", "churned",
+            )
+        )
+
+    def test_backfill_books_a_trial_canceled_before_it_ended_as_trialing(self):
+        self.plan.trial_days = 14
+        self.plan.save(update_fields=["trial_days"])
+        started = timezone.now() - timedelta(days=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            subscription = SubscriptionLifecycleService(now=lambda: started).create_subscription(
+                user=self.user, plan=self.plan, wallet_address="WALLET"
+            ).subscription
+        Subscription.objects.filter(pk=subscription.pk).update(created_at=started)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lifecycle.cancel_subscription(subscription, at_period_end=False)
+        incremental = self._buckets()
+
+        rollups.rebuild_rollups()
+
+        self.assertEqual(self._buckets(), incremental)
+        created = MetricsRollup.objects.get(granularity=RollupGranularity.DAY, new_subscriptions=1)
+        self.assertEqual((created.trialing_change, created.active_change), (1, 0))
+
+    def test_quantity_and_plan_price_edits_move_mrr(self):
+        admin = get_user_model().objects.create_user(
+            email="owner@example.com", password="pass1234", username="owner", wallet_address="OWNER", is_staff=True
+        )
+        subscription = self._subscribe(quantity=2)
+        Subscription.objects.filter(pk=subscription.pk).update(
+            billing_email="metrics@example.com", billing_address="1 Rollup Street"
+        )
+        client = APIClient()
+        client.force_authenticate(user=admin)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.patch(f"/api/subscriptions/subscriptions/{subscription.pk}/", {"quantity": 5})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(rollups.snapshot()["mrr"], Decimal("60.000000"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.patch(f"/api/subscriptions/plans/{self.plan.pk}/", {"amount": "20.000000"})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(rollups.snapshot()["mrr"], Decimal("100.000000"))
+
+        rollups.rebuild_rollups()
+        self.assertEqual(rollups.snapshot()["mrr"], Decimal("100.000000"))
+
+    def test_rebuild_discards_a_build_that_raced_a_delta(self):
+        self._subscribe()
+        build = rollups.build_rollups
+        raced = []
+
+        def racing_build(granularity):
+            if not raced:
+                raced.append(granularity)
+                rollups.apply_deltas("USDC", timezone.now(), {"swap_count": 1})
+            return build(granularity)
+
+        with mock.patch.object(rollups, "build_rollups", side_effect=racing_build) as mock_build:
+            rollups.rebuild_rollups()
+
+        self.assertEqual(mock_build.call_count, 2 * len(RollupGranularity.values))
+        # The raced delta has no source rows, so the retried build drops it consistently.
+        self.assertFalse(MetricsRollup.objects.filter(currency="USDC").exists())
+        self.assertEqual(rollups.snapshot()["mrr"], Decimal("12.000000"))
+
+        def always_racing(granularity):
+            rollups.apply_deltas("USDC", timezone.now() - timedelta(days=len(raced)), {"swap_count": 1})
+            raced.append(granularity)
+            return build(granularity)
+
+        with mock.patch.object(rollups, "build_rollups", side_effect=always_racing):
+            with self.assertRaises(rollups.RollupRebuildConflict):
+                rollups.rebuild_rollups(attempts=2)
+
+
+class FounderInsightsAPITests(APITestCase):
+    def test_admin_reads_metrics_and_series_from_rollups(self):
+        admin = get_user_model().objects.create_user(
+            email="insights@example.com",
+            password="pass1234",
+            username="insights",
+            is_staff=True,
+        )
+        rollups.apply_deltas("ALGO", timezone.now(), {"mrr_change": Decimal("5"), "active_change": 1})
+        self.client.force_authenticate(user=admin)
+
+        response = self.client.get(reverse("founder-insights-api"), {"granularity": "hour"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["metrics"]["mrr"], Decimal("5"))
+        self.assertEqual(response.data["metrics"]["active_subscriptions"], 1)
+        self.assertEqual(len(response.data["series"]), 1)
+        self.assertEqual(self.client.get(reverse("founder-insights-api"), {"granularity": "week"}).status_code, 400)
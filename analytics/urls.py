@@ -1,11 +1,12 @@
 # analytics/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import AnalyticsLogViewSet
+from .views import AnalyticsLogViewSet, FounderInsightsView
 
 router = DefaultRouter()
 router.register(r'logs', AnalyticsLogViewSet, basename='analytics-log')
 
 urlpatterns = [
+    path('insights/', FounderInsightsView.as_view(), name='founder-insights-api'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
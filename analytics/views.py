@@ -1,6 +1,10 @@
 # analytics/views.py
-from rest_framework import viewsets, permissions
-from .models import AnalyticsLog
+from rest_framework import permissions, status, viewsets
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import rollups
+from .models import AnalyticsLog, RollupGranularity
 from .serializers import AnalyticsLogSerializer
 
 class AnalyticsLogViewSet(viewsets.ModelViewSet):
@@ -14,4 +18,28 @@ class AnalyticsLogViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         if self.request.user.is_staff:
             return AnalyticsLog.objects.all()
-        return AnalyticsLog.objects.filter(user=self.request.user)
\ No newline at end of file
+        return AnalyticsLog.objects.filter(user=self.request.user)
+
+class FounderInsightsView(APIView):
+    """Founder insight metrics and a per-bucket series, read from the metrics rollups."""
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        granularity = request.query_params.get("granularity", RollupGranularity.DAY)
+        if granularity not in RollupGranularity.values:
+            return Response({"detail": "granularity must be 'hour' or 'day'."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            days = int(request.query_params.get("days", 30))
+        except ValueError:
+            return Response({"detail": "days must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        days = min(max(days, 1), 366)
+
+        metrics = rollups.snapshot(days=days)
+        return Response(
+            {
+                "metrics": metrics,
+                "granularity": granularity,
+                "series": rollups.series(granularity, since=metrics["period_start"]),
+            }
+        )
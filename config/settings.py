@@ -139,6 +139,9 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
+    "DEFAULT_THROTTLE_RATES": {
+        "x402_challenges": os.getenv("X402_CHALLENGE_THROTTLE_RATE", "30/min"),
+    },
 }
 
 SIMPLE_JWT = {
@@ -159,6 +162,14 @@ FRONTEND_BASE_URL = os.getenv("FRONTEND_BASE_URL", "http://localhost:3000")
 CHECKOUT_BASE_URL = os.getenv("CHECKOUT_BASE_URL", FRONTEND_BASE_URL)
 SKIP_EMAIL_VERIFICATION = os.getenv("SKIP_EMAIL_VERIFICATION", "false").lower() == "true"
 
+# Email outbox: rows are delivered after commit by a Celery worker (or inline when async is off)
+NOTIFICATION_OUTBOX_ASYNC = os.getenv("NOTIFICATION_OUTBOX_ASYNC", "true").lower() == "true"
+NOTIFICATION_OUTBOX_BATCH_SIZE = int(os.getenv("NOTIFICATION_OUTBOX_BATCH_SIZE", 100))
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_OUTBOX_MAX_ATTEMPTS", 5))
+NOTIFICATION_OUTBOX_BACKOFF_SECONDS = int(os.getenv("NOTIFICATION_OUTBOX_BACKOFF_SECONDS", 30))
+NOTIFICATION_OUTBOX_LEASE_SECONDS = int(os.getenv("NOTIFICATION_OUTBOX_LEASE_SECONDS", 300))
+NOTIFICATION_OUTBOX_SWEEP_SECONDS = int(os.getenv("NOTIFICATION_OUTBOX_SWEEP_SECONDS", 60))
+
 # 📚 SWAGGER
 SWAGGER_SETTINGS = {
     "USE_SESSION_AUTH": False,
@@ -181,6 +192,11 @@ ALGO_NODE_URL = os.getenv("ALGO_NODE_URL", "https://testnet-api.algonode.cloud")
 ALGO_INDEXER_URL = os.getenv("ALGO_INDEXER_URL", "https://testnet-idx.algonode.cloud")
 ALGO_API_TOKEN = os.getenv("ALGO_API_TOKEN", "")  # Si nécessaire (souvent vide avec Algonode)
 TINYMAN_SWAP_SLIPPAGE = float(os.getenv("TINYMAN_SWAP_SLIPPAGE", 0.03))  # 3% max slippage
+TINYMAN_POOL_CACHE_SECONDS = float(os.getenv("TINYMAN_POOL_CACHE_SECONDS", 10))  # reuse pool reserves this long
+# Conversion rates are refreshed by Celery beat and served from memory up to EXCHANGE_RATE_MAX_AGE_SECONDS old
+EXCHANGE_RATE_REFRESH_SECONDS = float(os.getenv("EXCHANGE_RATE_REFRESH_SECONDS", 30))
+EXCHANGE_RATE_MAX_AGE_SECONDS = float(os.getenv("EXCHANGE_RATE_MAX_AGE_SECONDS", 120))
+CURRENCY_CONVERSION_BATCH_LIMIT = int(os.getenv("CURRENCY_CONVERSION_BATCH_LIMIT", 1000))  # amounts per batch request
 ALGORAND_NETWORK = os.getenv("ALGORAND_NETWORK", "testnet")
 ALGORAND_ACCOUNT_ADDRESS = os.getenv("ALGORAND_ACCOUNT_ADDRESS", "")
 ALGORAND_ACCOUNT_MNEMONIC = os.getenv("ALGORAND_ACCOUNT_MNEMONIC", "")
@@ -189,6 +205,65 @@ ALGORAND_USDC_ASSET_ID_TESTNET = int(os.getenv("ALGORAND_USDC_ASSET_ID_TESTNET",
 ALGORAND_SWAP_MAX_RETRIES = int(os.getenv("ALGORAND_SWAP_MAX_RETRIES", 3))
 ALGORAND_SWAP_WAIT_ROUNDS = int(os.getenv("ALGORAND_SWAP_WAIT_ROUNDS", 4))
 ALGORAND_SWAP_RETRY_DELAY_SECONDS = float(os.getenv("ALGORAND_SWAP_RETRY_DELAY_SECONDS", 1.5))
+# Combine renewal swaps into one Tinyman group per window / amount / request threshold
+SWAP_AGGREGATION_ENABLED = os.getenv("SWAP_AGGREGATION_ENABLED", "false").lower() == "true"
+SWAP_AGGREGATION_WINDOW_SECONDS = float(os.getenv("SWAP_AGGREGATION_WINDOW_SECONDS", 30))
+SWAP_AGGREGATION_MAX_ALGO = os.getenv("SWAP_AGGREGATION_MAX_ALGO", "5000")
+SWAP_AGGREGATION_MAX_REQUESTS = int(os.getenv("SWAP_AGGREGATION_MAX_REQUESTS", 100))
+# Payouts and platform fees per atomic group (Algorand allows at most 16)
+PAYOUT_GROUP_SIZE = int(os.getenv("PAYOUT_GROUP_SIZE", 16))
+PAYOUT_MAX_ATTEMPTS = int(os.getenv("PAYOUT_MAX_ATTEMPTS", 3))
+# Suggested params are shared by every transaction builder: fresh for one round, then refreshed in the background
+ALGORAND_PARAMS_TTL_SECONDS = float(os.getenv("ALGORAND_PARAMS_TTL_SECONDS", 3))
+ALGORAND_PARAMS_MAX_STALE_SECONDS = float(os.getenv("ALGORAND_PARAMS_MAX_STALE_SECONDS", 30))
+# Submitted contract, opt-in, renewal and payout transactions are confirmed by a polling task instead of a blocking wait
+ALGORAND_ASYNC_CONFIRMATIONS = os.getenv("ALGORAND_ASYNC_CONFIRMATIONS", "true").lower() == "true"
+ALGORAND_CONFIRMATION_POLL_SECONDS = float(os.getenv("ALGORAND_CONFIRMATION_POLL_SECONDS", 4))
+ALGORAND_CONFIRMATION_MAX_ROUNDS = int(os.getenv("ALGORAND_CONFIRMATION_MAX_ROUNDS", 50))
+
+# Renewal engine
+RENEWAL_BACKEND = os.getenv("RENEWAL_BACKEND", "inline")  # inline | celery
+RENEWAL_SHARD_SIZE = int(os.getenv("RENEWAL_SHARD_SIZE", 200))
+RENEWAL_WALLET_CONCURRENCY = int(os.getenv("RENEWAL_WALLET_CONCURRENCY", 1))
+RENEWAL_WALLET_WAIT_SECONDS = float(os.getenv("RENEWAL_WALLET_WAIT_SECONDS", 5))
+RENEWAL_SHARD_LEASE_SECONDS = int(os.getenv("RENEWAL_SHARD_LEASE_SECONDS", 900))
+
+# Due-work scheduler (next_action_at index)
+SCHEDULER_BATCH_SIZE = int(os.getenv("SCHEDULER_BATCH_SIZE", 200))
+SCHEDULER_LEASE_SECONDS = int(os.getenv("SCHEDULER_LEASE_SECONDS", 600))
+SCHEDULER_RETRY_DELAY_SECONDS = int(os.getenv("SCHEDULER_RETRY_DELAY_SECONDS", 86400))
+
+# Billing pipelines (Celery beat dispatches chunks of due work to the billing queues)
+BILLING_CHUNK_SIZE = int(os.getenv("BILLING_CHUNK_SIZE", 100))
+BILLING_LOCK_SECONDS = int(os.getenv("BILLING_LOCK_SECONDS", 300))
+BILLING_QUEUE = os.getenv("BILLING_QUEUE", "billing")
+BILLING_RETRY_QUEUE = os.getenv("BILLING_RETRY_QUEUE", "billing_retries")
+BILLING_CHUNK_RATE_LIMIT = os.getenv("BILLING_CHUNK_RATE_LIMIT", "60/m")  # per worker, empty to disable
+BILLING_TRIALS_INTERVAL_SECONDS = int(os.getenv("BILLING_TRIALS_INTERVAL_SECONDS", 300))
+BILLING_RENEWALS_INTERVAL_SECONDS = int(os.getenv("BILLING_RENEWALS_INTERVAL_SECONDS", 300))
+BILLING_RETRIES_INTERVAL_SECONDS = int(os.getenv("BILLING_RETRIES_INTERVAL_SECONDS", 3600))
+CHECKOUT_EXPIRY_INTERVAL_SECONDS = int(os.getenv("CHECKOUT_EXPIRY_INTERVAL_SECONDS", 300))
+
+# Renewal forecasting (leave FORECAST_MONTHLY_CHURN empty to use the churn observed over the last 90 days)
+_forecast_churn = os.getenv("FORECAST_MONTHLY_CHURN", "")
+FORECAST_MONTHLY_CHURN = float(_forecast_churn) if _forecast_churn else None
+FORECAST_TRIAL_CONVERSION = float(os.getenv("FORECAST_TRIAL_CONVERSION", 1.0))
+FORECAST_CHUNK_SIZE = int(os.getenv("FORECAST_CHUNK_SIZE", 50000))
+FORECAST_CACHE_SECONDS = int(os.getenv("FORECAST_CACHE_SECONDS", 300))
+
+# Batch plan pricing (POST /api/subscriptions/plans/price/)
+PRICING_BATCH_LIMIT = int(os.getenv("PRICING_BATCH_LIMIT", 1000))
+
+# Usage metering (POST /api/subscriptions/usage/): events per request, rows per bulk insert
+USAGE_INGEST_MAX_EVENTS = int(os.getenv("USAGE_INGEST_MAX_EVENTS", 50000))
+USAGE_INGEST_BATCH_SIZE = int(os.getenv("USAGE_INGEST_BATCH_SIZE", 5000))
+
+# QR codes: rendered images kept per process (LRU entries) and in the shared cache (seconds)
+QR_CODE_LRU_SIZE = int(os.getenv("QR_CODE_LRU_SIZE", 256))
+QR_CODE_CACHE_SECONDS = int(os.getenv("QR_CODE_CACHE_SECONDS", 86400))
+
+# Lifecycle/payment events are buffered and bulk-inserted on commit; set to true to save each one immediately.
+EVENT_RECORDER_SYNC = os.getenv("EVENT_RECORDER_SYNC", "false").lower() == "true"
 
 # 🧾 x402 micropayments
 X402_ENABLED = os.getenv("X402_ENABLED", "false").lower() == "true"
@@ -204,6 +279,9 @@ X402_CACHE_ALIAS = os.getenv("X402_CACHE_ALIAS", "default")
 _x402_asset_id = os.getenv("X402_ASSET_ID", "")
 X402_ASSET_ID = int(_x402_asset_id) if _x402_asset_id else None
 X402_ASSET_DECIMALS = int(os.getenv("X402_ASSET_DECIMALS", 6))
+X402_CHALLENGE_BATCH_LIMIT = int(os.getenv("X402_CHALLENGE_BATCH_LIMIT", 100))
+X402_VERIFICATION_STRATEGIES = os.getenv("X402_VERIFICATION_STRATEGIES", "algod,indexer")
+X402_VERIFIERS = os.getenv("X402_VERIFIERS", "{}")
 
 # Celery
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
@@ -213,6 +291,61 @@ CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_ALWAYS_EAGER = os.getenv("CELERY_TASK_ALWAYS_EAGER", "false").lower() == "true"
+# Redis honours per-message priorities (0 is served first) only with the priority queue order strategy.
+CELERY_BROKER_TRANSPORT_OPTIONS = {"queue_order_strategy": "priority", "priority_steps": list(range(10))}
+CELERY_TASK_ROUTES = {
+    "subscriptions.tasks.dispatch_billing": {"queue": BILLING_QUEUE},
+    "subscriptions.tasks.expire_checkout_sessions": {"queue": BILLING_QUEUE},
+}
+CELERY_BEAT_SCHEDULE = {
+    "billing-trials": {
+        "task": "subscriptions.tasks.dispatch_billing",
+        "schedule": BILLING_TRIALS_INTERVAL_SECONDS,
+        "args": ("trials",),
+    },
+    "billing-renewals": {
+        "task": "subscriptions.tasks.dispatch_billing",
+        "schedule": BILLING_RENEWALS_INTERVAL_SECONDS,
+        "args": ("renewals",),
+    },
+    "billing-retries": {
+        "task": "subscriptions.tasks.dispatch_billing",
+        "schedule": BILLING_RETRIES_INTERVAL_SECONDS,
+        "args": ("retries",),
+    },
+    "checkout-session-expiry": {
+        "task": "subscriptions.tasks.expire_checkout_sessions",
+        "schedule": CHECKOUT_EXPIRY_INTERVAL_SECONDS,
+    },
+    "exchange-rate-refresh": {
+        "task": "currency.tasks.refresh_exchange_rates",
+        "schedule": EXCHANGE_RATE_REFRESH_SECONDS,
+    },
+    "notification-outbox-sweep": {
+        "task": "notifications.tasks.deliver_outbox",
+        "schedule": NOTIFICATION_OUTBOX_SWEEP_SECONDS,
+        "kwargs": {"reschedule": False},
+    },
+    "algorand-confirmations": {
+        "task": "algorand.tasks.poll_confirmations",
+        "schedule": ALGORAND_CONFIRMATION_POLL_SECONDS,
+    },
+}
+
+# Shared cache: wallet slots, billing locks, throttles and the conversion graph version
+# must be visible to every web and Celery process, so set REDIS_URL when running more
+# than one. Without it the cache is Django's per-process LocMemCache.
+REDIS_URL = os.getenv("REDIS_URL", "")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": os.getenv("CACHE_KEY_PREFIX", "subchain"),
+        }
+    }
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
 
 # ✅ LOGS
 LOGGING = {
@@ -2,6 +2,24 @@
 
 from django.contrib import admin
 from .models import Currency, ExchangeRate
+from .services import invalidate_conversion_graph
 
-admin.site.register(Currency)
-admin.site.register(ExchangeRate)
+
+class ConversionGraphAdmin(admin.ModelAdmin):
+    """Rebuild the conversion graph after currencies or rates are edited by hand."""
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        invalidate_conversion_graph()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidate_conversion_graph()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        invalidate_conversion_graph()
+
+
+admin.site.register(Currency, ConversionGraphAdmin)
+admin.site.register(ExchangeRate, ConversionGraphAdmin)
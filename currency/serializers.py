@@ -1,5 +1,6 @@
 # currency/serializers.py
 
+from django.conf import settings
 from rest_framework import serializers
 from .models import Currency, ExchangeRate
 
@@ -15,3 +16,28 @@ class ExchangeRateSerializer(serializers.ModelSerializer):
     class Meta:
         model = ExchangeRate
         fields = '__all__'
+
+
+class ConversionRequestSerializer(serializers.Serializer):
+    source = serializers.CharField(max_length=10)
+    target = serializers.CharField(max_length=10)
+    amounts = serializers.ListField(
+        child=serializers.DecimalField(max_digits=30, decimal_places=8), allow_empty=False
+    )
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # "from" is a Python keyword; expose the pair as from/to like the single conversion endpoint.
+        fields["from"] = fields.pop("source")
+        fields["to"] = fields.pop("target")
+        return fields
+
+
+class BatchConversionSerializer(serializers.Serializer):
+    conversions = ConversionRequestSerializer(many=True, allow_empty=False)
+
+    def validate_conversions(self, conversions):
+        limit = getattr(settings, "CURRENCY_CONVERSION_BATCH_LIMIT", 1000)
+        if sum(len(item["amounts"]) for item in conversions) > limit:
+            raise serializers.ValidationError(f"At most {limit} amounts can be converted per request.")
+        return conversions
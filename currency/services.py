@@ -0,0 +1,263 @@
+# currency/services.py
+"""
+Exchange rates served from memory.
+
+Quotes come from on-chain sources (Tinyman for ALGO→USDC). The
+``refresh_exchange_rates`` beat task refreshes them every
+``EXCHANGE_RATE_REFRESH_SECONDS`` and persists them to ``ExchangeRate``, so every
+process shares the latest value. ``ExchangeRateService.get`` answers from an
+in-process copy while it is younger than ``EXCHANGE_RATE_MAX_AGE_SECONDS``. Past
+that it reloads the stored row, and only when that is stale too does it fetch a
+new quote. The fetch is single-flight: concurrent requests for the same pair
+wait for the one in progress instead of each calling the source.
+
+``ConversionGraph`` covers every other pair. It triangulates the stored rates
+between active currencies along the fewest hops. The views hold a route to the
+same staleness bound, through its oldest rate. Each process keeps one graph
+and rebuilds it when ``invalidate_conversion_graph`` bumps the shared version,
+which happens whenever a rate is stored or edited in the admin.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import uuid
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import ROUND_HALF_EVEN, Decimal
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Currency, ExchangeRate
+
+logger = logging.getLogger(__name__)
+
+Pair = Tuple[str, str]
+
+AMOUNT_QUANTUM = Decimal("0.000001")
+GRAPH_VERSION_KEY = "currency:conversion-graph:version"
+
+
+class RateUnavailable(Exception):
+    """Raised when no quote within the staleness bound can be served for a pair."""
+
+
+class StaleRate(RateUnavailable):
+    """Raised when a conversion route relies on a stored rate older than the staleness bound."""
+
+
+@dataclass(frozen=True)
+class RateQuote:
+    base: str
+    target: str
+    rate: Decimal
+    as_of: datetime
+
+
+def _algo_to_usdc() -> Decimal:
+    from algorand.utils import get_algo_to_usdc_rate
+
+    return Decimal(str(get_algo_to_usdc_rate()))
+
+
+DEFAULT_SOURCES: Dict[Pair, Callable[[], Decimal]] = {
+    ("ALGO", "USDC"): _algo_to_usdc,
+}
+
+
+class ExchangeRateService:
+    def __init__(
+        self,
+        *,
+        sources: Optional[Dict[Pair, Callable[[], Decimal]]] = None,
+        max_age_seconds: Optional[float] = None,
+        clock: Callable[[], datetime] = timezone.now,
+    ):
+        self.sources = DEFAULT_SOURCES if sources is None else sources
+        self._max_age_seconds = max_age_seconds
+        self._clock = clock
+        self._quotes: Dict[Pair, RateQuote] = {}
+        self._locks: Dict[Pair, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    @property
+    def max_age(self) -> timedelta:
+        seconds = self._max_age_seconds
+        if seconds is None:
+            seconds = getattr(settings, "EXCHANGE_RATE_MAX_AGE_SECONDS", 120)
+        return timedelta(seconds=seconds)
+
+    def supports(self, base: str, target: str) -> bool:
+        return (base, target) in self.sources
+
+    def get(self, base: str, target: str) -> RateQuote:
+        pair = (base, target)
+        if pair not in self.sources:
+            raise RateUnavailable(f"No rate source for {base}→{target}.")
+
+        quote = self._fresh(self._quotes.get(pair))
+        if quote is not None:
+            return quote
+
+        with self._lock_for(pair):
+            # Another request may have refreshed the pair while this one waited for the lock.
+            quote = self._fresh(self._quotes.get(pair)) or self._fresh(self._load(pair))
+            if quote is None:
+                quote = self._fetch(pair)
+            self._quotes[pair] = quote
+            return quote
+
+    def refresh(self, base: str, target: str) -> RateQuote:
+        """Fetch and persist a new quote for the pair regardless of the cached one."""
+        pair = (base, target)
+        with self._lock_for(pair):
+            quote = self._fetch(pair)
+            self._quotes[pair] = quote
+            return quote
+
+    def refresh_all(self) -> Dict[Pair, Optional[RateQuote]]:
+        """Refresh every configured pair; a failing source is logged and reported as ``None``."""
+        refreshed: Dict[Pair, Optional[RateQuote]] = {}
+        for base, target in self.sources:
+            try:
+                refreshed[(base, target)] = self.refresh(base, target)
+            except RateUnavailable:
+                logger.exception("Exchange rate refresh failed for %s→%s.", base, target)
+                refreshed[(base, target)] = None
+        return refreshed
+
+    def clear(self) -> None:
+        self._quotes.clear()
+
+    def _fresh(self, quote: Optional[RateQuote]) -> Optional[RateQuote]:
+        if quote is not None and self._clock() - quote.as_of <= self.max_age:
+            return quote
+        return None
+
+    def _lock_for(self, pair: Pair) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(pair, threading.Lock())
+
+    def _load(self, pair: Pair) -> Optional[RateQuote]:
+        stored = (
+            ExchangeRate.objects.filter(base_currency__code=pair[0], target_currency__code=pair[1])
+            .values_list("rate", "updated_at")
+            .first()
+        )
+        if stored is None:
+            return None
+        return RateQuote(pair[0], pair[1], stored[0], stored[1])
+
+    def _fetch(self, pair: Pair) -> RateQuote:
+        try:
+            rate = Decimal(self.sources[pair]()).quantize(Decimal("0.00000001"))
+        except Exception as exc:
+            raise RateUnavailable(f"Unable to fetch the {pair[0]}→{pair[1]} rate: {exc}") from exc
+
+        base, _ = Currency.objects.get_or_create(code=pair[0], defaults={"name": pair[0], "is_crypto": True})
+        target, _ = Currency.objects.get_or_create(code=pair[1], defaults={"name": pair[1], "is_crypto": True})
+        stored, _ = ExchangeRate.objects.update_or_create(
+            base_currency=base, target_currency=target, defaults={"rate": rate}
+        )
+        invalidate_conversion_graph()
+        return RateQuote(pair[0], pair[1], stored.rate, stored.updated_at)
+
+
+rate_service = ExchangeRateService()
+
+
+@dataclass(frozen=True)
+class Route:
+    base: str
+    target: str
+    rate: Decimal
+    path: Tuple[str, ...]
+    as_of: Optional[datetime]  # update time of the oldest rate on the path
+
+
+class ConversionGraph:
+    """Precomputed conversion routes between every pair of connected currencies."""
+
+    def __init__(self, rates: Iterable[Tuple[str, str, Decimal, datetime]]):
+        self._edges: Dict[str, Dict[str, Tuple[Decimal, datetime]]] = defaultdict(dict)
+        for base, target, rate, updated_at in rates:
+            if rate <= 0:
+                continue
+            self._edges[base][target] = (rate, updated_at)
+            # A stored quote for the opposite direction wins over this inverse.
+            self._edges[target].setdefault(base, (Decimal(1) / rate, updated_at))
+        self.routes: Dict[Pair, Route] = {}
+        for origin in sorted(self._edges):
+            self._explore(origin)
+
+    @classmethod
+    def from_database(cls) -> "ConversionGraph":
+        return cls(
+            ExchangeRate.objects.filter(base_currency__is_active=True, target_currency__is_active=True).values_list(
+                "base_currency__code", "target_currency__code", "rate", "updated_at"
+            )
+        )
+
+    def route(self, base: str, target: str, *, max_age: Optional[timedelta] = None) -> Route:
+        """The pair's route; with ``max_age``, its oldest rate must be at most that old."""
+        try:
+            route = self.routes[(base, target)]
+        except KeyError:
+            raise RateUnavailable(f"No conversion route from {base} to {target}.") from None
+        if max_age is not None and route.as_of is not None and timezone.now() - route.as_of > max_age:
+            raise StaleRate(f"The {base}→{target} rate is older than {int(max_age.total_seconds())} seconds.")
+        return route
+
+    def convert(
+        self, base: str, target: str, amounts: Iterable[Decimal], *, max_age: Optional[timedelta] = None
+    ) -> Tuple[Route, List[Decimal]]:
+        """Convert every amount with the pair's single precomputed rate, rounded to the micro-unit."""
+        route = self.route(base, target, max_age=max_age)
+        rate = route.rate
+        return route, [(Decimal(amount) * rate).quantize(AMOUNT_QUANTUM, rounding=ROUND_HALF_EVEN) for amount in amounts]
+
+    def _explore(self, origin: str) -> None:
+        # Breadth-first, so every route uses the fewest conversions and compounds the least rounding.
+        reached = {origin: (Decimal(1), (origin,), None)}
+        queue = deque([origin])
+        while queue:
+            node = queue.popleft()
+            rate, path, as_of = reached[node]
+            for neighbour in sorted(self._edges[node]):
+                if neighbour in reached:
+                    continue
+                edge_rate, updated_at = self._edges[node][neighbour]
+                reached[neighbour] = (
+                    rate * edge_rate,
+                    path + (neighbour,),
+                    updated_at if as_of is None else min(as_of, updated_at),
+                )
+                queue.append(neighbour)
+        for target, (rate, path, as_of) in reached.items():
+            self.routes[(origin, target)] = Route(origin, target, rate, path, as_of)
+
+
+_graph_lock = threading.Lock()
+_graph_state: Dict[str, object] = {"version": None, "graph": None}
+
+
+def invalidate_conversion_graph() -> None:
+    """Make every process rebuild its conversion graph on next use."""
+    cache.set(GRAPH_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def get_conversion_graph() -> ConversionGraph:
+    version = cache.get_or_set(GRAPH_VERSION_KEY, uuid.uuid4().hex, None)
+    graph = _graph_state["graph"]
+    if graph is not None and _graph_state["version"] == version:
+        return graph
+    with _graph_lock:
+        if _graph_state["graph"] is None or _graph_state["version"] != version:
+            _graph_state["graph"] = ConversionGraph.from_database()
+            _graph_state["version"] = version
+        return _graph_state["graph"]
@@ -0,0 +1,10 @@
+from celery import shared_task
+
+from currency.services import rate_service
+
+
+@shared_task(ignore_result=True)
+def refresh_exchange_rates() -> dict:
+    """Fetch every configured exchange rate and persist it for the API processes."""
+    refreshed = rate_service.refresh_all()
+    return {f"{base}/{target}": str(quote.rate) if quote else None for (base, target), quote in refreshed.items()}
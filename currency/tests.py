@@ -1,3 +1,148 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import Currency, ExchangeRate
+from .services import ExchangeRateService, RateUnavailable, get_conversion_graph, invalidate_conversion_graph
+
+
+class ExchangeRateServiceTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.source = mock.Mock(return_value=Decimal("0.25"))
+        self.service = ExchangeRateService(
+            sources={("ALGO", "USDC"): self.source}, max_age_seconds=60, clock=lambda: self.now
+        )
+
+    def test_quotes_are_fetched_once_persisted_and_served_from_memory(self):
+        first = self.service.get("ALGO", "USDC")
+        with self.assertNumQueries(0):
+            second = self.service.get("ALGO", "USDC")
+
+        self.assertEqual(first, second)
+        self.assertEqual(first.rate, Decimal("0.25"))
+        self.source.assert_called_once()
+        self.assertEqual(ExchangeRate.objects.get().rate, Decimal("0.25"))
+
+    def test_stale_memory_reloads_the_stored_rate_before_fetching(self):
+        self.service.get("ALGO", "USDC")
+        other_process = ExchangeRateService(sources={("ALGO", "USDC"): self.source}, clock=lambda: self.now)
+
+        self.assertEqual(other_process.get("ALGO", "USDC").rate, Decimal("0.25"))
+        self.source.assert_called_once()
+
+        self.now += timedelta(seconds=61)
+        self.source.return_value = Decimal("0.30")
+        self.assertEqual(self.service.get("ALGO", "USDC").rate, Decimal("0.30"))
+        self.assertEqual(self.source.call_count, 2)
+
+    def test_failures_and_unknown_pairs_raise_rate_unavailable(self):
+        self.source.side_effect = RuntimeError("algod down")
+        with self.assertRaises(RateUnavailable):
+            self.service.get("ALGO", "USDC")
+        with self.assertRaises(RateUnavailable):
+            self.service.get("USDC", "EUR")
+        self.assertEqual(self.service.refresh_all(), {("ALGO", "USDC"): None})
+
+
+class ConvertCurrencyViewTests(TestCase):
+    def test_conversion_uses_the_cached_rate(self):
+        mock_rate = mock.Mock(return_value=Decimal("0.2"))
+        service = ExchangeRateService(sources={("ALGO", "USDC"): mock_rate})
+        client = APIClient()
+        client.force_authenticate(
+            get_user_model().objects.create_user(email="fx@example.com", username="fx", password="pass1234")
+        )
+        with mock.patch("currency.views.rate_service", service):
+            for _ in range(2):
+                response = client.get(reverse("convert-currency"), {"from": "ALGO", "to": "USDC", "amount": "10"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["converted_amount"], 2.0)
+        mock_rate.assert_called_once()
+
+
+class ConversionGraphTests(TestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.user = get_user_model().objects.create_user(email="graph@example.com", username="graph", password="pass1234")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        codes = {code: Currency.objects.create(code=code, name=code) for code in ("ALGO", "USDC", "EUR", "GBP")}
+        self.currencies = codes
+        for base, target, rate in (("ALGO", "USDC", "0.25"), ("EUR", "USDC", "1.10"), ("GBP", "EUR", "1.20")):
+            ExchangeRate.objects.create(base_currency=codes[base], target_currency=codes[target], rate=Decimal(rate))
+        invalidate_conversion_graph()
+
+    def test_routes_are_triangulated_along_the_fewest_hops(self):
+        graph = get_conversion_graph()
+
+        route = graph.route("ALGO", "GBP")
+        self.assertEqual(route.path, ("ALGO", "USDC", "EUR", "GBP"))
+        self.assertAlmostEqual(route.rate, Decimal("0.25") / Decimal("1.10") / Decimal("1.20"), places=20)
+        _, converted = graph.convert("USDC", "ALGO", [Decimal("1"), Decimal("2.5")])
+        self.assertEqual(converted, [Decimal("4.000000"), Decimal("10.000000")])
+        self.assertIs(get_conversion_graph(), graph)
+
+        self.currencies["EUR"].is_active = False
+        self.currencies["EUR"].save()
+        invalidate_conversion_graph()
+        with self.assertRaises(RateUnavailable):
+            get_conversion_graph().route("ALGO", "GBP")
+
+    def test_batch_endpoint_converts_many_pairs_in_one_request(self):
+        response = self.client.post(
+            reverse("convert-currency-batch"),
+            {
+                "conversions": [
+                    {"from": "ALGO", "to": "EUR", "amounts": ["11", "22"]},
+                    {"from": "GBP", "to": "USDC", "amounts": ["10"]},
+                    {"from": "ALGO", "to": "JPY", "amounts": ["1"]},
+                ]
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        algo_eur, gbp_usdc, missing = response.data["results"]
+        self.assertEqual(algo_eur["converted_amounts"], ["2.500000", "5.000000"])
+        self.assertEqual(algo_eur["path"], ["ALGO", "USDC", "EUR"])
+        self.assertEqual(gbp_usdc["converted_amounts"], ["13.200000"])
+        self.assertIn("error", missing)
+
+    def test_single_conversion_falls_back_to_the_graph(self):
+        response = self.client.get(reverse("convert-currency"), {"from": "GBP", "to": "USDC", "amount": "10"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["converted_amount"], 13.2)
+        self.assertEqual(response.data["path"], ["GBP", "EUR", "USDC"])
+
+    def test_stale_rates_on_a_route_are_reported_instead_of_converted(self):
+        ExchangeRate.objects.filter(base_currency__code="GBP").update(updated_at=timezone.now() - timedelta(hours=1))
+        invalidate_conversion_graph()
+
+        single = self.client.get(reverse("convert-currency"), {"from": "GBP", "to": "USDC", "amount": "10"})
+        batch = self.client.post(
+            reverse("convert-currency-batch"),
+            {
+                "conversions": [
+                    {"from": "GBP", "to": "USDC", "amounts": ["10"]},
+                    {"from": "EUR", "to": "USDC", "amounts": ["10"]},
+                ]
+            },
+            format="json",
+        )
 
-# Create your tests here.
+        self.assertEqual(single.status_code, 503)
+        self.assertIn("older than", single.data["error"])
+        stale, fresh = batch.data["results"]
+        self.assertIn("older than", stale["error"])
+        self.assertNotIn("converted_amounts", stale)
+        self.assertEqual(fresh["converted_amounts"], ["11.000000"])
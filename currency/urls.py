@@ -2,7 +2,7 @@
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CurrencyViewSet, ExchangeRateViewSet, convert_currency
+from .views import CurrencyViewSet, ExchangeRateViewSet, convert_currency, convert_currency_batch
 
 router = DefaultRouter()
 router.register(r'currencies', CurrencyViewSet)
@@ -11,4 +11,5 @@ router.register(r'exchange-rates', ExchangeRateViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path('convert/', convert_currency, name='convert-currency'),
+    path('convert/batch/', convert_currency_batch, name='convert-currency-batch'),
 ]
@@ -2,9 +2,9 @@
 
 from rest_framework import viewsets
 
-from algorand.utils import get_algo_to_usdc_rate
 from .models import Currency, ExchangeRate
-from .serializers import CurrencySerializer, ExchangeRateSerializer
+from .serializers import BatchConversionSerializer, CurrencySerializer, ExchangeRateSerializer
+from .services import RateUnavailable, StaleRate, get_conversion_graph, rate_service
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
@@ -32,15 +32,63 @@ def convert_currency(request):
     except ValueError:
         return Response({"error": "Invalid amount format."}, status=status.HTTP_400_BAD_REQUEST)
 
-    if from_currency == "ALGO" and to_currency == "USDC":
-        rate = get_algo_to_usdc_rate()
+    if rate_service.supports(from_currency, to_currency):
+        try:
+            quote = rate_service.get(from_currency, to_currency)
+        except RateUnavailable as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        rate = float(quote.rate)
         converted = round(amount * rate, 6)
         return Response({
             "from": from_currency,
             "to": to_currency,
             "rate": rate,
             "amount": amount,
-            "converted_amount": converted
+            "converted_amount": converted,
+            "as_of": quote.as_of,
         })
 
-    return Response({"error": "Conversion route not supported yet."}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+    try:
+        route = get_conversion_graph().route(from_currency, to_currency, max_age=rate_service.max_age)
+    except StaleRate as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except RateUnavailable:
+        return Response({"error": "Conversion route not supported yet."}, status=status.HTTP_400_BAD_REQUEST)
+    rate = float(route.rate)
+    return Response({
+        "from": from_currency,
+        "to": to_currency,
+        "rate": rate,
+        "amount": amount,
+        "converted_amount": round(amount * rate, 6),
+        "as_of": route.as_of,
+        "path": list(route.path),
+    })
+
+
+@api_view(['POST'])
+def convert_currency_batch(request):
+    """Convert lists of amounts across many pairs with one precomputed rate per pair."""
+    serializer = BatchConversionSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+
+    graph = get_conversion_graph()
+    max_age = rate_service.max_age
+    results = []
+    for item in serializer.validated_data["conversions"]:
+        base, target = item["from"], item["to"]
+        try:
+            route, converted = graph.convert(base, target, item["amounts"], max_age=max_age)
+        except RateUnavailable as exc:
+            results.append({"from": base, "to": target, "error": str(exc)})
+            continue
+        results.append({
+            "from": base,
+            "to": target,
+            "rate": str(route.rate),
+            "path": list(route.path),
+            "as_of": route.as_of,
+            "amounts": [str(amount) for amount in item["amounts"]],
+            "converted_amounts": [str(amount) for amount in converted],
+        })
+    return Response({"results": results})
\ No newline at end of file
@@ -2,6 +2,7 @@
 
 from decimal import Decimal, InvalidOperation
 
+from django.conf import settings
 from rest_framework import serializers
 
 from .models import (
@@ -16,6 +17,9 @@ from .models import (
     X402CreditPlan,
 )
 
+ALLOWED_HTTP_METHODS = {"GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"}
+
+
 class IntegrationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Integration
@@ -67,7 +71,7 @@ class EndpointPricingRuleSerializer(serializers.ModelSerializer):
             method_str = str(method).strip().upper()
             if not method_str:
                 continue
-            if method_str not in {"GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"}:
+            if method_str not in ALLOWED_HTTP_METHODS:
                 raise serializers.ValidationError(f"Unsupported HTTP method '{method}'.")
             if method_str not in cleaned:
                 cleaned.append(method_str)
@@ -291,3 +295,31 @@ class CreditUsageSerializer(serializers.ModelSerializer):
             return f"{obj.merchant_amount:.8f}".rstrip("0").rstrip(".")
         except (InvalidOperation, AttributeError):
             return str(obj.merchant_amount)
+
+
+class X402ChallengeTargetSerializer(serializers.Serializer):
+    method = serializers.CharField(default="GET")
+    path = serializers.CharField(max_length=255)
+
+    def to_internal_value(self, data):
+        if isinstance(data, (list, tuple)) and len(data) == 2:
+            data = {"method": data[0], "path": data[1]}
+        return super().to_internal_value(data)
+
+    def validate_method(self, value: str) -> str:
+        method = value.strip().upper()
+        if method not in ALLOWED_HTTP_METHODS:
+            raise serializers.ValidationError(f"Unsupported HTTP method '{value}'.")
+        return method
+
+
+class X402ChallengeBundleSerializer(serializers.Serializer):
+    requests = X402ChallengeTargetSerializer(many=True)
+
+    def validate_requests(self, value):
+        if not value:
+            raise serializers.ValidationError("At least one request is required.")
+        limit = getattr(settings, "X402_CHALLENGE_BATCH_LIMIT", 100)
+        if len(value) > limit:
+            raise serializers.ValidationError(f"At most {limit} requests can be priced per bundle.")
+        return value
@@ -15,6 +15,7 @@ from integrations.verifiers import algorand
     ALGORAND_NETWORK="testnet",
     ALGO_INDEXER_URL="https://indexer.testnet.algorand.network",
     X402_ASSET_DECIMALS=6,
+    X402_VERIFICATION_STRATEGIES="indexer",
 )
 class AlgorandVerifierTests(SimpleTestCase):
     def setUp(self):
@@ -67,3 +68,91 @@ class AlgorandVerifierTests(SimpleTestCase):
     def test_invalid_receipt_payload_returns_none(self):
         result = algorand.verify_receipt("not-json", Decimal("1"), None)
         self.assertIsNone(result)
+
+    def test_group_receipt_verifies_all_nonces_from_single_lookup(self):
+        group_id = "R1JPVVAtMTIz"
+        transactions = []
+        for index, nonce in enumerate(("nonce-a", "nonce-b")):
+            transaction = json.loads(json.dumps(self.base_transaction["transaction"]))
+            transaction["id"] = f"TX-{index}"
+            transaction["group"] = group_id
+            transaction["note"] = base64.b64encode(nonce.encode()).decode()
+            transactions.append(transaction)
+        mock_client = MagicMock()
+        mock_client.search_transactions.return_value = {"transactions": transactions}
+        receipt = json.dumps({"group_id": group_id, "nonces": ["nonce-a", "nonce-b"]})
+
+        with patch("integrations.verifiers.algorand._get_indexer_client", return_value=mock_client):
+            first = algorand.verify_receipt(receipt, Decimal("1"), None)
+            second = algorand.verify_receipt(receipt, Decimal("1"), None)
+
+        self.assertEqual(first, second)
+        self.assertEqual(first["group_id"], group_id)
+        self.assertEqual([entry["nonce"] for entry in first["payments"]], ["nonce-a", "nonce-b"])
+        self.assertEqual(first["payments"][1]["transaction_id"], "TX-1")
+        mock_client.search_transactions.assert_called_once_with(group_id=group_id)
+
+
+@override_settings(
+    X402_PAYTO_ADDRESS="RECEIVER123",
+    X402_ASSET_DECIMALS=6,
+    X402_NETWORK="algorand",
+    X402_VERIFICATION_STRATEGIES="algod,indexer",
+)
+class AlgodFirstVerificationTests(SimpleTestCase):
+    def setUp(self):
+        self.receipt = json.dumps({"nonce": "nonce-123", "txid": "TESTTXID", "asset_id": 10458941})
+        self.pending = {
+            "confirmed-round": 777,
+            "pool-error": "",
+            "txn": {
+                "txn": {
+                    "type": "axfer",
+                    "snd": "SENDER123",
+                    "arcv": "RECEIVER123",
+                    "aamt": 2_000_000,
+                    "xaid": 10458941,
+                    "note": base64.b64encode(b"nonce-123").decode(),
+                }
+            },
+        }
+
+    def test_confirmed_algod_lookup_skips_indexer(self):
+        algod_client = MagicMock()
+        algod_client.pending_transaction_info.return_value = self.pending
+        indexer_client = MagicMock()
+        with patch("integrations.verifiers.algorand._get_algod_client", return_value=algod_client), patch(
+            "integrations.verifiers.algorand._get_indexer_client", return_value=indexer_client
+        ):
+            result = algorand.verify_receipt(self.receipt, Decimal("1"), None)
+
+        self.assertEqual(result["payer"], "SENDER123")
+        self.assertEqual(result["metadata"]["confirmed_round"], 777)
+        algod_client.pending_transaction_info.assert_called_once_with("TESTTXID")
+        indexer_client.transaction.assert_not_called()
+
+    def test_algod_miss_falls_back_to_indexer(self):
+        algod_client = MagicMock()
+        algod_client.pending_transaction_info.side_effect = Exception("txn not found")
+        indexer_client = MagicMock()
+        indexer_client.transaction.return_value = {
+            "transaction": {
+                "tx-type": "axfer",
+                "sender": "SENDER123",
+                "confirmed-round": 700,
+                "asset-transfer-transaction": {"asset-id": 10458941, "receiver": "RECEIVER123", "amount": 2_000_000},
+                "note": base64.b64encode(b"nonce-123").decode(),
+            }
+        }
+        with patch("integrations.verifiers.algorand._get_algod_client", return_value=algod_client), patch(
+            "integrations.verifiers.algorand._get_indexer_client", return_value=indexer_client
+        ):
+            result = algorand.verify_receipt(self.receipt, Decimal("1"), None)
+
+        self.assertEqual(result["metadata"]["confirmed_round"], 700)
+        indexer_client.transaction.assert_called_once_with("TESTTXID")
+
+    @override_settings(X402_VERIFICATION_STRATEGIES='{"algorand": ["indexer"], "default": ["algod"]}')
+    def test_strategies_are_configurable_per_network(self):
+        self.assertEqual(algorand.get_lookup_strategies("algorand"), ("indexer",))
+        self.assertEqual(algorand.get_lookup_strategies("voi"), ("algod",))
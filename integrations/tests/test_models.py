@@ -1,13 +1,14 @@
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-from .models import Integration, IntegrationStatus
+from integrations.models import Integration, IntegrationStatus
 
 
 class IntegrationModelTests(TestCase):
     def setUp(self):
         self.user = get_user_model().objects.create_user(
             email="integrations@example.com",
+            username="integrations",
             password="pass1234",
         )
 
@@ -30,7 +30,9 @@ def fake_verifier(receipt: str, price: Decimal, request):
 )
 class PaymentLinkFlowTests(TestCase):
     def setUp(self):
-        self.user = get_user_model().objects.create_user(email="tenant@example.com", password="pass12345")
+        self.user = get_user_model().objects.create_user(
+            email="tenant@example.com", username="tenant", password="pass12345"
+        )
         self.client.force_login(self.user)
         self.api_client = APIClient()
         self.api_client.force_authenticate(self.user)
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import base64
+import json
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase, override_settings
+
+from integrations import x402
+from integrations.verifiers import algorand, registry
+
+
+def usdc_verifier(receipt, price, request, options=None):
+    return {"nonce": receipt, "verifier": "usdc", "options": dict(options or {})}
+
+
+def fallback_verifier(receipt, price, request):
+    return {"nonce": receipt, "verifier": "fallback"}
+
+
+def _request_for(network, currency):
+    rule = x402.PricingRule(pattern="/paid", amount=Decimal("1"), currency=currency, network=network)
+    return SimpleNamespace(x402_rule=rule)
+
+
+@override_settings(
+    X402_NETWORK="algorand",
+    X402_CURRENCY="USDC",
+    X402_RECEIPT_VERIFIER="integrations.tests.test_verifier_registry.fallback_verifier",
+    X402_VERIFIERS=json.dumps(
+        {
+            "algorand:USDC": {
+                "verifier": "integrations.tests.test_verifier_registry.usdc_verifier",
+                "asset_id": 31566704,
+            },
+            "voi:*": "integrations.tests.test_verifier_registry.usdc_verifier",
+        }
+    ),
+)
+class VerifierRegistryTests(SimpleTestCase):
+    def tearDown(self):
+        registry.unregister_verifier("algorand", "EURC")
+        registry.refresh_registry()
+
+    def test_dispatches_on_matched_rule_network_and_currency(self):
+        verifier = x402._get_verifier(_request_for("algorand", "usdc"))
+
+        result = verifier(receipt="n-1", price=Decimal("1"), request=None)
+
+        self.assertEqual(result["verifier"], "usdc")
+        self.assertEqual(result["options"], {"asset_id": 31566704})
+
+    def test_network_wildcard_and_global_fallback(self):
+        self.assertEqual(x402._get_verifier(_request_for("voi", "GOLD"))(receipt="n", price=1, request=None)["verifier"], "usdc")
+        self.assertIs(x402._get_verifier(_request_for("algorand", "EURC")), fallback_verifier)
+
+    def test_runtime_registration_overrides_fallback(self):
+        registry.register_verifier("algorand", "eurc", usdc_verifier, asset_id=227855942)
+
+        verifier = x402._get_verifier(_request_for("algorand", "EURC"))
+
+        self.assertEqual(verifier.options, {"asset_id": 227855942})
+
+
+@override_settings(X402_PAYTO_ADDRESS="RECEIVER123", X402_ASSET_DECIMALS=6, ALGO_API_TOKEN="")
+class AlgorandNetworkOptionsTests(SimpleTestCase):
+    def test_registry_options_pin_asset_and_select_endpoint(self):
+        transaction = {
+            "transaction": {
+                "tx-type": "axfer",
+                "sender": "SENDER123",
+                "confirmed-round": 10,
+                "asset-transfer-transaction": {"asset-id": 555, "receiver": "RECEIVER123", "amount": 5_000_000},
+                "note": base64.b64encode(b"nonce-9").decode(),
+            }
+        }
+        receipt = json.dumps({"nonce": "nonce-9", "txid": "TX9", "asset_id": 10458941})
+        options = {"network": "voi", "asset_id": 555, "indexer_url": "https://voi-indexer", "strategies": ["indexer"]}
+        client = MagicMock()
+        client.transaction.return_value = transaction
+
+        with patch.object(algorand, "_get_indexer_client", return_value=client) as get_client:
+            result = algorand.verify_receipt(receipt, Decimal("5"), None, options=options)
+
+        config = get_client.call_args.args[0]
+        self.assertEqual((config.network, config.indexer_url), ("voi", "https://voi-indexer"))
+        self.assertEqual(result["metadata"]["asset_id"], 555)
+        self.assertEqual(result["metadata"]["network"], "voi")
+
+    def test_clients_are_pooled_per_endpoint(self):
+        mainnet = algorand.resolve_network_config(None, {"indexer_url": "https://mainnet-idx"})
+        voi = algorand.resolve_network_config(None, {"indexer_url": "https://voi-idx"})
+
+        self.assertIs(algorand._get_indexer_client(mainnet), algorand._get_indexer_client(mainnet))
+        self.assertIsNot(algorand._get_indexer_client(mainnet), algorand._get_indexer_client(voi))
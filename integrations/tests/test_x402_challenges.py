@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import json
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.test import TestCase, override_settings
+from django.urls import include, path
+from rest_framework.test import APIClient
+from rest_framework.throttling import ScopedRateThrottle
+
+from integrations.models import EndpointPricingRule, PaymentReceipt
+
+
+def protected_view(request):
+    return JsonResponse({"ok": True})
+
+
+urlpatterns = [
+    path("api/integrations/", include("integrations.urls")),
+    path("reports/", protected_view),
+    path("exports/", protected_view),
+]
+
+
+def fake_verifier(receipt: str, price, request):
+    return {"nonce": receipt, "amount": str(price), "payer": "batch-wallet"}
+
+
+@override_settings(
+    ROOT_URLCONF=__name__,
+    X402_ENABLED=True,
+    X402_PAYTO_ADDRESS="BATCH_PAYTO",
+    X402_DEFAULT_PRICE="0",
+    X402_PRICING_RULES=json.dumps(
+        {
+            "/reports": {"amount": "0.25", "methods": ["GET"]},
+            "/exports": "1.5",
+        }
+    ),
+    X402_RECEIPT_VERIFIER="integrations.tests.test_x402_challenges.fake_verifier",
+    X402_NONCE_TTL_SECONDS=60,
+)
+class X402ChallengeBundleTests(TestCase):
+    url = "/api/integrations/x402/challenges/"
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.api_client = APIClient()
+
+    def test_bundle_prices_all_requests_and_sums_amounts(self):
+        payload = {
+            "requests": [
+                {"method": "get", "path": "/reports/"},
+                ["POST", "/exports"],
+                {"path": "/free"},
+            ]
+        }
+
+        response = self.api_client.post(self.url, payload, format="json")
+
+        self.assertEqual(response.status_code, 201, response.content)
+        data = response.json()
+        self.assertEqual(data["total_amount"], "1.75")
+        self.assertEqual(data["totals"], [{"currency": "USDC", "network": "algorand", "amount": "1.75"}])
+        reports, exports, free = data["challenges"]
+        self.assertEqual(reports["amount"], "0.25")
+        self.assertEqual(reports["pay_to"], "BATCH_PAYTO")
+        self.assertEqual(exports["method"], "POST")
+        self.assertFalse(free["paywalled"])
+        self.assertEqual(
+            set(PaymentReceipt.objects.values_list("nonce", flat=True)),
+            {reports["nonce"], exports["nonce"]},
+        )
+
+    def test_bundled_nonce_unlocks_request(self):
+        response = self.api_client.post(self.url, {"requests": [["GET", "/reports"]]}, format="json")
+        nonce = response.json()["challenges"][0]["nonce"]
+
+        paid = self.client.get("/reports/", HTTP_X_402_RECEIPT=nonce)
+
+        self.assertEqual(paid.status_code, 200)
+        self.assertEqual(PaymentReceipt.objects.get(nonce=nonce).status, "confirmed")
+
+    def test_tenant_rules_apply_to_their_paths(self):
+        tenant = get_user_model().objects.create_user(
+            email="tenant@example.com",
+            username="tenant",
+            password="pass1234",
+        )
+        EndpointPricingRule.objects.create(
+            user=tenant,
+            pattern=f"/paywall/tenant/{tenant.id}/links/*",
+            methods=["GET"],
+            amount=Decimal("3"),
+            currency="USDC",
+            network="algorand",
+        )
+
+        response = self.api_client.post(
+            self.url,
+            {"requests": [["GET", f"/paywall/tenant/{tenant.id}/links/report"]]},
+            format="json",
+        )
+
+        challenge = response.json()["challenges"][0]
+        self.assertEqual(challenge["amount"], "3")
+        self.assertEqual(PaymentReceipt.objects.get(nonce=challenge["nonce"]).user, tenant)
+
+    @override_settings(X402_CHALLENGE_BATCH_LIMIT=1)
+    def test_rejects_oversized_bundle(self):
+        response = self.api_client.post(
+            self.url,
+            {"requests": [["GET", "/reports"], ["GET", "/exports"]]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+    @mock.patch.object(ScopedRateThrottle, "THROTTLE_RATES", {"x402_challenges": "2/min"})
+    def test_anonymous_clients_are_throttled(self):
+        payload = {"requests": [["GET", "/reports"]]}
+
+        statuses = [self.api_client.post(self.url, payload, format="json").status_code for _ in range(3)]
+
+        self.assertEqual(statuses, [201, 201, 429])
+        self.assertEqual(PaymentReceipt.objects.count(), 2)
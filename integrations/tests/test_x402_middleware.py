@@ -6,6 +6,8 @@ from django.http import JsonResponse
 from django.test import TestCase, override_settings
 from django.urls import path
 
+from integrations.models import PaymentReceipt, PaymentReceiptStatus
+
 
 def protected_view(request):
     payload = {"ok": True}
@@ -16,6 +18,7 @@ def protected_view(request):
 
 urlpatterns = [
     path("protected/", protected_view),
+    path("premium/", protected_view),
 ]
 
 
@@ -29,6 +32,20 @@ def fake_verifier(receipt: str, price, request):
     }
 
 
+def fake_group_verifier(receipt: str, price, request):
+    nonces = [nonce for nonce in receipt.split(",") if nonce]
+    if not nonces:
+        return None
+    return {
+        "status": "confirmed",
+        "group_id": "GROUP-1",
+        "payments": [
+            {"nonce": nonce, "amount": str(price), "payer": "test-wallet", "transaction_id": f"TX-{nonce}"}
+            for nonce in nonces
+        ],
+    }
+
+
 @override_settings(
     ROOT_URLCONF=__name__,
     X402_ENABLED=True,
@@ -71,3 +88,44 @@ class X402MiddlewareTests(TestCase):
 
         replay = self.client.get("/protected/", HTTP_X_402_RECEIPT=nonce)
         self.assertEqual(replay.status_code, 402)
+
+
+@override_settings(
+    ROOT_URLCONF=__name__,
+    X402_ENABLED=True,
+    X402_PAYTO_ADDRESS="TEST_WALLET",
+    X402_DEFAULT_PRICE="0",
+    X402_PRICING_RULES=json.dumps({"/protected": {"amount": "0.25", "methods": ["GET"]}}),
+    X402_RECEIPT_VERIFIER="integrations.tests.test_x402_middleware.fake_group_verifier",
+    X402_NONCE_TTL_SECONDS=60,
+)
+class X402GroupReceiptTests(TestCase):
+    def test_group_receipt_settles_one_nonce_per_request(self):
+        nonces = [self.client.get("/protected/")["X-402-Nonce"] for _ in range(2)]
+        receipt = ",".join(nonces)
+
+        first = self.client.get("/protected/", HTTP_X_402_RECEIPT=receipt)
+        second = self.client.get("/protected/", HTTP_X_402_RECEIPT=receipt)
+        third = self.client.get("/protected/", HTTP_X_402_RECEIPT=receipt)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(third.status_code, 402)
+        settled = {first.json()["payment"]["nonce"], second.json()["payment"]["nonce"]}
+        self.assertEqual(settled, set(nonces))
+        self.assertEqual(first.json()["payment"]["group_id"], "GROUP-1")
+
+    @override_settings(
+        X402_PRICING_RULES=json.dumps(
+            {"/protected": {"amount": "0.25", "methods": ["GET"]}, "/premium": {"amount": "0.10", "methods": ["GET"]}}
+        )
+    )
+    def test_group_receipt_never_settles_a_nonce_issued_for_another_path(self):
+        premium_nonce = self.client.get("/premium/")["X-402-Nonce"]
+
+        response = self.client.get("/protected/", HTTP_X_402_RECEIPT=premium_nonce)
+
+        self.assertEqual(response.status_code, 402)
+        self.assertEqual(PaymentReceipt.objects.get(nonce=premium_nonce).status, PaymentReceiptStatus.PENDING)
+        premium = self.client.get("/premium/", HTTP_X_402_RECEIPT=premium_nonce)
+        self.assertEqual(premium.status_code, 200)
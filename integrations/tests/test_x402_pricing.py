@@ -5,7 +5,7 @@ from decimal import Decimal
 from django.contrib.auth import get_user_model
 from django.http import JsonResponse
 from django.test import RequestFactory, TestCase, override_settings
-from django.urls import path
+from django.urls import include, path
 from rest_framework.test import APIClient
 
 from integrations import x402
@@ -17,6 +17,7 @@ def protected_view(request):
 
 
 urlpatterns = [
+    path("api/integrations/", include("integrations.urls")),
     path("pricing-protected/", protected_view),
 ]
 
@@ -44,7 +45,9 @@ def fake_verifier(receipt: str, price: Decimal, request):
 )
 class X402PricingAPITests(TestCase):
     def setUp(self):
-        self.user = get_user_model().objects.create_user(email="pricing@example.com", password="pass1234")
+        self.user = get_user_model().objects.create_user(
+            email="pricing@example.com", username="pricing", password="pass1234"
+        )
         self.client.force_login(self.user)
         self.api_client = APIClient()
         self.api_client.force_authenticate(self.user)
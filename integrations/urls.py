@@ -11,12 +11,14 @@ from .views import (
     PaymentLinkViewSet,
     PaymentReceiptViewSet,
     PaymentWidgetViewSet,
+    X402ChallengeBundleViewSet,
 )
 
 router = DefaultRouter()
 router.register(r"integrations", IntegrationViewSet, basename="integration")
 router.register(r"x402/pricing-rules", EndpointPricingRuleViewSet, basename="x402-pricing-rule")
 router.register(r"x402/receipts", PaymentReceiptViewSet, basename="x402-receipt")
+router.register(r"x402/challenges", X402ChallengeBundleViewSet, basename="x402-challenges")
 router.register(r"x402/links", PaymentLinkViewSet, basename="x402-links")
 router.register(r"x402/widgets", PaymentWidgetViewSet, basename="x402-widgets")
 router.register(r"x402/credit-plans", CreditPlanViewSet, basename="x402-credit-plans")
@@ -4,20 +4,48 @@ import base64
 import binascii
 import json
 import logging
+from dataclasses import dataclass
 from decimal import Decimal, InvalidOperation
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Mapping, Optional
 
 from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
 
 try:  # pragma: no cover - module availability depends on deployment
-    from algosdk.v2client import indexer  # type: ignore
+    from algosdk.v2client import algod, indexer  # type: ignore
 except ImportError:  # pragma: no cover
+    algod = None  # type: ignore
     indexer = None  # type: ignore
 
 logger = logging.getLogger(__name__)
 
+_GROUP_CACHE_TEMPLATE = "x402:group:{network}:{group_id}"
+_DEFAULT_STRATEGIES = ("algod", "indexer")
+_STRATEGIES_CACHE: tuple[str, Dict[str, tuple[str, ...]]] = ("", {})
+_CLIENT_POOL: Dict[tuple[str, str, str], Any] = {}
 
-def verify_receipt(receipt: str, price: Decimal, request) -> Optional[Dict[str, Any]]:
+
+@dataclass(frozen=True)
+class NetworkConfig:
+    """Connection and asset settings used to verify receipts on one network."""
+
+    network: str
+    asset_id: Optional[int]
+    decimals: int
+    algod_url: str
+    indexer_url: str
+    api_token: str
+    cache_alias: str
+    strategies: Optional[tuple[str, ...]] = None
+
+
+def verify_receipt(
+    receipt: str,
+    price: Decimal,
+    request,
+    options: Optional[Mapping[str, Any]] = None,
+) -> Optional[Dict[str, Any]]:
     """
     Verify an x402 receipt by inspecting a USDC transfer on Algorand.
 
@@ -27,64 +55,46 @@ def verify_receipt(receipt: str, price: Decimal, request) -> Optional[Dict[str,
       - amount (optional): declared amount (used as secondary check)
       - asset_id (optional): ASA identifier (defaults to configured USDC asset)
 
+    Clients paying several nonces at once may instead send a ``group_id`` (the
+    base64 atomic group identifier) with an optional ``nonces`` list. Every
+    transfer in the group is then returned under ``payments`` so the x402 layer
+    can settle the nonce matching the current request.
+
+    ``options`` come from the verifier registry entry matching the pricing rule
+    (``asset_id``, ``decimals``, ``algod_url``, ``indexer_url``, ``api_token``,
+    ``cache_alias``, ``strategies``). Missing keys fall back to the global settings.
+
     Returns a dict with payment metadata if confirmed, otherwise None.
     """
     payload = _load_receipt_payload(receipt)
     if not payload:
         return None
 
+    config = resolve_network_config(request, options)
+
+    group_id = payload.get("group_id") or payload.get("group")
+    if group_id:
+        return _verify_group_receipt(payload, str(group_id), request, config)
+
     nonce = payload.get("nonce")
     tx_id = payload.get("txid") or payload.get("transaction_id")
     if not nonce or not tx_id:
         logger.warning("Algorand verifier missing nonce or transaction id in receipt payload.")
         return None
 
-    asset_id = _resolve_asset_id(payload.get("asset_id"))
-    expected_receiver = (getattr(request, "x402_payto_address", "") if request is not None else "") or getattr(settings, "X402_PAYTO_ADDRESS", "")
-    decimals = getattr(settings, "X402_ASSET_DECIMALS", 6)
+    asset_id = config.asset_id or _resolve_asset_id(payload.get("asset_id"))
+    expected_receiver = _resolve_expected_receiver(request)
+    decimals = config.decimals
 
-    try:
-        client = _get_indexer_client()
-        tx_response = client.transaction(tx_id)
-    except Exception:  # pragma: no cover - network errors logged but not fatal
-        logger.exception("Algorand indexer lookup failed for transaction %s.", tx_id)
-        return None
-
-    transaction = tx_response.get("transaction")
+    transaction = _lookup_transaction(tx_id, config)
     if not transaction:
-        logger.warning("Algorand indexer returned an empty transaction for txid=%s", tx_id)
-        return None
-
-    if transaction.get("tx-type") != "axfer":
-        logger.warning("Algorand transaction %s is not an asset transfer.", tx_id)
-        return None
-
-    transfer = transaction.get("asset-transfer-transaction") or {}
-    if asset_id and transfer.get("asset-id") != asset_id:
-        logger.warning(
-            "Algorand transaction %s asset mismatch. expected=%s actual=%s",
-            tx_id,
-            asset_id,
-            transfer.get("asset-id"),
-        )
         return None
 
-    receiver = transfer.get("receiver")
-    if expected_receiver and receiver and receiver.lower() != expected_receiver.lower():
-        logger.warning(
-            "Algorand transaction %s receiver mismatch. expected=%s actual=%s",
-            tx_id,
-            expected_receiver,
-            receiver,
-        )
-        return None
-
-    amount_micro = transfer.get("amount")
-    if amount_micro is None:
-        logger.warning("Algorand transaction %s missing amount.", tx_id)
+    validated = _validate_transfer(transaction, tx_id, asset_id, expected_receiver, decimals)
+    if validated is None:
         return None
+    transfer, amount_decimal = validated
 
-    amount_decimal = Decimal(amount_micro) / Decimal(10**decimals)
     if amount_decimal < price:
         logger.warning(
             "Algorand transaction %s amount %s below required price %s.",
@@ -99,17 +109,13 @@ def verify_receipt(receipt: str, price: Decimal, request) -> Optional[Dict[str,
         logger.warning("Algorand transaction %s note does not contain nonce %s.", tx_id, nonce)
         return None
 
-    confirmed_round = transaction.get("confirmed-round")
-    if not confirmed_round:
-        logger.warning("Algorand transaction %s not yet confirmed.", tx_id)
-        return None
-
     payer = transaction.get("sender")
     metadata = {
         "transaction_id": tx_id,
+        "network": config.network,
         "asset_id": transfer.get("asset-id"),
-        "confirmed_round": confirmed_round,
-        "receiver": receiver,
+        "confirmed_round": transaction.get("confirmed-round"),
+        "receiver": transfer.get("receiver"),
         "note": note,
     }
 
@@ -137,6 +143,333 @@ def verify_receipt(receipt: str, price: Decimal, request) -> Optional[Dict[str,
     }
 
 
+def _verify_group_receipt(
+    payload: Dict[str, Any],
+    group_id: str,
+    request,
+    config: NetworkConfig,
+) -> Optional[Dict[str, Any]]:
+    nonces = _parse_group_nonces(payload)
+    asset_id = config.asset_id or _resolve_asset_id(payload.get("asset_id"))
+    expected_receiver = _resolve_expected_receiver(request)
+    decimals = config.decimals
+
+    transactions = _fetch_group_transactions(group_id, config)
+    if not transactions:
+        return None
+
+    payload_metadata = payload.get("metadata")
+    payments: list[Dict[str, Any]] = []
+    for transaction in transactions:
+        tx_id = transaction.get("id")
+        if transaction.get("tx-type") != "axfer":
+            continue
+        validated = _validate_transfer(transaction, tx_id, asset_id, expected_receiver, decimals)
+        if validated is None:
+            continue
+        transfer, amount_decimal = validated
+
+        note = _decode_note(transaction.get("note"))
+        nonce = _match_group_nonce(note, nonces)
+        if not nonce:
+            logger.debug("Skipping group %s transfer %s without a known nonce.", group_id, tx_id)
+            continue
+
+        metadata = {
+            "transaction_id": tx_id,
+            "group_id": group_id,
+            "network": config.network,
+            "asset_id": transfer.get("asset-id"),
+            "confirmed_round": transaction.get("confirmed-round"),
+            "receiver": transfer.get("receiver"),
+            "note": note,
+        }
+        if isinstance(payload_metadata, dict):
+            metadata.update(payload_metadata)
+
+        payments.append(
+            {
+                "nonce": nonce,
+                "amount": str(amount_decimal),
+                "payer": transaction.get("sender"),
+                "transaction_id": tx_id,
+                "metadata": metadata,
+            }
+        )
+
+    if not payments:
+        logger.warning("Algorand group %s contains no transfer matching the receipt nonces.", group_id)
+        return None
+
+    return {
+        "status": "confirmed",
+        "group_id": group_id,
+        "expected_receiver": expected_receiver,
+        "payments": payments,
+    }
+
+
+def _lookup_transaction(tx_id: str, config: NetworkConfig) -> Optional[Dict[str, Any]]:
+    """
+    Resolve a transaction through the strategies configured for the network.
+
+    algod reports ``confirmed-round`` as soon as the block is committed while the
+    indexer trails by a few seconds, so algod is asked first by default and the
+    indexer only serves transactions that already left algod's pending pool.
+    """
+    network = config.network
+    for strategy in config.strategies or get_lookup_strategies(network):
+        lookup = _LOOKUP_STRATEGIES.get(strategy)
+        if lookup is None:
+            logger.warning("Unknown x402 verification strategy %s for network %s.", strategy, network)
+            continue
+        transaction = lookup(tx_id, config)
+        if transaction:
+            return transaction
+
+    logger.warning("Algorand transaction %s not found by strategies for network %s.", tx_id, network)
+    return None
+
+
+def _lookup_via_algod(tx_id: str, config: NetworkConfig) -> Optional[Dict[str, Any]]:
+    try:
+        response = _get_algod_client(config).pending_transaction_info(tx_id)
+    except Exception as exc:  # algod forgets transactions once they leave the pending cache
+        logger.debug("algod pending lookup unavailable for transaction %s: %s", tx_id, exc)
+        return None
+
+    if response.get("pool-error"):
+        logger.warning("algod rejected transaction %s: %s", tx_id, response["pool-error"])
+        return None
+
+    txn = (response.get("txn") or {}).get("txn") or {}
+    if not txn:
+        return None
+
+    transaction: Dict[str, Any] = {
+        "id": tx_id,
+        "tx-type": txn.get("type"),
+        "sender": txn.get("snd"),
+        "confirmed-round": response.get("confirmed-round"),
+        "note": txn.get("note"),
+        "group": txn.get("grp"),
+    }
+    if txn.get("type") == "axfer":
+        # algod omits zero-valued fields from its canonical encoding.
+        transaction["asset-transfer-transaction"] = {
+            "asset-id": txn.get("xaid"),
+            "receiver": txn.get("arcv"),
+            "amount": txn.get("aamt", 0),
+        }
+    return transaction
+
+
+def _lookup_via_indexer(tx_id: str, config: NetworkConfig) -> Optional[Dict[str, Any]]:
+    try:
+        client = _get_indexer_client(config)
+        tx_response = client.transaction(tx_id)
+    except Exception:  # pragma: no cover - network errors logged but not fatal
+        logger.exception("Algorand indexer lookup failed for transaction %s.", tx_id)
+        return None
+
+    transaction = tx_response.get("transaction")
+    if not transaction:
+        logger.warning("Algorand indexer returned an empty transaction for txid=%s", tx_id)
+        return None
+    return transaction
+
+
+_LOOKUP_STRATEGIES = {
+    "algod": _lookup_via_algod,
+    "indexer": _lookup_via_indexer,
+}
+
+
+def get_lookup_strategies(network: str) -> tuple[str, ...]:
+    """
+    Return the ordered lookup strategies for a network.
+
+    ``X402_VERIFICATION_STRATEGIES`` is either a comma separated list applied to every
+    network (``"algod,indexer"``) or a JSON object keyed by network with an optional
+    ``"default"`` entry (``{"algorand": ["indexer"], "default": ["algod", "indexer"]}``).
+    """
+    global _STRATEGIES_CACHE
+    raw = getattr(settings, "X402_VERIFICATION_STRATEGIES", "") or ""
+
+    if raw != _STRATEGIES_CACHE[0] or not _STRATEGIES_CACHE[1]:
+        _STRATEGIES_CACHE = (raw, _parse_strategies(raw))
+
+    strategies = _STRATEGIES_CACHE[1]
+    return strategies.get(network.lower()) or strategies.get("default") or _DEFAULT_STRATEGIES
+
+
+def _parse_strategies(raw: str) -> Dict[str, tuple[str, ...]]:
+    raw = raw.strip()
+    if not raw:
+        return {"default": _DEFAULT_STRATEGIES}
+
+    if raw.startswith("{"):
+        try:
+            parsed = json.loads(raw)
+        except ValueError as exc:
+            logger.warning("Invalid JSON for X402_VERIFICATION_STRATEGIES: %s", exc)
+            return {"default": _DEFAULT_STRATEGIES}
+        if not isinstance(parsed, dict):
+            return {"default": _DEFAULT_STRATEGIES}
+        return {
+            str(network).lower(): _normalize_strategy_list(entries)
+            for network, entries in parsed.items()
+            if _normalize_strategy_list(entries)
+        }
+
+    return {"default": _normalize_strategy_list(raw) or _DEFAULT_STRATEGIES}
+
+
+def _normalize_strategy_list(entries: Any) -> tuple[str, ...]:
+    if isinstance(entries, str):
+        entries = entries.split(",")
+    if not isinstance(entries, (list, tuple)):
+        return ()
+    return tuple(str(entry).strip().lower() for entry in entries if str(entry).strip())
+
+
+def resolve_network_config(request, options: Optional[Mapping[str, Any]] = None) -> NetworkConfig:
+    """
+    Build the verification settings for the network of the matched pricing rule.
+
+    Registry options take precedence over the global ``X402_*``/``ALGO_*`` settings so
+    each network keeps its own endpoints, asset and cache namespace.
+    """
+    options = options or {}
+    network = str(options.get("network") or _resolve_network(request)).lower()
+
+    asset_id = options.get("asset_id")
+    try:
+        asset_id = int(asset_id) if asset_id else None
+    except (TypeError, ValueError):
+        logger.warning("Ignoring invalid asset id %s configured for network %s.", asset_id, network)
+        asset_id = None
+
+    strategies = _normalize_strategy_list(options.get("strategies") or ())
+    return NetworkConfig(
+        network=network,
+        asset_id=asset_id,
+        decimals=int(options.get("decimals", getattr(settings, "X402_ASSET_DECIMALS", 6))),
+        algod_url=options.get("algod_url") or getattr(settings, "ALGO_NODE_URL", ""),
+        indexer_url=options.get("indexer_url") or getattr(settings, "ALGO_INDEXER_URL", ""),
+        api_token=options.get("api_token", getattr(settings, "ALGO_API_TOKEN", "")) or "",
+        cache_alias=options.get("cache_alias") or getattr(settings, "X402_CACHE_ALIAS", "default"),
+        strategies=strategies or None,
+    )
+
+
+def _resolve_network(request) -> str:
+    rule = getattr(request, "x402_rule", None) if request is not None else None
+    network = getattr(rule, "network", None) or getattr(settings, "X402_NETWORK", "algorand")
+    return str(network)
+
+
+def _fetch_group_transactions(group_id: str, config: NetworkConfig) -> list[Dict[str, Any]]:
+    """
+    Return the confirmed transactions of an atomic group.
+
+    Confirmed groups are immutable, so the indexer response is cached and every
+    nonce paid by the same group is verified from a single lookup.
+    """
+    cache = _get_cache(config.cache_alias)
+    cache_key = _GROUP_CACHE_TEMPLATE.format(network=config.network, group_id=group_id)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        client = _get_indexer_client(config)
+        response = client.search_transactions(group_id=group_id)
+    except Exception:  # pragma: no cover - network errors logged but not fatal
+        logger.exception("Algorand indexer lookup failed for group %s.", group_id)
+        return []
+
+    transactions = response.get("transactions") or []
+    if not transactions:
+        logger.warning("Algorand indexer returned no transactions for group=%s", group_id)
+        return []
+
+    ttl = max(1, int(getattr(settings, "X402_NONCE_TTL_SECONDS", 300)))
+    cache.set(cache_key, transactions, timeout=ttl)
+    return transactions
+
+
+def _validate_transfer(
+    transaction: Dict[str, Any],
+    tx_id: Optional[str],
+    asset_id: Optional[int],
+    expected_receiver: str,
+    decimals: int,
+) -> Optional[tuple[Dict[str, Any], Decimal]]:
+    if transaction.get("tx-type") != "axfer":
+        logger.warning("Algorand transaction %s is not an asset transfer.", tx_id)
+        return None
+
+    transfer = transaction.get("asset-transfer-transaction") or {}
+    if asset_id and transfer.get("asset-id") != asset_id:
+        logger.warning(
+            "Algorand transaction %s asset mismatch. expected=%s actual=%s",
+            tx_id,
+            asset_id,
+            transfer.get("asset-id"),
+        )
+        return None
+
+    receiver = transfer.get("receiver")
+    if expected_receiver and receiver and receiver.lower() != expected_receiver.lower():
+        logger.warning(
+            "Algorand transaction %s receiver mismatch. expected=%s actual=%s",
+            tx_id,
+            expected_receiver,
+            receiver,
+        )
+        return None
+
+    amount_micro = transfer.get("amount")
+    if amount_micro is None:
+        logger.warning("Algorand transaction %s missing amount.", tx_id)
+        return None
+
+    if not transaction.get("confirmed-round"):
+        logger.warning("Algorand transaction %s not yet confirmed.", tx_id)
+        return None
+
+    return transfer, Decimal(amount_micro) / Decimal(10**decimals)
+
+
+def _parse_group_nonces(payload: Dict[str, Any]) -> list[str]:
+    nonces = payload.get("nonces")
+    if isinstance(nonces, str):
+        nonces = [nonces]
+    if not isinstance(nonces, (list, tuple)):
+        nonces = []
+    single = payload.get("nonce")
+    if single:
+        nonces = [single, *nonces]
+    return [str(nonce) for nonce in nonces if nonce]
+
+
+def _match_group_nonce(note: Optional[str], nonces: list[str]) -> Optional[str]:
+    if not note:
+        return None
+    if not nonces:
+        return note.strip() or None
+    for nonce in nonces:
+        if nonce in note:
+            return nonce
+    return None
+
+
+def _resolve_expected_receiver(request) -> str:
+    receiver = getattr(request, "x402_payto_address", "") if request is not None else ""
+    return receiver or getattr(settings, "X402_PAYTO_ADDRESS", "")
+
+
 def _load_receipt_payload(receipt: str) -> Optional[Dict[str, Any]]:
     if not receipt:
         return None
@@ -159,12 +492,29 @@ def _load_receipt_payload(receipt: str) -> Optional[Dict[str, Any]]:
     return None
 
 
-def _get_indexer_client() -> indexer.IndexerClient:
+def _get_indexer_client(config: Optional[NetworkConfig] = None) -> indexer.IndexerClient:
     if indexer is None:  # pragma: no cover - defensive if SDK missing
         raise RuntimeError("algosdk must be installed to verify Algorand receipts.")
-    token = getattr(settings, "ALGO_API_TOKEN", "")
-    headers = {"X-API-Key": token} if token else {}
-    return indexer.IndexerClient(token, getattr(settings, "ALGO_INDEXER_URL", ""), headers)
+    config = config or resolve_network_config(None)
+    return _pooled_client("indexer", config.indexer_url, config.api_token, indexer.IndexerClient)
+
+
+def _get_algod_client(config: Optional[NetworkConfig] = None) -> algod.AlgodClient:
+    if algod is None:  # pragma: no cover - defensive if SDK missing
+        raise RuntimeError("algosdk must be installed to verify Algorand receipts.")
+    config = config or resolve_network_config(None)
+    return _pooled_client("algod", config.algod_url, config.api_token, algod.AlgodClient)
+
+
+def _pooled_client(kind: str, url: str, token: str, factory):
+    # SDK clients are stateless wrappers around an endpoint, so one instance per
+    # (endpoint, token) is shared by every request verifying on that network.
+    key = (kind, url, token)
+    client = _CLIENT_POOL.get(key)
+    if client is None:
+        headers = {"X-API-Key": token} if token else {}
+        client = _CLIENT_POOL.setdefault(key, factory(token, url, headers))
+    return client
 
 
 def _resolve_asset_id(payload_asset: Any) -> Optional[int]:
@@ -192,3 +542,12 @@ def _decode_note(note_field: Optional[str]) -> Optional[str]:
         return decoded.decode("utf-8", errors="ignore")
     except (ValueError, TypeError, binascii.Error):  # pragma: no cover - defensive
         return None
+
+
+def _get_cache(alias: Optional[str] = None):
+    alias = alias or getattr(settings, "X402_CACHE_ALIAS", "default")
+    try:
+        return caches[alias]
+    except (InvalidCacheBackendError, KeyError):
+        logger.warning("Cache alias %s not configured for x402 verifier, falling back to default.", alias)
+        return caches["default"]
@@ -0,0 +1,152 @@
+"""
+Registry of x402 receipt verifiers keyed by (network, asset).
+
+Entries are read from ``X402_VERIFIERS``, a JSON object whose keys are
+``"<network>:<asset>"`` (either side may be ``*``) and whose values are either a
+verifier import path or an object with a ``verifier`` path plus options handed
+to the verifier, for example::
+
+    {
+        "algorand:USDC": {"verifier": "integrations.verifiers.algorand.verify_receipt", "asset_id": 31566704},
+        "algorand-testnet:*": {
+            "verifier": "integrations.verifiers.algorand.verify_receipt",
+            "indexer_url": "https://testnet-idx.algonode.cloud",
+        },
+    }
+
+Networks without an entry keep using ``X402_RECEIPT_VERIFIER``.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+WILDCARD = "*"
+
+_REGISTRY_CACHE: tuple[str, Dict[tuple[str, str], "VerifierEntry"]] = ("", {})
+_RUNTIME_ENTRIES: Dict[tuple[str, str], "VerifierEntry"] = {}
+
+
+@dataclass(frozen=True)
+class VerifierEntry:
+    network: str
+    asset: str
+    verifier: Callable[..., Optional[Dict[str, Any]]]
+    options: Mapping[str, Any] = field(default_factory=dict)
+
+    def __call__(self, *, receipt: str, price, request) -> Optional[Dict[str, Any]]:
+        if self.options:
+            return self.verifier(receipt=receipt, price=price, request=request, options=self.options)
+        return self.verifier(receipt=receipt, price=price, request=request)
+
+
+def register_verifier(
+    network: str,
+    asset: str,
+    verifier: Callable[..., Optional[Dict[str, Any]]] | str,
+    **options: Any,
+) -> VerifierEntry:
+    """Register a verifier programmatically (e.g. from an ``AppConfig.ready`` hook)."""
+    if isinstance(verifier, str):
+        verifier = import_string(verifier)
+    key = _key(network, asset)
+    entry = VerifierEntry(network=key[0], asset=key[1], verifier=verifier, options=dict(options))
+    _RUNTIME_ENTRIES[key] = entry
+    return entry
+
+
+def unregister_verifier(network: str, asset: str) -> None:
+    _RUNTIME_ENTRIES.pop(_key(network, asset), None)
+
+
+def get_verifier(network: Optional[str], asset: Optional[str]) -> Optional[Callable[..., Optional[Dict[str, Any]]]]:
+    """
+    Return the verifier for a (network, asset) pair.
+
+    Lookup goes from the exact pair to ``network:*``, ``*:asset`` and ``*:*``
+    before falling back to ``X402_RECEIPT_VERIFIER``.
+    """
+    network = (network or getattr(settings, "X402_NETWORK", "algorand")).lower()
+    asset = (asset or getattr(settings, "X402_CURRENCY", "USDC")).upper()
+
+    entries = {**_get_configured_entries(), **_RUNTIME_ENTRIES}
+    for candidate in ((network, asset), (network, WILDCARD), (WILDCARD, asset), (WILDCARD, WILDCARD)):
+        entry = entries.get(candidate)
+        if entry is not None:
+            return entry
+
+    backend_path = getattr(settings, "X402_RECEIPT_VERIFIER", "")
+    if not backend_path:
+        return None
+    return import_string(backend_path)
+
+
+def refresh_registry() -> None:
+    global _REGISTRY_CACHE
+    _REGISTRY_CACHE = ("", {})
+
+
+def _get_configured_entries() -> Dict[tuple[str, str], VerifierEntry]:
+    global _REGISTRY_CACHE
+    raw = getattr(settings, "X402_VERIFIERS", "") or ""
+    if isinstance(raw, dict):
+        raw = json.dumps(raw, sort_keys=True)
+
+    if raw == _REGISTRY_CACHE[0]:
+        return _REGISTRY_CACHE[1]
+
+    _REGISTRY_CACHE = (raw, _parse_entries(raw))
+    return _REGISTRY_CACHE[1]
+
+
+def _parse_entries(raw: str) -> Dict[tuple[str, str], VerifierEntry]:
+    if not raw.strip():
+        return {}
+    try:
+        parsed = json.loads(raw)
+    except ValueError as exc:
+        logger.warning("Invalid JSON for X402_VERIFIERS: %s", exc)
+        return {}
+    if not isinstance(parsed, dict):
+        logger.warning("X402_VERIFIERS must be a JSON object keyed by network:asset.")
+        return {}
+
+    entries: Dict[tuple[str, str], VerifierEntry] = {}
+    for raw_key, value in parsed.items():
+        network, _, asset = str(raw_key).partition(":")
+        options: Dict[str, Any] = {}
+        if isinstance(value, str):
+            path = value
+        elif isinstance(value, dict):
+            options = {k: v for k, v in value.items() if k != "verifier"}
+            path = value.get("verifier") or getattr(settings, "X402_RECEIPT_VERIFIER", "")
+        else:
+            logger.warning("Ignoring invalid X402_VERIFIERS entry for %s.", raw_key)
+            continue
+
+        if not path:
+            logger.warning("X402_VERIFIERS entry %s has no verifier path.", raw_key)
+            continue
+        try:
+            verifier = import_string(path)
+        except ImportError:
+            logger.exception("Unable to import x402 verifier %s for %s.", path, raw_key)
+            continue
+
+        key = _key(network, asset or WILDCARD)
+        entries[key] = VerifierEntry(network=key[0], asset=key[1], verifier=verifier, options=options)
+    return entries
+
+
+def _key(network: str, asset: str) -> tuple[str, str]:
+    network = (network or WILDCARD).strip().lower() or WILDCARD
+    asset = (asset or WILDCARD).strip().upper() or WILDCARD
+    return network, asset
@@ -3,6 +3,9 @@
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.throttling import ScopedRateThrottle
+
+from . import x402
 
 from .models import (
     CreditSubscription,
@@ -24,6 +27,7 @@ from .serializers import (
     PaymentLinkSerializer,
     PaymentReceiptSerializer,
     PaymentWidgetSerializer,
+    X402ChallengeBundleSerializer,
 )
 from .services import (
     deactivate_pricing_rule,
@@ -75,6 +79,24 @@ class PaymentReceiptViewSet(viewsets.ReadOnlyModelViewSet):
         return queryset
 
 
+class X402ChallengeBundleViewSet(viewsets.ViewSet):
+    """Issue x402 challenges for many (method, path) pairs so clients can pre-pay in bulk."""
+
+    permission_classes = [permissions.AllowAny]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "x402_challenges"
+
+    def create(self, request):
+        if not x402.is_enabled():
+            return Response({"detail": "x402 payments are disabled."}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = X402ChallengeBundleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        targets = [(entry["method"], entry["path"]) for entry in serializer.validated_data["requests"]]
+        bundle = x402.build_challenge_bundle(request, targets)
+        return Response(bundle, status=status.HTTP_201_CREATED)
+
+
 class _BasePaymentLinkViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     kind = PaymentLinkType.LINK
@@ -13,7 +13,6 @@ from django.core.cache.backends.base import InvalidCacheBackendError
 from django.db import IntegrityError
 from django.core.exceptions import ImproperlyConfigured
 from django.http import HttpRequest
-from django.utils.module_loading import import_string
 
 from .models import (
     EndpointPricingRule,
@@ -23,6 +22,7 @@ from .models import (
     X402CreditPlan,
 )
 from .services import apply_credit_top_up, record_payment_link_event
+from .verifiers import registry as verifier_registry
 
 
 logger = logging.getLogger(__name__)
@@ -167,14 +167,129 @@ def build_challenge(request: HttpRequest, price: Decimal) -> Dict[str, str]:
     return challenge
 
 
+def build_challenge_bundle(request: HttpRequest, targets: Iterable[tuple[str, str]]) -> Dict[str, Any]:
+    """
+    Issue challenges for several (method, path) pairs in one pass so clients can pre-pay.
+
+    Pricing rules for every tenant referenced by the targets are loaded with a single
+    query, nonces are written to the cache with one ``set_many`` and their receipt
+    placeholders with one ``bulk_create``.
+    """
+    default_payto = get_payto_address()
+    if not default_payto:
+        raise ImproperlyConfigured(
+            "X402_PAYTO_ADDRESS must be configured to issue x402 challenges."
+        )
+
+    normalized_targets = [(str(method).upper(), _normalize_path(path)) for method, path in targets]
+    request_owner_ids = _request_owner_ids(request)
+    path_owner_ids = {path: _extract_owner_id(path) for _, path in normalized_targets}
+    owner_ids = request_owner_ids | {owner_id for owner_id in path_owner_ids.values() if owner_id}
+    user_rules = _load_user_pricing_rules(owner_ids)
+    static_rules = _get_pricing_rules()
+    default_price = _get_default_price()
+
+    request_user = getattr(request, "user", None)
+    auth_user_id = request_user.id if getattr(request_user, "is_authenticated", False) else None
+    request_meta = _build_request_metadata(request)
+    callback = getattr(settings, "X402_CALLBACK_URL", "")
+
+    challenges: list[Dict[str, Any]] = []
+    cache_entries: Dict[str, Dict[str, Any]] = {}
+    receipts: list[PaymentReceipt] = []
+    totals: Dict[tuple[str, str], Decimal] = {}
+
+    for method, path in normalized_targets:
+        allowed_owners = request_owner_ids | ({path_owner_ids[path]} if path_owner_ids[path] else set())
+        rule = next(
+            (
+                candidate
+                for candidate in user_rules
+                if candidate.owner_id in allowed_owners and candidate.matches(path, method)
+            ),
+            None,
+        ) or next((candidate for candidate in static_rules if candidate.matches(path, method)), None)
+
+        if rule is not None:
+            price = rule.amount
+        elif default_price > Decimal("0"):
+            price = default_price
+        else:
+            challenges.append({"method": method, "path": path, "paywalled": False})
+            continue
+
+        nonce = _generate_nonce()
+        currency = rule.currency if rule and rule.currency else _get_currency()
+        network = rule.network if rule and rule.network else _get_network()
+        pay_to = _resolve_payto_address(rule, default_payto)
+        owner_id = getattr(rule, "owner_id", None)
+        amount = _format_amount(price)
+
+        payload = {
+            "status": "pending",
+            "path": path,
+            "method": method,
+            "price": amount,
+            "rule_owner_id": owner_id,
+            "pay_to": pay_to,
+        }
+        cache_entries[_NONCE_TEMPLATE.format(nonce=nonce)] = payload
+        metadata: Dict[str, Any] = {"challenge": payload}
+        if request_meta:
+            metadata["request"] = request_meta
+        receipts.append(
+            PaymentReceipt(
+                nonce=nonce,
+                user_id=owner_id or auth_user_id,
+                amount=_quantize_amount(price),
+                currency=currency,
+                network=network,
+                request_path=path,
+                request_method=method,
+                metadata=metadata,
+            )
+        )
+        totals[(currency, network)] = totals.get((currency, network), Decimal("0")) + price
+
+        challenge = {
+            "method": method,
+            "path": path,
+            "paywalled": True,
+            "pay_to": pay_to,
+            "amount": amount,
+            "nonce": nonce,
+            "protocol": "x402",
+            "currency": currency,
+            "network": network,
+        }
+        if callback:
+            challenge["callback"] = callback
+        challenges.append(challenge)
+
+    if cache_entries:
+        _get_nonce_cache().set_many(cache_entries, timeout=_NONCE_TTL_SECONDS)
+        PaymentReceipt.objects.bulk_create(receipts)
+
+    bundle: Dict[str, Any] = {
+        "challenges": challenges,
+        "totals": [
+            {"currency": currency, "network": network, "amount": _format_amount(total)}
+            for (currency, network), total in totals.items()
+        ],
+    }
+    if len(totals) == 1:
+        bundle["total_amount"] = bundle["totals"][0]["amount"]
+    return bundle
+
+
 def verify_receipt(receipt: str, price: Decimal, request: HttpRequest) -> Optional[Dict[str, Any]]:
     """
     Validate a receipt header and return metadata if payment is accepted.
     """
-    verifier = _get_verifier()
+    verifier = _get_verifier(request)
     if verifier is None:
         logger.error(
-            "x402 receipt verifier is not configured. Set X402_RECEIPT_VERIFIER to enable verification."
+            "x402 receipt verifier is not configured. Set X402_RECEIPT_VERIFIER or X402_VERIFIERS to enable verification."
         )
         return None
 
@@ -187,6 +302,12 @@ def verify_receipt(receipt: str, price: Decimal, request: HttpRequest) -> Option
     if not result:
         return None
 
+    if result.get("payments"):
+        result = _select_group_payment(result, request)
+        if result is None:
+            logger.warning("x402 group receipt has no pending payment for path=%s", request.path)
+            return None
+
     nonce = result.get("nonce")
     if not nonce:
         logger.warning("x402 verifier did not return a nonce; rejecting receipt.")
@@ -295,6 +416,7 @@ def refresh_configuration() -> None:
     global _PRICING_RULES_CACHE, _DEFAULT_PRICE_CACHE
     _PRICING_RULES_CACHE = ("", [])
     _DEFAULT_PRICE_CACHE = ("", Decimal("0"))
+    verifier_registry.refresh_registry()
 
 
 def _get_pricing_rules() -> list[PricingRule]:
@@ -334,17 +456,25 @@ def _iter_pricing_rules(request: Optional[HttpRequest]) -> Iterable[PricingRule]
 
 def _get_user_pricing_rules(request: Optional[HttpRequest]) -> list[PricingRule]:
     path = _normalize_path(request.path) if request else ""
-    owner_ids: set[int] = set()
+    owner_ids = _request_owner_ids(request)
 
+    path_owner_id = _extract_owner_id(path)
+    if path_owner_id:
+        owner_ids.add(path_owner_id)
+
+    return _load_user_pricing_rules(owner_ids)
+
+
+def _request_owner_ids(request: Optional[HttpRequest]) -> set[int]:
+    owner_ids: set[int] = set()
     if request is not None:
         user = getattr(request, "user", None)
         if getattr(user, "is_authenticated", False) and user.id:
             owner_ids.add(user.id)
+    return owner_ids
 
-    path_owner_id = _extract_owner_id(path)
-    if path_owner_id:
-        owner_ids.add(path_owner_id)
 
+def _load_user_pricing_rules(owner_ids: set[int]) -> list[PricingRule]:
     if not owner_ids:
         return []
 
@@ -663,11 +793,53 @@ def _resolve_payto_address(rule: PricingRule | None, default_payto: str) -> str:
     return default_payto
 
 
-def _get_verifier():
-    backend_path = getattr(settings, "X402_RECEIPT_VERIFIER", "")
-    if not backend_path:
+def _select_group_payment(result: Dict[str, Any], request: HttpRequest) -> Optional[Dict[str, Any]]:
+    """
+    Flatten a multi-payment (atomic group) verification into the entry for this request.
+
+    A group pays several nonces at once; only a pending nonce whose challenge was
+    issued for the current path and method is selected, so each prepaid request
+    settles exactly one nonce and never one prepaid for another resource.
+    """
+    payments = [entry for entry in result.get("payments") or [] if isinstance(entry, dict) and entry.get("nonce")]
+    if not payments:
+        return None
+
+    pending = {
+        nonce: (request_path, request_method)
+        for nonce, request_path, request_method in PaymentReceipt.objects.filter(
+            nonce__in=[entry["nonce"] for entry in payments],
+            status=PaymentReceiptStatus.PENDING,
+        ).values_list("nonce", "request_path", "request_method")
+    }
+    target = (_normalize_path(request.path), request.method.upper())
+
+    selected = next(
+        (
+            entry
+            for entry in payments
+            if pending.get(entry["nonce"]) == target and not _nonce_consumed(entry["nonce"])
+        ),
+        None,
+    )
+    if selected is None:
         return None
-    return import_string(backend_path)
+
+    flattened = {key: value for key, value in result.items() if key != "payments"}
+    flattened.update(selected)
+    metadata = dict(selected.get("metadata") or {})
+    if result.get("group_id"):
+        metadata.setdefault("group_id", result["group_id"])
+    metadata["group_size"] = len(payments)
+    flattened["metadata"] = metadata
+    return flattened
+
+
+def _get_verifier(request: Optional[HttpRequest] = None):
+    rule = getattr(request, "x402_rule", None) if request is not None else None
+    network = getattr(rule, "network", None) or _get_network()
+    currency = getattr(rule, "currency", None) or _get_currency()
+    return verifier_registry.get_verifier(network, currency)
 
 
 def _to_decimal(value: Any) -> Decimal:
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Notification, NotificationTemplate
+from .models import Notification, NotificationTemplate, OutboundEmail
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
@@ -12,3 +12,9 @@ class NotificationTemplateAdmin(admin.ModelAdmin):
     list_display = ('name', 'subject', 'notification_type', 'is_active', 'created_at')
     search_fields = ('name', 'subject')
     list_filter = ('notification_type', 'is_active')
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('recipient', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    search_fields = ('recipient', 'subject')
+    list_filter = ('status',)
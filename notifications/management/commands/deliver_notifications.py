@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from notifications.outbox import deliver_pending
+
+
+class Command(BaseCommand):
+    help = "Deliver pending outbox emails (use from cron when no Celery worker is running)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-batches", type=int, default=50)
+
+    def handle(self, *args, **options):
+        summary = deliver_pending(max_batches=options["max_batches"])
+        self.stdout.write(
+            f"Sent {summary['sent']} email(s), {summary['retrying']} scheduled for retry, {summary['failed']} failed."
+        )
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 NOTIFICATION_CHANNELS = [
     ("email", "Email"),
@@ -41,3 +42,40 @@ class NotificationTemplate(models.Model):
 
     def __str__(self):
         return f"{self.name} ({self.notification_type})"
+
+
+class OutboundEmailStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    SENT = "sent", "Sent"
+    FAILED = "failed", "Failed"
+
+
+class OutboundEmail(models.Model):
+    """Outbox row written in the caller's transaction and delivered later by a worker."""
+
+    notification = models.ForeignKey(
+        Notification,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="outbound_emails",
+    )
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=OutboundEmailStatus.choices, default=OutboundEmailStatus.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("next_attempt_at", "id")
+        indexes = [
+            models.Index(fields=("status", "next_attempt_at")),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient} — {self.subject} ({self.status})"
@@ -0,0 +1,188 @@
+"""
+Transactional email outbox.
+
+Callers write ``OutboundEmail`` rows inside their own transaction; once it commits a
+worker drains pending rows in batches over a single SMTP connection, retrying
+failures with exponential backoff. Request and lifecycle code never waits on the
+mail provider.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from .models import Notification, OutboundEmail, OutboundEmailStatus
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FROM = "no-reply@subchain.app"
+
+
+def enqueue_email(
+    recipient: str,
+    subject: str,
+    body: str,
+    *,
+    from_email: str = "",
+    notification: Optional[Notification] = None,
+) -> OutboundEmail:
+    email = OutboundEmail.objects.create(
+        notification=notification,
+        recipient=recipient,
+        subject=subject[:255],
+        body=body,
+        from_email=from_email or "",
+    )
+    schedule_delivery()
+    return email
+
+
+def enqueue_notification_email(notification: Notification) -> Optional[OutboundEmail]:
+    recipient = getattr(notification.user, "email", None)
+    if not recipient:
+        logger.warning("Notification %s has no associated user email.", notification.id)
+        return None
+    return enqueue_email(
+        recipient,
+        notification.title or "Notification",
+        notification.message,
+        from_email=DEFAULT_FROM,
+        notification=notification,
+    )
+
+
+def schedule_delivery(using: str = DEFAULT_DB_ALIAS) -> None:
+    """Kick the outbox worker once the current transaction commits (once per transaction)."""
+    connection = connections[using]
+    if connection.in_atomic_block and any(func is _kick_delivery for _, func, _ in connection.run_on_commit):
+        return
+    transaction.on_commit(_kick_delivery, using=using)
+
+
+def drain_outbox(*, batch_size: Optional[int] = None, now=None) -> dict:
+    """
+    Deliver one batch of due emails over a single mail connection.
+
+    Rows are claimed with ``select_for_update(skip_locked=True)`` and leased by pushing
+    ``next_attempt_at`` forward, so concurrent workers never send the same email.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or getattr(settings, "NOTIFICATION_OUTBOX_BATCH_SIZE", 100)
+    lease = timedelta(seconds=getattr(settings, "NOTIFICATION_OUTBOX_LEASE_SECONDS", 300))
+
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboundEmailStatus.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        if batch:
+            OutboundEmail.objects.filter(pk__in=[email.pk for email in batch]).update(next_attempt_at=now + lease)
+
+    result = {"claimed": len(batch), "sent": 0, "retrying": 0, "failed": 0, "next_retry_at": None}
+    if not batch:
+        return result
+
+    delivered, errors = _send_batch(batch)
+    finished_at = timezone.now()
+
+    for email in delivered:
+        email.status = OutboundEmailStatus.SENT
+        email.sent_at = finished_at
+        email.attempts += 1
+        email.last_error = ""
+
+    max_attempts = getattr(settings, "NOTIFICATION_OUTBOX_MAX_ATTEMPTS", 5)
+    for email, error in errors:
+        email.attempts += 1
+        email.last_error = str(error)[:2000]
+        if email.attempts >= max_attempts:
+            email.status = OutboundEmailStatus.FAILED
+            result["failed"] += 1
+            continue
+        email.next_attempt_at = finished_at + _backoff(email.attempts)
+        result["retrying"] += 1
+        if result["next_retry_at"] is None or email.next_attempt_at < result["next_retry_at"]:
+            result["next_retry_at"] = email.next_attempt_at
+
+    OutboundEmail.objects.bulk_update(batch, ["status", "sent_at", "attempts", "last_error", "next_attempt_at"])
+    notification_ids = [email.notification_id for email in delivered if email.notification_id]
+    if notification_ids:
+        Notification.objects.filter(pk__in=notification_ids, sent_at__isnull=True).update(sent_at=finished_at)
+
+    result["sent"] = len(delivered)
+    return result
+
+
+def deliver_pending(*, max_batches: int = 50) -> dict:
+    """Drain batches until the outbox has nothing due (bounded by ``max_batches``)."""
+    batch_size = getattr(settings, "NOTIFICATION_OUTBOX_BATCH_SIZE", 100)
+    summary = {"sent": 0, "retrying": 0, "failed": 0, "next_retry_at": None}
+    for _ in range(max_batches):
+        result = drain_outbox(batch_size=batch_size)
+        for key in ("sent", "retrying", "failed"):
+            summary[key] += result[key]
+        retry_at = result["next_retry_at"]
+        if retry_at and (summary["next_retry_at"] is None or retry_at < summary["next_retry_at"]):
+            summary["next_retry_at"] = retry_at
+        if result["claimed"] < batch_size:
+            break
+    return summary
+
+
+def _send_batch(batch: list[OutboundEmail]) -> tuple[list[OutboundEmail], list[tuple[OutboundEmail, Exception]]]:
+    delivered: list[OutboundEmail] = []
+    errors: list[tuple[OutboundEmail, Exception]] = []
+
+    mail_connection = get_connection(fail_silently=False)
+    try:
+        mail_connection.open()
+    except Exception as exc:
+        logger.warning("Unable to open mail connection for outbox batch: %s", exc)
+        return delivered, [(email, exc) for email in batch]
+
+    try:
+        for email in batch:
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email or getattr(settings, "DEFAULT_FROM_EMAIL", DEFAULT_FROM),
+                to=[email.recipient],
+                connection=mail_connection,
+            )
+            try:
+                message.send()
+            except Exception as exc:
+                logger.error("Email error for outbox entry %s: %s", email.id, exc)
+                errors.append((email, exc))
+            else:
+                delivered.append(email)
+    finally:
+        mail_connection.close()
+
+    return delivered, errors
+
+
+def _backoff(attempts: int) -> timedelta:
+    base = getattr(settings, "NOTIFICATION_OUTBOX_BACKOFF_SECONDS", 30)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), 3600))
+
+
+def _kick_delivery() -> None:
+    if not getattr(settings, "NOTIFICATION_OUTBOX_ASYNC", True):
+        deliver_pending()
+        return
+
+    from .tasks import deliver_outbox
+
+    try:
+        deliver_outbox.delay()
+    except Exception:  # broker outages must not fail the committed request
+        logger.exception("Unable to enqueue outbox delivery; rows stay pending until the next drain.")
@@ -0,0 +1,17 @@
+from celery import shared_task
+
+from notifications.outbox import deliver_pending
+
+
+@shared_task
+def deliver_outbox(max_batches: int = 50, reschedule: bool = True) -> int:
+    """
+    Send pending outbox emails and reschedule itself for the earliest retry.
+
+    The beat sweep passes ``reschedule=False``: it catches rows whose on-commit kick
+    was lost (broker down, broken retry chain) and runs again on its own schedule.
+    """
+    summary = deliver_pending(max_batches=max_batches)
+    if reschedule and summary["next_retry_at"] is not None:
+        deliver_outbox.apply_async(eta=summary["next_retry_at"])
+    return summary["sent"]
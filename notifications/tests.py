@@ -1,10 +1,19 @@
+from unittest import mock
+
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.core import mail
+from django.core.mail import get_connection
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
 
-from notifications.models import Notification
+from notifications.models import Notification, OutboundEmail, OutboundEmailStatus
+from notifications.outbox import drain_outbox, enqueue_email, enqueue_notification_email
+from notifications.tasks import deliver_outbox
 from accounts.models import User
+from subscriptions.services import NotificationDispatcher
 
 
 class NotificationAPITests(APITestCase):
@@ -46,3 +55,76 @@ class NotificationAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         notification = Notification.objects.get(pk=response.data["id"])
         self.assertIsNone(notification.sent_at)
+
+
+@override_settings(
+    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    NOTIFICATION_OUTBOX_MAX_ATTEMPTS=2,
+    NOTIFICATION_OUTBOX_BACKOFF_SECONDS=30,
+)
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="outbox@example.com",
+            password="pass1234",
+            username="outbox",
+            wallet_address="OUTBOXWALLET",
+        )
+
+    def test_dispatcher_writes_outbox_rows_and_kicks_delivery_once(self):
+        dispatcher = NotificationDispatcher()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                dispatcher._notify(self.user, "First", "one")
+                dispatcher._notify(self.user, "Second", "two")
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(OutboundEmail.objects.filter(status=OutboundEmailStatus.PENDING).count(), 2)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_drain_sends_batch_over_one_connection(self):
+        first = Notification.objects.create(user=self.user, title="First", message="one")
+        enqueue_notification_email(first)
+        enqueue_email("other@example.com", "Reset", "link")
+
+        with mock.patch("notifications.outbox.get_connection", wraps=get_connection) as connection_factory:
+            result = drain_outbox()
+
+        self.assertEqual(result["sent"], 2)
+        connection_factory.assert_called_once()
+        self.assertEqual(len(mail.outbox), 2)
+        first.refresh_from_db()
+        self.assertIsNotNone(first.sent_at)
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmailStatus.SENT).exists())
+
+    def test_failed_delivery_backs_off_then_gives_up(self):
+        email = enqueue_email("flaky@example.com", "Hello", "body")
+
+        with mock.patch("notifications.outbox.EmailMessage.send", side_effect=OSError("smtp down")):
+            first = drain_outbox()
+            email.refresh_from_db()
+            self.assertEqual(first["retrying"], 1)
+            self.assertEqual(email.status, OutboundEmailStatus.PENDING)
+            self.assertGreater(email.next_attempt_at, timezone.now())
+
+            second = drain_outbox(now=email.next_attempt_at)
+
+        email.refresh_from_db()
+        self.assertEqual(second["failed"], 1)
+        self.assertEqual(email.status, OutboundEmailStatus.FAILED)
+        self.assertEqual(email.attempts, 2)
+        self.assertIn("smtp down", email.last_error)
+
+    def test_beat_sweep_sends_stranded_rows_without_rescheduling(self):
+        enqueue_email("stranded@example.com", "Hello", "body")  # its on-commit kick never ran
+        enqueue_email("flaky@example.com", "Again", "body")
+
+        send = mock.Mock(side_effect=[1, OSError("smtp down")])
+        with mock.patch("notifications.outbox.EmailMessage.send", send):
+            with mock.patch.object(deliver_outbox, "apply_async") as reschedule:
+                sent = deliver_outbox(reschedule=False)
+
+        self.assertEqual(sent, 1)
+        reschedule.assert_not_called()
+        self.assertEqual(OutboundEmail.objects.filter(status=OutboundEmailStatus.PENDING).count(), 1)
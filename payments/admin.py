@@ -1,7 +1,7 @@
 # payments/admin.py
 
 from django.contrib import admin
-from .models import Transaction
+from .models import SwapAllocation, SwapBatch, Transaction
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
@@ -9,3 +9,19 @@ class TransactionAdmin(admin.ModelAdmin):
     list_filter = ("currency", "status", "type")
     search_fields = ("user__email", "algo_tx_id")
     ordering = ("-created_at",)
+
+
+class SwapAllocationInline(admin.TabularInline):
+    model = SwapAllocation
+    extra = 0
+    readonly_fields = ("transaction", "amount_algo", "usdc_allocated", "created_at")
+    can_delete = False
+
+
+@admin.register(SwapBatch)
+class SwapBatchAdmin(admin.ModelAdmin):
+    list_display = ("id", "status", "amount_algo", "usdc_received", "request_count", "confirmed_round", "created_at")
+    list_filter = ("status",)
+    readonly_fields = ("tx_ids", "error", "executed_at", "created_at")
+    inlines = [SwapAllocationInline]
+    ordering = ("-created_at",)
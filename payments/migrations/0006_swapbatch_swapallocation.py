@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0005_transaction_payout_tx_id_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SwapBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('executed', 'Executed'), ('failed', 'Failed')], default='pending', max_length=12)),
+                ('amount_algo', models.DecimalField(decimal_places=6, max_digits=16)),
+                ('usdc_received', models.DecimalField(blank=True, decimal_places=6, max_digits=16, null=True)),
+                ('request_count', models.PositiveIntegerField(default=0)),
+                ('tx_ids', models.JSONField(blank=True, default=list)),
+                ('confirmed_round', models.BigIntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('executed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'swap batches',
+                'ordering': ('-created_at',),
+            },
+        ),
+        migrations.CreateModel(
+            name='SwapAllocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount_algo', models.DecimalField(decimal_places=6, max_digits=12)),
+                ('usdc_allocated', models.DecimalField(blank=True, decimal_places=6, max_digits=12, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='swap_allocations', to='payments.transaction')),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='payments.swapbatch')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('batch', 'transaction'), name='unique_swap_allocation')],
+            },
+        ),
+    ]
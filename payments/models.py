@@ -46,3 +46,48 @@ class Transaction(models.Model):
 
     def __str__(self):
         return f"{self.user.email} - {self.amount} {self.currency} ({self.status})"
+
+
+class SwapBatchStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    EXECUTED = "executed", "Executed"
+    FAILED = "failed", "Failed"
+
+
+class SwapBatch(models.Model):
+    """One combined ALGO→USDC swap executed for several transactions."""
+
+    status = models.CharField(max_length=12, choices=SwapBatchStatus.choices, default=SwapBatchStatus.PENDING)
+    amount_algo = models.DecimalField(max_digits=16, decimal_places=6)
+    usdc_received = models.DecimalField(max_digits=16, decimal_places=6, null=True, blank=True)
+    request_count = models.PositiveIntegerField(default=0)
+    tx_ids = models.JSONField(default=list, blank=True)
+    confirmed_round = models.BigIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    executed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+        verbose_name_plural = "swap batches"
+
+    def __str__(self):
+        return f"Swap batch {self.pk} - {self.amount_algo} ALGO ({self.status})"
+
+
+class SwapAllocation(models.Model):
+    """A transaction's share of a ``SwapBatch``, kept as the audit trail of the pro-rata split."""
+
+    batch = models.ForeignKey(SwapBatch, on_delete=models.CASCADE, related_name="allocations")
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name="swap_allocations")
+    amount_algo = models.DecimalField(max_digits=12, decimal_places=6)
+    usdc_allocated = models.DecimalField(max_digits=12, decimal_places=6, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=("batch", "transaction"), name="unique_swap_allocation"),
+        ]
+
+    def __str__(self):
+        return f"Transaction {self.transaction_id} in swap batch {self.batch_id}"
@@ -0,0 +1,138 @@
+# payments/qr.py
+"""
+QR codes rendered once and served as cacheable images.
+
+A QR image depends only on its payload, format and geometry, so ``QRCodeRenderer``
+keys each rendering by the SHA-256 of those. It keeps the most recent
+``QR_CODE_LRU_SIZE`` images in memory and shares every image through the Django
+cache for ``QR_CODE_CACHE_SECONDS``. A payload is encoded at most once per
+cache lifetime, not once per request.
+
+APIs hand out ``qr_code_url`` links instead of inline base64. The link carries
+the signed payload, and ``payments.views.qr_image`` serves it with the content
+hash as ETag and an immutable ``Cache-Control``. Browsers and CDNs then keep the
+image, and revalidations are answered with a 304 without rendering anything.
+SVG output is built by qrcode's path writer and never rasterised through Pillow.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.urls import reverse
+
+CONTENT_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+SIGNING_SALT = "payments.qr"
+
+
+@dataclass(frozen=True)
+class RenderedQR:
+    content: bytes
+    content_type: str
+    etag: str
+
+
+class QRCodeRenderer:
+    def __init__(
+        self,
+        *,
+        box_size: int = 4,
+        border: int = 2,
+        max_entries: Optional[int] = None,
+        timeout: Optional[int] = None,
+    ):
+        self.box_size = box_size
+        self.border = border
+        self._max_entries = max_entries
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._images: OrderedDict[str, RenderedQR] = OrderedDict()
+
+    @property
+    def max_entries(self) -> int:
+        if self._max_entries is not None:
+            return self._max_entries
+        return getattr(settings, "QR_CODE_LRU_SIZE", 256)
+
+    @property
+    def timeout(self) -> int:
+        if self._timeout is not None:
+            return self._timeout
+        return getattr(settings, "QR_CODE_CACHE_SECONDS", 86400)
+
+    def key(self, data: str, fmt: str = "png") -> str:
+        """Content hash of the image ``data`` renders to, usable as its ETag."""
+        fingerprint = f"{fmt}|{self.box_size}|{self.border}|{data}"
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+    def render(self, data: str, fmt: str = "png") -> RenderedQR:
+        if fmt not in CONTENT_TYPES:
+            raise ValueError(f"Unsupported QR code format: {fmt}.")
+        key = self.key(data, fmt)
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                return image
+
+        content = cache.get(f"qr:{key}")
+        if content is None:
+            content = self._encode(data, fmt)
+            cache.set(f"qr:{key}", content, self.timeout)
+        image = RenderedQR(content, CONTENT_TYPES[fmt], f'"{key}"')
+
+        with self._lock:
+            self._images[key] = image
+            self._images.move_to_end(key)
+            while len(self._images) > self.max_entries:
+                self._images.popitem(last=False)
+        return image
+
+    def clear(self) -> None:
+        with self._lock:
+            self._images.clear()
+
+    def _encode(self, data: str, fmt: str) -> bytes:
+        import qrcode  # Pillow-backed; imported only when a QR code is rendered
+
+        factory = None
+        if fmt == "svg":
+            from qrcode.image.svg import SvgPathImage
+
+            factory = SvgPathImage
+        qr = qrcode.QRCode(box_size=self.box_size, border=self.border, image_factory=factory)
+        qr.add_data(data)
+        qr.make(fit=True)
+        buffer = io.BytesIO()
+        if factory is None:
+            qr.make_image(fill_color="black", back_color="white").save(buffer, format="PNG")
+        else:
+            qr.make_image().save(buffer)
+        return buffer.getvalue()
+
+
+qr_renderer = QRCodeRenderer()
+
+
+def sign_payload(data: str) -> str:
+    return signing.dumps(data, salt=SIGNING_SALT, compress=True)
+
+
+def unsign_payload(token: str) -> str:
+    """The payload behind a ``qr_code_url`` token; raises ``signing.BadSignature`` if it was tampered with."""
+    return signing.loads(token, salt=SIGNING_SALT)
+
+
+def qr_code_url(request, data: str, fmt: str = "png") -> str:
+    """Absolute, cacheable URL of the QR code for ``data``; nothing is rendered until it is fetched."""
+    if fmt not in CONTENT_TYPES:
+        raise ValueError(f"Unsupported QR code format: {fmt}.")
+    return request.build_absolute_uri(reverse("qr_image", kwargs={"token": sign_payload(data), "fmt": fmt}))
@@ -1,24 +1,26 @@
 from __future__ import annotations
 
 import logging
+import time
+from dataclasses import dataclass
 from decimal import Decimal
-from typing import Dict
+from typing import Callable, Dict, Optional, Sequence
 
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction as db_transaction
 from django.utils import timezone
 
-from algosdk import mnemonic
-
-from algorand.utils import TinymanSwapError, perform_swap_algo_to_usdc, get_algod_client
-try:
-    from algosdk.future.transaction import PaymentTxn, wait_for_confirmation
-except ModuleNotFoundError:  # pragma: no cover - SDK compatibility
-    from algosdk import transaction as _transaction
-
-    PaymentTxn = _transaction.PaymentTxn
-    wait_for_confirmation = _transaction.wait_for_confirmation
-from .models import Transaction, TransactionStatus, CurrencyChoices
+from analytics.rollups import MetricsRecorder
+from algorand.confirmations import async_confirmations_enabled, track_submitted
+from algorand.utils import (
+    TinymanSwapError,
+    get_algod_client,
+    get_suggested_params,
+    get_transaction_module,
+    perform_swap_algo_to_usdc,
+)
+from .models import CurrencyChoices, SwapAllocation, SwapBatch, SwapBatchStatus, Transaction, TransactionStatus
 
 logger = logging.getLogger(__name__)
 
@@ -36,15 +38,23 @@ def _ensure_credentials():
         )
 
     if ACCOUNT_PRIVATE_KEY is None:
+        from algosdk import mnemonic
+
         try:
             ACCOUNT_PRIVATE_KEY = mnemonic.to_private_key(ACCOUNT_MNEMONIC)
         except Exception as exc:  # pragma: no cover - invalid configuration is caught during startup
             raise ImproperlyConfigured("ALGORAND_ACCOUNT_MNEMONIC is invalid.") from exc
 
+MICRO = Decimal("1000000")
 MAX_SWAP_ATTEMPTS = max(1, int(getattr(settings, "ALGORAND_SWAP_MAX_RETRIES", 3)))
 RETRY_DELAY_SECONDS = float(getattr(settings, "ALGORAND_SWAP_RETRY_DELAY_SECONDS", 1.5))
 
 
+def wait_for_confirmation(algod_client, tx_id: str, wait_rounds: int):
+    """algosdk's ``wait_for_confirmation``; the SDK is only imported once a payout is actually sent."""
+    return get_transaction_module().wait_for_confirmation(algod_client, tx_id, wait_rounds)
+
+
 class SwapExecutionError(Exception):
     """Raised when the swap cannot be executed after retries."""
 
@@ -55,6 +65,7 @@ def _append_note(transaction: Transaction, note: str) -> None:
 
 def _apply_swap_success(transaction: Transaction, usdc_micro: int) -> None:
     usdc_amount = (Decimal(usdc_micro) / Decimal("1000000")).quantize(Decimal("0.000001"))
+    first_swap = not transaction.swap_completed
     transaction.usdc_received = usdc_amount
     _append_note(transaction, f"Swapped to USDC: {usdc_amount}")
     transaction.swap_completed = True
@@ -63,6 +74,8 @@ def _apply_swap_success(transaction: Transaction, usdc_micro: int) -> None:
     if not transaction.confirmed_at:
         transaction.confirmed_at = timezone.now()
     transaction.save(update_fields=["usdc_received", "swap_completed", "notes", "status", "confirmed_at"])
+    if first_swap:
+        MetricsRecorder().swap_completed(transaction)
 
 
 def _apply_swap_failure(transaction: Transaction, reason: str) -> None:
@@ -72,12 +85,8 @@ def _apply_swap_failure(transaction: Transaction, reason: str) -> None:
     transaction.save(update_fields=["notes", "swap_completed", "status"])
 
 
-def execute_algo_to_usdc_swap(transaction: Transaction) -> Dict:
-    """
-    Trigger the ALGO ➜ USDC swap for a transaction and persist the outcome.
-    Returns the provider response on success, raises SwapExecutionError otherwise.
-    """
-    amount_micro = int(transaction.amount * Decimal("1000000"))
+def _swap_with_retries(amount_micro: int, reference) -> Dict:
+    """Run one Tinyman swap with retries; raises SwapExecutionError chained to the last error."""
     last_error: Exception | None = None
 
     for attempt in range(1, MAX_SWAP_ATTEMPTS + 1):
@@ -86,7 +95,7 @@ def execute_algo_to_usdc_swap(transaction: Transaction) -> Dict:
                 "Initiating Tinyman swap attempt %s/%s for transaction=%s amount=%sµALGO",
                 attempt,
                 MAX_SWAP_ATTEMPTS,
-                transaction.id,
+                reference,
                 amount_micro,
             )
 
@@ -95,17 +104,15 @@ def execute_algo_to_usdc_swap(transaction: Transaction) -> Dict:
                 sender_address=ACCOUNT_ADDRESS,
                 sender_private_key=ACCOUNT_PRIVATE_KEY,
                 amount_algo=amount_micro,
-                transaction_id=transaction.id,
+                transaction_id=reference,
             )
 
             if result.get("status") != "success":
                 raise TinymanSwapError(result.get("message", "Unknown Tinyman error"))
 
-            usdc_micro = result.get("usdc_received")
-            if usdc_micro is None:
+            if result.get("usdc_received") is None:
                 raise TinymanSwapError("Tinyman response missing usdc_received amount.")
 
-            _apply_swap_success(transaction, usdc_micro)
             return result
         except Exception as exc:  # pragma: no cover - retry loop handles specific cases below
             last_error = exc
@@ -113,7 +120,7 @@ def execute_algo_to_usdc_swap(transaction: Transaction) -> Dict:
                 "Tinyman swap attempt %s/%s failed for transaction=%s: %s",
                 attempt,
                 MAX_SWAP_ATTEMPTS,
-                transaction.id,
+                reference,
                 exc,
             )
             if attempt == MAX_SWAP_ATTEMPTS:
@@ -121,10 +128,153 @@ def execute_algo_to_usdc_swap(transaction: Transaction) -> Dict:
             _sleep(RETRY_DELAY_SECONDS * attempt)
 
     assert last_error is not None  # for type checkers
-    _apply_swap_failure(transaction, str(last_error))
     raise SwapExecutionError("Unable to complete ALGO→USDC swap.") from last_error
 
 
+def execute_algo_to_usdc_swap(transaction: Transaction) -> Dict:
+    """
+    Trigger the ALGO ➜ USDC swap for a transaction and persist the outcome.
+    Returns the provider response on success, raises SwapExecutionError otherwise.
+    """
+    amount_micro = int(transaction.amount * MICRO)
+    try:
+        result = _swap_with_retries(amount_micro, transaction.id)
+    except SwapExecutionError as exc:
+        _apply_swap_failure(transaction, str(exc.__cause__ or exc))
+        raise
+
+    _apply_swap_success(transaction, result["usdc_received"])
+    return result
+
+
+def allocate_pro_rata(total: int, weights: Sequence[int]) -> list[int]:
+    """
+    Split integer ``total`` proportionally to ``weights`` using the largest remainder.
+
+    The shares always add up to ``total`` exactly; ties go to the earlier weight.
+    """
+    weight_total = sum(weights)
+    if weight_total <= 0:
+        return [0] * len(weights)
+    shares = [total * weight // weight_total for weight in weights]
+    by_remainder = sorted(range(len(weights)), key=lambda index: (-(total * weights[index] % weight_total), index))
+    for index in by_remainder[: total - sum(shares)]:
+        shares[index] += 1
+    return shares
+
+
+def execute_batched_algo_to_usdc_swap(transactions: Sequence[Transaction]) -> SwapBatch:
+    """
+    Swap the ALGO of several transactions in one Tinyman group and split the USDC pro rata.
+
+    A ``SwapBatch`` with one ``SwapAllocation`` per transaction is committed before the
+    swap is submitted, and its outcome is committed on its own afterwards. Call it
+    outside a transaction, so every combined swap leaves an audit trail even when it
+    fails or the caller's later work does. Raises SwapExecutionError after marking
+    every transaction failed.
+    """
+    amounts = [int(txn.amount * MICRO) for txn in transactions]
+    with db_transaction.atomic():
+        batch = SwapBatch.objects.create(amount_algo=Decimal(sum(amounts)) / MICRO, request_count=len(transactions))
+        allocations = SwapAllocation.objects.bulk_create(
+            [
+                SwapAllocation(batch=batch, transaction=txn, amount_algo=Decimal(amount) / MICRO)
+                for txn, amount in zip(transactions, amounts)
+            ]
+        )
+
+    try:
+        result = _swap_with_retries(sum(amounts), f"batch:{batch.id}")
+    except SwapExecutionError as exc:
+        reason = str(exc.__cause__ or exc)
+        with db_transaction.atomic():
+            for txn in transactions:
+                _apply_swap_failure(txn, f"{reason} (swap batch {batch.id})")
+            batch.status = SwapBatchStatus.FAILED
+            batch.error = reason
+            batch.save(update_fields=["status", "error"])
+        raise
+
+    usdc_micro = int(result["usdc_received"])
+    shares = allocate_pro_rata(usdc_micro, amounts)
+    with db_transaction.atomic():
+        for txn, allocation, share in zip(transactions, allocations, shares):
+            allocation.usdc_allocated = Decimal(share) / MICRO
+            _append_note(txn, f"Swap batch {batch.id}: {len(transactions)} transaction(s)")
+            _apply_swap_success(txn, share)
+        SwapAllocation.objects.bulk_update(allocations, ["usdc_allocated"])
+
+        batch.status = SwapBatchStatus.EXECUTED
+        batch.usdc_received = Decimal(usdc_micro) / MICRO
+        batch.tx_ids = list(result.get("tx_ids", []))
+        batch.confirmed_round = result.get("confirmed_round")
+        batch.executed_at = timezone.now()
+        batch.save(update_fields=["status", "usdc_received", "tx_ids", "confirmed_round", "executed_at"])
+    logger.info("Swap batch %s swapped %s ALGO for %s transaction(s).", batch.id, batch.amount_algo, len(transactions))
+    return batch
+
+
+class SwapAggregator:
+    """
+    Collect transactions and swap them together through ``execute_batched_algo_to_usdc_swap``.
+
+    Pending requests are flushed as one combined swap once they reach
+    ``SWAP_AGGREGATION_MAX_ALGO`` or ``SWAP_AGGREGATION_MAX_REQUESTS``, when the oldest
+    one has waited ``SWAP_AGGREGATION_WINDOW_SECONDS`` by the next submission, or on
+    ``flush()``. Outcomes are looked up per transaction with ``batch_for``/``error_for``.
+    """
+
+    def __init__(
+        self,
+        *,
+        window_seconds: Optional[float] = None,
+        max_amount: Optional[Decimal] = None,
+        max_requests: Optional[int] = None,
+        executor: Optional[Callable[[Sequence[Transaction]], SwapBatch]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.window_seconds = (
+            window_seconds if window_seconds is not None else getattr(settings, "SWAP_AGGREGATION_WINDOW_SECONDS", 30)
+        )
+        self.max_amount = Decimal(str(max_amount or getattr(settings, "SWAP_AGGREGATION_MAX_ALGO", 5000)))
+        self.max_requests = max(1, max_requests or getattr(settings, "SWAP_AGGREGATION_MAX_REQUESTS", 100))
+        self.executor = executor or execute_batched_algo_to_usdc_swap
+        self._clock = clock
+        self._pending: list[Transaction] = []
+        self._opened_at: Optional[float] = None
+        self._batches: dict[int, SwapBatch] = {}
+        self._errors: dict[int, Exception] = {}
+
+    def submit(self, transaction: Transaction) -> None:
+        if self._pending and self._clock() - self._opened_at >= self.window_seconds:
+            self.flush()
+        if not self._pending:
+            self._opened_at = self._clock()
+        self._pending.append(transaction)
+        if len(self._pending) >= self.max_requests or sum(txn.amount for txn in self._pending) >= self.max_amount:
+            self.flush()
+
+    def flush(self) -> Optional[SwapBatch]:
+        pending, self._pending = self._pending, []
+        if not pending:
+            return None
+        try:
+            batch = self.executor(pending)
+        except SwapExecutionError as exc:
+            for txn in pending:
+                self._errors[txn.id] = exc
+            return None
+        for txn in pending:
+            self._batches[txn.id] = batch
+        return batch
+
+    def batch_for(self, transaction: Transaction) -> Optional[SwapBatch]:
+        return self._batches.get(transaction.id)
+
+    def error_for(self, transaction: Transaction) -> Optional[Exception]:
+        return self._errors.get(transaction.id)
+
+
 def _sleep(duration: float) -> None:
     """Expose sleep for easier mocking in tests."""
     import time
@@ -132,27 +282,205 @@ def _sleep(duration: float) -> None:
     time.sleep(duration)
 
 
-def _send_algo_payment(receiver: str, amount: Decimal, *, note: str = "") -> str:
-    if amount <= 0:
-        raise ValueError("Amount must be positive")
+MAX_GROUP_SIZE = 16  # Algorand's atomic transfer limit
+
 
-    _ensure_credentials()
-    algod_client = get_algod_client()
-    params = algod_client.suggested_params()
-    params.flat_fee = True
-    params.fee = max(params.min_fee, 1000)
+@dataclass
+class _PayoutLeg:
+    transaction: Transaction
+    field: str
+    receiver: str
+    micro_amount: int
+    note: str
 
-    micro_amount = int((amount * Decimal("1000000")).quantize(Decimal("1")))
-    if micro_amount <= 0:
-        raise ValueError("Amount too small for transfer")
 
-    note_bytes = note.encode("utf-8")[:1024] if note else None
-    txn = PaymentTxn(sender=ACCOUNT_ADDRESS, sp=params, receiver=receiver, amt=micro_amount, note=note_bytes)
-    signed = txn.sign(ACCOUNT_PRIVATE_KEY)
-    tx_id = algod_client.send_transaction(signed)
-    wait_rounds = getattr(settings, "ALGORAND_SWAP_WAIT_ROUNDS", 4)
-    wait_for_confirmation(algod_client, tx_id, wait_rounds)
-    return tx_id
+class PayoutBatcher:
+    """
+    Pack the payouts and platform fees of many transactions into atomic groups.
+
+    Up to ``PAYOUT_GROUP_SIZE`` payments (at most 16) share one group. Each group is
+    signed in a single pass, submitted with one ``send_transactions`` call and
+    confirmed with one wait. A transaction's payout and fee always go in the same
+    group, so they settle or fail together. Suggested params are taken from the
+    shared per-round cache once per batcher.
+
+    ``flush`` refuses to run inside a database transaction: a group sent on behalf of
+    a transaction that later rolls back would be lost without a trace. Callers queue
+    the payouts of payments that have committed. A flushed group's tx ids are
+    committed on their transactions before it is sent, so a retry cannot pay twice.
+    Failures are collected per transaction in ``errors`` and passed to ``on_error``
+    rather than raised.
+
+    Unless ``wait`` is set (or ``ALGORAND_ASYNC_CONFIRMATIONS`` is off), groups are not
+    waited on. They are handed to the confirmation tracker together with their tx ids,
+    before they are sent, and ``payout_group_resolved`` pays the legs of a group that
+    expires again, up to ``PAYOUT_MAX_ATTEMPTS`` groups in all.
+    """
+
+    def __init__(
+        self,
+        *,
+        group_size: Optional[int] = None,
+        wait: Optional[bool] = None,
+        on_error: Optional[Callable[[int, str], None]] = None,
+        attempt: int = 1,
+    ):
+        configured = group_size or getattr(settings, "PAYOUT_GROUP_SIZE", MAX_GROUP_SIZE)
+        self.group_size = min(MAX_GROUP_SIZE, max(2, configured))
+        self.wait = not async_confirmations_enabled() if wait is None else wait
+        self.on_error = on_error
+        self.attempt = attempt
+        self.errors: dict[int, str] = {}
+        self._legs: list[_PayoutLeg] = []
+        self._algod_client = None
+        self._params = None
+
+    def add(self, transaction: Transaction, *, payout_address: str, platform_fee_address: str | None = None) -> None:
+        if transaction.currency != CurrencyChoices.ALGO:
+            raise ValueError("Only ALGO payouts are supported for now")
+
+        legs = []
+        fee_address = platform_fee_address or getattr(settings, "PLATFORM_FEE_WALLET_ADDRESS", "")
+        for field, receiver, amount, prefix in (
+            ("payout_tx_id", payout_address, transaction.net_amount, "payout"),
+            ("platform_fee_tx_id", fee_address, transaction.platform_fee, "fee"),
+        ):
+            micro_amount = int((amount * MICRO).quantize(Decimal("1")))
+            if receiver and micro_amount > 0:
+                legs.append(_PayoutLeg(transaction, field, receiver, micro_amount, f"{prefix}:{transaction.id}"))
+        self._queue(legs)
+
+    def _queue(self, legs: list[_PayoutLeg]) -> None:
+        if len(self._legs) + len(legs) > self.group_size:
+            self.flush()
+        self._legs.extend(legs)
+
+    def flush(self) -> list[str]:
+        """Sign the pending payments as one atomic group, commit their tx ids, then send it."""
+        legs = self._legs
+        if not legs:
+            return []
+
+        try:
+            _ensure_credentials()
+            algod_client, params = self._suggested_params()
+            sdk = get_transaction_module()
+            txns = [
+                sdk.PaymentTxn(
+                    sender=ACCOUNT_ADDRESS,
+                    sp=params,
+                    receiver=leg.receiver,
+                    amt=leg.micro_amount,
+                    note=leg.note.encode("utf-8"),
+                )
+                for leg in legs
+            ]
+            if len(txns) > 1:
+                sdk.assign_group_id(txns)
+            signed = [txn.sign(ACCOUNT_PRIVATE_KEY) for txn in txns]
+        except Exception as exc:  # pragma: no cover - configuration and network errors handled at runtime
+            self._legs = []
+            self._fail(legs, exc)
+            return []
+
+        tx_ids = [txn.get_txid() for txn in txns]
+        # Durable: raises when called inside another atomic block, instead of tying the group to it.
+        with db_transaction.atomic(durable=True):
+            self._legs = []
+            self._store(legs, tx_ids)
+            if not self.wait:
+                # Grouped transactions are committed in the same round, so the first one confirms them all.
+                track_submitted(
+                    txns[0],
+                    kind="payout",
+                    callback="payments.services.payout_group_resolved",
+                    context={
+                        "legs": [
+                            [leg.transaction.id, leg.field, tx_id, leg.receiver, leg.micro_amount, leg.note]
+                            for leg, tx_id in zip(legs, tx_ids)
+                        ],
+                        "attempt": self.attempt,
+                    },
+                )
+        self._send(algod_client, legs, txns, signed)
+        return tx_ids
+
+    def _send(self, algod_client, legs: list[_PayoutLeg], txns: list, signed: list) -> None:
+        try:
+            algod_client.send_transactions(signed)
+        except Exception as exc:  # pragma: no cover - network errors handled at runtime
+            if self.wait:
+                # Nothing was sent, so the stored tx ids must not claim otherwise.
+                self._store(legs, [None] * len(legs))
+            # A tracked group that was not sent expires and is paid again by payout_group_resolved.
+            self._fail(legs, exc)
+            return
+        if self.wait:
+            try:
+                wait_rounds = getattr(settings, "ALGORAND_SWAP_WAIT_ROUNDS", 4)
+                wait_for_confirmation(algod_client, txns[0].get_txid(), wait_rounds)
+            except Exception as exc:  # pragma: no cover - network errors handled at runtime
+                self._fail(legs, exc)
+
+    @staticmethod
+    def _store(legs: list[_PayoutLeg], tx_ids: list[Optional[str]]) -> None:
+        updated = {}
+        for leg, tx_id in zip(legs, tx_ids):
+            setattr(leg.transaction, leg.field, tx_id)
+            updated[leg.transaction.id] = leg.transaction
+        Transaction.objects.bulk_update(list(updated.values()), ["payout_tx_id", "platform_fee_tx_id"])
+
+    def _fail(self, legs: list[_PayoutLeg], exc: Exception) -> None:
+        logger.warning("Payout group of %s payment(s) failed: %s", len(legs), exc)
+        for transaction_id in dict.fromkeys(leg.transaction.id for leg in legs):
+            self.errors[transaction_id] = str(exc)
+            if self.on_error is not None:
+                self.on_error(transaction_id, str(exc))
+
+    def _suggested_params(self):
+        if self._params is None:
+            self._algod_client = get_algod_client()
+            params = get_suggested_params(self._algod_client)
+            params.flat_fee = True
+            params.fee = max(params.min_fee, 1000)
+            self._params = params
+        return self._algod_client, self._params
+
+
+def payout_group_resolved(tracked) -> None:
+    """
+    Confirmation callback for payout groups.
+
+    A group that expired was never committed, so no funds left the treasury. Its tx
+    ids are cleared and its legs are sent again as a new group, until
+    ``PAYOUT_MAX_ATTEMPTS`` groups have expired for them.
+    """
+    if tracked.confirmed_round is not None:
+        return
+    legs = tracked.context.get("legs", [])
+    attempt = tracked.context.get("attempt", 1)
+    max_attempts = max(1, getattr(settings, "PAYOUT_MAX_ATTEMPTS", 3))
+    transactions = Transaction.objects.in_bulk({leg[0] for leg in legs})
+    retry: list[_PayoutLeg] = []
+    for transaction_id, field, tx_id, *payment in legs:
+        transaction = transactions.get(transaction_id)
+        if transaction is None or getattr(transaction, field) != tx_id:
+            continue
+        setattr(transaction, field, None)
+        if payment and attempt < max_attempts:
+            _append_note(transaction, f"Payout group {tracked.tx_id} expired unconfirmed; paying again")
+            receiver, micro_amount, note = payment
+            retry.append(_PayoutLeg(transaction, field, receiver, micro_amount, note))
+        else:
+            _append_note(transaction, f"Payout group {tracked.tx_id} expired unconfirmed")
+    Transaction.objects.bulk_update(list(transactions.values()), ["payout_tx_id", "platform_fee_tx_id", "notes"])
+
+    if retry:
+        batcher = PayoutBatcher(wait=False, attempt=attempt + 1)
+        batcher._queue(retry)
+        batcher.flush()
+    elif legs and attempt >= max_attempts:
+        logger.error("Payout group %s expired after %s attempt(s); pay its legs by hand.", tracked.tx_id, attempt)
 
 
 def disburse_transaction_funds(
@@ -161,47 +489,23 @@ def disburse_transaction_funds(
     payout_address: str,
     platform_fee_address: str | None = None,
     allow_partial: bool = True,
+    on_error: Optional[Callable[[int, str], None]] = None,
 ) -> dict:
-    """Send net amount to payout_address and platform fee to the configured address."""
-    results: dict[str, str] = {}
-
-    if transaction.currency != CurrencyChoices.ALGO:
-        raise ValueError("Only ALGO payouts are supported for now")
-
-    errors = []
-    if payout_address and transaction.net_amount > 0:
-        try:
-            tx_id = _send_algo_payment(
-                payout_address,
-                transaction.net_amount,
-                note=f"payout:{transaction.id}",
-            )
-            results["payout_tx_id"] = tx_id
-            transaction.payout_tx_id = tx_id
-        except Exception as exc:  # pragma: no cover - network errors handled at runtime
-            errors.append(str(exc))
-            if not allow_partial:
-                raise
-
-    fee_address = platform_fee_address or getattr(settings, "PLATFORM_FEE_WALLET_ADDRESS", "")
-    if fee_address and transaction.platform_fee > 0:
-        try:
-            tx_id = _send_algo_payment(
-                fee_address,
-                transaction.platform_fee,
-                note=f"fee:{transaction.id}",
-            )
-            results["platform_fee_tx_id"] = tx_id
-            transaction.platform_fee_tx_id = tx_id
-        except Exception as exc:  # pragma: no cover
-            errors.append(str(exc))
-            if not allow_partial:
-                raise
-
-    if results:
-        transaction.save(update_fields=["payout_tx_id", "platform_fee_tx_id"])
-
-    if errors and not allow_partial:
-        raise RuntimeError("; ".join(errors))
+    """
+    Send net amount to payout_address and platform fee to the configured address in one atomic group.
 
-    return results
+    Call it once the payment has committed, outside any transaction (see ``PayoutBatcher``).
+    """
+    batcher = PayoutBatcher(on_error=on_error)
+    batcher.add(transaction, payout_address=payout_address, platform_fee_address=platform_fee_address)
+    batcher.flush()
+
+    error = batcher.errors.get(transaction.id)
+    if error and not allow_partial:
+        raise RuntimeError(error)
+
+    return {
+        field: getattr(transaction, field)
+        for field in ("payout_tx_id", "platform_fee_tx_id")
+        if getattr(transaction, field)
+    }
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from payments.qr import QRCodeRenderer, qr_renderer
+
+
+class QRCodeRendererTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_payload_is_encoded_once_and_shared_after_lru_eviction(self):
+        renderer = QRCodeRenderer(max_entries=1)
+        with mock.patch.object(renderer, "_encode", wraps=renderer._encode) as encode:
+            first = renderer.render("algorand://pay?amount=1&receiver=A")
+            self.assertIs(renderer.render("algorand://pay?amount=1&receiver=A"), first)
+            renderer.render("algorand://pay?amount=2&receiver=A")  # evicts the first image
+            again = renderer.render("algorand://pay?amount=1&receiver=A")
+
+        self.assertEqual(encode.call_count, 2)
+        self.assertEqual(again, first)
+        self.assertTrue(first.content.startswith(b"\x89PNG"))
+        self.assertEqual(first.etag, f'"{renderer.key("algorand://pay?amount=1&receiver=A")}"')
+
+    def test_svg_output_is_text_with_its_own_etag(self):
+        renderer = QRCodeRenderer()
+
+        svg = renderer.render("https://checkout.example.com/pay?plan=PRO", "svg")
+        png = renderer.render("https://checkout.example.com/pay?plan=PRO", "png")
+
+        self.assertEqual(svg.content_type, "image/svg+xml")
+        self.assertIn(b"<svg", svg.content)
+        self.assertNotEqual(svg.etag, png.etag)
+        with self.assertRaises(ValueError):
+            renderer.render("data", "gif")
+
+
+class QRImageViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        qr_renderer.clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(qr_renderer.clear)
+        self.user = get_user_model().objects.create_user(
+            email="qr@example.com",
+            username="qruser",
+            password="pass1234",
+            wallet_address="QRWALLET",
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_payment_qr_is_served_from_a_cacheable_url(self):
+        response = self.client.get(reverse("generate_qr"), {"amount": "2.5", "qr_format": "svg"})
+        self.assertEqual(response.status_code, 200)
+        url = response.data["qr_code_url"]
+        self.assertTrue(url.endswith(".svg"))
+
+        image = self.client.get(url)
+        self.assertEqual(image.status_code, 200)
+        self.assertEqual(image["Content-Type"], "image/svg+xml")
+        self.assertIn("immutable", image["Cache-Control"])
+
+        with mock.patch.object(qr_renderer, "render") as render:
+            revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=image["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+        render.assert_not_called()
+
+    def test_tampered_or_unknown_format_requests_are_rejected(self):
+        url = self.client.get(reverse("generate_qr")).data["qr_code_url"]
+
+        self.assertEqual(self.client.get(url.replace(".png", "x.png")).status_code, 404)
+        self.assertEqual(self.client.get(reverse("generate_qr"), {"qr_format": "gif"}).status_code, 400)
@@ -1,15 +1,19 @@
+import base64
 from decimal import Decimal
 import importlib
 import sys
 from unittest import mock
 
 from django.contrib.auth import get_user_model
+from django.db import transaction as db_transaction
 from django.test import TestCase
 from django.test.utils import override_settings
 
-from algosdk import account, mnemonic
+from algosdk import account, mnemonic, transaction
 
-from payments.models import CurrencyChoices, Transaction, TransactionStatus, TransactionType
+from algorand.models import TrackedTransaction
+from algorand.utils import suggested_params_provider
+from payments.models import CurrencyChoices, SwapBatch, SwapBatchStatus, Transaction, TransactionStatus, TransactionType
 
 
 def _reload_payments_services():
@@ -90,3 +94,248 @@ class SwapServiceTests(TestCase):
         self.assertEqual(self.transaction.status, TransactionStatus.FAILED)
         self.assertIn("Swap failed", self.transaction.notes)
         self.assertEqual(mock_swap.call_count, self.services.MAX_SWAP_ATTEMPTS)
+
+
+class SwapAggregationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        priv_key, address = account.generate_account()
+        cls.override = override_settings(
+            ALGORAND_ACCOUNT_ADDRESS=address,
+            ALGORAND_ACCOUNT_MNEMONIC=mnemonic.from_private_key(priv_key),
+            ALGORAND_SWAP_MAX_RETRIES=1,
+        )
+        cls.override.enable()
+        cls.services = _reload_payments_services()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.override.disable()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="batch@example.com",
+            username="batchuser",
+            password="pass1234",
+            wallet_address="BATCHWALLET",
+        )
+
+    def _transaction(self, amount):
+        return Transaction.objects.create(
+            user=self.user,
+            amount=Decimal(amount),
+            currency=CurrencyChoices.ALGO,
+            type=TransactionType.RENEWAL,
+            status=TransactionStatus.PENDING,
+        )
+
+    def test_allocate_pro_rata_adds_up_exactly(self):
+        self.assertEqual(self.services.allocate_pro_rata(100, [1, 1, 1]), [34, 33, 33])
+        self.assertEqual(self.services.allocate_pro_rata(7, [0, 2, 5]), [0, 2, 5])
+        self.assertEqual(self.services.allocate_pro_rata(5, [0, 0]), [0, 0])
+
+    @mock.patch("payments.services.perform_swap_algo_to_usdc")
+    def test_batched_swap_splits_usdc_and_records_allocations(self, mock_swap):
+        mock_swap.return_value = {
+            "status": "success",
+            "usdc_received": 1_000_001,
+            "tx_ids": ["GROUP1"],
+            "confirmed_round": 77,
+        }
+        transactions = [self._transaction("1.00"), self._transaction("3.00")]
+
+        batch = self.services.execute_batched_algo_to_usdc_swap(transactions)
+
+        mock_swap.assert_called_once()
+        self.assertEqual(mock_swap.call_args.kwargs["amount_algo"], 4_000_000)
+        self.assertEqual(batch.status, SwapBatchStatus.EXECUTED)
+        self.assertEqual(batch.tx_ids, ["GROUP1"])
+        received = [Transaction.objects.get(pk=txn.pk).usdc_received for txn in transactions]
+        self.assertEqual(received, [Decimal("0.250000"), Decimal("0.750001")])
+        self.assertEqual(
+            sorted(batch.allocations.values_list("usdc_allocated", flat=True)), [Decimal("0.250000"), Decimal("0.750001")]
+        )
+
+    @mock.patch("payments.services._sleep")
+    @mock.patch("payments.services.perform_swap_algo_to_usdc")
+    def test_aggregator_flushes_on_request_threshold_and_reports_failures(self, mock_swap, mock_sleep):
+        mock_swap.side_effect = [
+            {"status": "success", "usdc_received": 400_000, "tx_ids": ["G1"], "confirmed_round": 1},
+            Exception("pool drained"),
+        ]
+        aggregator = self.services.SwapAggregator(max_requests=2, window_seconds=60)
+        transactions = [self._transaction("1.00") for _ in range(3)]
+
+        for txn in transactions:
+            aggregator.submit(txn)
+        self.assertEqual(mock_swap.call_count, 1)
+        aggregator.flush()
+
+        first_batch = aggregator.batch_for(transactions[0])
+        self.assertEqual(first_batch, aggregator.batch_for(transactions[1]))
+        self.assertIsNone(aggregator.error_for(transactions[0]))
+        self.assertIsInstance(aggregator.error_for(transactions[2]), self.services.SwapExecutionError)
+        self.assertEqual(SwapBatch.objects.get(status=SwapBatchStatus.FAILED).error, "pool drained")
+        transactions[2].refresh_from_db()
+        self.assertEqual(transactions[2].status, TransactionStatus.FAILED)
+
+
+class PayoutBatcherTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        priv_key, address = account.generate_account()
+        cls.override = override_settings(
+            ALGORAND_ACCOUNT_ADDRESS=address,
+            ALGORAND_ACCOUNT_MNEMONIC=mnemonic.from_private_key(priv_key),
+            PLATFORM_FEE_WALLET_ADDRESS=account.generate_account()[1],
+            ALGORAND_ASYNC_CONFIRMATIONS=False,
+        )
+        cls.override.enable()
+        cls.services = _reload_payments_services()
+        cls.merchant = account.generate_account()[1]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.override.disable()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="payout@example.com",
+            username="payoutuser",
+            password="pass1234",
+            wallet_address="PAYOUTWALLET",
+        )
+        self.algod = mock.Mock()
+        self.algod.suggested_params.return_value = transaction.SuggestedParams(
+            fee=1000, first=1, last=1000, gh=base64.b64encode(b"\0" * 32).decode(), min_fee=1000, flat_fee=True
+        )
+        patcher = mock.patch("payments.services.get_algod_client", return_value=self.algod)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        suggested_params_provider.clear()
+        self.addCleanup(suggested_params_provider.clear)
+
+    def _transaction(self):
+        return Transaction.objects.create(
+            user=self.user,
+            amount=Decimal("10.00"),
+            currency=CurrencyChoices.ALGO,
+            type=TransactionType.RENEWAL,
+            status=TransactionStatus.CONFIRMED,
+            platform_fee=Decimal("0.50"),
+            net_amount=Decimal("9.50"),
+        )
+
+    @mock.patch("payments.services.wait_for_confirmation")
+    def test_payouts_and_fees_are_packed_into_groups_of_sixteen(self, mock_wait):
+        transactions = [self._transaction() for _ in range(9)]
+        batcher = self.services.PayoutBatcher()
+
+        for txn in transactions:
+            batcher.add(txn, payout_address=self.merchant)
+        batcher.flush()
+
+        groups = [call.args[0] for call in self.algod.send_transactions.call_args_list]
+        self.assertEqual([len(group) for group in groups], [16, 2])
+        self.assertEqual(len({signed.transaction.group for signed in groups[0]}), 1)
+        self.assertEqual(mock_wait.call_count, 2)
+        self.algod.suggested_params.assert_called_once()
+        stored = Transaction.objects.get(pk=transactions[0].pk)
+        self.assertEqual(stored.payout_tx_id, groups[0][0].transaction.get_txid())
+        self.assertEqual(stored.platform_fee_tx_id, groups[0][1].transaction.get_txid())
+        self.assertEqual(batcher.errors, {})
+
+    @mock.patch("payments.services.wait_for_confirmation")
+    def test_disburse_sends_payout_and_fee_as_one_group(self, mock_wait):
+        txn = self._transaction()
+
+        result = self.services.disburse_transaction_funds(txn, payout_address=self.merchant)
+
+        self.assertEqual(set(result), {"payout_tx_id", "platform_fee_tx_id"})
+        self.algod.send_transactions.assert_called_once()
+        mock_wait.assert_called_once()
+
+        self.algod.send_transactions.side_effect = Exception("node unavailable")
+        failed = self._transaction()
+        on_error = mock.Mock()
+        self.services.disburse_transaction_funds(failed, payout_address=self.merchant, on_error=on_error)
+        on_error.assert_called_once_with(failed.id, "node unavailable")
+        failed.refresh_from_db()
+        self.assertIsNone(failed.payout_tx_id)
+
+        with mock.patch.object(self.services, "ACCOUNT_MNEMONIC", ""):
+            with self.assertRaises(RuntimeError):
+                self.services.disburse_transaction_funds(
+                    self._transaction(), payout_address=self.merchant, allow_partial=False
+                )
+
+    @mock.patch("payments.services.wait_for_confirmation")
+    def test_groups_are_flushed_outside_transactions_with_their_tx_ids_committed_first(self, mock_wait):
+        txn = self._transaction()
+        batcher = self.services.PayoutBatcher()
+        batcher.add(txn, payout_address=self.merchant)
+
+        with self.assertRaises(RuntimeError):
+            with db_transaction.atomic():
+                batcher.flush()
+        self.algod.send_transactions.assert_not_called()
+        self.assertIsNone(Transaction.objects.get(pk=txn.pk).payout_tx_id)
+
+        stored_before_send = []
+        self.algod.send_transactions.side_effect = lambda signed: stored_before_send.append(
+            Transaction.objects.get(pk=txn.pk).payout_tx_id
+        )
+        tx_ids = batcher.flush()
+
+        self.assertEqual(stored_before_send, [tx_ids[0]])
+        self.assertEqual(batcher.errors, {})
+
+    @mock.patch("payments.services.wait_for_confirmation")
+    def test_async_groups_are_tracked_before_sending_and_paid_again_when_they_expire(self, mock_wait):
+        txn = self._transaction()
+        batcher = self.services.PayoutBatcher(wait=False)
+
+        # The tracking row is committed with the tx ids, before the group goes out.
+        self.algod.send_transactions.side_effect = lambda signed: self.assertTrue(TrackedTransaction.objects.exists())
+        batcher.add(txn, payout_address=self.merchant)
+        tx_ids = batcher.flush()
+        tracked = TrackedTransaction.objects.get()
+
+        mock_wait.assert_not_called()
+        self.algod.send_transactions.assert_called_once()
+        self.assertEqual((tracked.tx_id, tracked.kind), (tx_ids[0], "payout"))
+        self.assertEqual(tracked.callback, "payments.services.payout_group_resolved")
+        self.assertEqual(tracked.context["attempt"], 1)
+
+        tracked.error = "Not confirmed by round 1000."
+        self.algod.suggested_params.return_value = transaction.SuggestedParams(
+            fee=1000, first=1001, last=2000, gh=base64.b64encode(b"\0" * 32).decode(), min_fee=1000, flat_fee=True
+        )
+        suggested_params_provider.clear()
+        self.services.payout_group_resolved(tracked)
+
+        self.assertEqual(self.algod.send_transactions.call_count, 2)
+        retry = TrackedTransaction.objects.exclude(pk=tracked.pk).get()
+        self.assertEqual(retry.context["attempt"], 2)
+        txn.refresh_from_db()
+        self.assertEqual(txn.payout_tx_id, retry.tx_id)
+        self.assertIsNotNone(txn.platform_fee_tx_id)
+        self.assertNotEqual(txn.payout_tx_id, tx_ids[0])
+        self.assertIn("paying again", txn.notes)
+
+        # A stale callback for the first group no longer touches the re-sent legs.
+        self.services.payout_group_resolved(tracked)
+        self.assertEqual(Transaction.objects.get(pk=txn.pk).payout_tx_id, retry.tx_id)
+
+        with self.settings(PAYOUT_MAX_ATTEMPTS=2):
+            self.services.payout_group_resolved(retry)
+
+        self.assertEqual(self.algod.send_transactions.call_count, 2)
+        txn.refresh_from_db()
+        self.assertIsNone(txn.payout_tx_id)
+        self.assertIsNone(txn.platform_fee_tx_id)
+        self.assertTrue(txn.notes.endswith("expired unconfirmed"))
@@ -1,14 +1,16 @@
 # payments/urls.py
 
-from django.urls import path, include
+from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
-from .views import TransactionViewSet, algo_payment_webhook, get_algo_qr
+from .views import TransactionViewSet, algo_payment_webhook, get_algo_qr, qr_image
 
 router = DefaultRouter()
 router.register(r'', TransactionViewSet, basename="transaction")
 
 urlpatterns = [
+    # Listed before the router, whose detail route would otherwise take "qr/" as a pk.
+    path("qr/", get_algo_qr, name="generate_qr"),
+    re_path(r"^qr/(?P<token>[\w.:-]+)\.(?P<fmt>png|svg)$", qr_image, name="qr_image"),
     path('', include(router.urls)),
     path("webhook/algo-confirm/", algo_payment_webhook, name="algo_webhook"),
-    path("qr/", get_algo_qr, name="generate_qr"),
 ]
@@ -1,11 +1,16 @@
 # payments/views.py
 
 from decimal import Decimal, InvalidOperation
+from django.core import signing
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_GET
 from rest_framework import viewsets, status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
-from payments.utils import calculate_fees, generate_algo_payment_qr
+from payments.qr import CONTENT_TYPES, qr_code_url, qr_renderer, unsign_payload
+from payments.utils import algo_payment_uri, calculate_fees
 from .models import Transaction, TransactionStatus
 from .serializers import TransactionSerializer
 from django.utils import timezone
@@ -77,6 +82,36 @@ def algo_payment_webhook(request):
 @permission_classes([IsAuthenticated])
 def get_algo_qr(request):
     wallet = request.user.wallet_address
-    amount = request.GET.get("amount", "1.0")
-    qr_base64 = generate_algo_payment_qr(wallet, float(amount))
-    return Response({"qr_code_base64": qr_base64})
+    fmt = request.GET.get("qr_format", "png")
+    if fmt not in CONTENT_TYPES:
+        return Response({"error": "qr_format must be png or svg."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        amount = float(request.GET.get("amount", "1.0"))
+    except ValueError:
+        return Response({"error": "Invalid amount."}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"qr_code_url": qr_code_url(request, algo_payment_uri(wallet, amount), fmt)})
+
+
+QR_IMAGE_MAX_AGE = 365 * 24 * 3600  # the URL fixes the content, so it never changes
+
+
+def _qr_image_etag(request, token, fmt):
+    try:
+        return qr_renderer.key(unsign_payload(token), fmt)
+    except signing.BadSignature:
+        return None
+
+
+@require_GET
+@condition(etag_func=_qr_image_etag)
+def qr_image(request, token, fmt):
+    """Serve a QR code from a signed ``qr_code_url``; revalidations get a 304 without rendering."""
+    try:
+        data = unsign_payload(token)
+    except signing.BadSignature:
+        raise Http404("Unknown QR code.")
+    image = qr_renderer.render(data, fmt)
+    response = HttpResponse(image.content, content_type=image.content_type)
+    response["ETag"] = image.etag
+    patch_cache_control(response, public=True, max_age=QR_IMAGE_MAX_AGE, immutable=True)
+    return response
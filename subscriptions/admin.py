@@ -1,13 +1,6 @@
-from decimal import Decimal
-from datetime import timedelta
-
-from django.conf import settings
 from django.contrib import admin
 from django.template.response import TemplateResponse
 from django.urls import path
-from django.utils import timezone
-from django.db.models import Sum, Count, F, DecimalField
-from django.db.models.functions import Coalesce
 
 from .models import (
     Coupon,
@@ -21,8 +14,10 @@ from .models import (
     Subscription,
     CheckoutSession,
 )
-from payments.models import Transaction, TransactionStatus
-from subscriptions.models import InvoiceStatus, SubscriptionStatus
+from algorand.subscription import deploy_plan_contract
+from analytics import rollups
+from analytics.rollups import MetricsRecorder
+from subscriptions.services import RenewalForecaster
 
 
 class PlanFeatureInline(admin.TabularInline):
@@ -38,32 +33,36 @@ class PriceTierInline(admin.TabularInline):
 @admin.register(Plan)
 class PlanAdmin(admin.ModelAdmin):
     list_display = ("code", "name", "created_by", "amount", "currency", "interval", "trial_days", "is_active")
-    list_filter = ("currency", "interval", "is_active")
+    list_filter = ("currency", "interval", "tiers_mode", "usage_type", "is_active")
     search_fields = ("code", "name", "created_by__email")
     inlines = [PlanFeatureInline, PriceTierInline]
     actions = ["deploy_contract_action"]
 
     def deploy_contract_action(self, request, queryset):
-        deployed = 0
+        submitted = 0
         for plan in queryset:
             if plan.contract_app_id:
                 continue
+            deploy_plan_contract(plan, wait=False)
+            submitted += 1
 
-            config = SubscriptionContractConfig(
-                plan_id=plan.id,
-                price_micro_algo=int(plan.amount * Decimal("1000000")),
-                renew_interval_rounds=30 * 60,  # placeholder
-                treasury_address=settings.ALGORAND_ACCOUNT_ADDRESS,
-            )
-            app_id = deploy_subscription_contract(config)
-            plan.contract_app_id = app_id
-            plan.save(update_fields=["contract_app_id"])
-            deployed += 1
-
-        self.message_user(request, f"Deployed contracts for {deployed} plan(s).")
+        self.message_user(
+            request, f"Submitted contracts for {submitted} plan(s); app IDs are recorded once confirmed."
+        )
 
     deploy_contract_action.short_description = "Deploy Algorand subscription contract"
 
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        with MetricsRecorder().pricing_changes(Subscription.objects.filter(plan=obj)):
+            super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        # Price tiers are saved with the inlines, after the plan itself.
+        with MetricsRecorder().pricing_changes(Subscription.objects.filter(plan=form.instance)):
+            super().save_related(request, form, formsets, change)
+
 
 @admin.register(Coupon)
 class CouponAdmin(admin.ModelAdmin):
@@ -142,6 +141,12 @@ class SubscriptionAdmin(admin.ModelAdmin):
     )
     readonly_fields = ("created_at", "updated_at")
 
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        with MetricsRecorder().pricing_changes(Subscription.objects.filter(pk=obj.pk)):
+            super().save_model(request, obj, form, change)
+
 
 class InvoiceLineItemInline(admin.TabularInline):
     model = InvoiceLineItem
@@ -180,64 +185,23 @@ class CheckoutSessionAdmin(admin.ModelAdmin):
 
 
 def founder_insights_view(request):
-    period_start = timezone.now() - timedelta(days=30)
+    metrics = rollups.snapshot(days=30)
+    context = {**admin.site.each_context(request), "metrics": metrics, "period_start": metrics["period_start"]}
+    return TemplateResponse(request, "subscriptions/founder_insights.html", context)
 
-    active_statuses = [SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIALING]
-    subscriptions_qs = Subscription.objects.filter(status__in=active_statuses)
 
-    mrr = subscriptions_qs.aggregate(
-        total=Coalesce(
-            Sum(F("plan__amount") * F("quantity"), output_field=DecimalField(max_digits=14, decimal_places=6)),
-            Decimal("0"),
-        )
-    )["total"]
-
-    paid_invoices = Invoice.objects.filter(status=InvoiceStatus.PAID, paid_at__isnull=False)
-    net_mrr = paid_invoices.filter(paid_at__gte=period_start).aggregate(
-        total=Coalesce(Sum("total"), Decimal("0"))
-    )["total"]
-
-    churn_count = Subscription.objects.filter(
-        status=SubscriptionStatus.CANCELED,
-        ended_at__isnull=False,
-        ended_at__gte=period_start,
-    ).count()
-
-    swap_stats = Transaction.objects.filter(
-        status=TransactionStatus.CONFIRMED,
-        created_at__gte=period_start,
-    ).aggregate(
-        volume=Coalesce(Sum("usdc_received"), Decimal("0")),
-        count=Count("id"),
-    )
-    swap_volume = swap_stats["volume"]
-    swap_count = swap_stats["count"]
-    swap_avg = swap_volume / swap_count if swap_count else Decimal("0")
-
-    invoices_count = Invoice.objects.filter(issued_at__gte=period_start).count()
-
-    metrics = {
-        "currency": subscriptions_qs.values_list("plan__currency", flat=True).first() or "ALGO",
-        "mrr": mrr,
-        "net_mrr": net_mrr,
-        "churn_count": churn_count,
-        "swap_volume_usdc": swap_volume,
-        "swap_count": swap_count,
-        "swap_avg_usdc": swap_avg,
-        "active_subscriptions": subscriptions_qs.filter(status=SubscriptionStatus.ACTIVE).count(),
-        "trialing_subscriptions": Subscription.objects.filter(status=SubscriptionStatus.TRIALING).count(),
-        "past_due_subscriptions": Subscription.objects.filter(status=SubscriptionStatus.PAST_DUE).count(),
-        "invoices_count": invoices_count,
-    }
-
-    context = {**admin.site.each_context(request), "metrics": metrics, "period_start": period_start}
-    return TemplateResponse(request, "subscriptions/founder_insights.html", context)
+def renewal_forecast_view(request):
+    refresh = request.GET.get("refresh") == "1"
+    report = RenewalForecaster().cached_forecast(refresh=refresh)
+    context = {**admin.site.each_context(request), "report": report}
+    return TemplateResponse(request, "subscriptions/renewal_forecast.html", context)
 
 
 def _admin_urls_with_founder_insights(original_get_urls):
     def get_urls():
         custom_urls = [
             path("founder-insights/", admin.site.admin_view(founder_insights_view), name="founder-insights"),
+            path("renewal-forecast/", admin.site.admin_view(renewal_forecast_view), name="renewal-forecast"),
         ]
         return custom_urls + original_get_urls()
 
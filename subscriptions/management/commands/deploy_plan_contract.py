@@ -3,7 +3,7 @@ from __future__ import annotations
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 
-from algorand.contracts.subscription_contract import SubscriptionContractConfig
+from algorand.contracts.config import SubscriptionContractConfig
 from algorand.utils import deploy_subscription_contract
 from subscriptions.models import Plan
 
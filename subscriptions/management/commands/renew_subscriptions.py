@@ -1,50 +1,53 @@
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from django.db import transaction
-from django.utils import timezone
 
-from payments.models import TransactionType
-from payments.services import SwapExecutionError
-from subscriptions.models import InvoiceStatus, Subscription, SubscriptionStatus
-from subscriptions.services import InvoiceService, PaymentIntentService, SubscriptionLifecycleService
+from subscriptions.models import SubscriptionAction
+from subscriptions.services import BillingDispatcher, DueWorkScheduler, PaymentIntentService
+from subscriptions.services.renewal import CANCELED, FAILED, RENEWED
 
 
 class Command(BaseCommand):
-    help = "Process renewals for subscriptions whose period has ended."
+    help = "Process renewals and period-end cancellations (the 'renewals' billing pipeline)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--backend",
+            choices=("inline", "celery"),
+            default=getattr(settings, "RENEWAL_BACKEND", "inline"),
+            help="Run the pipeline in this process, or enqueue its chunks for Celery billing workers.",
+        )
 
     def handle(self, *args, **options):
-        now = timezone.now()
-        lifecycle = SubscriptionLifecycleService()
-        invoicing = InvoiceService()
-        payment_service = PaymentIntentService()
-
-        queryset = (
-            Subscription.objects.select_related("plan", "user", "coupon")
-            .filter(
-                status__in=[SubscriptionStatus.ACTIVE, SubscriptionStatus.PAST_DUE],
-                current_period_end__lte=now,
-            )
-        )
+        scheduler = DueWorkScheduler(payment_service=PaymentIntentService(), on_result=self._report)
+        dispatcher = BillingDispatcher(scheduler=scheduler)
+
+        if options["backend"] == "celery":
+            chunks = dispatcher.dispatch("renewals")
+            if chunks is None:
+                self.stdout.write(self.style.WARNING("Another renewal run is in progress."))
+            else:
+                self.stdout.write(f"Enqueued {chunks} renewal chunk(s) for Celery workers.")
+            return
 
-        if not queryset.exists():
-            self.stdout.write("No subscriptions to renew.")
+        summary = dispatcher.run("renewals")
+        if summary is None:
+            self.stdout.write(self.style.WARNING("Another renewal run is in progress."))
             return
 
-        for subscription in queryset:
-            if subscription.cancel_at_period_end and subscription.current_period_end <= now:
-                lifecycle.finalize_cancellation(subscription)
-                self.stdout.write(f"Subscription {subscription.id} canceled at period end.")
-                continue
-
-            with transaction.atomic():
-                invoice = invoicing.create_invoice(
-                    subscription,
-                    status=InvoiceStatus.OPEN,
-                    coupon=subscription.coupon,
-                )
-                try:
-                    payment_service.process_invoice(invoice, transaction_type=TransactionType.RENEWAL)
-                    lifecycle.advance_period(subscription)
-                    self.stdout.write(self.style.SUCCESS(f"Subscription {subscription.id} renewed."))
-                except SwapExecutionError as exc:
-                    lifecycle.mark_past_due(subscription, reason=str(exc))
-                    self.stdout.write(self.style.WARNING(f"Subscription {subscription.id} payment failed: {exc}"))
+        totals = {outcome: 0 for outcome in (RENEWED, FAILED, CANCELED)}
+        for action in (SubscriptionAction.RENEW, SubscriptionAction.CANCEL):
+            for outcome, count in summary.get(action, {}).items():
+                totals[outcome] = totals.get(outcome, 0) + count
+        if not any(totals.values()):
+            self.stdout.write("No subscriptions to renew.")
+            return
+        details = ", ".join(f"{count} {outcome}" for outcome, count in totals.items())
+        self.stdout.write(f"Renewals: {details}.")
+
+    def _report(self, subscription, action, outcome, detail):
+        if outcome == CANCELED:
+            self.stdout.write(f"Subscription {subscription.id} canceled at period end.")
+        elif outcome == FAILED:
+            self.stdout.write(self.style.WARNING(f"Subscription {subscription.id} payment failed: {detail}"))
+        elif outcome == RENEWED:
+            self.stdout.write(self.style.SUCCESS(f"Subscription {subscription.id} renewed."))
@@ -1,43 +1,34 @@
 from django.core.management.base import BaseCommand
-from django.utils import timezone
 
-from payments.models import TransactionType
-from payments.services import SwapExecutionError
-from subscriptions.models import Invoice, InvoiceStatus, SubscriptionStatus
-from subscriptions.services import PaymentIntentService, SubscriptionLifecycleService
+from subscriptions.models import SubscriptionAction
+from subscriptions.services import BillingDispatcher, DueWorkScheduler, PaymentIntentService
+from subscriptions.services.renewal import FAILED, RENEWED
 
 
 class Command(BaseCommand):
-    help = "Retry payments for invoices linked to past-due subscriptions."
+    help = "Retry payments for past-due subscriptions (the 'retries' billing pipeline, run inline)."
 
-    def handle(self, *args, **options):
-        invoices = (
-            Invoice.objects.select_related("subscription", "subscription__plan", "subscription__coupon", "user")
-            .filter(
-                status__in=[InvoiceStatus.OPEN, InvoiceStatus.UNCOLLECTIBLE],
-                subscription__status=SubscriptionStatus.PAST_DUE,
-            )
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--due-only",
+            action="store_true",
+            help="Only retry subscriptions whose SCHEDULER_RETRY_DELAY_SECONDS back-off has elapsed, as beat does.",
         )
 
-        if not invoices.exists():
-            self.stdout.write("No invoices to retry.")
-            return
+    def handle(self, *args, **options):
+        scheduler = DueWorkScheduler(payment_service=PaymentIntentService(), on_result=self._report)
+        if not options["due_only"]:
+            # Like cron runs always have, retry every past-due subscription on each run.
+            scheduler.make_retries_due()
+        summary = BillingDispatcher(scheduler=scheduler).run("retries")
 
-        lifecycle = SubscriptionLifecycleService()
-        payment_service = PaymentIntentService()
+        if summary is None:
+            self.stdout.write(self.style.WARNING("Another payment retry run is in progress."))
+        elif not summary.get(SubscriptionAction.RETRY_PAYMENT):
+            self.stdout.write("No invoices to retry.")
 
-        for invoice in invoices:
-            subscription = invoice.subscription
-            try:
-                payment_service.process_invoice(invoice, transaction_type=TransactionType.RENEWAL)
-                invoice.refresh_from_db()
-                if invoice.status != InvoiceStatus.PAID:
-                    invoice.status = InvoiceStatus.PAID
-                    if invoice.paid_at is None:
-                        invoice.paid_at = timezone.now()
-                    invoice.save(update_fields=["status", "paid_at"])
-                lifecycle.advance_period(subscription)
-                self.stdout.write(self.style.SUCCESS(f"Invoice {invoice.number} paid. Subscription {subscription.id} renewed."))
-            except SwapExecutionError as exc:
-                lifecycle.mark_past_due(subscription, reason=str(exc))
-                self.stdout.write(self.style.WARNING(f"Payment failed for invoice {invoice.number}: {exc}"))
+    def _report(self, subscription, action, outcome, detail):
+        if outcome == RENEWED:
+            self.stdout.write(self.style.SUCCESS(f"Subscription {subscription.id} paid and renewed."))
+        elif outcome == FAILED:
+            self.stdout.write(self.style.WARNING(f"Payment failed for subscription {subscription.id}: {detail}"))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from subscriptions.services import DueWorkScheduler
+
+
+class Command(BaseCommand):
+    help = "Process due trial expirations, renewals, period-end cancellations and payment retries in time order."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None, help="Subscriptions claimed per batch.")
+        parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches.")
+
+    def handle(self, *args, **options):
+        scheduler = DueWorkScheduler(batch_size=options["batch_size"], on_result=self._report)
+        summary = scheduler.tick(max_batches=options["max_batches"])
+
+        if not summary:
+            self.stdout.write("No due work.")
+            return
+
+        for action, outcomes in summary.items():
+            details = ", ".join(f"{count} {outcome}" for outcome, count in sorted(outcomes.items()))
+            self.stdout.write(f"{action}: {details}.")
+
+    def _report(self, subscription, action, outcome, detail):
+        if detail:
+            self.stdout.write(self.style.WARNING(f"Subscription {subscription.id} {action} -> {outcome}: {detail}"))
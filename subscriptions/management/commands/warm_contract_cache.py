@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from algorand.subscription import get_subscription_config
+from algorand.utils import get_contract_template
+from subscriptions.models import Plan
+
+
+class Command(BaseCommand):
+    help = "Compile and cache the subscription contract template, then render it for active plans"
+
+    def add_arguments(self, parser):
+        parser.add_argument("plan_codes", nargs="*", help="Plan codes to render. Renders every active plan if omitted.")
+        parser.add_argument(
+            "--interval-rounds",
+            type=int,
+            default=30 * 60,
+            help="Renewal interval baked into the programs (must match the one used to deploy).",
+        )
+
+    def handle(self, *args, **options):
+        plans = Plan.objects.filter(is_active=True)
+        if options["plan_codes"]:
+            plans = plans.filter(code__in=options["plan_codes"])
+        if not plans.exists():
+            raise CommandError("No plans found to warm.")
+
+        # The first build compiles through algod; every later one is read from CompiledProgram rows.
+        template = get_contract_template()
+        rendered = 0
+        for plan in plans.order_by("id"):
+            program = template.render(get_subscription_config(plan, options["interval_rounds"]))
+            rendered += 1
+            self.stdout.write(f"Plan {plan.code}: {len(program)}-byte approval program.")
+
+        self.stdout.write(self.style.SUCCESS(f"Contract template ready; rendered programs for {rendered} plan(s)."))
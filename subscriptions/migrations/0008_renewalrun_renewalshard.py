@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0007_plan_payout_wallet_address'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenewalRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed')], default='running', max_length=12)),
+                ('cutoff', models.DateTimeField()),
+                ('shard_size', models.PositiveIntegerField()),
+                ('total_due', models.PositiveIntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ('-started_at',),
+            },
+        ),
+        migrations.CreateModel(
+            name='RenewalShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_subscription_id', models.PositiveBigIntegerField()),
+                ('last_subscription_id', models.PositiveBigIntegerField()),
+                ('checkpoint_subscription_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed')], default='pending', max_length=12)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('worker', models.CharField(blank=True, max_length=128)),
+                ('renewed', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('canceled', models.PositiveIntegerField(default=0)),
+                ('deferred', models.PositiveIntegerField(default=0)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='subscriptions.renewalrun')),
+            ],
+            options={
+                'ordering': ('run', 'first_subscription_id'),
+                'indexes': [models.Index(fields=['run', 'status'], name='subscriptio_run_id_6620d3_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:00
+
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+def schedule_existing_subscriptions(apps, schema_editor):
+    Subscription = apps.get_model("subscriptions", "Subscription")
+    Subscription.objects.filter(status="trialing", trial_end_at__isnull=False).update(
+        next_action="expire_trial", next_action_at=F("trial_end_at")
+    )
+    Subscription.objects.filter(status="active", current_period_end__isnull=False, cancel_at_period_end=True).update(
+        next_action="cancel", next_action_at=F("current_period_end")
+    )
+    Subscription.objects.filter(status="active", current_period_end__isnull=False, cancel_at_period_end=False).update(
+        next_action="renew", next_action_at=F("current_period_end")
+    )
+    Subscription.objects.filter(status="past_due").update(next_action="retry_payment", next_action_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0008_renewalrun_renewalshard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='next_action',
+            field=models.CharField(blank=True, choices=[('expire_trial', 'Expire trial'), ('renew', 'Renew'), ('retry_payment', 'Retry payment'), ('cancel', 'Cancel at period end')], default='', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='subscription',
+            name='next_action_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(condition=models.Q(('next_action_at__isnull', False)), fields=['next_action_at', 'next_action', 'id'], name='subscription_next_action_idx'),
+        ),
+        migrations.RunPython(schedule_existing_subscriptions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0009_subscription_next_action'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plan',
+            name='tiers_mode',
+            field=models.CharField(choices=[('graduated', 'Graduated'), ('volume', 'Volume')], default='graduated', help_text='How price tiers apply: each unit at its own tier, or every unit at the tier of the total quantity.', max_length=10),
+        ),
+    ]
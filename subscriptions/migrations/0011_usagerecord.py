@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0010_plan_tiers_mode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plan',
+            name='usage_type',
+            field=models.CharField(choices=[('licensed', 'Licensed'), ('metered', 'Metered')], default='licensed', help_text='Licensed plans bill the subscription quantity; metered plans bill the usage recorded in the period.', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='UsageRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=64)),
+                ('quantity', models.PositiveBigIntegerField()),
+                ('occurred_at', models.DateTimeField()),
+                ('subscription', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='usage_records', to='subscriptions.subscription')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['subscription', 'occurred_at'], name='usage_subscription_time_idx')],
+                'constraints': [models.UniqueConstraint(fields=('subscription', 'idempotency_key'), name='unique_usage_idempotency_key')],
+            },
+        ),
+    ]
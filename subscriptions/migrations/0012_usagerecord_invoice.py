@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 17:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0011_usagerecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usagerecord',
+            name='invoice',
+            field=models.ForeignKey(blank=True, help_text='Invoice that billed this usage; empty until the next renewal.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='usage_records', to='subscriptions.invoice'),
+        ),
+    ]
@@ -17,6 +17,16 @@ class PlanInterval(models.TextChoices):
     YEAR = "year", "Yearly"
 
 
+class TiersMode(models.TextChoices):
+    GRADUATED = "graduated", "Graduated"
+    VOLUME = "volume", "Volume"
+
+
+class UsageType(models.TextChoices):
+    LICENSED = "licensed", "Licensed"
+    METERED = "metered", "Metered"
+
+
 class SubscriptionStatus(models.TextChoices):
     INCOMPLETE = "incomplete", "Incomplete"
     TRIALING = "trialing", "Trialing"
@@ -59,6 +69,24 @@ class CustomerType(models.TextChoices):
     BUSINESS = "business", "Entreprise"
 
 
+class SubscriptionAction(models.TextChoices):
+    EXPIRE_TRIAL = "expire_trial", "Expire trial"
+    RENEW = "renew", "Renew"
+    RETRY_PAYMENT = "retry_payment", "Retry payment"
+    CANCEL = "cancel", "Cancel at period end"
+
+
+class RenewalRunStatus(models.TextChoices):
+    RUNNING = "running", "Running"
+    COMPLETED = "completed", "Completed"
+
+
+class RenewalShardStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    RUNNING = "running", "Running"
+    COMPLETED = "completed", "Completed"
+
+
 class Plan(models.Model):
     code = models.SlugField(max_length=64, unique=True)
     name = models.CharField(max_length=120)
@@ -67,6 +95,18 @@ class Plan(models.Model):
     currency = models.CharField(max_length=10, choices=CurrencyChoices.choices, default=CurrencyChoices.ALGO)
     interval = models.CharField(max_length=10, choices=PlanInterval.choices, default=PlanInterval.MONTH)
     trial_days = models.PositiveIntegerField(default=0)
+    tiers_mode = models.CharField(
+        max_length=10,
+        choices=TiersMode.choices,
+        default=TiersMode.GRADUATED,
+        help_text="How price tiers apply: each unit at its own tier, or every unit at the tier of the total quantity.",
+    )
+    usage_type = models.CharField(
+        max_length=10,
+        choices=UsageType.choices,
+        default=UsageType.LICENSED,
+        help_text="Licensed plans bill the subscription quantity; metered plans bill the usage recorded in the period.",
+    )
     is_active = models.BooleanField(default=True)
     metadata = models.JSONField(default=dict, blank=True)
     payout_wallet_address = models.CharField(max_length=255, blank=True, default="")
@@ -171,6 +211,8 @@ class Subscription(models.Model):
     cancel_at_period_end = models.BooleanField(default=False)
     canceled_at = models.DateTimeField(null=True, blank=True)
     ended_at = models.DateTimeField(null=True, blank=True)
+    next_action = models.CharField(max_length=16, choices=SubscriptionAction.choices, blank=True, default="")
+    next_action_at = models.DateTimeField(null=True, blank=True)
     metadata = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -179,6 +221,12 @@ class Subscription(models.Model):
         ordering = ("-created_at",)
         indexes = [
             models.Index(fields=("status", "current_period_end")),
+            # Covering index for the due-work scheduler: one range scan in time order per tick.
+            models.Index(
+                fields=("next_action_at", "next_action", "id"),
+                condition=models.Q(next_action_at__isnull=False),
+                name="subscription_next_action_idx",
+            ),
         ]
 
     def __str__(self) -> str:
@@ -189,6 +237,34 @@ class Subscription(models.Model):
         return self.status in {SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIALING}
 
 
+class UsageRecord(models.Model):
+    """One reported usage event. Rows are inserted in bulk and tied to the invoice that bills them at renewal."""
+
+    subscription = models.ForeignKey(Subscription, on_delete=models.CASCADE, related_name="usage_records", db_index=False)
+    idempotency_key = models.CharField(max_length=64)
+    quantity = models.PositiveBigIntegerField()
+    occurred_at = models.DateTimeField()
+    invoice = models.ForeignKey(
+        "Invoice",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="usage_records",
+        help_text="Invoice that billed this usage; empty until the next renewal.",
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=("subscription", "idempotency_key"), name="unique_usage_idempotency_key"),
+        ]
+        indexes = [
+            models.Index(fields=("subscription", "occurred_at"), name="usage_subscription_time_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.subscription_id}: {self.quantity} @ {self.occurred_at:%Y-%m-%d %H:%M}"
+
+
 class Invoice(models.Model):
     subscription = models.ForeignKey(Subscription, on_delete=models.CASCADE, related_name="invoices")
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="invoices")
@@ -316,3 +392,44 @@ class CheckoutSession(models.Model):
 
     def __str__(self) -> str:
         return f"CheckoutSession {self.id} for {self.plan.code}"
+
+
+class RenewalRun(models.Model):
+    """A billing run split into id-range shards that workers claim independently."""
+
+    status = models.CharField(max_length=12, choices=RenewalRunStatus.choices, default=RenewalRunStatus.RUNNING)
+    cutoff = models.DateTimeField()
+    shard_size = models.PositiveIntegerField()
+    total_due = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("-started_at",)
+
+    def __str__(self) -> str:
+        return f"RenewalRun {self.id} ({self.status})"
+
+
+class RenewalShard(models.Model):
+    run = models.ForeignKey(RenewalRun, on_delete=models.CASCADE, related_name="shards")
+    first_subscription_id = models.PositiveBigIntegerField()
+    last_subscription_id = models.PositiveBigIntegerField()
+    checkpoint_subscription_id = models.PositiveBigIntegerField(null=True, blank=True)
+    status = models.CharField(max_length=12, choices=RenewalShardStatus.choices, default=RenewalShardStatus.PENDING)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=128, blank=True)
+    renewed = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    canceled = models.PositiveIntegerField(default=0)
+    deferred = models.PositiveIntegerField(default=0)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("run", "first_subscription_id")
+        indexes = [
+            models.Index(fields=("run", "status")),
+        ]
+
+    def __str__(self) -> str:
+        return f"RenewalShard {self.first_subscription_id}-{self.last_subscription_id} ({self.status})"
@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 
 from .models import (
@@ -44,6 +45,8 @@ class PlanSerializer(serializers.ModelSerializer):
             "currency",
             "interval",
             "trial_days",
+            "tiers_mode",
+            "usage_type",
             "is_active",
             "metadata",
             "payout_wallet_address",
@@ -67,11 +70,28 @@ class PublicPlanSerializer(serializers.ModelSerializer):
             "currency",
             "interval",
             "trial_days",
+            "tiers_mode",
+            "usage_type",
             "metadata",
             "payout_wallet_address",
         )
 
 
+class PriceRequestSerializer(serializers.Serializer):
+    plan = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class BatchPriceSerializer(serializers.Serializer):
+    items = PriceRequestSerializer(many=True, allow_empty=False)
+
+    def validate_items(self, items):
+        limit = getattr(settings, "PRICING_BATCH_LIMIT", 1000)
+        if len(items) > limit:
+            raise serializers.ValidationError(f"At most {limit} items can be priced per request.")
+        return items
+
+
 class CouponSerializer(serializers.ModelSerializer):
     created_by = serializers.ReadOnlyField(source="created_by_id")
 
@@ -1,13 +1,27 @@
-from .events import EventRecorder
+from .billing import BillingDispatcher
+from .events import BufferedEventRecorder, EventRecorder
+from .forecasting import RenewalForecaster
 from .invoicing import InvoiceService
 from .lifecycle import SubscriptionLifecycleService
+from .metering import UsageIngestor, UsageRollup
 from .notification import NotificationDispatcher
 from .payment import PaymentIntentService
+from .pricing import PricingEngine
+from .renewal import RenewalEngine
+from .scheduler import DueWorkScheduler
 
 __all__ = [
+    "BillingDispatcher",
+    "BufferedEventRecorder",
+    "DueWorkScheduler",
     "EventRecorder",
     "InvoiceService",
     "SubscriptionLifecycleService",
     "NotificationDispatcher",
     "PaymentIntentService",
+    "PricingEngine",
+    "RenewalEngine",
+    "RenewalForecaster",
+    "UsageIngestor",
+    "UsageRollup",
 ]
@@ -0,0 +1,140 @@
+"""
+Periodic billing pipelines.
+
+Celery beat runs ``dispatch_billing`` for each pipeline. The dispatcher holds a
+cache lock so overlapping beats cannot claim the same work twice. It schedules
+rows that were written outside the lifecycle service, then claims due rows from
+the ``next_action_at`` index in chunks and enqueues one ``process_billing_chunk``
+task per chunk on the pipeline's queue and priority. Billing throughput therefore
+grows with the number of workers consuming those queues. The management commands
+run the same pipeline inline.
+"""
+
+from __future__ import annotations
+
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from subscriptions.models import CheckoutSession, CheckoutSessionStatus, SubscriptionAction
+from subscriptions.services.scheduler import DueWorkScheduler
+
+_LOCK_TEMPLATE = "billing:lock:{name}"
+
+
+@dataclass(frozen=True)
+class BillingPipeline:
+    name: str
+    actions: tuple[str, ...]
+    queue_setting: str
+    priority: int
+
+    @property
+    def queue(self) -> str:
+        return getattr(settings, self.queue_setting, "billing")
+
+
+# Celery's Redis transport serves lower priority values first.
+PIPELINES = {
+    pipeline.name: pipeline
+    for pipeline in (
+        BillingPipeline("trials", (SubscriptionAction.EXPIRE_TRIAL,), "BILLING_QUEUE", 0),
+        BillingPipeline("renewals", (SubscriptionAction.RENEW, SubscriptionAction.CANCEL), "BILLING_QUEUE", 3),
+        # Retries go to their own queue so a backlog of failing wallets cannot delay first charges and renewals.
+        BillingPipeline("retries", (SubscriptionAction.RETRY_PAYMENT,), "BILLING_RETRY_QUEUE", 6),
+    )
+}
+
+
+@contextmanager
+def billing_lock(name: str, timeout: Optional[int] = None) -> Iterator[bool]:
+    """Hold a cache lock for ``name``; yields ``False`` without blocking when another run holds it."""
+    key = _LOCK_TEMPLATE.format(name=name)
+    token = uuid.uuid4().hex
+    acquired = cache.add(key, token, timeout=timeout or getattr(settings, "BILLING_LOCK_SECONDS", 300))
+    try:
+        yield acquired
+    finally:
+        # Only release our own lock; it may have expired and been taken over by another run.
+        if acquired and cache.get(key) == token:
+            cache.delete(key)
+
+
+def _enqueue_chunk(pipeline: BillingPipeline, claimed: list[tuple[int, str]]) -> None:
+    from subscriptions.tasks import process_billing_chunk
+
+    process_billing_chunk.apply_async(
+        args=(pipeline.name, [list(item) for item in claimed]),
+        queue=pipeline.queue,
+        priority=pipeline.priority,
+    )
+
+
+class BillingDispatcher:
+    """Split due billing work into chunks for Celery workers, or run it inline."""
+
+    def __init__(
+        self,
+        *,
+        scheduler: Optional[DueWorkScheduler] = None,
+        chunk_size: Optional[int] = None,
+        lock_seconds: Optional[int] = None,
+        send: Optional[Callable[[BillingPipeline, list[tuple[int, str]]], None]] = None,
+    ):
+        self.scheduler = scheduler or DueWorkScheduler(
+            batch_size=chunk_size or getattr(settings, "BILLING_CHUNK_SIZE", 100)
+        )
+        self.lock_seconds = lock_seconds
+        self.send = send or _enqueue_chunk
+
+    def dispatch(self, name: str, *, max_chunks: Optional[int] = None) -> Optional[int]:
+        """Claim due work for pipeline ``name`` chunk by chunk and enqueue it; ``None`` if it is locked."""
+        pipeline = PIPELINES[name]
+        with billing_lock(name, self.lock_seconds) as acquired:
+            if not acquired:
+                return None
+            self.scheduler.reconcile()
+            chunks = 0
+            while max_chunks is None or chunks < max_chunks:
+                claimed = self.scheduler.claim_batch(actions=pipeline.actions)
+                if not claimed:
+                    break
+                self.send(pipeline, claimed)
+                chunks += 1
+                if len(claimed) < self.scheduler.batch_size:
+                    break
+            return chunks
+
+    def run(self, name: str, *, max_batches: Optional[int] = None) -> Optional[dict[str, dict[str, int]]]:
+        """Process pipeline ``name`` in this process; ``None`` if another run holds its lock."""
+        pipeline = PIPELINES[name]
+        with billing_lock(name, self.lock_seconds) as acquired:
+            if not acquired:
+                return None
+            self.scheduler.reconcile()
+            return self.scheduler.tick(actions=pipeline.actions, max_batches=max_batches)
+
+
+def expire_checkout_sessions(*, now=None, batch_size: Optional[int] = None) -> int:
+    """Mark open checkout sessions past ``expires_at`` as expired, in bounded batches."""
+    now = now or timezone.now()
+    batch_size = batch_size or getattr(settings, "BILLING_CHUNK_SIZE", 100)
+    expired = 0
+    while True:
+        ids = list(
+            CheckoutSession.objects.filter(status=CheckoutSessionStatus.OPEN, expires_at__lte=now)
+            .order_by("expires_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return expired
+        expired += CheckoutSession.objects.filter(pk__in=ids, status=CheckoutSessionStatus.OPEN).update(
+            status=CheckoutSessionStatus.EXPIRED, updated_at=now
+        )
+        if len(ids) < batch_size:
+            return expired
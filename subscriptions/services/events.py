@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+import threading
 from typing import Any, Optional
 
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
 from subscriptions.models import EventLog
 
 
@@ -17,6 +21,11 @@ class EventRecorder:
         payload: Optional[dict[str, Any]] = None,
         timestamp=None,
     ) -> EventLog:
+        entry = self._build_entry(event_type, resource_type, resource_id, payload, timestamp)
+        entry.save()
+        return entry
+
+    def _build_entry(self, event_type, resource_type, resource_id, payload, timestamp) -> EventLog:
         entry = EventLog(
             event_type=event_type,
             resource_type=resource_type,
@@ -25,5 +34,77 @@ class EventRecorder:
         )
         if timestamp is not None:
             entry.created_at = timestamp
-        entry.save()
         return entry
+
+
+class BufferedEventRecorder(EventRecorder):
+    """
+    Collect events for the current transaction and insert them with one ``bulk_create`` on commit.
+
+    Events are grouped by savepoint so a rolled-back ``atomic`` block drops exactly the
+    events it recorded, like the rows it wrote. Outside a transaction (autocommit) events
+    are saved straight away. ``sync=True`` (or ``EVENT_RECORDER_SYNC``) saves every
+    event as it is recorded, which keeps ``TestCase`` assertions straightforward.
+    """
+
+    def __init__(self, *, sync: Optional[bool] = None, using: str = DEFAULT_DB_ALIAS):
+        self.sync = getattr(settings, "EVENT_RECORDER_SYNC", False) if sync is None else sync
+        self.using = using
+        self._local = threading.local()
+
+    def record(
+        self,
+        event_type: str,
+        *,
+        resource_type: str,
+        resource_id: str,
+        payload: Optional[dict[str, Any]] = None,
+        timestamp=None,
+    ) -> EventLog:
+        if self.sync or not connections[self.using].in_atomic_block:
+            return super().record(
+                event_type,
+                resource_type=resource_type,
+                resource_id=resource_id,
+                payload=payload,
+                timestamp=timestamp,
+            )
+
+        entry = self._build_entry(event_type, resource_type, resource_id, payload, timestamp)
+        self._buffer_for_scope().append(entry)
+        return entry
+
+    def pending(self) -> int:
+        """Number of events waiting for their transaction to commit."""
+        return sum(len(buffer) for buffer, _ in self._buffers().values())
+
+    def _buffer_for_scope(self) -> list[EventLog]:
+        connection = connections[self.using]
+        scope = tuple(connection.savepoint_ids)
+        buffers = self._buffers()
+
+        current = buffers.get(scope)
+        if current is not None:
+            buffer, flush = current
+            # A rollback discards the hook; the stale buffer must not leak into the next transaction.
+            if any(func is flush for _, func, _ in connection.run_on_commit):
+                return buffer
+
+        buffer: list[EventLog] = []
+
+        def flush():
+            if buffers.get(scope, (None,))[0] is buffer:
+                del buffers[scope]
+            if buffer:
+                EventLog.objects.using(self.using).bulk_create(buffer)
+
+        buffers[scope] = (buffer, flush)
+        transaction.on_commit(flush, using=self.using)
+        return buffer
+
+    def _buffers(self) -> dict:
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        return buffers
+
@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+from typing import Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from subscriptions.models import CouponDuration, CurrencyChoices, Plan, PlanInterval, Subscription, SubscriptionStatus
+
+from .pricing import PricingEngine
+
+DEFAULT_HORIZONS = (30, 90, 365)
+MAX_HORIZON_DAYS = 730
+BUCKET_DAYS = 30
+
+_DAY = 86400.0
+# Mirrors lifecycle._calculate_period_end: monthly plans renew every 30 days, yearly every 365.
+_PERIOD_SECONDS = {PlanInterval.MONTH: 30 * _DAY, PlanInterval.YEAR: 365 * _DAY}
+_MONTH_SECONDS = 30 * _DAY
+_CURRENCIES = tuple(CurrencyChoices.values)
+_SWAPPED_CURRENCY = CurrencyChoices.ALGO
+_CACHE_KEY = "subscriptions:forecast:{horizons}"
+
+_COLUMNS = (
+    "plan_id",
+    "plan__amount",
+    "plan__tiers_mode",
+    "quantity",
+    "plan__currency",
+    "plan__interval",
+    "status",
+    "current_period_end",
+    "cancel_at_period_end",
+    "created_at",
+    "coupon__percent_off",
+    "coupon__amount_off",
+    "coupon__currency",
+    "coupon__duration",
+    "coupon__duration_in_months",
+)
+
+
+@dataclass
+class SubscriptionColumns:
+    """One chunk of forecastable subscriptions, one NumPy array per attribute."""
+
+    subtotal: np.ndarray
+    currency: np.ndarray
+    period_seconds: np.ndarray
+    trialing: np.ndarray
+    period_end: np.ndarray
+    canceling: np.ndarray
+    percent_off: np.ndarray
+    amount_off: np.ndarray
+    # Coupons cover charges before ``coupon_until`` (-inf: none, inf: forever); ``once``
+    # coupons cover only the first invoice, which is the charge that ends a trial.
+    coupon_until: np.ndarray
+    coupon_once: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.subtotal)
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[tuple], pricing: PricingEngine) -> "SubscriptionColumns":
+        (
+            plan_id, amount, tiers_mode, quantity, currency, interval, status, period_end, canceling, created_at,
+            percent_off, amount_off, coupon_currency, duration, duration_in_months,
+        ) = zip(*rows)
+
+        # Each distinct (plan, quantity) pair is priced once, through the plan's tiers.
+        plans = {pk: Plan(pk=pk, amount=unit, tiers_mode=mode) for pk, unit, mode in zip(plan_id, amount, tiers_mode)}
+        pricing.load(plans.values())
+        prices = {key: pricing.price(plans[key[0]], key[1]).total for key in set(zip(plan_id, quantity))}
+
+        currency_codes = np.array(currency, dtype=object)
+        currency_index = np.zeros(len(rows), dtype=np.int64)
+        for index, code in enumerate(_CURRENCIES):
+            currency_index[currency_codes == code] = index
+
+        # A fixed-amount coupon only applies when it is denominated in the plan currency.
+        same_currency = np.array(coupon_currency, dtype=object) == currency_codes
+        amount_off_values = np.array([value if value is not None else 0 for value in amount_off], dtype=np.float64)
+
+        return cls(
+            subtotal=np.array([prices[key] for key in zip(plan_id, quantity)], dtype=np.float64),
+            currency=currency_index,
+            period_seconds=np.array([_PERIOD_SECONDS.get(value, _MONTH_SECONDS) for value in interval], dtype=np.float64),
+            trialing=np.array(status, dtype=object) == SubscriptionStatus.TRIALING,
+            period_end=np.array(
+                [value.timestamp() if value is not None else np.nan for value in period_end], dtype=np.float64
+            ),
+            canceling=np.array(canceling, dtype=bool),
+            percent_off=np.array([value if value is not None else np.nan for value in percent_off], dtype=np.float64),
+            amount_off=np.where(same_currency, amount_off_values, 0.0),
+            coupon_until=np.array(
+                [
+                    _coupon_until(kind, months, created)
+                    for kind, months, created in zip(duration, duration_in_months, created_at)
+                ],
+                dtype=np.float64,
+            ),
+            coupon_once=np.array(duration, dtype=object) == CouponDuration.ONCE,
+        )
+
+    def covered_charges(self, first: np.ndarray) -> np.ndarray:
+        """How many leading charges, the first due at ``first``, each subscription's coupon discounts."""
+        until = np.maximum(np.ceil((self.coupon_until - first) / self.period_seconds), 0.0)
+        return np.where(self.coupon_once, self.trialing.astype(np.float64), until)
+
+    def invoice_totals(self) -> np.ndarray:
+        """Per-renewal invoice total for a charge the coupon covers, discounted the way ``InvoiceService`` does."""
+        subtotal = self.subtotal
+        has_percent = ~np.isnan(self.percent_off)
+        discount = np.where(
+            has_percent,
+            subtotal * np.nan_to_num(self.percent_off) / 100.0,
+            np.minimum(subtotal, self.amount_off),
+        )
+        return np.maximum(subtotal - discount, 0.0)
+
+
+class RenewalForecaster:
+    """
+    Project upcoming renewal billing from active and trialing subscriptions.
+
+    Subscriptions are streamed from the database in chunks and loaded column by
+    column into NumPy arrays; renewal counts, churn-adjusted revenue and the
+    ALGO→USDC swap volume are computed with array operations, so memory stays
+    bounded by ``FORECAST_CHUNK_SIZE`` however large the subscriber base is. Renewals
+    are priced by ``PricingEngine``, like the invoices they forecast.
+    """
+
+    def __init__(
+        self,
+        *,
+        monthly_churn: Optional[float] = None,
+        trial_conversion: Optional[float] = None,
+        chunk_size: Optional[int] = None,
+        now=None,
+    ):
+        configured_churn = getattr(settings, "FORECAST_MONTHLY_CHURN", None)
+        self.monthly_churn = monthly_churn if monthly_churn is not None else configured_churn
+        self.trial_conversion = (
+            trial_conversion if trial_conversion is not None else getattr(settings, "FORECAST_TRIAL_CONVERSION", 1.0)
+        )
+        self.chunk_size = max(1, chunk_size or getattr(settings, "FORECAST_CHUNK_SIZE", 50_000))
+        self._now = now or timezone.now
+        self.pricing = PricingEngine()
+
+    def queryset(self):
+        return Subscription.objects.filter(
+            status__in=[SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIALING],
+            current_period_end__isnull=False,
+        )
+
+    def iter_columns(self, queryset=None) -> Iterator[SubscriptionColumns]:
+        rows: list[tuple] = []
+        queryset = self.queryset() if queryset is None else queryset
+        for row in queryset.values_list(*_COLUMNS).iterator(chunk_size=self.chunk_size):
+            rows.append(row)
+            if len(rows) == self.chunk_size:
+                yield SubscriptionColumns.from_rows(rows, self.pricing)
+                rows = []
+        if rows:
+            yield SubscriptionColumns.from_rows(rows, self.pricing)
+
+    def observed_monthly_churn(self, *, window_days: int = 90) -> float:
+        """Cancellations over the last ``window_days`` divided by the base, as a 30-day rate."""
+        since = self._now() - timedelta(days=window_days)
+        churned = Subscription.objects.filter(status=SubscriptionStatus.CANCELED, ended_at__gte=since).count()
+        base = (
+            Subscription.objects.filter(
+                Q(status__in=[SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIALING, SubscriptionStatus.PAST_DUE])
+                | Q(status=SubscriptionStatus.CANCELED, ended_at__gte=since)
+            ).count()
+        )
+        if not base or not churned:
+            return 0.0
+        window_rate = churned / base
+        return float(1.0 - (1.0 - window_rate) ** (30.0 / window_days))
+
+    def forecast(self, horizons: Iterable[int] = DEFAULT_HORIZONS, *, queryset=None) -> dict:
+        horizons = sorted({min(max(1, int(days)), MAX_HORIZON_DAYS) for days in horizons})
+        now = self._now()
+        now_ts = now.timestamp()
+        churn = self.monthly_churn if self.monthly_churn is not None else self.observed_monthly_churn()
+        churn = float(min(max(churn, 0.0), 1.0))
+        conversion = float(min(max(self.trial_conversion, 0.0), 1.0))
+
+        currencies = len(_CURRENCIES)
+        buckets = -(-horizons[-1] // BUCKET_DAYS)
+        renewals = np.zeros(len(horizons), dtype=np.int64)
+        expected_renewals = np.zeros(len(horizons), dtype=np.float64)
+        billed = np.zeros((len(horizons), currencies), dtype=np.float64)
+        expected = np.zeros((len(horizons), currencies), dtype=np.float64)
+        timeline = np.zeros(currencies * buckets, dtype=np.float64)
+        subscriptions = 0
+
+        for columns in self.iter_columns(queryset):
+            subscriptions += len(columns)
+            discounted = columns.invoice_totals()
+            full = columns.subtotal
+            # Overdue subscriptions are picked up by the next renewal run, i.e. now.
+            first = np.maximum(columns.period_end, now_ts)
+            covered = columns.covered_charges(first)
+            period = columns.period_seconds
+            weight = np.where(columns.trialing, conversion, 1.0)
+            renewing = ~columns.canceling
+            # Survival to the first charge, then a constant survival ratio per billing period.
+            survival_first = (1.0 - churn) ** ((first - now_ts) / _MONTH_SECONDS)
+            ratio = (1.0 - churn) ** (period / _MONTH_SECONDS)
+
+            for position, days in enumerate(horizons):
+                end_ts = now_ts + days * _DAY
+                counts = np.where(renewing & (first <= end_ts), np.floor((end_ts - first) / period) + 1, 0.0)
+                discounted_counts = np.minimum(counts, covered)
+                survival = survival_first * _geometric_sum(ratio, counts) * weight
+                discounted_survival = survival_first * _geometric_sum(ratio, discounted_counts) * weight
+                billed_value = discounted * discounted_counts + full * (counts - discounted_counts)
+                expected_value = discounted * discounted_survival + full * (survival - discounted_survival)
+
+                renewals[position] += int(counts.sum())
+                expected_renewals[position] += float(survival.sum())
+                billed[position] += np.bincount(columns.currency, weights=billed_value, minlength=currencies)
+                expected[position] += np.bincount(columns.currency, weights=expected_value, minlength=currencies)
+
+            # Cash-flow timeline over the longest horizon: expand one charge index at a time.
+            end_ts = now_ts + horizons[-1] * _DAY
+            counts = np.where(renewing & (first <= end_ts), np.floor((end_ts - first) / period) + 1, 0.0)
+            for charge in range(int(counts.max(initial=0))):
+                mask = counts > charge
+                charge_ts = first[mask] + charge * period[mask]
+                bucket = np.minimum(((charge_ts - now_ts) // (BUCKET_DAYS * _DAY)).astype(np.int64), buckets - 1)
+                totals = np.where(covered[mask] > charge, discounted[mask], full[mask])
+                value = totals * weight[mask] * (1.0 - churn) ** ((charge_ts - now_ts) / _MONTH_SECONDS)
+                timeline += np.bincount(
+                    columns.currency[mask] * buckets + bucket, weights=value, minlength=currencies * buckets
+                )
+
+        swap_rate = _algo_usdc_rate()
+        swapped = _CURRENCIES.index(_SWAPPED_CURRENCY)
+        timeline = timeline.reshape(currencies, buckets)
+
+        report_horizons = []
+        for position, days in enumerate(horizons):
+            swap_volume = expected[position, swapped]
+            report_horizons.append(
+                {
+                    "days": days,
+                    "renewals": int(renewals[position]),
+                    "expected_renewals": round(float(expected_renewals[position]), 2),
+                    "billed": _by_currency(billed[position]),
+                    "expected_revenue": _by_currency(expected[position]),
+                    "swap_volume_algo": _money(swap_volume),
+                    "swap_volume_usdc_estimate": _money(swap_volume * float(swap_rate)) if swap_rate is not None else None,
+                }
+            )
+
+        return {
+            "generated_at": now.isoformat(),
+            "subscriptions": subscriptions,
+            "monthly_churn": round(churn, 6),
+            "trial_conversion": round(conversion, 6),
+            "algo_usdc_rate": str(swap_rate) if swap_rate is not None else None,
+            "horizons": report_horizons,
+            "timeline": [
+                {
+                    "start": (now + timedelta(days=bucket * BUCKET_DAYS)).date().isoformat(),
+                    "end": (now + timedelta(days=min((bucket + 1) * BUCKET_DAYS, horizons[-1]))).date().isoformat(),
+                    "expected_revenue": _by_currency(timeline[:, bucket]),
+                }
+                for bucket in range(buckets)
+            ],
+        }
+
+    def cached_forecast(self, horizons: Iterable[int] = DEFAULT_HORIZONS, *, refresh: bool = False) -> dict:
+        """``forecast`` memoized in the default cache for ``FORECAST_CACHE_SECONDS``."""
+        horizons = sorted({int(days) for days in horizons})
+        key = _CACHE_KEY.format(horizons=",".join(str(days) for days in horizons))
+        if not refresh:
+            report = cache.get(key)
+            if report is not None:
+                return report
+        report = self.forecast(horizons)
+        cache.set(key, report, timeout=getattr(settings, "FORECAST_CACHE_SECONDS", 300))
+        return report
+
+
+def _geometric_sum(ratio: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Vectorized ``sum(ratio ** k for k in range(count))``, exact when ``ratio == 1``."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        closed_form = (1.0 - ratio**counts) / (1.0 - ratio)
+    return np.where(np.isclose(ratio, 1.0), counts, closed_form)
+
+
+def _money(value) -> str:
+    return str(Decimal(repr(float(value))).quantize(Decimal("0.000001")))
+
+
+def _by_currency(values: np.ndarray) -> dict:
+    return {code: _money(values[index]) for index, code in enumerate(_CURRENCIES)}
+
+
+def _coupon_until(duration: Optional[str], months: Optional[int], created_at) -> float:
+    if duration == CouponDuration.FOREVER:
+        return np.inf
+    if duration == CouponDuration.REPEATING and created_at is not None:
+        # Months are 30 days, as for monthly periods.
+        return created_at.timestamp() + (months or 0) * _MONTH_SECONDS
+    return -np.inf
+
+
+def _algo_usdc_rate() -> Optional[Decimal]:
+    from currency.models import ExchangeRate
+
+    rate = (
+        ExchangeRate.objects.filter(base_currency__code="ALGO", target_currency__code="USDC")
+        .order_by("-updated_at")
+        .values_list("rate", flat=True)
+        .first()
+    )
+    return rate
@@ -2,11 +2,12 @@ from __future__ import annotations
 
 import uuid
 from decimal import Decimal
-from typing import Iterable, Optional
+from typing import Iterable, Mapping, Optional
 
 from django.db import transaction
 from django.utils import timezone
 
+from analytics.rollups import MetricsRecorder
 from payments.utils import calculate_fees
 from subscriptions.models import (
     Coupon,
@@ -16,13 +17,17 @@ from subscriptions.models import (
     InvoiceStatus,
     Plan,
     Subscription,
+    UsageType,
 )
+from subscriptions.services.metering import UnbilledUsage, UsageRollup
+from subscriptions.services.pricing import PricingEngine
 
 
 class InvoiceService:
     """Create and update invoices for subscriptions."""
 
-    def __init__(self, *, now=None):
+    def __init__(self, *, metrics_recorder: Optional[MetricsRecorder] = None, now=None):
+        self.metrics = metrics_recorder or MetricsRecorder()
         self._now = now or timezone.now
 
     def create_invoice(
@@ -41,7 +46,10 @@ class InvoiceService:
         period_start = period_start or subscription.current_period_start
         period_end = period_end or subscription.current_period_end
 
-        defaults = self._build_invoice_totals(subscription, coupon, line_items)
+        cutoff = self._now()
+        usage = {} if line_items else self._usage([subscription], cutoff)
+        items = list(line_items or []) or self._default_line_items(subscription, PricingEngine(), usage, cutoff)
+        defaults = self._build_invoice_totals(subscription, coupon, items)
 
         with transaction.atomic():
             invoice = Invoice.objects.create(
@@ -58,29 +66,151 @@ class InvoiceService:
                 **defaults,
             )
 
-            items = line_items or [
-                {
-                    "plan": subscription.plan,
-                    "description": subscription.plan.name,
-                    "quantity": subscription.quantity,
-                    "unit_amount": subscription.plan.amount,
-                    "total_amount": subscription.plan.amount * subscription.quantity,
-                    "metadata": {},
-                }
-            ]
-
             for item in items:
                 InvoiceLineItem.objects.create(invoice=invoice, **item)
+            UsageRollup().mark_billed(usage, {subscription.id: invoice}, until=cutoff)
+            self.metrics.invoices_issued([invoice], at=invoice.issued_at)
 
         return invoice
 
+    def create_invoices_bulk(
+        self,
+        subscriptions: Iterable[Subscription],
+        *,
+        status: InvoiceStatus = InvoiceStatus.DRAFT,
+        coupons: Optional[Mapping[int, Optional[Coupon]]] = None,
+        line_items: Optional[Mapping[int, Iterable[dict]]] = None,
+        due_at=None,
+        metadata: Optional[dict] = None,
+        memo: str = "",
+        reuse_open: bool = False,
+    ) -> list[Invoice]:
+        """
+        Create one invoice per subscription with a single INSERT for invoices and one for line items.
+
+        Totals are computed in memory exactly as ``create_invoice`` does. Coupons and
+        line items are keyed by subscription id; coupons default to each subscription's
+        own coupon. With ``reuse_open`` an OPEN invoice already issued for the current
+        period is returned instead of billing the period twice. Invoices come back in
+        the order of ``subscriptions``.
+        """
+        subscriptions = list(subscriptions)
+        if not subscriptions:
+            return []
+
+        existing: dict[tuple[int, object], Invoice] = {}
+        if reuse_open:
+            open_invoices = Invoice.objects.filter(
+                subscription__in=subscriptions,
+                status=InvoiceStatus.OPEN,
+            ).order_by("issued_at", "id")
+            for invoice in open_invoices:
+                existing[(invoice.subscription_id, invoice.period_start)] = invoice
+
+        pricing = PricingEngine()
+        pricing.load(subscription.plan for subscription in subscriptions)
+        cutoff = self._now()
+        usage = self._usage(
+            (
+                subscription
+                for subscription in subscriptions
+                if (subscription.id, subscription.current_period_start) not in existing
+                and not (line_items or {}).get(subscription.id)
+            ),
+            cutoff,
+        )
+        invoices: list[Invoice] = []
+        pending: list[tuple[Invoice, list[dict]]] = []
+        for subscription in subscriptions:
+            reused = existing.get((subscription.id, subscription.current_period_start))
+            if reused is not None:
+                reused.subscription = subscription
+                invoices.append(reused)
+                continue
+
+            coupon = coupons.get(subscription.id) if coupons is not None else subscription.coupon
+            items = list((line_items or {}).get(subscription.id) or []) or self._default_line_items(
+                subscription, pricing, usage, cutoff
+            )
+            defaults = self._build_invoice_totals(subscription, coupon, items)
+            invoice = Invoice(
+                subscription=subscription,
+                user=subscription.user,
+                number=self._generate_number(subscription),
+                status=status,
+                currency=subscription.plan.currency,
+                period_start=subscription.current_period_start,
+                period_end=subscription.current_period_end,
+                due_at=due_at or subscription.current_period_end,
+                metadata=dict(metadata or {}),
+                memo=memo,
+                **defaults,
+            )
+            invoices.append(invoice)
+            pending.append((invoice, items))
+
+        if pending:
+            with transaction.atomic():
+                created = Invoice.objects.bulk_create([invoice for invoice, _ in pending])
+                self._ensure_primary_keys(created)
+                InvoiceLineItem.objects.bulk_create(
+                    [InvoiceLineItem(invoice=invoice, **item) for invoice, items in pending for item in items]
+                )
+                UsageRollup().mark_billed(
+                    usage, {invoice.subscription_id: invoice for invoice, _ in pending}, until=cutoff
+                )
+                self.metrics.invoices_issued(created, at=cutoff)
+
+        return invoices
+
+    def _usage(self, subscriptions: Iterable[Subscription], cutoff) -> dict[int, UnbilledUsage]:
+        """Usage not billed yet before ``cutoff`` of the metered subscriptions among ``subscriptions``."""
+        return UsageRollup().totals(
+            (subscription for subscription in subscriptions if subscription.plan.usage_type == UsageType.METERED),
+            until=cutoff,
+        )
+
+    def _default_line_items(
+        self, subscription: Subscription, pricing: PricingEngine, usage: Mapping[int, UnbilledUsage], cutoff
+    ) -> list[dict]:
+        plan = subscription.plan
+        metadata: dict = {}
+        if subscription.id in usage:
+            # Metered plans bill the usage reported since the last invoice, in arrears, instead of the seat count.
+            quantity = usage[subscription.id].quantity
+            description = f"{plan.name} usage"
+            metadata["usage_through"] = cutoff.isoformat()
+        else:
+            quantity, description = subscription.quantity, plan.name
+        quote = pricing.price(plan, quantity)
+        if quote.tiers_mode:
+            metadata["tiers_mode"] = quote.tiers_mode
+        return [
+            {
+                "plan": plan,
+                "description": description,
+                "quantity": quantity,
+                "unit_amount": quote.unit_amount,
+                "total_amount": quote.total,
+                "metadata": metadata,
+            }
+        ]
+
+    def _ensure_primary_keys(self, invoices: list[Invoice]) -> None:
+        # Backends that cannot return ids from a bulk INSERT leave pk unset.
+        missing = {invoice.number: invoice for invoice in invoices if invoice.pk is None}
+        if not missing:
+            return
+        for number, pk in Invoice.objects.filter(number__in=missing).values_list("number", "pk"):
+            missing[number].pk = pk
+
     def _build_invoice_totals(
         self,
         subscription: Subscription,
         coupon: Optional[Coupon],
-        line_items: Optional[Iterable[dict]],
+        line_items: Iterable[dict],
     ) -> dict:
-        subtotal = self._compute_subtotal(subscription, line_items)
+        subtotal = self._compute_subtotal(line_items)
         discount_total = self._compute_discount(subtotal, coupon, subscription.plan.currency)
 
         total = (subtotal - discount_total).quantize(Decimal("0.000001"))
@@ -94,16 +224,16 @@ class InvoiceService:
             "tax_total": Decimal("0"),
         }
 
-    def _compute_subtotal(self, subscription: Subscription, line_items: Optional[Iterable[dict]]) -> Decimal:
-        if line_items:
-            subtotal = sum(
+    def _compute_subtotal(self, line_items: Iterable[dict]) -> Decimal:
+        subtotal = sum(
+            (
                 Decimal(item["total_amount"])
                 if not isinstance(item["total_amount"], Decimal)
                 else item["total_amount"]
                 for item in line_items
-            )
-        else:
-            subtotal = subscription.plan.amount * subscription.quantity
+            ),
+            Decimal("0"),
+        )
         return subtotal.quantize(Decimal("0.000001"))
 
     def _compute_discount(
@@ -4,14 +4,24 @@ from dataclasses import dataclass
 from datetime import timedelta
 from typing import Optional
 
+from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
 
-from subscriptions.models import Coupon, Plan, PlanInterval, Subscription, SubscriptionStatus, CustomerType
-from subscriptions.services.events import EventRecorder
+from subscriptions.models import (
+    Coupon,
+    CustomerType,
+    Plan,
+    PlanInterval,
+    Subscription,
+    SubscriptionAction,
+    SubscriptionStatus,
+)
+from subscriptions.services.events import BufferedEventRecorder, EventRecorder
 from subscriptions.services.invoicing import InvoiceService
 from subscriptions.services.notification import NotificationDispatcher
 from algorand.subscription import opt_in_subscription, SubscriptionAccount
+from analytics.rollups import MetricsRecorder
 
 
 def _calculate_period_end(start, interval: str) -> timezone.datetime:
@@ -21,6 +31,24 @@ def _calculate_period_end(start, interval: str) -> timezone.datetime:
     return start + timedelta(days=30)
 
 
+SCHEDULE_FIELDS = ["next_action", "next_action_at"]
+
+
+def schedule_next_action(subscription: Subscription, now) -> None:
+    """Derive ``next_action``/``next_action_at`` from the subscription's state (not saved)."""
+    action, due_at = "", None
+    if subscription.status == SubscriptionStatus.TRIALING and subscription.trial_end_at:
+        action, due_at = SubscriptionAction.EXPIRE_TRIAL, subscription.trial_end_at
+    elif subscription.status == SubscriptionStatus.ACTIVE and subscription.current_period_end:
+        action = SubscriptionAction.CANCEL if subscription.cancel_at_period_end else SubscriptionAction.RENEW
+        due_at = subscription.current_period_end
+    elif subscription.status == SubscriptionStatus.PAST_DUE:
+        action = SubscriptionAction.RETRY_PAYMENT
+        due_at = now + timedelta(seconds=getattr(settings, "SCHEDULER_RETRY_DELAY_SECONDS", 86400))
+    subscription.next_action = action
+    subscription.next_action_at = due_at
+
+
 @dataclass
 class LifecycleResult:
     subscription: Subscription
@@ -33,11 +61,13 @@ class SubscriptionLifecycleService:
         invoice_service: Optional[InvoiceService] = None,
         event_recorder: Optional[EventRecorder] = None,
         notification_dispatcher: Optional[NotificationDispatcher] = None,
+        metrics_recorder: Optional[MetricsRecorder] = None,
         now=None,
     ):
         self.invoice_service = invoice_service or InvoiceService()
-        self.events = event_recorder or EventRecorder()
+        self.events = event_recorder or BufferedEventRecorder()
         self.notifications = notification_dispatcher or NotificationDispatcher()
+        self.metrics = metrics_recorder or MetricsRecorder()
         self._now = now or timezone.now
 
     def create_subscription(
@@ -67,7 +97,7 @@ class SubscriptionLifecycleService:
         status = SubscriptionStatus.TRIALING if trial_end else SubscriptionStatus.ACTIVE
 
         with transaction.atomic():
-            subscription = Subscription.objects.create(
+            subscription = Subscription(
                 user=user,
                 plan=plan,
                 coupon=coupon,
@@ -87,6 +117,8 @@ class SubscriptionLifecycleService:
                 billing_same_as_shipping=billing_same_as_shipping,
                 shipping_address=shipping_address if not billing_same_as_shipping else "",
             )
+            schedule_next_action(subscription, now)
+            subscription.save(force_insert=True)
 
             self.events.record(
                 "subscription.created",
@@ -98,6 +130,7 @@ class SubscriptionLifecycleService:
                     "trial_end_at": subscription.trial_end_at.isoformat() if subscription.trial_end_at else None,
                 },
             )
+            self.metrics.subscription_status_changed(subscription, None, at=now)
 
             self.notifications.subscription_created(subscription)
 
@@ -115,11 +148,16 @@ class SubscriptionLifecycleService:
         if subscription.status == SubscriptionStatus.ACTIVE:
             return LifecycleResult(subscription=subscription)
 
+        previous_status = subscription.status
         subscription.status = SubscriptionStatus.ACTIVE
         subscription.trial_end_at = None
         subscription.current_period_start = self._now()
         subscription.current_period_end = _calculate_period_end(subscription.current_period_start, subscription.plan.interval)
-        subscription.save(update_fields=["status", "trial_end_at", "current_period_start", "current_period_end", "updated_at"])
+        schedule_next_action(subscription, self._now())
+        subscription.save(
+            update_fields=["status", "trial_end_at", "current_period_start", "current_period_end", "updated_at", *SCHEDULE_FIELDS]
+        )
+        self.metrics.subscription_status_changed(subscription, previous_status, at=subscription.current_period_start)
 
         self.events.record(
             "subscription.activated",
@@ -136,14 +174,18 @@ class SubscriptionLifecycleService:
         now = self._now()
         if at_period_end:
             subscription.cancel_at_period_end = True
-            subscription.save(update_fields=["cancel_at_period_end", "updated_at"])
+            schedule_next_action(subscription, now)
+            subscription.save(update_fields=["cancel_at_period_end", "updated_at", *SCHEDULE_FIELDS])
             event_payload = {"cancel_at_period_end": True, "current_period_end": subscription.current_period_end}
             self.notifications.subscription_canceled(subscription, immediate=False)
         else:
+            previous_status = subscription.status
             subscription.status = SubscriptionStatus.CANCELED
             subscription.canceled_at = now
             subscription.ended_at = now
-            subscription.save(update_fields=["status", "canceled_at", "ended_at", "updated_at"])
+            schedule_next_action(subscription, now)
+            subscription.save(update_fields=["status", "canceled_at", "ended_at", "updated_at", *SCHEDULE_FIELDS])
+            self.metrics.subscription_status_changed(subscription, previous_status, at=now)
             event_payload = {"cancelled_immediately": True}
             self.notifications.subscription_canceled(subscription, immediate=True)
 
@@ -156,8 +198,12 @@ class SubscriptionLifecycleService:
         return LifecycleResult(subscription=subscription)
 
     def mark_past_due(self, subscription: Subscription, reason: str | None = None) -> LifecycleResult:
+        previous_status = subscription.status
         subscription.status = SubscriptionStatus.PAST_DUE
-        subscription.save(update_fields=["status", "updated_at"])
+        now = self._now()
+        schedule_next_action(subscription, now)
+        subscription.save(update_fields=["status", "updated_at", *SCHEDULE_FIELDS])
+        self.metrics.subscription_status_changed(subscription, previous_status, at=now)
 
         self.events.record(
             "subscription.past_due",
@@ -169,12 +215,14 @@ class SubscriptionLifecycleService:
         return LifecycleResult(subscription=subscription)
 
     def resume_subscription(self, subscription: Subscription) -> LifecycleResult:
+        previous_status = subscription.status
         subscription.status = SubscriptionStatus.ACTIVE
         subscription.cancel_at_period_end = False
         subscription.canceled_at = None
         subscription.ended_at = None
         subscription.current_period_start = self._now()
         subscription.current_period_end = _calculate_period_end(subscription.current_period_start, subscription.plan.interval)
+        schedule_next_action(subscription, subscription.current_period_start)
         subscription.save(
             update_fields=[
                 "status",
@@ -184,8 +232,10 @@ class SubscriptionLifecycleService:
                 "current_period_start",
                 "current_period_end",
                 "updated_at",
+                *SCHEDULE_FIELDS,
             ]
         )
+        self.metrics.subscription_status_changed(subscription, previous_status, at=subscription.current_period_start)
 
         self.events.record(
             "subscription.resumed",
@@ -201,17 +251,21 @@ class SubscriptionLifecycleService:
             return self.finalize_cancellation(subscription)
 
         now = self._now()
+        previous_status = subscription.status
         subscription.status = SubscriptionStatus.ACTIVE
         subscription.current_period_start = now
         subscription.current_period_end = _calculate_period_end(now, subscription.plan.interval)
+        schedule_next_action(subscription, now)
         subscription.save(
             update_fields=[
                 "status",
                 "current_period_start",
                 "current_period_end",
                 "updated_at",
+                *SCHEDULE_FIELDS,
             ]
         )
+        self.metrics.subscription_status_changed(subscription, previous_status, at=now)
 
         self.events.record(
             "subscription.renewed",
@@ -224,11 +278,16 @@ class SubscriptionLifecycleService:
 
     def finalize_cancellation(self, subscription: Subscription) -> LifecycleResult:
         now = self._now()
+        previous_status = subscription.status
         subscription.status = SubscriptionStatus.CANCELED
         subscription.canceled_at = subscription.canceled_at or now
         subscription.ended_at = now
         subscription.cancel_at_period_end = False
-        subscription.save(update_fields=["status", "canceled_at", "ended_at", "cancel_at_period_end", "updated_at"])
+        schedule_next_action(subscription, now)
+        subscription.save(
+            update_fields=["status", "canceled_at", "ended_at", "cancel_at_period_end", "updated_at", *SCHEDULE_FIELDS]
+        )
+        self.metrics.subscription_status_changed(subscription, previous_status, at=now)
 
         self.events.record(
             "subscription.ended",
@@ -0,0 +1,187 @@
+"""
+Usage metering for metered plans.
+
+Usage arrives as JSON lines, one event per line::
+
+    {"subscription": 42, "quantity": 3, "idempotency_key": "evt_01H...", "timestamp": "2026-10-19T12:00:00Z"}
+
+``UsageIngestor`` parses a whole request body and checks that the caller may report
+usage for each subscription, and that its plan is metered, with one query. Events are then appended to
+``UsageRecord`` in chunks of ``USAGE_INGEST_BATCH_SIZE``, all inside one
+transaction. Each chunk costs two queries: the idempotency keys already stored are
+looked up, then the rest are bulk-inserted. A retried event is therefore counted
+once. The unique constraint on ``(subscription, idempotency_key)`` settles
+concurrent retries.
+
+``UsageRollup`` sums the usage not billed yet of many subscriptions in one grouped
+query, up to the time the invoices are issued. ``InvoiceService`` bills that total
+as the line item of metered plans at renewal, priced through the plan's tiers, and
+ties the summed rows to their invoice. Usage reported between the end of a period
+and the renewal run, or late for a period already billed, therefore goes on the
+next invoice instead of being lost.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, Iterable, List, Mapping, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, QuerySet, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from subscriptions.models import Invoice, Subscription, UsageRecord, UsageType
+
+MAX_KEY_LENGTH = UsageRecord._meta.get_field("idempotency_key").max_length
+
+
+class UsageIngestError(Exception):
+    """Raised when a usage batch is rejected as a whole."""
+
+
+class UnmeteredSubscriptionError(UsageIngestError):
+    """Raised when a usage batch reports usage for subscriptions whose plan is not metered."""
+
+
+@dataclass
+class IngestResult:
+    accepted: int = 0
+    duplicates: int = 0
+    rejected: List[dict] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {"accepted": self.accepted, "duplicates": self.duplicates, "rejected": self.rejected}
+
+
+def _parse_timestamp(value, now: datetime) -> datetime:
+    if value is None:
+        return now
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+    if isinstance(value, str):
+        parsed = parse_datetime(value)
+        if parsed is not None:
+            return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed, dt_timezone.utc)
+    raise ValueError("timestamp must be an ISO-8601 string or a Unix time.")
+
+
+def _parse_event(line: bytes, now: datetime) -> UsageRecord:
+    try:
+        event = json.loads(line)
+    except ValueError:
+        raise ValueError("Not valid JSON.") from None
+    if not isinstance(event, dict):
+        raise ValueError("Each line must be a JSON object.")
+    subscription_id, quantity, key = event.get("subscription"), event.get("quantity"), event.get("idempotency_key")
+    if not isinstance(subscription_id, int) or isinstance(subscription_id, bool):
+        raise ValueError("subscription must be a subscription id.")
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 0:
+        raise ValueError("quantity must be a non-negative integer.")
+    if not isinstance(key, str) or not 0 < len(key) <= MAX_KEY_LENGTH:
+        raise ValueError(f"idempotency_key must be a string of 1 to {MAX_KEY_LENGTH} characters.")
+    return UsageRecord(
+        subscription_id=subscription_id,
+        idempotency_key=key,
+        quantity=quantity,
+        occurred_at=_parse_timestamp(event.get("timestamp"), now),
+    )
+
+
+class UsageIngestor:
+    def __init__(self, *, batch_size: Optional[int] = None, max_events: Optional[int] = None, now=None):
+        self.batch_size = max(1, batch_size or getattr(settings, "USAGE_INGEST_BATCH_SIZE", 5000))
+        self.max_events = max_events or getattr(settings, "USAGE_INGEST_MAX_EVENTS", 50000)
+        self._now = now or timezone.now
+
+    def ingest(self, body: bytes, *, subscriptions: QuerySet) -> IngestResult:
+        """Append the JSON-lines ``body`` for the subscriptions in ``subscriptions``; bad lines are reported, not fatal."""
+        lines = [(number, line) for number, line in enumerate(body.splitlines(), start=1) if line.strip()]
+        if len(lines) > self.max_events:
+            raise UsageIngestError(f"At most {self.max_events} usage events can be sent per request.")
+
+        result = IngestResult()
+        now = self._now()
+        parsed: List[tuple[int, UsageRecord]] = []
+        for number, line in lines:
+            try:
+                parsed.append((number, _parse_event(line, now)))
+            except ValueError as exc:
+                result.rejected.append({"line": number, "error": str(exc)})
+
+        usage_types = dict(
+            subscriptions.filter(pk__in={record.subscription_id for _, record in parsed}).values_list(
+                "pk", "plan__usage_type"
+            )
+        )
+        unmetered = sorted(pk for pk, usage_type in usage_types.items() if usage_type != UsageType.METERED)
+        if unmetered:
+            # Usage of a licensed plan would be stored but never priced.
+            raise UnmeteredSubscriptionError(
+                f"Subscriptions {', '.join(map(str, unmetered))} are not on a metered plan."
+            )
+        allowed = set(usage_types)
+        records: Dict[tuple[int, str], UsageRecord] = {}
+        for number, record in parsed:
+            if record.subscription_id not in allowed:
+                result.rejected.append({"line": number, "error": f"Unknown subscription {record.subscription_id}."})
+            elif (record.subscription_id, record.idempotency_key) in records:
+                result.duplicates += 1
+            else:
+                records[(record.subscription_id, record.idempotency_key)] = record
+
+        pending = list(records.values())
+        with transaction.atomic():
+            for offset in range(0, len(pending), self.batch_size):
+                chunk = pending[offset : offset + self.batch_size]
+                stored = set(
+                    UsageRecord.objects.filter(
+                        subscription_id__in={record.subscription_id for record in chunk},
+                        idempotency_key__in={record.idempotency_key for record in chunk},
+                    ).values_list("subscription_id", "idempotency_key")
+                )
+                fresh = [record for record in chunk if (record.subscription_id, record.idempotency_key) not in stored]
+                UsageRecord.objects.bulk_create(fresh, batch_size=self.batch_size, ignore_conflicts=True)
+                result.accepted += len(fresh)
+                result.duplicates += len(chunk) - len(fresh)
+        result.rejected.sort(key=lambda rejection: rejection["line"])
+        return result
+
+
+@dataclass(frozen=True)
+class UnbilledUsage:
+    quantity: int
+    last_id: Optional[int]  # highest row summed; rows inserted after the sum wait for the next invoice
+
+
+class UsageRollup:
+    def totals(self, subscriptions: Iterable[Subscription], *, until: datetime) -> Dict[int, UnbilledUsage]:
+        """Usage of each subscription that occurred before ``until`` and is not on an invoice yet."""
+        ids = [subscription.pk for subscription in subscriptions]
+        if not ids:
+            return {}
+        rows = (
+            UsageRecord.objects.filter(subscription_id__in=ids, invoice__isnull=True, occurred_at__lt=until)
+            .values("subscription_id")
+            .annotate(total=Sum("quantity"), last_id=Max("id"))
+            .values_list("subscription_id", "total", "last_id")
+        )
+        totals = dict.fromkeys(ids, UnbilledUsage(0, None))
+        totals.update((subscription_id, UnbilledUsage(total, last_id)) for subscription_id, total, last_id in rows)
+        return totals
+
+    def mark_billed(self, usage: Mapping[int, UnbilledUsage], invoices: Mapping[int, Invoice], *, until: datetime) -> None:
+        """Tie the rows summed into ``usage`` to the invoice of their subscription."""
+        for subscription_id, invoice in invoices.items():
+            summed = usage.get(subscription_id)
+            if summed is None or summed.last_id is None:
+                continue
+            UsageRecord.objects.filter(
+                subscription_id=subscription_id,
+                invoice__isnull=True,
+                occurred_at__lt=until,
+                pk__lte=summed.last_id,
+            ).update(invoice=invoice)
@@ -2,8 +2,10 @@ from __future__ import annotations
 
 from typing import Optional
 
+from django.db import transaction
+
 from notifications.models import Notification
-from notifications.utils import send_email_notification
+from notifications.outbox import enqueue_notification_email
 
 
 class NotificationDispatcher:
@@ -60,12 +62,13 @@ class NotificationDispatcher:
         return self._notify(invoice.user, title, message)
 
     def _notify(self, user, title: str, message: str, channel: str = "email") -> Notification:
-        notification = Notification.objects.create(
-            user=user,
-            title=title,
-            message=message,
-            channel=channel,
-        )
-        if channel == "email":
-            send_email_notification(notification)
+        with transaction.atomic():
+            notification = Notification.objects.create(
+                user=user,
+                title=title,
+                message=message,
+                channel=channel,
+            )
+            if channel == "email":
+                enqueue_notification_email(notification)
         return notification
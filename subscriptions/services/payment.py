@@ -1,42 +1,174 @@
 from __future__ import annotations
 
 import logging
+from dataclasses import dataclass
 from decimal import Decimal
-from typing import Optional
+from functools import partial
+from typing import Callable, Iterable, Optional
 
 from django.db import transaction
 from django.utils import timezone
 from django.conf import settings
 
+from analytics.rollups import MetricsRecorder
 from payments.models import CurrencyChoices as PaymentCurrencyChoices
 from payments.models import Transaction, TransactionStatus, TransactionType
 from payments.utils import calculate_fees
-from payments.services import disburse_transaction_funds
+from payments.services import PayoutBatcher, SwapAggregator, disburse_transaction_funds
 from subscriptions.models import Invoice, InvoiceStatus, PaymentIntent, PaymentIntentStatus
-from subscriptions.services.events import EventRecorder
+from subscriptions.services.events import BufferedEventRecorder, EventRecorder
 from subscriptions.services.notification import NotificationDispatcher
 
 
+class PaymentInProgressError(Exception):
+    """Raised for an invoice whose payment another worker started and has not finished."""
+
+
+@dataclass
+class PaymentOutcome:
+    invoice: Invoice
+    payment_intent: PaymentIntent
+    error: Optional[Exception] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+
 class PaymentIntentService:
     def __init__(
         self,
         *,
         event_recorder: Optional[EventRecorder] = None,
         notification_dispatcher: Optional[NotificationDispatcher] = None,
+        metrics_recorder: Optional[MetricsRecorder] = None,
         swap_executor=None,
         swap_error_class=None,
+        batch_swap_executor=None,
         now=None,
         unit_amount_quantize: str = "0.01",
     ):
-        self.events = event_recorder or EventRecorder()
+        self.events = event_recorder or BufferedEventRecorder()
         self.notifications = notification_dispatcher or NotificationDispatcher()
+        self.metrics = metrics_recorder or MetricsRecorder()
         self._swap_executor = swap_executor
         self._swap_error_class = swap_error_class
+        self._batch_swap_executor = batch_swap_executor
         self._now = now or timezone.now
         self._unit_quantize = Decimal(unit_amount_quantize)
         self._logger = logging.getLogger(__name__)
 
     def process_invoice(self, invoice: Invoice, *, transaction_type: TransactionType = TransactionType.SUBSCRIPTION) -> PaymentIntent:
+        payment_intent = self._start_payment_intent(invoice)
+        if invoice.total <= 0:
+            return self._mark_free_invoice(invoice, payment_intent)
+
+        swap_executor, swap_error_class = self._ensure_swap_components()
+
+        payment_intent.refresh_from_db()
+        invoice.refresh_from_db()
+
+        txn = self._create_transaction(invoice, transaction_type)
+
+        try:
+            result = swap_executor(txn)
+        except swap_error_class as exc:
+            self._record_failure(invoice, payment_intent, exc)
+            raise
+        except Exception as exc:  # pragma: no cover - unexpected errors
+            self._record_failure(invoice, payment_intent, exc)
+            raise
+
+        return self._record_success(invoice, payment_intent, txn, result)
+
+    def process_invoices(
+        self,
+        invoices: Iterable[Invoice],
+        *,
+        transaction_type: TransactionType = TransactionType.SUBSCRIPTION,
+        aggregator: Optional[SwapAggregator] = None,
+        on_outcome: Optional[Callable[[PaymentOutcome], None]] = None,
+    ) -> list[PaymentOutcome]:
+        """
+        Pay several invoices with combined swaps from a ``SwapAggregator``.
+
+        Each invoice ends up exactly as ``process_invoice`` would leave it, but swap
+        failures are returned on the outcome instead of raised, and payouts go out
+        through one ``PayoutBatcher``.
+
+        Call it outside a transaction. Payment intents and ``Transaction`` rows are
+        committed before any swap, and the swap executor commits its own records
+        around the on-chain swap. Each invoice's result is then committed on its own,
+        together with ``on_outcome(outcome)`` where callers apply their lifecycle
+        updates. An invoice whose intent another worker is still processing comes back
+        with a ``PaymentInProgressError`` and is left untouched.
+        """
+        aggregator = aggregator or SwapAggregator(executor=self._batch_swap_executor)
+        invoices = list(invoices)
+        outcomes: dict[int, PaymentOutcome] = {}
+        pending = []
+        with transaction.atomic():
+            # Two workers holding the same OPEN invoice must not both start paying it.
+            list(Invoice.objects.select_for_update().filter(pk__in=[invoice.pk for invoice in invoices]))
+            for invoice in invoices:
+                payment_intent = self._start_payment_intent(invoice, exclusive=True)
+                if payment_intent is None:
+                    error = PaymentInProgressError(f"Invoice {invoice.id} is already being paid.")
+                    outcomes[invoice.id] = PaymentOutcome(invoice, invoice.payment_intent, error)
+                    continue
+                if invoice.total <= 0:
+                    outcome = PaymentOutcome(invoice, self._mark_free_invoice(invoice, payment_intent))
+                    if on_outcome is not None:
+                        on_outcome(outcome)
+                    outcomes[invoice.id] = outcome
+                    continue
+                pending.append((invoice, payment_intent, self._create_transaction(invoice, transaction_type)))
+
+        for _, _, txn in pending:
+            aggregator.submit(txn)
+        aggregator.flush()
+
+        # Payouts and platform fees of the whole group settle in atomic groups of up to 16 payments.
+        # Only invoices whose result has committed queue theirs, and the last group goes out
+        # even when a later invoice raises.
+        by_transaction = {txn.id: invoice for invoice, _, txn in pending}
+        payouts = PayoutBatcher(
+            on_error=lambda transaction_id, error: self._payout_failed(by_transaction[transaction_id], error)
+        )
+        try:
+            for invoice, payment_intent, txn in pending:
+                committed_payouts: list = []
+                with transaction.atomic():
+                    error = aggregator.error_for(txn)
+                    if error is not None:
+                        self._record_failure(invoice, payment_intent, error)
+                        outcome = PaymentOutcome(invoice, payment_intent, error)
+                    else:
+                        batch = aggregator.batch_for(txn)
+                        txn.refresh_from_db()
+                        result = {
+                            "tx_ids": batch.tx_ids,
+                            "confirmed_round": batch.confirmed_round,
+                            "usdc_received": int(txn.usdc_received * Decimal("1000000")),
+                            "swap_batch": batch.id,
+                        }
+                        outcome = PaymentOutcome(
+                            invoice, self._record_success(invoice, payment_intent, txn, result, committed_payouts)
+                        )
+                    if on_outcome is not None:
+                        on_outcome(outcome)
+                for paid_invoice, paid_txn, payout_address, platform_wallet in committed_payouts:
+                    try:
+                        payouts.add(paid_txn, payout_address=payout_address, platform_fee_address=platform_wallet)
+                    except Exception as exc:  # pragma: no cover - payout errors logged and surfaced via events
+                        self._payout_failed(paid_invoice, str(exc))
+                outcomes[invoice.id] = outcome
+        finally:
+            payouts.flush()
+        return [outcomes[invoice.id] for invoice in invoices]
+
+    def _start_payment_intent(self, invoice: Invoice, *, exclusive: bool = False) -> Optional[PaymentIntent]:
+        """Mark the invoice's intent processing; with ``exclusive``, ``None`` if it already is."""
         with transaction.atomic():
             payment_intent, created = PaymentIntent.objects.select_for_update().get_or_create(
                 invoice=invoice,
@@ -47,51 +179,36 @@ class PaymentIntentService:
                 },
             )
             if not created:
+                if exclusive and payment_intent.status == PaymentIntentStatus.PROCESSING:
+                    return None
                 payment_intent.amount = invoice.total
                 payment_intent.currency = invoice.currency
                 payment_intent.status = PaymentIntentStatus.PROCESSING
                 payment_intent.save(update_fields=["amount", "currency", "status", "updated_at"])
+        return payment_intent
 
-            if invoice.total <= 0:
-                return self._mark_free_invoice(invoice, payment_intent)
-
-        swap_executor, swap_error_class = self._ensure_swap_components()
-
-        payment_intent.refresh_from_db()
-        invoice.refresh_from_db()
-
-        txn = self._create_transaction(invoice, transaction_type)
+    def _record_failure(self, invoice: Invoice, payment_intent: PaymentIntent, exc: Exception) -> None:
+        payment_intent.status = PaymentIntentStatus.FAILED
+        payment_intent.attempts += 1
+        payment_intent.last_error = str(exc)
+        payment_intent.save(update_fields=["status", "attempts", "last_error", "updated_at"])
 
-        try:
-            result = swap_executor(txn)
-        except swap_error_class as exc:
-            payment_intent.status = PaymentIntentStatus.FAILED
-            payment_intent.attempts += 1
-            payment_intent.last_error = str(exc)
-            payment_intent.save(update_fields=["status", "attempts", "last_error", "updated_at"])
-
-            self.events.record(
-                "invoice.payment_failed",
-                resource_type="invoice",
-                resource_id=invoice.id,
-                payload={"error": str(exc)},
-            )
-            self.notifications.invoice_payment_failed(invoice, str(exc))
-            raise
-        except Exception as exc:  # pragma: no cover - unexpected errors
-            payment_intent.status = PaymentIntentStatus.FAILED
-            payment_intent.attempts += 1
-            payment_intent.last_error = str(exc)
-            payment_intent.save(update_fields=["status", "attempts", "last_error", "updated_at"])
-            self.events.record(
-                "invoice.payment_failed",
-                resource_type="invoice",
-                resource_id=invoice.id,
-                payload={"error": str(exc)},
-            )
-            self.notifications.invoice_payment_failed(invoice, str(exc))
-            raise
+        self.events.record(
+            "invoice.payment_failed",
+            resource_type="invoice",
+            resource_id=invoice.id,
+            payload={"error": str(exc)},
+        )
+        self.notifications.invoice_payment_failed(invoice, str(exc))
 
+    def _record_success(
+        self,
+        invoice: Invoice,
+        payment_intent: PaymentIntent,
+        txn: Transaction,
+        result: dict,
+        payouts: Optional[list] = None,
+    ) -> PaymentIntent:
         payment_intent.status = PaymentIntentStatus.SUCCEEDED
         payment_intent.swap_tx_ids = result.get("tx_ids", [])
         if result.get("confirmed_round") is not None:
@@ -106,17 +223,21 @@ class PaymentIntentService:
         invoice.status = InvoiceStatus.PAID
         invoice.paid_at = self._now()
         invoice.save(update_fields=["status", "paid_at"])
+        self.metrics.invoice_paid(invoice)
 
-        self._disburse_payout(invoice, txn)
+        self._disburse_payout(invoice, txn, payouts)
 
+        payload = {
+            "payment_intent": payment_intent.id,
+            "tx_ids": payment_intent.swap_tx_ids,
+        }
+        if result.get("swap_batch") is not None:
+            payload["swap_batch"] = result["swap_batch"]
         self.events.record(
             "invoice.paid",
             resource_type="invoice",
             resource_id=invoice.id,
-            payload={
-                "payment_intent": payment_intent.id,
-                "tx_ids": payment_intent.swap_tx_ids,
-            },
+            payload=payload,
         )
         self.notifications.invoice_paid(invoice)
         return payment_intent
@@ -125,6 +246,7 @@ class PaymentIntentService:
         invoice.status = InvoiceStatus.PAID
         invoice.paid_at = self._now()
         invoice.save(update_fields=["status", "paid_at"])
+        self.metrics.invoice_paid(invoice)
 
         payment_intent.status = PaymentIntentStatus.SUCCEEDED
         payment_intent.attempts += 1
@@ -155,7 +277,7 @@ class PaymentIntentService:
         )
         return txn
 
-    def _disburse_payout(self, invoice: Invoice, transaction: Transaction) -> None:
+    def _disburse_payout(self, invoice: Invoice, txn: Transaction, payouts: Optional[list] = None) -> None:
         subscription = getattr(invoice, "subscription", None)
         if not subscription:
             return
@@ -169,20 +291,32 @@ class PaymentIntentService:
             return
 
         platform_wallet = getattr(settings, "PLATFORM_FEE_WALLET_ADDRESS", "")
+        if payouts is not None:
+            # process_invoices queues it on its PayoutBatcher once this invoice has committed.
+            payouts.append((invoice, txn, payout_address, platform_wallet))
+            return
+        # Payout groups are sent outside any transaction; a rolled-back payment pays nobody.
+        transaction.on_commit(partial(self._send_payout, invoice, txn, payout_address, platform_wallet))
+
+    def _send_payout(self, invoice: Invoice, txn: Transaction, payout_address: str, platform_wallet: str) -> None:
         try:
             disburse_transaction_funds(
-                transaction,
+                txn,
                 payout_address=payout_address,
                 platform_fee_address=platform_wallet,
+                on_error=lambda _, error: self._payout_failed(invoice, error),
             )
         except Exception as exc:  # pragma: no cover - payout errors logged and surfaced via events
-            self._logger.exception("Failed to disburse payout for invoice %s: %s", invoice.id, exc)
-            self.events.record(
-                "invoice.payout_failed",
-                resource_type="invoice",
-                resource_id=invoice.id,
-                payload={"error": str(exc)},
-            )
+            self._payout_failed(invoice, str(exc))
+
+    def _payout_failed(self, invoice: Invoice, error: str) -> None:
+        self._logger.error("Failed to disburse payout for invoice %s: %s", invoice.id, error)
+        self.events.record(
+            "invoice.payout_failed",
+            resource_type="invoice",
+            resource_id=invoice.id,
+            payload={"error": error},
+        )
 
     def _ensure_swap_components(self):
         if self._swap_executor is not None and self._swap_error_class is not None:
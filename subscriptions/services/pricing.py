@@ -0,0 +1,119 @@
+"""
+Plan prices for any quantity, from the plan's ``PriceTier`` rows.
+
+``PricingEngine`` compiles each plan's tiers once into ascending upper bounds,
+their unit amounts, and the graduated price of every full tier below each bound.
+Pricing a quantity is then a ``bisect`` over the bounds, O(log tiers), in both
+modes:
+
+* ``graduated``: every unit is billed at the tier it falls in, so the price is the
+  cumulative price of the tiers below plus the remainder at the current tier.
+* ``volume``: every unit is billed at the tier the total quantity falls in.
+
+The open-ended tier (``up_to`` empty) covers quantities above the last bound;
+without one, the last tier does. Plans without tiers bill ``amount`` per unit.
+An engine loads the tiers of all the plans it prices in one query (none when
+``price_tiers`` was prefetched), so a batch of invoices or quotes costs the same
+whatever its size.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from subscriptions.models import Plan, PriceTier, TiersMode
+
+AMOUNT_QUANTUM = Decimal("0.000001")
+
+
+@dataclass(frozen=True)
+class PriceQuote:
+    plan_id: int
+    quantity: int
+    unit_amount: Decimal  # average per unit for graduated tiers
+    total: Decimal
+    tiers_mode: Optional[str]  # None when the plan has no tiers
+
+
+@dataclass(frozen=True)
+class CompiledTiers:
+    mode: str
+    bounds: Tuple[int, ...]
+    unit_amounts: Tuple[Decimal, ...]  # one per bound, plus the open-ended tier if there is one
+    cumulative: Tuple[Decimal, ...]  # graduated price of ``bounds[i]`` units
+
+    @classmethod
+    def build(cls, mode: str, tiers: Sequence[Tuple[Optional[int], Decimal]]) -> "CompiledTiers":
+        bounded = sorted((up_to, unit) for up_to, unit in tiers if up_to is not None)
+        open_ended = [unit for up_to, unit in tiers if up_to is None]
+        bounds, units, cumulative = [], [], []
+        running, previous = Decimal("0"), 0
+        for up_to, unit in bounded:
+            running += (up_to - previous) * unit
+            bounds.append(up_to)
+            units.append(unit)
+            cumulative.append(running)
+            previous = up_to
+        return cls(mode, tuple(bounds), tuple(units + open_ended[:1]), tuple(cumulative))
+
+    def total(self, quantity: int) -> Tuple[Decimal, Decimal]:
+        """Unit amount and total for ``quantity`` units."""
+        index = bisect_left(self.bounds, quantity)
+        unit = self.unit_amounts[min(index, len(self.unit_amounts) - 1)]
+        if self.mode == TiersMode.VOLUME:
+            return unit, unit * quantity
+        below = self.cumulative[index - 1] if index else Decimal("0")
+        floor = self.bounds[index - 1] if index else 0
+        total = below + (quantity - floor) * unit
+        return (total / quantity if quantity else unit), total
+
+
+class PricingEngine:
+    def __init__(self):
+        self._compiled: Dict[int, Optional[CompiledTiers]] = {}
+
+    def load(self, plans: Iterable[Plan]) -> None:
+        """Compile the tiers of every plan not compiled yet, with at most one query."""
+        pending = {plan.pk: plan for plan in plans if plan.pk not in self._compiled}
+        if not pending:
+            return
+        tiers: Dict[int, List[Tuple[Optional[int], Decimal]]] = {}
+        unfetched = []
+        for plan_id, plan in pending.items():
+            prefetched = getattr(plan, "_prefetched_objects_cache", {}).get("price_tiers")
+            if prefetched is None:
+                unfetched.append(plan_id)
+            elif prefetched:
+                tiers[plan_id] = [(tier.up_to, tier.unit_amount) for tier in prefetched]
+        if unfetched:
+            for plan_id, up_to, unit_amount in PriceTier.objects.filter(plan_id__in=unfetched).values_list(
+                "plan_id", "up_to", "unit_amount"
+            ):
+                tiers.setdefault(plan_id, []).append((up_to, unit_amount))
+        for plan_id, plan in pending.items():
+            plan_tiers = tiers.get(plan_id)
+            self._compiled[plan_id] = CompiledTiers.build(plan.tiers_mode, plan_tiers) if plan_tiers else None
+
+    def price(self, plan: Plan, quantity: int) -> PriceQuote:
+        self.load([plan])
+        compiled = self._compiled[plan.pk]
+        if compiled is None:
+            unit, total, mode = plan.amount, plan.amount * quantity, None
+        else:
+            unit, total = compiled.total(quantity)
+            mode = compiled.mode
+        return PriceQuote(
+            plan_id=plan.pk,
+            quantity=quantity,
+            unit_amount=unit.quantize(AMOUNT_QUANTUM),
+            total=total.quantize(AMOUNT_QUANTUM),
+            tiers_mode=mode,
+        )
+
+    def price_many(self, items: Sequence[Tuple[Plan, int]]) -> List[PriceQuote]:
+        """Price every ``(plan, quantity)`` pair, loading the tiers of all their plans at once."""
+        self.load(plan for plan, _ in items)
+        return [self.price(plan, quantity) for plan, quantity in items]
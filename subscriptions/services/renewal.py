@@ -0,0 +1,417 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from payments.models import TransactionType
+from payments.services import SwapExecutionError
+from subscriptions.models import (
+    Invoice,
+    InvoiceStatus,
+    RenewalRun,
+    RenewalRunStatus,
+    RenewalShard,
+    RenewalShardStatus,
+    Subscription,
+    SubscriptionStatus,
+)
+from subscriptions.services.invoicing import InvoiceService
+from subscriptions.services.lifecycle import SubscriptionLifecycleService
+from subscriptions.services.payment import PaymentIntentService
+
+logger = logging.getLogger(__name__)
+
+RENEWED = "renewed"
+FAILED = "failed"
+CANCELED = "canceled"
+DEFERRED = "deferred"
+SKIPPED = "skipped"
+
+_WALLET_SLOT_TEMPLATE = "renewals:wallet:{wallet}:{slot}"
+
+
+class RenewalEngine:
+    """
+    Renew due subscriptions in id-range shards that any number of workers can share.
+
+    A run snapshots the due subscriptions into ``RenewalShard`` rows. Workers claim
+    shards with ``select_for_update(skip_locked=True)``, lock each subscription the
+    same way while it is billed, and checkpoint the last processed id so a crashed
+    or interrupted run resumes where it stopped. Renewals for the same wallet are
+    capped by ``RENEWAL_WALLET_CONCURRENCY`` slots held in the shared cache. A shard
+    with renewals deferred on a busy wallet goes back to pending, checkpointed just
+    before the first of them, and is picked up again when the run is resumed.
+    """
+
+    BACKENDS = ("inline", "process", "celery")
+
+    def __init__(
+        self,
+        *,
+        lifecycle: Optional[SubscriptionLifecycleService] = None,
+        invoice_service: Optional[InvoiceService] = None,
+        payment_service: Optional[PaymentIntentService] = None,
+        shard_size: Optional[int] = None,
+        wallet_concurrency: Optional[int] = None,
+        wallet_wait_seconds: Optional[float] = None,
+        lease_seconds: Optional[int] = None,
+        aggregate_swaps: Optional[bool] = None,
+        on_result: Optional[Callable[[Subscription, str, Optional[str]], None]] = None,
+        now=None,
+    ):
+        self.lifecycle = lifecycle or SubscriptionLifecycleService()
+        self.invoicing = invoice_service or InvoiceService()
+        self.payments = payment_service or PaymentIntentService()
+        self.shard_size = max(1, shard_size or getattr(settings, "RENEWAL_SHARD_SIZE", 200))
+        self.wallet_concurrency = max(1, wallet_concurrency or getattr(settings, "RENEWAL_WALLET_CONCURRENCY", 1))
+        self.wallet_wait_seconds = (
+            wallet_wait_seconds if wallet_wait_seconds is not None else getattr(settings, "RENEWAL_WALLET_WAIT_SECONDS", 5)
+        )
+        self.lease_seconds = lease_seconds or getattr(settings, "RENEWAL_SHARD_LEASE_SECONDS", 900)
+        self.aggregate_swaps = (
+            aggregate_swaps if aggregate_swaps is not None else getattr(settings, "SWAP_AGGREGATION_ENABLED", False)
+        )
+        self.on_result = on_result
+        self._now = now or timezone.now
+        self.worker_name = f"{socket.gethostname()}:{os.getpid()}"
+
+    def due_queryset(self, cutoff):
+        return Subscription.objects.select_related("plan", "user", "coupon").filter(
+            status__in=[SubscriptionStatus.ACTIVE, SubscriptionStatus.PAST_DUE],
+            current_period_end__lte=cutoff,
+        )
+
+    def run(self, *, backend: str = "inline", workers: int = 1, resume: bool = True) -> Optional[RenewalRun]:
+        """Resume the unfinished run (or plan a new one) and process it with ``backend``."""
+        run = self.get_unfinished_run() if resume else None
+        if run is None:
+            run = self.plan_run()
+        if run is None:
+            return None
+
+        self.dispatch(run, backend=backend, workers=workers)
+        run.refresh_from_db()
+        return run
+
+    def get_unfinished_run(self) -> Optional[RenewalRun]:
+        return RenewalRun.objects.filter(status=RenewalRunStatus.RUNNING).order_by("-started_at").first()
+
+    def plan_run(self) -> Optional[RenewalRun]:
+        """Snapshot due subscription ids into shards; returns None when nothing is due."""
+        cutoff = self._now()
+        due_ids = self.due_queryset(cutoff).order_by("id").values_list("id", flat=True)
+
+        shards: list[RenewalShard] = []
+        total = 0
+        batch: list[int] = []
+        for subscription_id in due_ids.iterator(chunk_size=self.shard_size * 10):
+            batch.append(subscription_id)
+            total += 1
+            if len(batch) == self.shard_size:
+                shards.append(RenewalShard(first_subscription_id=batch[0], last_subscription_id=batch[-1]))
+                batch = []
+        if batch:
+            shards.append(RenewalShard(first_subscription_id=batch[0], last_subscription_id=batch[-1]))
+
+        if not shards:
+            return None
+
+        with transaction.atomic():
+            run = RenewalRun.objects.create(cutoff=cutoff, shard_size=self.shard_size, total_due=total)
+            for shard in shards:
+                shard.run = run
+            RenewalShard.objects.bulk_create(shards)
+        return run
+
+    def dispatch(self, run: RenewalRun, *, backend: str = "inline", workers: int = 1) -> None:
+        workers = max(1, workers)
+        if backend == "inline":
+            self.work(run.id)
+        elif backend == "process":
+            # Forked children must open their own database connections.
+            connections.close_all()
+            context = multiprocessing.get_context("fork")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                list(pool.map(_work_in_subprocess, [run.id] * workers))
+        elif backend == "celery":
+            from subscriptions.tasks import process_renewal_run
+
+            for _ in range(workers):
+                process_renewal_run.delay(run.id)
+        else:
+            raise ValueError(f"Unknown renewal backend: {backend}")
+
+    def work(self, run_id: int) -> int:
+        """Claim and process shards of a run until none are left. Returns the shard count handled."""
+        processed = 0
+        released: set[int] = set()
+        while True:
+            shard = self.claim_shard(run_id, exclude=released)
+            if shard is None:
+                break
+            shard = self.process_shard(shard)
+            if shard.status == RenewalShardStatus.PENDING:
+                # Deferred renewals are retried by the next resume, not in a busy loop.
+                released.add(shard.pk)
+            processed += 1
+
+        self._finish_run_if_done(run_id)
+        return processed
+
+    def claim_shard(self, run_id: int, exclude=()) -> Optional[RenewalShard]:
+        now = self._now()
+        stale_before = now - timedelta(seconds=self.lease_seconds)
+        with transaction.atomic():
+            shard = (
+                RenewalShard.objects.select_for_update(skip_locked=True)
+                .filter(run_id=run_id)
+                .exclude(pk__in=exclude)
+                .filter(
+                    Q(status=RenewalShardStatus.PENDING)
+                    | Q(status=RenewalShardStatus.RUNNING, claimed_at__lt=stale_before)
+                )
+                .order_by("first_subscription_id")
+                .first()
+            )
+            if shard is None:
+                return None
+            shard.status = RenewalShardStatus.RUNNING
+            shard.claimed_at = now
+            shard.worker = self.worker_name
+            shard.save(update_fields=["status", "claimed_at", "worker"])
+        return shard
+
+    def process_shard(self, shard: RenewalShard) -> RenewalShard:
+        run = shard.run
+        start_id = shard.first_subscription_id
+        if shard.checkpoint_subscription_id is not None:
+            start_id = shard.checkpoint_subscription_id + 1
+
+        pending = list(
+            self.due_queryset(run.cutoff)
+            .filter(id__gte=start_id, id__lte=shard.last_subscription_id)
+            .order_by("id")
+        )
+        # Invoices are created under each row lock once the wallet slot is held, so a
+        # deferred or skipped renewal never leaves an orphan OPEN invoice behind.
+        # The checkpoint never moves past a deferred renewal, so a resume retries it.
+        first_deferred: Optional[int] = None
+        if self.aggregate_swaps:
+            group_size = max(1, getattr(settings, "SWAP_AGGREGATION_MAX_REQUESTS", 100))
+            for offset in range(0, len(pending), group_size):
+                group = pending[offset : offset + group_size]
+                outcomes = self.renew_batch(group, run.cutoff)
+                deferred = [subscription_id for subscription_id, outcome in outcomes.items() if outcome == DEFERRED]
+                if deferred and first_deferred is None:
+                    first_deferred = min(deferred)
+                self._checkpoint(shard, group[-1].id, list(outcomes.values()), first_deferred)
+        else:
+            for subscription in pending:
+                outcome = self.renew_with_wallet_slot(subscription.id, subscription.wallet_address, run.cutoff)
+                if outcome == DEFERRED and first_deferred is None:
+                    first_deferred = subscription.id
+                self._checkpoint(shard, subscription.id, [outcome], first_deferred)
+
+        if first_deferred is None:
+            RenewalShard.objects.filter(pk=shard.pk).update(
+                status=RenewalShardStatus.COMPLETED,
+                checkpoint_subscription_id=shard.last_subscription_id,
+                finished_at=self._now(),
+            )
+        else:
+            RenewalShard.objects.filter(pk=shard.pk).update(status=RenewalShardStatus.PENDING, claimed_at=None, worker="")
+        shard.refresh_from_db()
+        return shard
+
+    def _checkpoint(
+        self, shard: RenewalShard, subscription_id: int, outcomes: list[str], first_deferred: Optional[int] = None
+    ) -> None:
+        if first_deferred is not None:
+            subscription_id = min(subscription_id, first_deferred - 1)
+        counters = {"checkpoint_subscription_id": subscription_id, "claimed_at": self._now()}
+        for outcome in (RENEWED, FAILED, CANCELED, DEFERRED):
+            if outcome in outcomes:
+                counters[outcome] = F(outcome) + outcomes.count(outcome)
+        RenewalShard.objects.filter(pk=shard.pk).update(**counters)
+
+    def renew_subscription(self, subscription: Subscription, invoice: Optional[Invoice] = None) -> str:
+        if subscription.cancel_at_period_end:
+            self.lifecycle.finalize_cancellation(subscription)
+            self._report(subscription, CANCELED)
+            return CANCELED
+
+        with transaction.atomic():
+            if invoice is None:
+                invoice = self.invoicing.create_invoices_bulk([subscription], status=InvoiceStatus.OPEN, reuse_open=True)[0]
+            try:
+                self.payments.process_invoice(invoice, transaction_type=TransactionType.RENEWAL)
+                self.lifecycle.advance_period(subscription)
+            except SwapExecutionError as exc:
+                self.lifecycle.mark_past_due(subscription, reason=str(exc))
+                self._report(subscription, FAILED, str(exc))
+                return FAILED
+
+        self._report(subscription, RENEWED)
+        return RENEWED
+
+    def renew_with_wallet_slot(self, subscription_id: int, wallet: str, cutoff) -> str:
+        """Renew one subscription that is due at ``cutoff`` while holding a wallet slot and its row lock."""
+        slot_key = self._acquire_wallet_slot(wallet)
+        if slot_key is None:
+            logger.info("Deferring renewal of subscription %s: wallet %s is busy.", subscription_id, wallet)
+            return DEFERRED
+
+        try:
+            with transaction.atomic():
+                subscription = (
+                    self.due_queryset(cutoff)
+                    .select_for_update(skip_locked=True, of=("self",))
+                    .filter(pk=subscription_id)
+                    .first()
+                )
+                if subscription is None:
+                    # Renewed elsewhere or locked by another worker.
+                    return SKIPPED
+                return self.renew_subscription(subscription)
+        except Exception:
+            logger.exception("Renewal of subscription %s failed unexpectedly.", subscription_id)
+            return FAILED
+        finally:
+            cache.delete(slot_key)
+
+    def renew_batch(self, subscriptions: list[Subscription], cutoff) -> dict[int, str]:
+        """
+        Renew ``subscriptions`` together so their invoices share aggregated swaps.
+
+        Wallet slots are taken for the whole group first; busy wallets are deferred and
+        rows renewed elsewhere are skipped, as in ``renew_with_wallet_slot``. Row locks
+        are held while the group is selected and its invoices are created in one INSERT,
+        then again while each
+        lifecycle update commits with its payment result. The combined swap runs in
+        between and commits its own records, so a late error cannot roll back the
+        record of a swap that already happened on chain.
+        """
+        outcomes: dict[int, str] = {}
+        slots: dict[int, str] = {}
+        try:
+            for subscription in subscriptions:
+                slot_key = self._acquire_wallet_slot(subscription.wallet_address)
+                if slot_key is None:
+                    logger.info(
+                        "Deferring renewal of subscription %s: wallet %s is busy.",
+                        subscription.id,
+                        subscription.wallet_address,
+                    )
+                    outcomes[subscription.id] = DEFERRED
+                else:
+                    slots[subscription.id] = slot_key
+
+            try:
+                with transaction.atomic():
+                    locked = list(
+                        self.due_queryset(cutoff)
+                        .select_for_update(skip_locked=True, of=("self",))
+                        .filter(pk__in=list(slots))
+                        .order_by("id")
+                    )
+                    billable = []
+                    for subscription in locked:
+                        if subscription.cancel_at_period_end:
+                            self.lifecycle.finalize_cancellation(subscription)
+                            self._report(subscription, CANCELED)
+                            outcomes[subscription.id] = CANCELED
+                        else:
+                            billable.append(subscription)
+
+                    invoices = {
+                        invoice.subscription_id: invoice
+                        for invoice in self.invoicing.create_invoices_bulk(
+                            billable, status=InvoiceStatus.OPEN, reuse_open=True
+                        )
+                    }
+            except Exception:
+                logger.exception("Batched renewal of subscriptions %s failed unexpectedly.", list(slots))
+                for subscription_id in slots:
+                    outcomes[subscription_id] = FAILED
+                return outcomes
+
+            def settle(result) -> None:
+                # Runs inside the transaction that records this invoice's payment result.
+                subscription = (
+                    Subscription.objects.select_related("plan", "user", "coupon")
+                    .select_for_update(of=("self",))
+                    .get(pk=result.invoice.subscription_id)
+                )
+                if result.succeeded:
+                    self.lifecycle.advance_period(subscription)
+                    self._report(subscription, RENEWED)
+                    outcomes[subscription.id] = RENEWED
+                else:
+                    self.lifecycle.mark_past_due(subscription, reason=str(result.error))
+                    self._report(subscription, FAILED, str(result.error))
+                    outcomes[subscription.id] = FAILED
+
+            try:
+                self.payments.process_invoices(
+                    [invoices[subscription.id] for subscription in billable],
+                    transaction_type=TransactionType.RENEWAL,
+                    on_outcome=settle,
+                )
+            except Exception:
+                unsettled = [subscription.id for subscription in billable if subscription.id not in outcomes]
+                # Their payment intents stay processing, so no later run swaps for them again
+                # until the swap batch has been reconciled.
+                logger.exception("Batched renewal of subscriptions %s failed after payment started.", unsettled)
+                for subscription_id in unsettled:
+                    outcomes[subscription_id] = FAILED
+        finally:
+            for slot_key in slots.values():
+                cache.delete(slot_key)
+
+        for subscription_id in slots:
+            # Renewed elsewhere, locked by another worker, or already being paid.
+            outcomes.setdefault(subscription_id, SKIPPED)
+        return outcomes
+
+    def _acquire_wallet_slot(self, wallet: str) -> Optional[str]:
+        deadline = time.monotonic() + max(0, self.wallet_wait_seconds)
+        while True:
+            for slot in range(self.wallet_concurrency):
+                key = _WALLET_SLOT_TEMPLATE.format(wallet=wallet or "-", slot=slot)
+                if cache.add(key, self.worker_name, timeout=self.lease_seconds):
+                    return key
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.2)
+
+    def _finish_run_if_done(self, run_id: int) -> None:
+        unfinished = RenewalShard.objects.filter(run_id=run_id).exclude(status=RenewalShardStatus.COMPLETED)
+        if unfinished.exists():
+            return
+        RenewalRun.objects.filter(pk=run_id, status=RenewalRunStatus.RUNNING).update(
+            status=RenewalRunStatus.COMPLETED,
+            finished_at=self._now(),
+        )
+
+    def _report(self, subscription: Subscription, outcome: str, detail: Optional[str] = None) -> None:
+        if self.on_result is not None:
+            self.on_result(subscription, outcome, detail)
+
+
+def _work_in_subprocess(run_id: int) -> int:
+    try:
+        return RenewalEngine().work(run_id)
+    finally:
+        connections.close_all()
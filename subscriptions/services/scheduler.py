@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from typing import Callable, Iterable, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from payments.models import TransactionType
+from payments.services import SwapExecutionError
+from subscriptions.models import (
+    Invoice,
+    InvoiceStatus,
+    Subscription,
+    SubscriptionAction,
+    SubscriptionStatus,
+)
+from subscriptions.services.invoicing import InvoiceService
+from subscriptions.services.lifecycle import SCHEDULE_FIELDS, SubscriptionLifecycleService, schedule_next_action
+from subscriptions.services.payment import PaymentIntentService
+from subscriptions.services.renewal import FAILED, RENEWED, SKIPPED, RenewalEngine
+
+logger = logging.getLogger(__name__)
+
+ACTIVATED = "activated"
+PAST_DUE = "past_due"
+# Detail of an activation whose first invoice had nothing to charge.
+NOTHING_DUE = "nothing due"
+
+
+class DueWorkScheduler:
+    """
+    Run every kind of due subscription work from the ``next_action_at`` index.
+
+    ``SubscriptionLifecycleService`` keeps ``next_action``/``next_action_at`` current, so a
+    tick is one range scan over the partial index in time order: trials to expire,
+    renewals, period-end cancellations and payment retries come out of the same
+    queue in bounded batches. Claimed rows are leased by pushing ``next_action_at``
+    forward; the lifecycle call that handles a row sets its real next action, and a
+    row whose worker died comes back once the lease expires.
+    """
+
+    def __init__(
+        self,
+        *,
+        lifecycle: Optional[SubscriptionLifecycleService] = None,
+        invoice_service: Optional[InvoiceService] = None,
+        payment_service: Optional[PaymentIntentService] = None,
+        renewal_engine: Optional[RenewalEngine] = None,
+        batch_size: Optional[int] = None,
+        lease_seconds: Optional[int] = None,
+        on_result: Optional[Callable[[Subscription, str, str, Optional[str]], None]] = None,
+        now=None,
+    ):
+        self._now = now or timezone.now
+        self.lifecycle = lifecycle or SubscriptionLifecycleService(now=self._now)
+        self.invoicing = invoice_service or InvoiceService(now=self._now)
+        self.payments = payment_service or PaymentIntentService()
+        self.renewals = renewal_engine or RenewalEngine(
+            lifecycle=self.lifecycle,
+            invoice_service=self.invoicing,
+            payment_service=self.payments,
+            now=self._now,
+        )
+        self.batch_size = max(1, batch_size or getattr(settings, "SCHEDULER_BATCH_SIZE", 200))
+        self.lease_seconds = lease_seconds or getattr(settings, "SCHEDULER_LEASE_SECONDS", 600)
+        self.on_result = on_result
+        self._handlers = {
+            SubscriptionAction.EXPIRE_TRIAL: self.expire_trials,
+            SubscriptionAction.RENEW: self.renew,
+            SubscriptionAction.CANCEL: self.renew,
+            SubscriptionAction.RETRY_PAYMENT: self.retry_payments,
+        }
+
+    def due(self, *, actions: Optional[Iterable[str]] = None, limit: Optional[int] = None) -> list[tuple[int, str]]:
+        """Peek at due ``(subscription_id, action)`` pairs in the order a tick would run them."""
+        return list(
+            self._due_queryset(self._now(), actions)
+            .order_by("next_action_at", "id")
+            .values_list("id", "next_action")[: limit or self.batch_size]
+        )
+
+    def tick(
+        self, *, actions: Optional[Iterable[str]] = None, max_batches: Optional[int] = None
+    ) -> dict[str, dict[str, int]]:
+        """Process due work batch by batch; returns outcome counts per action."""
+        summary: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            claimed = self.claim_batch(actions=actions)
+            if not claimed:
+                break
+            batches += 1
+            for action, outcomes in self.process_batch(claimed).items():
+                for outcome, count in outcomes.items():
+                    summary[action][outcome] += count
+            if len(claimed) < self.batch_size:
+                break
+        return {action: dict(outcomes) for action, outcomes in summary.items()}
+
+    def claim_batch(self, *, actions: Optional[Iterable[str]] = None) -> list[tuple[int, str]]:
+        now = self._now()
+        with transaction.atomic():
+            claimed = list(
+                self._due_queryset(now, actions)
+                .select_for_update(skip_locked=True)
+                .order_by("next_action_at", "id")
+                .values_list("id", "next_action")[: self.batch_size]
+            )
+            if claimed:
+                Subscription.objects.filter(pk__in=[pk for pk, _ in claimed]).update(
+                    next_action_at=now + timedelta(seconds=self.lease_seconds)
+                )
+        return claimed
+
+    def reconcile(self) -> int:
+        """
+        Schedule rows that need work but have no ``next_action_at``.
+
+        Rows written outside the lifecycle service (admin edits, fixtures, raw inserts)
+        are picked up here the same way the scheduling migration backfilled them.
+        Past-due rows become due immediately.
+        """
+        unscheduled = Subscription.objects.filter(next_action_at__isnull=True)
+        return (
+            unscheduled.filter(status=SubscriptionStatus.TRIALING, trial_end_at__isnull=False).update(
+                next_action=SubscriptionAction.EXPIRE_TRIAL, next_action_at=F("trial_end_at")
+            )
+            + unscheduled.filter(
+                status=SubscriptionStatus.ACTIVE, current_period_end__isnull=False, cancel_at_period_end=True
+            ).update(next_action=SubscriptionAction.CANCEL, next_action_at=F("current_period_end"))
+            + unscheduled.filter(
+                status=SubscriptionStatus.ACTIVE, current_period_end__isnull=False, cancel_at_period_end=False
+            ).update(next_action=SubscriptionAction.RENEW, next_action_at=F("current_period_end"))
+            + unscheduled.filter(status=SubscriptionStatus.PAST_DUE).update(
+                next_action=SubscriptionAction.RETRY_PAYMENT, next_action_at=self._now()
+            )
+        )
+
+    def make_retries_due(self) -> int:
+        """Bring every scheduled payment retry forward to now, skipping the retry back-off once."""
+        now = self._now()
+        return Subscription.objects.filter(
+            status=SubscriptionStatus.PAST_DUE,
+            next_action=SubscriptionAction.RETRY_PAYMENT,
+            next_action_at__gt=now,
+        ).update(next_action_at=now)
+
+    def process_batch(self, claimed: list[tuple[int, str]]) -> dict[str, dict[str, int]]:
+        subscriptions = Subscription.objects.select_related("plan", "user", "coupon").in_bulk([pk for pk, _ in claimed])
+        grouped: dict[str, list[Subscription]] = defaultdict(list)
+        for pk, action in claimed:
+            if pk in subscriptions:
+                grouped[action].append(subscriptions[pk])
+
+        summary: dict[str, dict[str, int]] = {}
+        for action, members in grouped.items():
+            handler = self._handlers.get(action)
+            if handler is None:
+                logger.warning("Unknown scheduled action %r for subscriptions %s.", action, [s.id for s in members])
+                continue
+            counts: dict[str, int] = defaultdict(int)
+            for subscription, outcome in handler(members):
+                counts[outcome] += 1
+            summary[action] = dict(counts)
+        return summary
+
+    def expire_trials(self, subscriptions: list[Subscription]) -> list[tuple[Subscription, str]]:
+        now = self._now()
+        due = [s for s in subscriptions if s.status == SubscriptionStatus.TRIALING and s.trial_end_at and s.trial_end_at <= now]
+        results = [(s, SKIPPED) for s in subscriptions if s not in due]
+        invoices = self.invoicing.create_invoices_bulk(due, status=InvoiceStatus.OPEN, reuse_open=True)
+
+        for subscription, invoice in zip(due, invoices):
+            with transaction.atomic():
+                # A chunk whose lease expired in a queue may be claimed twice; the row lock bills it once.
+                locked = (
+                    Subscription.objects.select_for_update(skip_locked=True, of=("self",))
+                    .select_related("plan", "user", "coupon")
+                    .filter(pk=subscription.pk, status=SubscriptionStatus.TRIALING)
+                    .first()
+                )
+                if locked is None:
+                    results.append(self._report(subscription, SubscriptionAction.EXPIRE_TRIAL, SKIPPED))
+                    continue
+                # Tiers and coupons can zero the first invoice of a paid plan, and price a free one.
+                if invoice.total <= 0:
+                    self.lifecycle.activate_subscription(locked)
+                    invoice.status = InvoiceStatus.PAID
+                    invoice.paid_at = now
+                    invoice.save(update_fields=["status", "paid_at"])
+                    results.append(self._report(locked, SubscriptionAction.EXPIRE_TRIAL, ACTIVATED, NOTHING_DUE))
+                    continue
+                try:
+                    self.payments.process_invoice(invoice, transaction_type=TransactionType.SUBSCRIPTION)
+                    self.lifecycle.activate_subscription(locked)
+                    results.append(self._report(locked, SubscriptionAction.EXPIRE_TRIAL, ACTIVATED))
+                except SwapExecutionError as exc:
+                    self.lifecycle.mark_past_due(locked, reason=str(exc))
+                    results.append(self._report(locked, SubscriptionAction.EXPIRE_TRIAL, PAST_DUE, str(exc)))
+        self._reschedule(s for s, outcome in results if outcome == SKIPPED)
+        return results
+
+    def renew(self, subscriptions: list[Subscription]) -> list[tuple[Subscription, str]]:
+        """Renewals and period-end cancellations both go through the renewal engine's wallet slots."""
+        cutoff = self._now()
+        if self.renewals.aggregate_swaps:
+            outcomes = self.renewals.renew_batch(subscriptions, cutoff)
+        else:
+            outcomes = {
+                subscription.id: self.renewals.renew_with_wallet_slot(subscription.id, subscription.wallet_address, cutoff)
+                for subscription in subscriptions
+            }
+        results = []
+        for subscription in subscriptions:
+            action = SubscriptionAction.CANCEL if subscription.cancel_at_period_end else SubscriptionAction.RENEW
+            results.append(self._report(subscription, action, outcomes[subscription.id]))
+        self._reschedule(s for s, outcome in results if outcome == SKIPPED)
+        return results
+
+    def retry_payments(self, subscriptions: list[Subscription]) -> list[tuple[Subscription, str]]:
+        results = []
+        for subscription in subscriptions:
+            with transaction.atomic():
+                locked = (
+                    Subscription.objects.select_for_update(skip_locked=True, of=("self",))
+                    .select_related("plan", "user", "coupon")
+                    .filter(pk=subscription.pk, status=SubscriptionStatus.PAST_DUE)
+                    .first()
+                )
+                if locked is None:
+                    results.append(self._report(subscription, SubscriptionAction.RETRY_PAYMENT, SKIPPED))
+                    continue
+                invoice = (
+                    Invoice.objects.filter(
+                        subscription=locked, status__in=[InvoiceStatus.OPEN, InvoiceStatus.UNCOLLECTIBLE]
+                    )
+                    .order_by("-issued_at")
+                    .first()
+                ) or self.invoicing.create_invoices_bulk([locked], status=InvoiceStatus.OPEN, reuse_open=True)[0]
+                try:
+                    self.payments.process_invoice(invoice, transaction_type=TransactionType.RENEWAL)
+                    invoice.refresh_from_db()
+                    if invoice.status != InvoiceStatus.PAID:
+                        invoice.status = InvoiceStatus.PAID
+                        invoice.paid_at = invoice.paid_at or self._now()
+                        invoice.save(update_fields=["status", "paid_at"])
+                    self.lifecycle.advance_period(locked)
+                    outcome, detail = RENEWED, None
+                except SwapExecutionError as exc:
+                    self.lifecycle.mark_past_due(locked, reason=str(exc))
+                    outcome, detail = FAILED, str(exc)
+            results.append(self._report(locked, SubscriptionAction.RETRY_PAYMENT, outcome, detail))
+        self._reschedule(s for s, outcome in results if outcome == SKIPPED)
+        return results
+
+    def _due_queryset(self, now, actions: Optional[Iterable[str]]):
+        queryset = Subscription.objects.filter(next_action_at__lte=now)
+        if actions is not None:
+            queryset = queryset.filter(next_action__in=list(actions))
+        return queryset
+
+    def _reschedule(self, subscriptions) -> None:
+        """Skipped rows were no longer due as claimed; re-derive their next action from current state."""
+        now = self._now()
+        for subscription in subscriptions:
+            with transaction.atomic():
+                current = (
+                    Subscription.objects.select_for_update(skip_locked=True)
+                    .filter(pk=subscription.pk)
+                    .first()
+                )
+                if current is None:
+                    continue
+                schedule_next_action(current, now)
+                current.save(update_fields=SCHEDULE_FIELDS)
+
+    def _report(self, subscription: Subscription, action: str, outcome: str, detail: Optional[str] = None):
+        if self.on_result is not None:
+            self.on_result(subscription, action, outcome, detail)
+        return subscription, outcome
@@ -0,0 +1,35 @@
+from celery import shared_task
+from django.conf import settings
+
+from subscriptions.services import billing
+from subscriptions.services.renewal import RenewalEngine
+from subscriptions.services.scheduler import DueWorkScheduler
+
+
+@shared_task
+def process_renewal_run(run_id: int) -> int:
+    """Claim and process shards of a renewal run until none are left."""
+    return RenewalEngine().work(run_id)
+
+
+@shared_task
+def run_due_work(max_batches: int | None = None) -> dict:
+    """Process due trials, renewals, cancellations and payment retries from the scheduling index."""
+    return DueWorkScheduler().tick(max_batches=max_batches)
+
+
+@shared_task(ignore_result=True)
+def dispatch_billing(pipeline: str) -> int | None:
+    """Beat entry point: claim the pipeline's due work and fan it out as chunk tasks."""
+    return billing.BillingDispatcher().dispatch(pipeline)
+
+
+@shared_task(acks_late=True, rate_limit=getattr(settings, "BILLING_CHUNK_RATE_LIMIT", None) or None)
+def process_billing_chunk(pipeline: str, claimed: list) -> dict:
+    """Bill one chunk of subscriptions leased by ``dispatch_billing``."""
+    return DueWorkScheduler().process_batch([(pk, action) for pk, action in claimed])
+
+
+@shared_task(ignore_result=True)
+def expire_checkout_sessions() -> int:
+    return billing.expire_checkout_sessions()
@@ -147,3 +147,15 @@ class SubscriptionAPITests(APITestCase):
         response = self.client.patch(url, {"name": "Updated"}, format="json")
 
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_share_returns_a_cacheable_qr_code_url(self):
+        self.plan.created_by = self.user
+        self.plan.save(update_fields=["created_by"])
+
+        response = self.client.post(reverse("plan-share", args=[self.plan.id]) + "?qr_format=svg")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["share_url"].endswith("/pay?plan=trial-plan"))
+        image = self.client.get(response.data["qr_code_url"])
+        self.assertEqual(image.status_code, status.HTTP_200_OK)
+        self.assertEqual(image["Content-Type"], "image/svg+xml")
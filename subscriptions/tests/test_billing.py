@@ -0,0 +1,114 @@
+from decimal import Decimal
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from subscriptions.models import (
+    CheckoutSession,
+    CheckoutSessionStatus,
+    CurrencyChoices,
+    Plan,
+    PlanInterval,
+    Subscription,
+    SubscriptionAction,
+    SubscriptionStatus,
+)
+from subscriptions.services import BillingDispatcher, DueWorkScheduler
+from subscriptions.services.billing import PIPELINES, billing_lock, expire_checkout_sessions
+from subscriptions.tasks import process_billing_chunk
+
+
+class BillingPipelineTests(TestCase):
+    def setUp(self):
+        self.override_email = self.settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+        self.override_email.enable()
+        self.addCleanup(self.override_email.disable)
+        self.addCleanup(cache.clear)
+        self.plan = Plan.objects.create(
+            code="billing",
+            name="Billing",
+            amount=Decimal("10.000000"),
+            currency=CurrencyChoices.ALGO,
+            interval=PlanInterval.MONTH,
+        )
+        self.user = get_user_model().objects.create_user(
+            email="billing@example.com",
+            password="pass1234",
+            username="billing",
+        )
+        self.payments = mock.Mock()
+        self.sent = []
+
+    def _due(self, wallet, **kwargs):
+        # Written without the lifecycle service: the dispatcher schedules these rows itself.
+        kwargs.setdefault("status", SubscriptionStatus.ACTIVE)
+        return Subscription.objects.create(
+            user=self.user,
+            plan=self.plan,
+            wallet_address=wallet,
+            current_period_start=timezone.now() - timedelta(days=30),
+            current_period_end=timezone.now() - timedelta(minutes=5),
+            **kwargs,
+        )
+
+    def _dispatcher(self, **kwargs):
+        scheduler = DueWorkScheduler(payment_service=self.payments, batch_size=kwargs.pop("chunk_size", 2))
+        return BillingDispatcher(
+            scheduler=scheduler,
+            send=lambda pipeline, claimed: self.sent.append((pipeline, claimed)),
+            **kwargs,
+        )
+
+    def test_dispatch_splits_due_work_into_chunks_for_the_pipeline_queue(self):
+        renewals = [self._due(f"W{i}") for i in range(5)]
+        self._due("W-trial", status=SubscriptionStatus.TRIALING, trial_end_at=timezone.now() - timedelta(hours=1))
+
+        chunks = self._dispatcher().dispatch("renewals")
+
+        self.assertEqual(chunks, 3)
+        self.assertEqual([len(claimed) for _, claimed in self.sent], [2, 2, 1])
+        self.assertEqual({pipeline for pipeline, _ in self.sent}, {PIPELINES["renewals"]})
+        self.assertEqual(
+            sorted(pk for _, claimed in self.sent for pk, _ in claimed), [subscription.id for subscription in renewals]
+        )
+        # Claimed rows are leased, so a second beat finds nothing left to enqueue.
+        self.assertEqual(self._dispatcher().dispatch("renewals"), 0)
+
+    def test_overlapping_runs_are_locked_out(self):
+        self._due("W1")
+
+        with billing_lock("renewals") as acquired:
+            self.assertTrue(acquired)
+            self.assertIsNone(self._dispatcher().dispatch("renewals"))
+            self.assertIsNone(self._dispatcher().run("renewals"))
+
+        self.assertEqual(self._dispatcher().dispatch("renewals"), 1)
+
+    @mock.patch("subscriptions.services.scheduler.PaymentIntentService")
+    def test_chunk_task_bills_the_claimed_subscriptions(self, mock_payment_service):
+        subscription = self._due("W1")
+        self._dispatcher().dispatch("renewals")
+        (_, claimed), = self.sent
+
+        summary = process_billing_chunk("renewals", [list(item) for item in claimed])
+
+        self.assertEqual(summary, {SubscriptionAction.RENEW: {"renewed": 1}})
+        subscription.refresh_from_db()
+        self.assertGreater(subscription.current_period_end, timezone.now())
+        self.assertTrue(mock_payment_service.return_value.process_invoice.called)
+
+    def test_expire_checkout_sessions_in_batches(self):
+        past = timezone.now() - timedelta(minutes=1)
+        for index in range(3):
+            CheckoutSession.objects.create(user=self.user, plan=self.plan, wallet_address=f"W{index}", expires_at=past)
+        fresh = CheckoutSession.objects.create(user=self.user, plan=self.plan, wallet_address="W-fresh")
+
+        self.assertEqual(expire_checkout_sessions(batch_size=2), 3)
+
+        self.assertEqual(CheckoutSession.objects.filter(status=CheckoutSessionStatus.EXPIRED).count(), 3)
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, CheckoutSessionStatus.OPEN)
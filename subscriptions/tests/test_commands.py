@@ -1,4 +1,5 @@
 from decimal import Decimal
+from io import StringIO
 from datetime import timedelta
 from unittest import mock
 
@@ -9,11 +10,13 @@ from django.utils import timezone
 
 from payments.services import SwapExecutionError
 from subscriptions.models import (
+    Coupon,
     CurrencyChoices,
     Invoice,
     InvoiceStatus,
     Plan,
     PlanInterval,
+    PriceTier,
     Subscription,
     SubscriptionStatus,
 )
@@ -65,6 +68,36 @@ class CommandTests(TestCase):
         self.assertFalse(mock_payment_service.return_value.process_invoice.called)
         self.assertGreaterEqual(Notification.objects.count(), 1)
 
+    @mock.patch("subscriptions.management.commands.expire_trials.PaymentIntentService")
+    def test_expire_trials_bills_the_invoice_total_not_the_plan_amount(self, mock_payment_service):
+        coupon = Coupon.objects.create(code="FREE", percent_off=Decimal("100"), currency=CurrencyChoices.ALGO)
+        waived = Subscription.objects.create(
+            user=self.user,
+            plan=self.plan_paid,
+            coupon=coupon,
+            status=SubscriptionStatus.TRIALING,
+            wallet_address=self.user.wallet_address,
+            trial_end_at=timezone.now() - timedelta(days=1),
+        )
+        PriceTier.objects.create(plan=self.plan_free, up_to=None, unit_amount=Decimal("2"))
+        seats = Subscription.objects.create(
+            user=self.user,
+            plan=self.plan_free,
+            quantity=3,
+            status=SubscriptionStatus.TRIALING,
+            wallet_address=self.user.wallet_address,
+            trial_end_at=timezone.now() - timedelta(days=1),
+        )
+        out = StringIO()
+
+        call_command("expire_trials", stdout=out)
+
+        billed = [call.args[0] for call in mock_payment_service.return_value.process_invoice.call_args_list]
+        self.assertEqual([(invoice.subscription_id, invoice.total) for invoice in billed], [(seats.id, Decimal("6"))])
+        self.assertEqual(Invoice.objects.get(subscription=waived).status, InvoiceStatus.PAID)
+        self.assertIn(f"Subscription {waived.id} activated (nothing due).", out.getvalue())
+        self.assertIn(f"Subscription {seats.id} activated (billed).", out.getvalue())
+
     @mock.patch("subscriptions.management.commands.expire_trials.PaymentIntentService")
     def test_expire_trials_paid_plan_success(self, mock_payment_service):
         subscription = Subscription.objects.create(
@@ -155,10 +188,16 @@ class CommandTests(TestCase):
             subtotal=Decimal("10.000000"),
             total=Decimal("10.000000"),
         )
-        mock_payment_service.return_value.process_invoice.side_effect = SwapExecutionError("swap failed")
+        process_invoice = mock_payment_service.return_value.process_invoice
+        process_invoice.side_effect = SwapExecutionError("swap failed")
 
         call_command("retry_failed_payments")
 
         subscription.refresh_from_db()
         self.assertEqual(subscription.status, SubscriptionStatus.PAST_DUE)
         self.assertGreaterEqual(Notification.objects.count(), 1)
+
+        # Each run retries again; only --due-only waits for the retry back-off.
+        call_command("retry_failed_payments")
+        call_command("retry_failed_payments", "--due-only")
+        self.assertEqual(process_invoice.call_count, 2)
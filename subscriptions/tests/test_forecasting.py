@@ -0,0 +1,185 @@
+from decimal import Decimal
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from currency.models import Currency, ExchangeRate
+from subscriptions.models import (
+    Coupon,
+    CouponDuration,
+    CurrencyChoices,
+    Plan,
+    PlanInterval,
+    PriceTier,
+    Subscription,
+    SubscriptionStatus,
+    TiersMode,
+)
+from subscriptions.services import RenewalForecaster
+
+
+class RenewalForecasterTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.user = get_user_model().objects.create_user(
+            email="forecast@example.com",
+            password="pass1234",
+            username="forecast",
+        )
+        self.monthly = Plan.objects.create(
+            code="monthly",
+            name="Monthly",
+            amount=Decimal("10.000000"),
+            currency=CurrencyChoices.ALGO,
+            interval=PlanInterval.MONTH,
+        )
+        self.yearly = Plan.objects.create(
+            code="yearly",
+            name="Yearly",
+            amount=Decimal("100.000000"),
+            currency=CurrencyChoices.USDC,
+            interval=PlanInterval.YEAR,
+        )
+
+    def _subscription(self, plan, days_until_renewal, **kwargs):
+        kwargs.setdefault("status", SubscriptionStatus.ACTIVE)
+        return Subscription.objects.create(
+            user=self.user,
+            plan=plan,
+            wallet_address="WALLET",
+            current_period_end=self.now + timedelta(days=days_until_renewal),
+            **kwargs,
+        )
+
+    def _forecast(self, **kwargs):
+        kwargs.setdefault("monthly_churn", 0.0)
+        return RenewalForecaster(now=lambda: self.now, **kwargs).forecast((30, 90, 365))
+
+    def test_projects_renewals_per_horizon_and_currency(self):
+        coupon = Coupon.objects.create(
+            code="HALF", percent_off=Decimal("50"), currency=CurrencyChoices.ALGO, duration=CouponDuration.FOREVER
+        )
+        self._subscription(self.monthly, 10, quantity=2)
+        self._subscription(self.monthly, 10, coupon=coupon)
+        self._subscription(self.yearly, 100)
+        self._subscription(self.monthly, 5, cancel_at_period_end=True)
+
+        report = self._forecast()
+
+        thirty, ninety, year = report["horizons"]
+        self.assertEqual(report["subscriptions"], 4)
+        self.assertEqual(thirty["renewals"], 2)
+        self.assertEqual(thirty["billed"], {"ALGO": "25.000000", "USDC": "0.000000"})
+        # Day 10, 40 and 70 fall inside 90 days; the yearly plan renews on day 100.
+        self.assertEqual(ninety["billed"]["ALGO"], "75.000000")
+        self.assertEqual(ninety["billed"]["USDC"], "0.000000")
+        self.assertEqual(year["billed"]["USDC"], "100.000000")
+        self.assertEqual(year["swap_volume_algo"], year["expected_revenue"]["ALGO"])
+        self.assertEqual(len(report["timeline"]), 13)
+
+    def test_coupons_only_discount_the_renewals_they_cover(self):
+        once = Coupon.objects.create(code="ONCE", percent_off=Decimal("50"), duration=CouponDuration.ONCE)
+        repeating = Coupon.objects.create(
+            code="TWO-MONTHS", percent_off=Decimal("50"), duration=CouponDuration.REPEATING, duration_in_months=2
+        )
+        self._subscription(self.monthly, 10, coupon=once)
+        self._subscription(self.monthly, 10, coupon=once, status=SubscriptionStatus.TRIALING)
+        # Created now: day 10 and 40 fall inside the two 30-day months, day 70 does not.
+        self._subscription(self.monthly, 10, coupon=repeating)
+
+        report = self._forecast(monthly_churn=0.1)
+
+        ninety = report["horizons"][1]
+        # 3 full renewals, the trial's first charge at half price, then 2 full ones, and 5 + 5 + 10.
+        self.assertEqual(ninety["billed"]["ALGO"], "75.000000")
+        timeline = sum(Decimal(bucket["expected_revenue"]["ALGO"]) for bucket in report["timeline"][:3])
+        self.assertAlmostEqual(float(timeline), float(ninety["expected_revenue"]["ALGO"]), places=4)
+
+    def test_tiered_plans_are_priced_like_their_invoices(self):
+        seats = Plan.objects.create(
+            code="seats",
+            name="Seats",
+            amount=Decimal("0"),
+            currency=CurrencyChoices.ALGO,
+            interval=PlanInterval.MONTH,
+            tiers_mode=TiersMode.VOLUME,
+        )
+        PriceTier.objects.create(plan=seats, up_to=5, unit_amount=Decimal("4"))
+        PriceTier.objects.create(plan=seats, up_to=None, unit_amount=Decimal("3"))
+        self._subscription(seats, 10, quantity=3)
+        self._subscription(seats, 10, quantity=6)
+
+        report = self._forecast()
+
+        self.assertEqual(report["horizons"][0]["billed"]["ALGO"], "30.000000")  # 3 x 4 + 6 x 3
+
+    def test_churn_and_trial_conversion_discount_expected_revenue(self):
+        self._subscription(self.monthly, 0)
+        self._subscription(self.monthly, 0, status=SubscriptionStatus.TRIALING)
+
+        report = self._forecast(monthly_churn=0.1, trial_conversion=0.5)
+
+        ninety = report["horizons"][1]
+        # Charges on day 0, 30, 60 and 90 survive with 1, 0.9, 0.81 and 0.729; the trial counts for half.
+        self.assertEqual(ninety["renewals"], 8)
+        self.assertAlmostEqual(float(ninety["expected_revenue"]["ALGO"]), 1.5 * 10 * 3.439, places=4)
+
+    def test_swap_volume_uses_stored_algo_usdc_rate(self):
+        algo = Currency.objects.create(code="ALGO", name="Algorand")
+        usdc = Currency.objects.create(code="USDC", name="USD Coin")
+        ExchangeRate.objects.create(base_currency=algo, target_currency=usdc, rate=Decimal("0.2"))
+        self._subscription(self.monthly, 1)
+
+        report = self._forecast()
+
+        self.assertEqual(report["horizons"][0]["swap_volume_usdc_estimate"], "2.000000")
+
+    def test_chunks_give_the_same_totals(self):
+        for days in range(7):
+            self._subscription(self.monthly, days, quantity=days + 1)
+
+        chunked = RenewalForecaster(now=lambda: self.now, monthly_churn=0.05, chunk_size=2).forecast((90,))
+        single = RenewalForecaster(now=lambda: self.now, monthly_churn=0.05).forecast((90,))
+
+        self.assertEqual(chunked["horizons"], single["horizons"])
+        self.assertEqual(chunked["timeline"], single["timeline"])
+
+
+class ForecastReportAPITests(APITestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.url = reverse("forecast-report")
+        self.admin = get_user_model().objects.create_user(
+            email="admin-forecast@example.com",
+            password="pass1234",
+            username="admin_forecast",
+            wallet_address="ADMINFORECAST",
+            is_staff=True,
+        )
+
+    def test_admin_gets_requested_horizons(self):
+        self.client.force_authenticate(user=self.admin)
+
+        response = self.client.get(self.url, {"horizons": "7,30"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([horizon["days"] for horizon in response.data["horizons"]], [7, 30])
+
+    def test_rejects_invalid_horizons_and_non_staff(self):
+        self.client.force_authenticate(user=self.admin)
+        self.assertEqual(self.client.get(self.url, {"horizons": "soon"}).status_code, status.HTTP_400_BAD_REQUEST)
+
+        member = get_user_model().objects.create_user(
+            email="member@example.com",
+            password="pass1234",
+            username="member",
+            wallet_address="MEMBERWALLET",
+        )
+        self.client.force_authenticate(user=member)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+# Loaded on first use only: none of them may be imported while a worker boots.
+DEFERRED_PACKAGES = ("algosdk", "pyteal", "tinyman", "qrcode", "PIL")
+
+STARTUP_SCRIPT = """
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+import payments.services, payments.utils, subscriptions.services.lifecycle, subscriptions.views
+"""
+
+
+class ImportBudgetTests(SimpleTestCase):
+    def _import_times(self) -> dict[str, int]:
+        """Cumulative import time in microseconds of every module loaded by ``STARTUP_SCRIPT``."""
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "config.settings")},
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+        times = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+        return times
+
+    def test_startup_does_not_import_blockchain_or_qr_libraries(self):
+        times = self._import_times()
+
+        self.assertIn("subscriptions.views", times)
+        loaded = {name: times[name] for name in DEFERRED_PACKAGES if name in times}
+        self.assertFalse(
+            loaded,
+            "Startup imports deferred packages: "
+            + ", ".join(f"{name} ({micros / 1000:.0f} ms)" for name, micros in loaded.items()),
+        )
@@ -0,0 +1,175 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from subscriptions.models import (
+    CurrencyChoices,
+    InvoiceStatus,
+    Plan,
+    PlanInterval,
+    PriceTier,
+    Subscription,
+    SubscriptionStatus,
+    UsageRecord,
+    UsageType,
+)
+from subscriptions.services import InvoiceService, UsageIngestor
+
+
+def _lines(*events):
+    return "\n".join(event if isinstance(event, str) else json.dumps(event) for event in events).encode()
+
+
+class MeteringTestCase(TestCase):
+    def setUp(self):
+        self.merchant = get_user_model().objects.create_user(
+            email="meter@example.com", password="pass1234", username="meter", wallet_address="METERWALLET"
+        )
+        self.plan = Plan.objects.create(
+            code="api-calls",
+            name="API calls",
+            amount=Decimal("0.010000"),
+            currency=CurrencyChoices.USDC,
+            interval=PlanInterval.MONTH,
+            usage_type=UsageType.METERED,
+            created_by=self.merchant,
+        )
+        self.period_start = timezone.now() - timedelta(days=30)
+        self.subscription = Subscription.objects.create(
+            user=self.merchant,
+            plan=self.plan,
+            status=SubscriptionStatus.ACTIVE,
+            wallet_address="METERWALLET",
+            current_period_start=self.period_start,
+            current_period_end=self.period_start + timedelta(days=30),
+        )
+
+
+class UsageIngestorTests(MeteringTestCase):
+    def test_events_are_deduplicated_by_idempotency_key_across_chunks_and_requests(self):
+        ingestor = UsageIngestor(batch_size=2)
+        body = _lines(
+            {"subscription": self.subscription.id, "quantity": 5, "idempotency_key": "a"},
+            {"subscription": self.subscription.id, "quantity": 5, "idempotency_key": "a"},
+            {"subscription": self.subscription.id, "quantity": 7, "idempotency_key": "b", "timestamp": 1_700_000_000},
+            "not json",
+            {"subscription": 999_999, "quantity": 1, "idempotency_key": "c"},
+            {"subscription": self.subscription.id, "quantity": -1, "idempotency_key": "d"},
+            {"subscription": self.subscription.id, "quantity": 2, "idempotency_key": "e"},
+        )
+
+        result = ingestor.ingest(body, subscriptions=Subscription.objects.all())
+
+        self.assertEqual((result.accepted, result.duplicates), (3, 1))
+        self.assertEqual([rejection["line"] for rejection in result.rejected], [4, 5, 6])
+        self.assertEqual(UsageRecord.objects.count(), 3)
+
+        retried = ingestor.ingest(body, subscriptions=Subscription.objects.all())
+        self.assertEqual((retried.accepted, retried.duplicates), (0, 4))
+        self.assertEqual(UsageRecord.objects.count(), 3)
+
+    def test_renewal_invoice_bills_the_period_usage_through_the_plan_tiers(self):
+        PriceTier.objects.bulk_create(
+            [
+                PriceTier(plan=self.plan, up_to=1000, unit_amount=Decimal("0.010000")),
+                PriceTier(plan=self.plan, up_to=None, unit_amount=Decimal("0.005000")),
+            ]
+        )
+        in_period = self.period_start + timedelta(days=3)
+        UsageRecord.objects.bulk_create(
+            [
+                UsageRecord(subscription=self.subscription, idempotency_key="1", quantity=900, occurred_at=in_period),
+                UsageRecord(subscription=self.subscription, idempotency_key="2", quantity=300, occurred_at=in_period),
+                UsageRecord(
+                    subscription=self.subscription,
+                    idempotency_key="old",
+                    quantity=10_000,
+                    occurred_at=self.period_start - timedelta(seconds=1),
+                    invoice=InvoiceService().create_invoice(self.subscription, line_items=[]),
+                ),
+            ]
+        )
+
+        invoice = InvoiceService().create_invoices_bulk([self.subscription], status=InvoiceStatus.OPEN)[0]
+
+        line = invoice.line_items.get()
+        self.assertEqual(line.quantity, 1200)
+        self.assertEqual(line.total_amount, Decimal("11.000000"))  # 1000 × 0.01 + 200 × 0.005
+        self.assertEqual(invoice.subtotal, Decimal("11.000000"))
+        self.assertEqual(line.description, "API calls usage")
+
+    def test_usage_after_the_period_end_and_late_usage_go_on_the_next_invoice(self):
+        period_end = timezone.now() - timedelta(hours=1)
+        Subscription.objects.filter(pk=self.subscription.pk).update(current_period_end=period_end)
+        self.subscription.refresh_from_db()
+        UsageRecord.objects.bulk_create(
+            [
+                UsageRecord(subscription=self.subscription, idempotency_key=key, quantity=quantity, occurred_at=at)
+                for key, quantity, at in (
+                    ("in", 5, period_end - timedelta(hours=1)),
+                    # Reported between the end of the period and the renewal run.
+                    ("gap", 7, period_end + timedelta(minutes=1)),
+                    ("future", 100, timezone.now() + timedelta(hours=1)),
+                )
+            ]
+        )
+
+        first = InvoiceService().create_invoices_bulk([self.subscription], status=InvoiceStatus.OPEN)[0]
+
+        self.assertEqual(first.line_items.get().quantity, 12)
+        self.assertEqual(set(first.usage_records.values_list("idempotency_key", flat=True)), {"in", "gap"})
+
+        # Usage for the billed period that arrives after its invoice is not dropped.
+        UsageRecord.objects.create(
+            subscription=self.subscription, idempotency_key="late", quantity=3, occurred_at=self.period_start
+        )
+        second = InvoiceService(now=lambda: timezone.now() + timedelta(hours=2)).create_invoice(self.subscription)
+
+        self.assertEqual(second.line_items.get().quantity, 103)
+        self.assertEqual(UsageRecord.objects.filter(invoice__isnull=True).count(), 0)
+
+
+class UsageIngestAPITests(APITestCase, MeteringTestCase):
+    def test_merchant_reports_usage_as_json_lines(self):
+        other = get_user_model().objects.create_user(
+            email="other-meter@example.com", password="pass1234", username="othermeter", wallet_address="OTHER"
+        )
+        url = reverse("usage-ingest")
+        body = _lines({"subscription": self.subscription.id, "quantity": 4, "idempotency_key": "evt-1"})
+
+        self.client.force_authenticate(other)
+        response = self.client.generic("POST", url, body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["accepted"], 0)
+        self.assertEqual(len(response.data["rejected"]), 1)
+
+        self.client.force_authenticate(self.merchant)
+        response = self.client.generic("POST", url, body, content_type="application/x-ndjson")
+        self.assertEqual(response.data, {"accepted": 1, "duplicates": 0, "rejected": []})
+        self.assertEqual(UsageRecord.objects.get().quantity, 4)
+
+    def test_usage_for_a_plan_that_is_not_metered_is_refused(self):
+        licensed = Plan.objects.create(
+            code="seats", name="Seats", amount=Decimal("5"), currency=CurrencyChoices.USDC, created_by=self.merchant
+        )
+        seats = Subscription.objects.create(
+            user=self.merchant, plan=licensed, status=SubscriptionStatus.ACTIVE, wallet_address="METERWALLET"
+        )
+        body = _lines(
+            {"subscription": self.subscription.id, "quantity": 4, "idempotency_key": "evt-1"},
+            {"subscription": seats.id, "quantity": 1, "idempotency_key": "evt-2"},
+        )
+
+        self.client.force_authenticate(self.merchant)
+        response = self.client.generic("POST", reverse("usage-ingest"), body, content_type="application/x-ndjson")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(seats.id), response.data["detail"])
+        self.assertFalse(UsageRecord.objects.exists())
@@ -0,0 +1,117 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from subscriptions.models import (
+    CurrencyChoices,
+    Plan,
+    PlanInterval,
+    PriceTier,
+    Subscription,
+    SubscriptionStatus,
+    TiersMode,
+)
+from subscriptions.services import InvoiceService, PricingEngine
+
+
+def _tiered_plan(code, mode, tiers):
+    plan = Plan.objects.create(
+        code=code,
+        name=code.title(),
+        amount=Decimal("0"),
+        currency=CurrencyChoices.USDC,
+        interval=PlanInterval.MONTH,
+        tiers_mode=mode,
+    )
+    PriceTier.objects.bulk_create(
+        [PriceTier(plan=plan, up_to=up_to, unit_amount=Decimal(unit)) for up_to, unit in tiers]
+    )
+    return plan
+
+
+class PricingEngineTests(TestCase):
+    def setUp(self):
+        tiers = [(10, "5"), (50, "4"), (None, "3")]
+        self.graduated = _tiered_plan("seats-graduated", TiersMode.GRADUATED, tiers)
+        self.volume = _tiered_plan("seats-volume", TiersMode.VOLUME, tiers)
+        self.flat = Plan.objects.create(code="flat", name="Flat", amount=Decimal("7.5"), interval=PlanInterval.MONTH)
+
+    def test_graduated_and_volume_modes_across_tier_boundaries(self):
+        engine = PricingEngine()
+        totals = {
+            (plan.code, quantity): engine.price(plan, quantity).total
+            for plan in (self.graduated, self.volume)
+            for quantity in (1, 10, 11, 50, 60)
+        }
+
+        self.assertEqual(totals[("seats-graduated", 10)], Decimal("50"))
+        self.assertEqual(totals[("seats-graduated", 11)], Decimal("54"))
+        self.assertEqual(totals[("seats-graduated", 60)], Decimal("240"))  # 50 + 160 + 30
+        self.assertEqual(totals[("seats-volume", 10)], Decimal("50"))
+        self.assertEqual(totals[("seats-volume", 11)], Decimal("44"))
+        self.assertEqual(totals[("seats-volume", 60)], Decimal("180"))
+        self.assertEqual(engine.price(self.graduated, 60).unit_amount, Decimal("4.000000"))
+
+    def test_last_bounded_tier_prices_overflow_and_untiered_plans_use_amount(self):
+        capped = _tiered_plan("capped", TiersMode.GRADUATED, [(5, "2"), (10, "1")])
+        engine = PricingEngine()
+
+        self.assertEqual(engine.price(capped, 12).total, Decimal("17"))  # 10 + 5 + 2
+        quote = engine.price(self.flat, 4)
+        self.assertEqual((quote.total, quote.tiers_mode), (Decimal("30"), None))
+
+    def test_batch_loads_every_plan_with_one_query(self):
+        engine = PricingEngine()
+        plans = list(Plan.objects.all())
+
+        with self.assertNumQueries(1):
+            quotes = engine.price_many([(plan, quantity) for plan in plans for quantity in (1, 25, 100)])
+
+        self.assertEqual(len(quotes), len(plans) * 3)
+
+
+class TieredInvoiceTests(TestCase):
+    def test_invoice_bills_seats_through_the_plan_tiers(self):
+        plan = _tiered_plan("team", TiersMode.GRADUATED, [(10, "5"), (None, "4")])
+        user = get_user_model().objects.create_user(
+            email="tiers@example.com", password="pass1234", username="tiers", wallet_address="TIERWALLET"
+        )
+        subscription = Subscription.objects.create(
+            user=user,
+            plan=plan,
+            status=SubscriptionStatus.ACTIVE,
+            wallet_address="TIERWALLET",
+            quantity=15,
+            current_period_start=timezone.now(),
+            current_period_end=timezone.now() + timedelta(days=30),
+        )
+
+        invoice = InvoiceService().create_invoice(subscription)
+
+        self.assertEqual(invoice.subtotal, Decimal("70.000000"))
+        line = invoice.line_items.get()
+        self.assertEqual((line.quantity, line.total_amount), (15, Decimal("70.000000")))
+        self.assertEqual(line.metadata, {"tiers_mode": "graduated"})
+
+
+class BatchPricingAPITests(APITestCase):
+    def test_prices_many_items_and_rejects_unknown_plans(self):
+        plan = _tiered_plan("api-seats", TiersMode.VOLUME, [(10, "5"), (None, "4")])
+        url = reverse("plan-price")
+
+        response = self.client.post(
+            url, {"items": [{"plan": plan.id, "quantity": 3}, {"plan": plan.id, "quantity": 20}]}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["total"] for item in response.data["items"]], ["15.000000", "80.000000"])
+        self.assertEqual(response.data["items"][0]["currency"], CurrencyChoices.USDC)
+
+        response = self.client.post(url, {"items": [{"plan": 9999, "quantity": 1}]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,288 @@
+import importlib
+from decimal import Decimal
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from payments.models import SwapBatch, SwapBatchStatus, Transaction, TransactionStatus
+from payments.services import SwapExecutionError
+from subscriptions.models import (
+    CurrencyChoices,
+    Invoice,
+    PaymentIntent,
+    PaymentIntentStatus,
+    Plan,
+    PlanInterval,
+    RenewalRun,
+    RenewalRunStatus,
+    RenewalShard,
+    RenewalShardStatus,
+    Subscription,
+    SubscriptionStatus,
+)
+from subscriptions.services import PaymentIntentService, RenewalEngine
+from subscriptions.services.billing import billing_lock
+
+
+class RenewalEngineTests(TestCase):
+    def setUp(self):
+        self.override_email = self.settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+        self.override_email.enable()
+        self.addCleanup(self.override_email.disable)
+        self.addCleanup(cache.clear)
+        self.plan = Plan.objects.create(
+            code="renewal",
+            name="Renewal",
+            amount=Decimal("10.000000"),
+            currency=CurrencyChoices.ALGO,
+            interval=PlanInterval.MONTH,
+        )
+        self.user = get_user_model().objects.create_user(
+            email="renewal@example.com",
+            password="pass1234",
+            username="renewal",
+        )
+        self.payments = mock.Mock()
+
+    def _due(self, wallet="WALLET", **kwargs):
+        return Subscription.objects.create(
+            user=self.user,
+            plan=self.plan,
+            status=SubscriptionStatus.ACTIVE,
+            wallet_address=wallet,
+            current_period_start=timezone.now() - timedelta(days=30),
+            current_period_end=timezone.now() - timedelta(minutes=5),
+            **kwargs,
+        )
+
+    def _engine(self, **kwargs):
+        kwargs.setdefault("shard_size", 2)
+        kwargs.setdefault("wallet_wait_seconds", 0)
+        return RenewalEngine(payment_service=self.payments, **kwargs)
+
+    def test_run_processes_every_shard_and_completes(self):
+        renewed = [self._due(wallet=f"W{i}") for i in range(3)]
+        canceled = self._due(wallet="W-cancel", cancel_at_period_end=True)
+        failing = self._due(wallet="W-fail")
+
+        def process_invoice(invoice, **kwargs):
+            if invoice.subscription_id == failing.id:
+                raise SwapExecutionError("swap failed")
+
+        self.payments.process_invoice.side_effect = process_invoice
+
+        run = self._engine().run()
+
+        self.assertEqual(run.status, RenewalRunStatus.COMPLETED)
+        self.assertEqual(run.total_due, 5)
+        self.assertEqual(run.shards.count(), 3)
+        self.assertFalse(run.shards.exclude(status=RenewalShardStatus.COMPLETED).exists())
+        for subscription in renewed:
+            subscription.refresh_from_db()
+            self.assertGreater(subscription.current_period_end, timezone.now())
+        canceled.refresh_from_db()
+        failing.refresh_from_db()
+        self.assertEqual(canceled.status, SubscriptionStatus.CANCELED)
+        self.assertEqual(failing.status, SubscriptionStatus.PAST_DUE)
+        self.assertEqual(sum(run.shards.values_list("renewed", flat=True)), 3)
+        self.assertEqual(sum(run.shards.values_list("failed", flat=True)), 1)
+
+    def test_resume_skips_work_before_checkpoint(self):
+        first, second, third = (self._due(wallet=f"W{i}") for i in range(3))
+        engine = self._engine(shard_size=3)
+        run = engine.plan_run()
+        RenewalShard.objects.filter(run=run).update(
+            status=RenewalShardStatus.RUNNING,
+            claimed_at=timezone.now() - timedelta(hours=1),
+            checkpoint_subscription_id=first.id,
+        )
+
+        resumed = engine.run()
+
+        self.assertEqual(resumed.pk, run.pk)
+        self.assertFalse(Invoice.objects.filter(subscription=first).exists())
+        self.assertEqual(Invoice.objects.filter(subscription__in=[second, third]).count(), 2)
+        self.assertEqual(RenewalRun.objects.count(), 1)
+
+    def test_checkpoint_stops_before_a_deferred_renewal(self):
+        first, busy, third = (self._due(wallet=wallet) for wallet in ("W1", "SHARED", "W3"))
+        cache.add("renewals:wallet:SHARED:0", "other-worker")
+
+        run = self._engine(shard_size=3).run()
+
+        shard = run.shards.get()
+        self.assertEqual((shard.status, shard.checkpoint_subscription_id), (RenewalShardStatus.PENDING, first.id))
+        self.assertEqual((shard.renewed, shard.deferred), (2, 1))
+        busy.refresh_from_db()
+        self.assertLess(busy.current_period_end, timezone.now())
+
+    def test_busy_wallet_is_deferred(self):
+        subscription = self._due(wallet="SHARED")
+        cache.add("renewals:wallet:SHARED:0", "other-worker")
+
+        run = self._engine().run()
+
+        subscription.refresh_from_db()
+        self.assertEqual(subscription.status, SubscriptionStatus.ACTIVE)
+        self.assertFalse(self.payments.process_invoice.called)
+        self.assertFalse(Invoice.objects.filter(subscription=subscription).exists())
+        self.assertEqual(run.status, RenewalRunStatus.RUNNING)
+        self.assertEqual(run.shards.get().deferred, 1)
+        self.assertEqual(run.shards.get().status, RenewalShardStatus.PENDING)
+
+        cache.delete("renewals:wallet:SHARED:0")
+        resumed = self._engine().run()
+
+        self.assertEqual(resumed.pk, run.pk)
+        self.assertEqual(resumed.status, RenewalRunStatus.COMPLETED)
+        subscription.refresh_from_db()
+        self.assertGreater(subscription.current_period_end, timezone.now())
+        self.assertEqual(Invoice.objects.filter(subscription=subscription).count(), 1)
+
+    def test_deferred_and_skipped_renewals_leave_no_invoice(self):
+        busy = self._due(wallet="SHARED")
+        renewed_elsewhere = self._due(wallet="W-elsewhere")
+        cache.add("renewals:wallet:SHARED:0", "other-worker")
+        engine = self._engine(shard_size=2)
+        run = engine.plan_run()
+        # Another worker renews this row between planning and processing.
+        Subscription.objects.filter(pk=renewed_elsewhere.pk).update(
+            current_period_end=timezone.now() + timedelta(days=30)
+        )
+
+        for aggregate in (False, True):
+            with self.subTest(aggregate_swaps=aggregate):
+                engine.aggregate_swaps = aggregate
+                RenewalShard.objects.filter(run=run).update(status=RenewalShardStatus.PENDING)
+                engine.work(run.id)
+
+                self.assertFalse(Invoice.objects.filter(subscription__in=[busy, renewed_elsewhere]).exists())
+                self.assertEqual(run.shards.get().status, RenewalShardStatus.PENDING)
+
+    def test_aggregated_swaps_bill_a_shard_in_one_combined_swap(self):
+        renewed = [self._due(wallet=f"W{i}") for i in range(3)]
+        canceled = self._due(wallet="W-cancel", cancel_at_period_end=True)
+        swaps = []
+
+        def combined_swap(transactions):
+            swaps.append(len(transactions))
+            Transaction.objects.filter(pk__in=[txn.pk for txn in transactions]).update(
+                usdc_received=Decimal("0.500000"), swap_completed=True, status=TransactionStatus.CONFIRMED
+            )
+            return SwapBatch.objects.create(
+                status=SwapBatchStatus.EXECUTED,
+                amount_algo=sum(txn.amount for txn in transactions),
+                request_count=len(transactions),
+                tx_ids=["GROUP"],
+            )
+
+        payments = PaymentIntentService(batch_swap_executor=combined_swap)
+        run = RenewalEngine(payment_service=payments, shard_size=10, wallet_wait_seconds=0, aggregate_swaps=True).run()
+
+        self.assertEqual(swaps, [3])
+        shard = run.shards.get()
+        self.assertEqual((shard.renewed, shard.canceled, shard.failed), (3, 1, 0))
+        for subscription in renewed:
+            intent = PaymentIntent.objects.get(invoice__subscription=subscription)
+            self.assertEqual(intent.swap_tx_ids, ["GROUP"])
+            self.assertEqual(intent.usdc_received, Decimal("0.500000"))
+        canceled.refresh_from_db()
+        self.assertEqual(canceled.status, SubscriptionStatus.CANCELED)
+
+    def test_failed_combined_swap_marks_every_member_past_due(self):
+        members = [self._due(wallet=f"W{i}") for i in range(2)]
+
+        def failing_swap(transactions):
+            raise SwapExecutionError("pool drained")
+
+        payments = PaymentIntentService(batch_swap_executor=failing_swap)
+        run = RenewalEngine(payment_service=payments, wallet_wait_seconds=0, aggregate_swaps=True).run()
+
+        self.assertEqual(run.shards.get().failed, 2)
+        for subscription in members:
+            subscription.refresh_from_db()
+            self.assertEqual(subscription.status, SubscriptionStatus.PAST_DUE)
+
+    def test_late_error_keeps_the_committed_swap_records(self):
+        # Other suites reload payments.services; use the module object that is current now.
+        services = importlib.import_module("payments.services")
+        patcher = mock.patch.object(
+            services, "_swap_with_retries", return_value={"usdc_received": 1_000_000, "tx_ids": ["GROUP"]}
+        )
+        mock_swap = patcher.start()
+        self.addCleanup(patcher.stop)
+        renewed, broken = self._due(wallet="W1"), self._due(wallet="W2")
+
+        def batched_engine():
+            payments = PaymentIntentService(batch_swap_executor=services.execute_batched_algo_to_usdc_swap)
+            return RenewalEngine(payment_service=payments, wallet_wait_seconds=0, aggregate_swaps=True)
+
+        engine = batched_engine()
+        advance_period = engine.lifecycle.advance_period
+
+        def advance(subscription):
+            if subscription.pk == broken.pk:
+                raise RuntimeError("database went away")
+            advance_period(subscription)
+
+        with mock.patch.object(engine.lifecycle, "advance_period", side_effect=advance):
+            run = engine.run()
+
+        mock_swap.assert_called_once()
+        batch = SwapBatch.objects.get()
+        self.assertEqual((batch.status, batch.allocations.count()), (SwapBatchStatus.EXECUTED, 2))
+        self.assertEqual(Transaction.objects.filter(swap_completed=True).count(), 2)
+        shard = run.shards.get()
+        self.assertEqual((shard.renewed, shard.failed), (1, 1))
+        renewed.refresh_from_db()
+        broken.refresh_from_db()
+        self.assertGreater(renewed.current_period_end, timezone.now())
+        self.assertEqual(broken.status, SubscriptionStatus.ACTIVE)
+        # The swap already ran for it, so the intent stays processing and no later run swaps again.
+        self.assertEqual(PaymentIntent.objects.get(invoice__subscription=broken).status, PaymentIntentStatus.PROCESSING)
+        batched_engine().run(resume=False)
+        mock_swap.assert_called_once()
+
+    @mock.patch("subscriptions.management.commands.renew_subscriptions.PaymentIntentService")
+    def test_command_reports_run_summary(self, mock_payment_service):
+        self._due()
+        self._due(wallet="W-cancel", cancel_at_period_end=True)
+        out = StringIO()
+
+        call_command("renew_subscriptions", stdout=out)
+
+        self.assertIn("renewed.", out.getvalue())
+        self.assertIn("Renewals: 1 renewed, 0 failed, 1 canceled.", out.getvalue())
+        self.assertTrue(mock_payment_service.return_value.process_invoice.called)
+
+        out = StringIO()
+        call_command("renew_subscriptions", stdout=out)
+        self.assertIn("No subscriptions to renew.", out.getvalue())
+
+    def test_command_respects_the_renewals_billing_lock(self):
+        self._due()
+        out = StringIO()
+
+        with billing_lock("renewals") as acquired:
+            self.assertTrue(acquired)
+            call_command("renew_subscriptions", stdout=out)
+
+        self.assertIn("Another renewal run is in progress.", out.getvalue())
+        self.assertFalse(Invoice.objects.exists())
+
+    @mock.patch("subscriptions.services.billing._enqueue_chunk")
+    def test_command_enqueues_renewal_chunks_for_celery(self, enqueue):
+        subscription = self._due()
+        out = StringIO()
+
+        call_command("renew_subscriptions", "--backend", "celery", stdout=out)
+
+        self.assertIn("Enqueued 1 renewal chunk(s)", out.getvalue())
+        pipeline, claimed = enqueue.call_args.args
+        self.assertEqual((pipeline.name, [item[0] for item in claimed]), ("renewals", [subscription.id]))
@@ -0,0 +1,179 @@
+from decimal import Decimal
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from payments.services import SwapExecutionError
+from subscriptions.models import (
+    CurrencyChoices,
+    Plan,
+    PlanInterval,
+    Subscription,
+    SubscriptionAction,
+    SubscriptionStatus,
+)
+from subscriptions.services import DueWorkScheduler, SubscriptionLifecycleService
+
+
+class DueWorkSchedulerTests(TestCase):
+    def setUp(self):
+        self.override_email = self.settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+        self.override_email.enable()
+        self.addCleanup(self.override_email.disable)
+        self.addCleanup(cache.clear)
+        self.now = timezone.now()
+        self.plan = Plan.objects.create(
+            code="scheduled",
+            name="Scheduled",
+            amount=Decimal("10.000000"),
+            currency=CurrencyChoices.ALGO,
+            interval=PlanInterval.MONTH,
+        )
+        self.trial_plan = Plan.objects.create(
+            code="scheduled-trial",
+            name="Scheduled trial",
+            amount=Decimal("10.000000"),
+            currency=CurrencyChoices.ALGO,
+            interval=PlanInterval.MONTH,
+            trial_days=14,
+        )
+        self.user = get_user_model().objects.create_user(
+            email="scheduler@example.com",
+            password="pass1234",
+            username="scheduler",
+        )
+        self.payments = mock.Mock()
+
+    def _subscription(self, wallet, status, due_in, action, **kwargs):
+        due_at = self.now + due_in
+        kwargs.setdefault("current_period_start", due_at - timedelta(days=30))
+        kwargs.setdefault("current_period_end", due_at)
+        return Subscription.objects.create(
+            user=self.user,
+            plan=self.plan,
+            status=status,
+            wallet_address=wallet,
+            next_action=action,
+            next_action_at=due_at,
+            **kwargs,
+        )
+
+    def _scheduler(self, **kwargs):
+        return DueWorkScheduler(payment_service=self.payments, now=lambda: self.now, **kwargs)
+
+    def test_lifecycle_keeps_next_action_current(self):
+        lifecycle = SubscriptionLifecycleService()
+        subscription = lifecycle.create_subscription(
+            user=self.user, plan=self.trial_plan, wallet_address="WALLET"
+        ).subscription
+        self.assertEqual(subscription.next_action, SubscriptionAction.EXPIRE_TRIAL)
+        self.assertEqual(subscription.next_action_at, subscription.trial_end_at)
+
+        lifecycle.activate_subscription(subscription)
+        lifecycle.cancel_subscription(subscription, at_period_end=True)
+        subscription.refresh_from_db()
+        self.assertEqual(subscription.next_action, SubscriptionAction.CANCEL)
+        self.assertEqual(subscription.next_action_at, subscription.current_period_end)
+
+        lifecycle.cancel_subscription(subscription, at_period_end=False)
+        subscription.refresh_from_db()
+        self.assertEqual(subscription.next_action, "")
+        self.assertIsNone(subscription.next_action_at)
+
+    def test_tick_runs_every_kind_of_due_work(self):
+        trial = self._subscription(
+            "W-trial",
+            SubscriptionStatus.TRIALING,
+            -timedelta(hours=3),
+            SubscriptionAction.EXPIRE_TRIAL,
+            trial_end_at=self.now - timedelta(hours=3),
+        )
+        renewing = self._subscription("W-renew", SubscriptionStatus.ACTIVE, -timedelta(hours=2), SubscriptionAction.RENEW)
+        canceling = self._subscription(
+            "W-cancel",
+            SubscriptionStatus.ACTIVE,
+            -timedelta(hours=1),
+            SubscriptionAction.CANCEL,
+            cancel_at_period_end=True,
+        )
+        retrying = self._subscription(
+            "W-retry", SubscriptionStatus.PAST_DUE, -timedelta(minutes=5), SubscriptionAction.RETRY_PAYMENT
+        )
+        later = self._subscription("W-later", SubscriptionStatus.ACTIVE, timedelta(days=3), SubscriptionAction.RENEW)
+
+        def process_invoice(invoice, **kwargs):
+            if invoice.subscription_id == retrying.id:
+                raise SwapExecutionError("swap failed")
+
+        self.payments.process_invoice.side_effect = process_invoice
+        scheduler = self._scheduler()
+
+        self.assertEqual(
+            [pk for pk, _ in scheduler.due()], [trial.id, renewing.id, canceling.id, retrying.id]
+        )
+        summary = scheduler.tick()
+
+        self.assertEqual(
+            summary,
+            {
+                SubscriptionAction.EXPIRE_TRIAL: {"activated": 1},
+                SubscriptionAction.RENEW: {"renewed": 1},
+                SubscriptionAction.CANCEL: {"canceled": 1},
+                SubscriptionAction.RETRY_PAYMENT: {"failed": 1},
+            },
+        )
+        for subscription in (trial, renewing, canceling, retrying, later):
+            subscription.refresh_from_db()
+        self.assertEqual(trial.status, SubscriptionStatus.ACTIVE)
+        self.assertEqual(trial.next_action, SubscriptionAction.RENEW)
+        self.assertGreater(renewing.next_action_at, self.now)
+        self.assertEqual(canceling.status, SubscriptionStatus.CANCELED)
+        self.assertIsNone(canceling.next_action_at)
+        self.assertEqual(retrying.next_action, SubscriptionAction.RETRY_PAYMENT)
+        self.assertGreater(retrying.next_action_at, self.now)
+        self.assertEqual(later.next_action_at, self.now + timedelta(days=3))
+        self.assertEqual(scheduler.due(), [])
+
+    def test_claimed_rows_are_leased(self):
+        subscription = self._subscription("W-1", SubscriptionStatus.ACTIVE, -timedelta(minutes=1), SubscriptionAction.RENEW)
+        scheduler = self._scheduler(lease_seconds=300)
+
+        self.assertEqual(scheduler.claim_batch(), [(subscription.id, SubscriptionAction.RENEW)])
+        self.assertEqual(scheduler.claim_batch(), [])
+        subscription.refresh_from_db()
+        self.assertEqual(subscription.next_action_at, self.now + timedelta(seconds=300))
+
+    def test_stale_claims_are_rescheduled_from_current_state(self):
+        subscription = self._subscription(
+            "W-1",
+            SubscriptionStatus.ACTIVE,
+            -timedelta(minutes=1),
+            SubscriptionAction.EXPIRE_TRIAL,
+            current_period_end=self.now + timedelta(days=20),
+        )
+
+        summary = self._scheduler().tick()
+
+        self.assertEqual(summary, {SubscriptionAction.EXPIRE_TRIAL: {"skipped": 1}})
+        subscription.refresh_from_db()
+        self.assertEqual(subscription.next_action, SubscriptionAction.RENEW)
+        self.assertEqual(subscription.next_action_at, subscription.current_period_end)
+
+    @mock.patch("subscriptions.services.scheduler.PaymentIntentService")
+    def test_command_reports_outcomes(self, mock_payment_service):
+        out = StringIO()
+        call_command("run_scheduler", stdout=out)
+        self.assertIn("No due work.", out.getvalue())
+
+        self._subscription("W-1", SubscriptionStatus.ACTIVE, -timedelta(minutes=1), SubscriptionAction.RENEW)
+        out = StringIO()
+        call_command("run_scheduler", "--batch-size", "10", stdout=out)
+
+        self.assertIn("renew: 1 renewed.", out.getvalue())
+        self.assertTrue(mock_payment_service.return_value.process_invoice.called)
@@ -3,10 +3,11 @@ from datetime import timedelta
 from unittest import mock
 
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.test import TestCase
 from django.utils import timezone
 
-from payments.models import Transaction
+from payments.models import SwapBatch, SwapBatchStatus, Transaction, TransactionStatus
 from notifications.models import Notification
 from subscriptions.models import (
     Coupon,
@@ -20,12 +21,21 @@ from subscriptions.models import (
     Subscription,
     SubscriptionStatus,
 )
-from subscriptions.services import EventRecorder, InvoiceService, PaymentIntentService, SubscriptionLifecycleService
+from subscriptions.services import (
+    BufferedEventRecorder,
+    EventRecorder,
+    InvoiceService,
+    PaymentIntentService,
+    SubscriptionLifecycleService,
+)
 
 
 class SubscriptionLifecycleServiceTests(TestCase):
     def setUp(self):
-        self.override_email = self.settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+        self.override_email = self.settings(
+            EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+            NOTIFICATION_OUTBOX_ASYNC=False,
+        )
         self.override_email.enable()
         self.addCleanup(self.override_email.disable)
         self.plan = Plan.objects.create(
@@ -45,11 +55,12 @@ class SubscriptionLifecycleServiceTests(TestCase):
         self.lifecycle = SubscriptionLifecycleService()
 
     def test_create_subscription_with_trial(self):
-        result = self.lifecycle.create_subscription(
-            user=self.user,
-            plan=self.plan,
-            wallet_address="WALLET",
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            result = self.lifecycle.create_subscription(
+                user=self.user,
+                plan=self.plan,
+                wallet_address="WALLET",
+            )
 
         subscription = result.subscription
         self.assertEqual(subscription.status, SubscriptionStatus.TRIALING)
@@ -61,13 +72,58 @@ class SubscriptionLifecycleServiceTests(TestCase):
         subscription = self.lifecycle.create_subscription(
             user=self.user, plan=self.plan, wallet_address="WALLET"
         ).subscription
-        self.lifecycle.cancel_subscription(subscription, at_period_end=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lifecycle.cancel_subscription(subscription, at_period_end=False)
         subscription.refresh_from_db()
         self.assertEqual(subscription.status, SubscriptionStatus.CANCELED)
         self.assertTrue(EventLog.objects.filter(event_type="subscription.canceled").exists())
         self.assertEqual(Notification.objects.filter(user=self.user).count(), 2)
 
 
+class BufferedEventRecorderTests(TestCase):
+    def _record(self, recorder, event_type):
+        recorder.record(event_type, resource_type="subscription", resource_id=1)
+
+    def test_events_are_inserted_together_on_commit(self):
+        recorder = BufferedEventRecorder()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                for event_type in ("subscription.created", "invoice.paid", "subscription.renewed"):
+                    self._record(recorder, event_type)
+            self.assertEqual(EventLog.objects.count(), 0)
+            self.assertEqual(recorder.pending(), 3)
+
+        with self.assertNumQueries(1):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(EventLog.objects.count(), 3)
+        self.assertEqual(recorder.pending(), 0)
+
+    def test_rolled_back_savepoint_drops_its_events(self):
+        recorder = BufferedEventRecorder()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self._record(recorder, "invoice.created")
+                try:
+                    with transaction.atomic():
+                        self._record(recorder, "invoice.paid")
+                        raise RuntimeError("swap failed")
+                except RuntimeError:
+                    pass
+
+        self.assertEqual(list(EventLog.objects.values_list("event_type", flat=True)), ["invoice.created"])
+
+    def test_sync_mode_saves_immediately(self):
+        with self.settings(EVENT_RECORDER_SYNC=True):
+            recorder = BufferedEventRecorder()
+
+        self._record(recorder, "subscription.created")
+
+        self.assertEqual(EventLog.objects.count(), 1)
+
+
 class InvoiceServiceTests(TestCase):
     def setUp(self):
         self.override_email = self.settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
@@ -109,10 +165,48 @@ class InvoiceServiceTests(TestCase):
         self.assertEqual(invoice.total, Decimal("18.000000"))
         self.assertEqual(invoice.line_items.count(), 1)
 
+    def test_create_invoices_bulk_matches_single_invoice_totals(self):
+        coupon = Coupon.objects.create(
+            code="BULK10",
+            percent_off=Decimal("10"),
+            currency=CurrencyChoices.ALGO,
+            duration="once",
+        )
+        self.subscription.coupon = coupon
+        other = Subscription.objects.create(
+            user=self.user,
+            plan=self.plan,
+            status=SubscriptionStatus.ACTIVE,
+            wallet_address="INVWALLET",
+            quantity=3,
+            current_period_start=timezone.now(),
+            current_period_end=timezone.now() + timedelta(days=30),
+        )
+
+        with self.assertNumQueries(5):  # price tiers of every plan are loaded together
+            invoices = self.service.create_invoices_bulk([self.subscription, other], status=InvoiceStatus.OPEN)
+
+        discounted, plain = invoices
+        self.assertEqual(discounted.total, Decimal("18.000000"))
+        self.assertEqual(plain.total, Decimal("60.000000"))
+        self.assertEqual(plain.line_items.get().quantity, 3)
+        self.assertEqual(Invoice.objects.get(pk=discounted.pk).platform_fee, discounted.platform_fee)
+
+    def test_create_invoices_bulk_reuses_open_invoice_for_period(self):
+        first = self.service.create_invoices_bulk([self.subscription], status=InvoiceStatus.OPEN)[0]
+
+        again = self.service.create_invoices_bulk([self.subscription], status=InvoiceStatus.OPEN, reuse_open=True)[0]
+
+        self.assertEqual(again.pk, first.pk)
+        self.assertEqual(Invoice.objects.filter(subscription=self.subscription).count(), 1)
+
 
 class PaymentIntentServiceTests(TestCase):
     def setUp(self):
-        self.override_email = self.settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+        self.override_email = self.settings(
+            EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+            NOTIFICATION_OUTBOX_ASYNC=False,
+        )
         self.override_email.enable()
         self.addCleanup(self.override_email.disable)
         self.plan = Plan.objects.create(
@@ -187,3 +281,65 @@ class PaymentIntentServiceTests(TestCase):
         self.assertEqual(self.invoice.status, InvoiceStatus.OPEN)
         self.assertTrue(EventLog.objects.filter(event_type="invoice.payment_failed").exists())
         self.assertEqual(Notification.objects.filter(user=self.user).count(), 1)
+
+    def _pay_merchant(self):
+        self.plan.payout_wallet_address = "MERCHANTWALLET"
+        self.plan.save(update_fields=["payout_wallet_address"])
+
+    @mock.patch("subscriptions.services.payment.disburse_transaction_funds")
+    def test_single_payout_is_sent_once_the_payment_commits(self, disburse):
+        self._pay_merchant()
+        service = PaymentIntentService(
+            event_recorder=EventRecorder(),
+            swap_executor=mock.Mock(return_value={"usdc_received": 950_000, "tx_ids": ["TX123"]}),
+            swap_error_class=Exception,
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    service.process_invoice(self.invoice)
+                    raise RuntimeError("renewal failed")
+        disburse.assert_not_called()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            service.process_invoice(self.invoice)
+            disburse.assert_not_called()
+        disburse.assert_called_once()
+
+    @mock.patch("subscriptions.services.payment.PayoutBatcher")
+    def test_committed_payouts_are_flushed_when_a_later_outcome_raises(self, payout_batcher):
+        self._pay_merchant()
+        second = Invoice.objects.create(
+            subscription=self.subscription,
+            user=self.user,
+            number="INV-PI-2",
+            status=InvoiceStatus.OPEN,
+            currency=CurrencyChoices.ALGO,
+            subtotal=self.plan.amount,
+            total=self.plan.amount,
+        )
+
+        def combined_swap(transactions):
+            Transaction.objects.filter(pk__in=[txn.pk for txn in transactions]).update(
+                usdc_received=Decimal("1"), swap_completed=True, status=TransactionStatus.CONFIRMED
+            )
+            return SwapBatch.objects.create(
+                status=SwapBatchStatus.EXECUTED, amount_algo=Decimal("200"), request_count=2, tx_ids=["GROUP"]
+            )
+
+        def on_outcome(outcome):
+            if outcome.invoice.pk == second.pk:
+                raise RuntimeError("database went away")
+
+        service = PaymentIntentService(event_recorder=EventRecorder(), batch_swap_executor=combined_swap)
+        with self.assertRaises(RuntimeError):
+            service.process_invoices([self.invoice, second], on_outcome=on_outcome)
+
+        payouts = payout_batcher.return_value
+        queued = [call.args[0] for call in payouts.add.call_args_list]
+        # Transactions are created in invoice order; only the committed first invoice queues its payout.
+        self.assertEqual(queued, [Transaction.objects.order_by("pk").first()])
+        payouts.flush.assert_called_once()
+        second.refresh_from_db()
+        self.assertEqual(second.status, InvoiceStatus.OPEN)
@@ -5,10 +5,12 @@ from .views import (
     CheckoutSessionViewSet,
     CouponViewSet,
     EventLogViewSet,
+    ForecastReportView,
     InvoiceViewSet,
     PlanViewSet,
     PlanPublicRetrieveView,
     SubscriptionViewSet,
+    UsageIngestView,
 )
 
 router = DefaultRouter()
@@ -21,5 +23,7 @@ router.register(r"checkout-sessions", CheckoutSessionViewSet, basename="checkout
 
 urlpatterns = [
     path("plans/public/<slug:code>/", PlanPublicRetrieveView.as_view(), name="plan-public-detail"),
+    path("reports/forecast/", ForecastReportView.as_view(), name="forecast-report"),
+    path("usage/", UsageIngestView.as_view(), name="usage-ingest"),
     path("", include(router.urls)),
 ]
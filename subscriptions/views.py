@@ -1,7 +1,5 @@
-import base64
-import io
-
 from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from rest_framework import permissions, status, viewsets
@@ -10,9 +8,10 @@ from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.views import APIView
 
+from analytics.rollups import MetricsRecorder
 from payments.services import SwapExecutionError
 from payments.models import TransactionType
-import qrcode
+from payments.qr import CONTENT_TYPES as QR_CONTENT_TYPES, qr_code_url
 from .models import (
     CheckoutSession,
     CheckoutSessionStatus,
@@ -25,6 +24,7 @@ from .models import (
     SubscriptionStatus,
 )
 from .serializers import (
+    BatchPriceSerializer,
     CouponSerializer,
     CheckoutSessionSerializer,
     EventLogSerializer,
@@ -34,7 +34,15 @@ from .serializers import (
     SubscriptionSerializer,
     PaymentIntentSerializer,
 )
-from .services import InvoiceService, PaymentIntentService, SubscriptionLifecycleService
+from .services import (
+    InvoiceService,
+    PaymentIntentService,
+    PricingEngine,
+    RenewalForecaster,
+    SubscriptionLifecycleService,
+)
+from .services.forecasting import DEFAULT_HORIZONS
+from .services.metering import UnmeteredSubscriptionError, UsageIngestError, UsageIngestor
 
 
 def execute_subscription_checkout(
@@ -102,7 +110,7 @@ class PlanViewSet(viewsets.ModelViewSet):
     serializer_class = PlanSerializer
 
     def get_permissions(self):
-        if self.action in ["list", "retrieve"]:
+        if self.action in ["list", "retrieve", "price"]:
             return [permissions.AllowAny()]
         return [permissions.IsAuthenticated()]
 
@@ -110,7 +118,7 @@ class PlanViewSet(viewsets.ModelViewSet):
         queryset = Plan.objects.all()
         user = getattr(self.request, "user", None)
 
-        if self.action in ["list", "retrieve"]:
+        if self.action in ["list", "retrieve", "price"]:
             if user and user.is_authenticated:
                 if user.is_staff:
                     return queryset
@@ -127,27 +135,52 @@ class PlanViewSet(viewsets.ModelViewSet):
             payout_address = getattr(self.request.user, "wallet_address", "")
         serializer.save(created_by=self.request.user, payout_wallet_address=payout_address or "")
 
+    def perform_update(self, serializer):
+        # Amount and tier mode edits reprice every live subscription on the plan.
+        subscribers = Subscription.objects.filter(plan=serializer.instance)
+        with transaction.atomic(), MetricsRecorder().pricing_changes(subscribers):
+            serializer.save()
+
+    @action(detail=False, methods=["post"])
+    def price(self, request):
+        """Price many ``{"plan": id, "quantity": n}`` items at once, loading every plan's tiers together."""
+        serializer = BatchPriceSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data["items"]
+
+        plans = self.get_queryset().in_bulk({item["plan"] for item in items})
+        missing = sorted({item["plan"] for item in items} - set(plans))
+        if missing:
+            return Response({"detail": f"Unknown plans: {missing}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        quotes = PricingEngine().price_many([(plans[item["plan"]], item["quantity"]) for item in items])
+        return Response(
+            {
+                "items": [
+                    {
+                        "plan": quote.plan_id,
+                        "quantity": quote.quantity,
+                        "currency": plans[quote.plan_id].currency,
+                        "tiers_mode": quote.tiers_mode,
+                        "unit_amount": str(quote.unit_amount),
+                        "total": str(quote.total),
+                    }
+                    for quote in quotes
+                ]
+            }
+        )
+
     @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated])
     def share(self, request, pk=None):
         plan = self.get_object()
         if not request.user.is_staff and plan.created_by_id != request.user.id:
             raise PermissionDenied("You can only share plans you created.")
 
+        fmt = request.query_params.get("qr_format", "png")
+        if fmt not in QR_CONTENT_TYPES:
+            return Response({"detail": "qr_format must be png or svg."}, status=status.HTTP_400_BAD_REQUEST)
         share_url = f"{settings.CHECKOUT_BASE_URL.rstrip('/')}/pay?plan={plan.code}"
-        qr = qrcode.QRCode(box_size=4, border=2)
-        qr.add_data(share_url)
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-        buffer = io.BytesIO()
-        img.save(buffer, format="PNG")
-        qr_base64 = base64.b64encode(buffer.getvalue()).decode("ascii")
-
-        return Response(
-            {
-                "share_url": share_url,
-                "qr_code": f"data:image/png;base64,{qr_base64}",
-            }
-        )
+        return Response({"share_url": share_url, "qr_code_url": qr_code_url(request, share_url, fmt)})
 
 
 class SubscriptionViewSet(viewsets.ModelViewSet):
@@ -206,6 +239,12 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
         headers = self.get_success_headers(subscription_data)
         return Response(data, status=status.HTTP_201_CREATED, headers=headers)
 
+    def perform_update(self, serializer):
+        # Plan and quantity edits reprice the subscription's MRR.
+        subscription = Subscription.objects.filter(pk=serializer.instance.pk)
+        with transaction.atomic(), MetricsRecorder().pricing_changes(subscription):
+            serializer.save()
+
     @action(detail=True, methods=["post"])
     def cancel(self, request, pk=None):
         subscription = self.get_object()
@@ -286,6 +325,49 @@ class EventLogViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.IsAdminUser]
 
 
+class ForecastReportView(APIView):
+    """Renewal, churn-adjusted revenue and swap-volume projections (admin only)."""
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        raw_horizons = request.query_params.get("horizons", "")
+        try:
+            horizons = [int(value) for value in raw_horizons.split(",") if value.strip()] or list(DEFAULT_HORIZONS)
+        except ValueError:
+            return Response({"detail": "horizons must be a comma-separated list of days."}, status=status.HTTP_400_BAD_REQUEST)
+        if any(days <= 0 for days in horizons):
+            return Response({"detail": "horizons must be positive."}, status=status.HTTP_400_BAD_REQUEST)
+
+        refresh = request.query_params.get("refresh", "").lower() in {"1", "true", "yes"}
+        report = RenewalForecaster().cached_forecast(horizons, refresh=refresh)
+        return Response(report)
+
+
+class UsageIngestView(APIView):
+    """
+    Append usage events for metered subscriptions, sent as JSON lines.
+
+    Callers report usage for subscriptions to the plans they created (staff for any).
+    A batch naming a subscription whose plan is not metered is refused with a 400.
+    Events already stored under the same idempotency key are counted as duplicates.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        subscriptions = Subscription.objects.all()
+        if not request.user.is_staff:
+            subscriptions = subscriptions.filter(plan__created_by=request.user)
+        try:
+            result = UsageIngestor().ingest(request.body, subscriptions=subscriptions)
+        except UnmeteredSubscriptionError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except UsageIngestError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        return Response(result.as_dict())
+
+
 class CheckoutSessionViewSet(viewsets.ModelViewSet):
     serializer_class = CheckoutSessionSerializer
     permission_classes = [permissions.IsAuthenticated]